@@ -0,0 +1,194 @@
+"""
+缓存工具模块
+提供进程内 LRU+TTL 缓存、版本计数器，以及可选的 Redis 共享后端
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from backend.core.config import get_settings
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis 为可选依赖
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class TTLCache:
+    """线程安全的进程内 LRU 缓存，每个条目带过期时间"""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 300, timer: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """读取条目，过期条目视为不存在"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= self._timer():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """写入条目，超出容量时淘汰最久未使用的条目"""
+        expires_at = self._timer() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """删除条目"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisBackend:
+    """基于 Redis 的共享缓存后端，所有操作失败时只记录日志并降级"""
+
+    def __init__(self, client: Any, prefix: str = "aiad"):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get_json(self, key: str) -> Any:
+        """读取 JSON 值，不存在或出错时返回 MISSING"""
+        try:
+            raw = self.client.get(self._key(key))
+        except Exception as e:
+            logger.warning(f"Shared cache get failed: {e}")
+            return MISSING
+        if raw is None:
+            return MISSING
+        return json.loads(raw)
+
+    def set_json(self, key: str, value: Any, ttl: float) -> None:
+        """写入 JSON 值"""
+        try:
+            self.client.set(self._key(key), json.dumps(value, default=str), ex=max(int(ttl), 1))
+        except Exception as e:
+            logger.warning(f"Shared cache set failed: {e}")
+
+    def get_counters(self, names: List[str]) -> Optional[List[int]]:
+        """批量读取计数器，出错时返回 None"""
+        try:
+            values = self.client.mget([self._key(name) for name in names])
+        except Exception as e:
+            logger.warning(f"Shared counter read failed: {e}")
+            return None
+        return [int(value or 0) for value in values]
+
+    def incr_counters(self, names: Iterable[str]) -> Optional[List[int]]:
+        """批量递增计数器，返回递增后的值，出错时返回 None"""
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for name in names:
+                pipe.incr(self._key(name))
+            return [int(value) for value in pipe.execute()]
+        except Exception as e:
+            logger.warning(f"Shared counter bump failed: {e}")
+            return None
+
+
+class VersionCounter:
+    """命名版本计数器
+
+    写路径调用 ``bump`` 递增相关计数器，读路径把 ``token`` 存入缓存条目，
+    计数器变化后旧条目自然失效。本地计数器带进程纪元前缀，重启后不会与旧值混淆。
+    """
+
+    def __init__(self, backend: Optional[RedisBackend] = None, namespace: str = "ver"):
+        self.backend = backend
+        self.namespace = namespace
+        self.epoch = uuid.uuid4().hex[:8]
+        self._local: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _names(self, names: Iterable[str]) -> List[str]:
+        return [f"{self.namespace}:{name}" for name in names]
+
+    def token(self, names: Iterable[str]) -> str:
+        """返回一组计数器的当前版本标识"""
+        names = list(names)
+        if self.backend is not None:
+            values = self.backend.get_counters(self._names(names))
+            if values is not None:
+                return "r:" + ".".join(str(value) for value in values)
+        with self._lock:
+            values = [self._local.get(name, 0) for name in names]
+        return f"{self.epoch}:" + ".".join(str(value) for value in values)
+
+    def tokens(self, names: Iterable[str]) -> Dict[str, str]:
+        """逐个返回计数器的版本标识，共享后端只读取一次；单项结果与 ``token([name])`` 相同"""
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+        if self.backend is not None:
+            values = self.backend.get_counters(self._names(names))
+            if values is not None:
+                return {name: f"r:{value}" for name, value in zip(names, values)}
+        with self._lock:
+            return {name: f"{self.epoch}:{self._local.get(name, 0)}" for name in names}
+
+    def bump(self, names: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+        """递增计数器，本地与共享后端同时更新
+
+        Returns:
+            每个计数器递增前后的单项版本标识；调用方据此判断缓存条目是否只错过了本次递增
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+        with self._lock:
+            changes = {}
+            for name in names:
+                value = self._local.get(name, 0) + 1
+                self._local[name] = value
+                changes[name] = (f"{self.epoch}:{value - 1}", f"{self.epoch}:{value}")
+        if self.backend is not None:
+            values = self.backend.incr_counters(self._names(names))
+            if values is not None:
+                changes = {name: (f"r:{value - 1}", f"r:{value}") for name, value in zip(names, values)}
+        return changes
+
+
+@lru_cache(maxsize=1)
+def get_shared_backend() -> Optional[RedisBackend]:
+    """根据 settings.redis_url 创建共享后端，未配置或不可用时返回 None"""
+    url = get_settings().redis_url
+    if not url or redis is None:
+        return None
+    try:
+        client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+    except Exception as e:
+        logger.warning(f"Shared cache backend unavailable: {e}")
+        return None
+    return RedisBackend(client)
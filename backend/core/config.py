@@ -6,7 +6,7 @@ AI财务系统配置管理模块
 import os
 import secrets
 from functools import lru_cache
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import validator, Field
 from pydantic_settings import BaseSettings
@@ -47,11 +47,15 @@ class Settings(BaseSettings):
     jwt_access_token_expire_minutes: int = Field(30, ge=5, le=1440, description="JWT访问令牌过期时间（分钟）")
     jwt_refresh_token_expire_days: int = Field(7, ge=1, le=365, description="JWT刷新令牌过期时间（天）")
     encryption_key: str = Field(..., min_length=32, description="数据加密密钥")
+    password_hash_max_workers: int = Field(4, ge=1, le=64, description="密码哈希线程池大小，即同时进行的哈希计算上限")
+    password_hash_rounds: int = Field(12, ge=4, le=16, description="bcrypt 计算轮数（log2）")
 
     # Supabase配置
     supabase_url: str = Field(..., description="Supabase项目URL")
     supabase_anon_key: str = Field(..., min_length=20, description="Supabase匿名密钥")
     supabase_service_role_key: str = Field(..., min_length=20, description="Supabase服务角色密钥")
+    login_email_cache_ttl: int = Field(300, ge=0, le=86400, description="登录失败记录中邮箱到用户ID的缓存时间（秒），0 表示不缓存")
+    login_email_negative_ttl: int = Field(60, ge=0, le=86400, description="不存在的邮箱的缓存时间（秒）")
 
     @property
     def supabase_key(self) -> str:
@@ -69,14 +73,50 @@ class Settings(BaseSettings):
     # API配置
     rate_limit: int = Field(100, ge=1, le=10000, description="API限流请求数")
     rate_window: int = Field(60, ge=1, le=3600, description="API限流时间窗口（秒）")
+    rate_limit_enabled: bool = Field(True, description="是否启用API限流")
+    rate_limit_heavy: int = Field(10, ge=1, le=10000, description="重型接口（导出、统计、自动对账、导入）限流请求数")
+    rate_limit_heavy_window: int = Field(60, ge=1, le=3600, description="重型接口限流时间窗口（秒）")
+    rate_limit_trusted_proxies: List[str] = Field(default_factory=list, description="可信反向代理地址或网段，仅来自这些地址的请求按 X-Forwarded-For / X-Real-IP 取客户端IP（限流与请求、审计日志共用）")
+    id_node_id: Optional[int] = Field(None, ge=0, le=9999, description="单号生成器主机号，每台主机或每个容器须唯一（同一主机上的 worker 由进程号区分）；未配置时取主机名哈希后4位")
     max_file_size: int = Field(10485760, ge=1024, le=104857600, description="最大文件大小（字节）")
 
+    # 缓存配置
+    redis_url: Optional[str] = Field(None, description="Redis连接URL，配置后作为多进程共享缓存后端")
+    report_cache_ttl: int = Field(300, ge=0, le=86400, description="报表结果缓存有效期（秒），0表示关闭")
+    report_cache_max_entries: int = Field(512, ge=1, le=100000, description="进程内报表缓存最大条目数")
+    account_stats_cache_ttl: int = Field(30, ge=0, le=3600, description="广告账户统计缓存有效期（秒），0表示关闭")
+    single_flight_ttl: float = Field(2.0, ge=0, le=60, description="合并并发请求后结果的复用时间（秒），0表示仅合并进行中的请求")
+    permission_scope_cache_ttl: int = Field(300, ge=0, le=86400, description="用户权限数据范围缓存有效期（秒），0表示关闭；配置Redis时按共享版本号即时失效")
+    permission_scope_local_cache_ttl: int = Field(5, ge=0, le=300, description="未配置Redis时权限范围缓存有效期上限（秒），其他进程撤销授权后本进程最长在该时间内仍按旧范围放行")
+
+    # 导出配置
+    export_dir: str = Field("exports", description="异步导出产物目录")
+    export_retention_hours: float = Field(24, gt=0, le=720, description="导出产物保留时间（小时）")
+    export_max_workers: int = Field(2, ge=1, le=32, description="导出后台线程数")
+
+    # 分区配置
+    partition_months_ahead: int = Field(3, ge=1, le=24, description="按月分区表预建的未来月份数")
+    partition_retention_months: int = Field(24, ge=1, le=240, description="在线保留的月份数，更早的分区可分离归档")
+    partition_archive_dir: str = Field("archives", description="分区归档文件目录")
+
+    # 列式分析副本配置（需安装可选依赖 duckdb）
+    analytics_store_enabled: bool = Field(False, description="是否将长周期统计查询路由到本地 DuckDB 列式副本")
+    analytics_store_path: str = Field("analytics/analytics.duckdb", description="DuckDB 列式副本文件路径")
+    analytics_min_days: int = Field(90, ge=1, le=3660, description="统计区间超过该天数时改查列式副本")
+    analytics_max_staleness_minutes: int = Field(60, ge=1, le=10080, description="列式副本最近同步超过该分钟数时回退查询主库")
+
     # 日志配置
     log_level: str = Field("INFO", pattern="^(DEBUG|INFO|WARNING|ERROR|CRITICAL)$", description="日志级别")
-
-    @validator("allowed_origins", pre=True)
+    log_batch_size: int = Field(200, ge=1, le=10000, description="异步操作日志每批写入条数")
+    log_flush_interval: float = Field(1.0, gt=0, le=60, description="异步操作日志攒批最长等待时间（秒）")
+    log_sample_rates: Dict[str, float] = Field(default_factory=dict, description="成功请求日志按路由前缀的采样率，JSON对象")
+    log_default_sample_rate: float = Field(1.0, ge=0, le=1, description="未配置路由的成功请求日志采样率")
+    log_error_burst: int = Field(5, ge=1, le=10000, description="相同错误日志在窗口内最多输出条数")
+    log_error_window: float = Field(60.0, gt=0, le=3600, description="相同错误日志限流窗口（秒）")
+
+    @validator("allowed_origins", "rate_limit_trusted_proxies", pre=True)
     def parse_allowed_origins(cls, v: Any) -> List[str]:
-        """解析允许的源地址列表"""
+        """解析允许的源地址列表、可信代理列表"""
         if isinstance(v, str) and v.strip().startswith("["):
             import json
             return json.loads(v)
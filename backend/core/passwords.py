@@ -0,0 +1,84 @@
+"""
+密码哈希
+bcrypt 刻意耗时（默认轮数约 250ms），在事件循环内直接调用会阻塞同一进程的所有请求；
+哈希与校验统一提交到有界线程池执行（bcrypt 计算期间释放 GIL），线程数即并发上限，
+超出的请求在池内排队而不占用事件循环。未知用户分支校验预先计算的哑哈希，保持与真实校验耗时一致
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+import bcrypt
+
+from backend.core.config import get_settings
+
+
+class PasswordHasher:
+    """在专用线程池中执行 bcrypt 哈希与校验"""
+
+    def __init__(self, max_workers: int = 4, rounds: int = 12):
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._dummy_lock = threading.Lock()
+        self._dummy_hash: Optional[bytes] = None
+        # 启动时在池内预先计算哑哈希，首个未知用户登录无需额外生成盐与哈希
+        self._executor.submit(self._dummy)
+
+    def hash_sync(self, secret: str) -> str:
+        """同步计算哈希，仅供脚本或已在工作线程中的调用方使用"""
+        return bcrypt.hashpw(secret.encode(), bcrypt.gensalt(self.rounds)).decode()
+
+    def verify_sync(self, secret: str, hashed: Optional[str]) -> bool:
+        """同步校验，哈希缺失或格式非法时视为不匹配"""
+        if not hashed:
+            return False
+        try:
+            return bcrypt.checkpw(secret.encode(), hashed.encode())
+        except ValueError:
+            return False
+
+    def _dummy(self) -> bytes:
+        if self._dummy_hash is None:
+            with self._dummy_lock:
+                if self._dummy_hash is None:
+                    self._dummy_hash = bcrypt.hashpw(b"dummy-password", bcrypt.gensalt(self.rounds))
+        return self._dummy_hash
+
+    def dummy_verify_sync(self, secret: str) -> bool:
+        """对哑哈希做一次完整校验，结果恒为 False"""
+        try:
+            bcrypt.checkpw(secret.encode(), self._dummy())
+        except ValueError:
+            pass
+        return False
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """在哈希线程池中执行任意阻塞的密码学计算"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def hash(self, secret: str) -> str:
+        return await self.run(self.hash_sync, secret)
+
+    async def verify(self, secret: str, hashed: Optional[str]) -> bool:
+        return await self.run(self.verify_sync, secret, hashed)
+
+    async def dummy_verify(self, secret: str) -> bool:
+        """未知用户时调用，耗时与真实校验一致，防止按响应时间枚举账户"""
+        return await self.run(self.dummy_verify_sync, secret)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+@lru_cache(maxsize=1)
+def get_password_hasher() -> PasswordHasher:
+    """按配置创建进程内唯一的密码哈希器"""
+    settings = get_settings()
+    return PasswordHasher(
+        max_workers=settings.password_hash_max_workers,
+        rounds=settings.password_hash_rounds,
+    )
@@ -1,10 +1,65 @@
 from datetime import datetime
+from decimal import Decimal
 from typing import Any, Dict, Optional
+import json
+import re
 import uuid
 
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 为可选依赖
+    orjson = None
+
+
+def _encode_default(obj: Any) -> Any:
+    """序列化器无法直接处理的类型，与 jsonable_encoder 的转换结果保持一致"""
+    if isinstance(obj, Decimal):
+        # 与 fastapi 的 decimal_encoder 一致：整数值输出 int，否则输出 float
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return jsonable_encoder(obj)
+
+
+# 与 JSONResponse.render 相同的标准库参数，保证输出字节一致
+_STDLIB_ENCODER = json.JSONEncoder(
+    ensure_ascii=False,
+    allow_nan=False,
+    indent=None,
+    separators=(",", ":"),
+    default=_encode_default,
+)
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+    # orjson 与标准库仅在科学计数法浮点数（绝对值 <1e-4 或 >=1e16）上格式不同，命中时回退到标准库
+    _FLOAT_FORMAT_MISMATCH = re.compile(rb"[:,\[]-?\d+(?:\.\d+)?[eE]|[:,\[]-?0\.0000")
+
+
+def render_json(content: Any) -> bytes:
+    """一次遍历完成 Decimal/UUID/日期的转换与序列化，输出与 JSONResponse 字节一致"""
+    if orjson is not None:
+        try:
+            rendered = orjson.dumps(content, default=_encode_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # 超出 64 位的整数等 orjson 不支持的值
+            rendered = None
+        if rendered is not None and not _FLOAT_FORMAT_MISMATCH.search(rendered):
+            return rendered
+    return _STDLIB_ENCODER.encode(content).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """直接序列化原始数据的 JSONResponse，无需预先调用 jsonable_encoder"""
+
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
+
 
 class StandardResponse:
     """标准响应格式类"""
@@ -16,11 +71,11 @@ class StandardResponse:
         code: str = "SUCCESS",
         status_code: int = 200,
         meta: Optional[Dict[str, Any]] = None
-    ) -> JSONResponse:
+    ) -> FastJSONResponse:
         """成功响应"""
         content = {
             "success": True,
-            "data": jsonable_encoder(data),
+            "data": data,
             "message": message,
             "code": code,
             "request_id": str(uuid.uuid4()),
@@ -30,7 +85,7 @@ class StandardResponse:
         if meta:
             content["meta"] = meta
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status_code,
             content=content
         )
@@ -42,7 +97,7 @@ class StandardResponse:
         status_code: int = 400,
         details: Optional[Dict[str, Any]] = None,
         meta: Optional[Dict[str, Any]] = None
-    ) -> JSONResponse:
+    ) -> FastJSONResponse:
         """错误响应"""
         content = {
             "success": False,
@@ -59,7 +114,7 @@ class StandardResponse:
         if meta:
             content["meta"] = meta
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status_code,
             content=content
         )
@@ -69,19 +124,24 @@ class StandardResponse:
         data: Any,
         page: int,
         page_size: int,
-        total: int,
+        total: Optional[int],
         message: str = "获取成功",
-        code: str = "SUCCESS"
-    ) -> JSONResponse:
-        """分页响应"""
-        total_pages = (total + page_size - 1) // page_size if page_size > 0 else 0
+        code: str = "SUCCESS",
+        has_next: Optional[bool] = None
+    ) -> FastJSONResponse:
+        """分页响应，未统计总数时 total / total_pages 为 None，是否有下一页由调用方给出"""
+        if total is None:
+            total_pages = None
+        else:
+            total_pages = (total + page_size - 1) // page_size if page_size > 0 else 0
+            has_next = page < total_pages
 
         pagination = {
             "page": page,
             "page_size": page_size,
             "total": total,
             "total_pages": total_pages,
-            "has_next": page < total_pages,
+            "has_next": bool(has_next),
             "has_prev": page > 1
         }
 
@@ -124,7 +184,7 @@ def error_response(message: str, code: str = "INTERNAL_ERROR", status_code: int
     return StandardResponse.error(message=message, code=code, status_code=status_code, **kwargs)
 
 
-def paginated_response(data: Any, page: int, page_size: int, total: int, **kwargs) -> JSONResponse:
+def paginated_response(data: Any, page: int, page_size: int, total: Optional[int], **kwargs) -> JSONResponse:
     """分页响应函数"""
     return StandardResponse.paginated(data=data, page=page, page_size=page_size, total=total, **kwargs)
 
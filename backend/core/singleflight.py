@@ -0,0 +1,132 @@
+"""
+请求合并（single-flight）
+相同键的并发调用只执行一次，其余调用等待并共享同一结果（或异常）；
+可选短时结果缓存，计算结束后 ttl 秒内的相同调用直接复用。
+同步调用在线程间合并，异步调用在事件循环内合并，同步服务可经线程池执行并在事件循环上等待
+"""
+import asyncio
+import functools
+import inspect
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.cache import MISSING, TTLCache
+from backend.core.config import get_settings
+
+
+class SingleFlight:
+    """按键合并并发调用，共享结果须视为只读"""
+
+    def __init__(self, ttl: float = 0, maxsize: int = 1024, timer: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._results = TTLCache(maxsize=maxsize, ttl=ttl, timer=timer) if ttl > 0 else None
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: Hashable) -> Tuple[Any, Optional[Future], bool]:
+        """返回 (缓存结果, 进行中的调用, 是否由本调用执行)"""
+        with self._lock:
+            if self._results is not None:
+                cached = self._results.get(key)
+                if cached is not MISSING:
+                    return cached, None, False
+            future = self._calls.get(key)
+            if future is not None:
+                return MISSING, future, False
+            future = self._calls[key] = Future()
+            return MISSING, future, True
+
+    def _finish(self, key: Hashable, future: Future, result: Any = MISSING, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if error is None and self._results is not None:
+                self._results.set(key, result)
+            self._calls.pop(key, None)
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # 执行方被取消或退出，等待方同样以取消结束，下一次调用重新执行
+            future.cancel()
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """同步执行，等待方阻塞当前线程"""
+        cached, future, leader = self._join(key)
+        if cached is not MISSING:
+            return cached
+        if not leader:
+            return future.result()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(self, key: Hashable, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """执行协程函数，等待方在事件循环上等待"""
+        cached, future, leader = self._join(key)
+        if cached is not MISSING:
+            return cached
+        if not leader:
+            # 等待方被取消时不影响共享的计算
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_in_threadpool(self, key: Hashable, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在线程池中执行同步函数，等待方不占用线程池"""
+        return await self.do_async(key, run_in_threadpool, func, *args, **kwargs)
+
+    def forget(self, key: Hashable) -> None:
+        """丢弃已缓存的结果，进行中的调用不受影响"""
+        if self._results is not None:
+            self._results.delete(key)
+
+
+def single_flight(key: Callable[..., Hashable], ttl: Optional[float] = None, maxsize: int = 1024):
+    """服务方法装饰器：相同规范化键的并发调用合并为一次执行
+
+    ``key`` 与被装饰函数签名相同，返回可哈希的规范化键（参数与数据范围），方法名自动加入键中；
+    ``ttl`` 默认取 settings.single_flight_ttl。同步方法在异步路由中经 ``run_coalesced`` 调用
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        flight = SingleFlight(ttl=get_settings().single_flight_ttl if ttl is None else ttl, maxsize=maxsize)
+        name = func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await flight.do_async((name, key(*args, **kwargs)), func, *args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return flight.do((name, key(*args, **kwargs)), func, *args, **kwargs)
+
+        wrapper.single_flight = (flight, name, key, func)
+        return wrapper
+
+    return decorator
+
+
+async def run_coalesced(method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """在异步路由中调用同步服务方法：执行方进线程池，合并的等待方留在事件循环上"""
+    spec = getattr(getattr(method, "__func__", method), "single_flight", None)
+    if spec is None:
+        return await run_in_threadpool(method, *args, **kwargs)
+    flight, name, key, func = spec
+    owner = getattr(method, "__self__", None)
+    if owner is not None:
+        args = (owner,) + args
+    return await flight.do_in_threadpool((name, key(*args, **kwargs)), func, *args, **kwargs)
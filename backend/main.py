@@ -1,3 +1,4 @@
+import logging
 from datetime import datetime, timezone
 from typing import Dict, Tuple
 
@@ -9,6 +10,8 @@ from sqlalchemy import text
 from core.config import get_settings
 from core.db import get_engine
 from core.response import fail, ok, success_response, StandardResponse
+from middleware import LogFlushMiddleware, RateLimitMiddleware
+from services.partitioning import ensure_partitions
 # 导入核心路由模块
 from routers import (
     projects,
@@ -32,9 +35,12 @@ from routers import (
 
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title=settings.app_name, debug=settings.debug)
 
+# 限流位于 CORS 之内：预检请求不计数，429 响应同样带跨域头
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins,
@@ -42,6 +48,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(LogFlushMiddleware)
 
 API_V1_PREFIX = "/api/v1"
 
@@ -60,6 +67,16 @@ app.include_router(reconciliation_extended.router, prefix=API_V1_PREFIX)  # 对
 app.include_router(ai_monitoring.router, prefix=API_V1_PREFIX)  # AI监控
 
 
+@app.on_event("startup")
+def ensure_table_partitions() -> None:
+    """预建未来月份的分区；失败只记录日志，未建分区的月份仍写入兜底分区"""
+    try:
+        with get_engine().begin() as connection:
+            ensure_partitions(connection)
+    except Exception:
+        logger.exception("Failed to ensure monthly partitions")
+
+
 @app.get("/healthz")
 async def healthz() -> JSONResponse:
     """Return service health status (Kubernetes compatible)."""
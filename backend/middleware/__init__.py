@@ -1,10 +1,32 @@
 """
 中间件模块
 """
-from .logging import LoggingMiddleware, AuditLogMiddleware, setup_logging
+from .log_format import ErrorRateLimitFilter, JsonLogFormatter, RouteSampler
+from .logging import (
+    AuditLogMiddleware,
+    LogFlushMiddleware,
+    LoggingMiddleware,
+    PathPrefixMatcher,
+    setup_logging,
+)
+from .rate_limit import (
+    MemoryRateLimitBackend,
+    RateLimitMiddleware,
+    RedisRateLimitBackend,
+    RoutePatternMatcher,
+)
 
 __all__ = [
     "LoggingMiddleware",
     "AuditLogMiddleware",
+    "LogFlushMiddleware",
+    "PathPrefixMatcher",
     "setup_logging",
+    "JsonLogFormatter",
+    "RouteSampler",
+    "ErrorRateLimitFilter",
+    "RateLimitMiddleware",
+    "MemoryRateLimitBackend",
+    "RedisRateLimitBackend",
+    "RoutePatternMatcher",
 ]
\ No newline at end of file
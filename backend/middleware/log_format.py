@@ -0,0 +1,170 @@
+"""
+结构化日志组件
+提供 JSON 日志格式化器、按路由的请求日志采样器以及重复错误限流过滤器
+"""
+import json
+import logging
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from backend.core.config import get_settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 为可选依赖
+    orjson = None
+
+# ErrorRateLimitFilter 记在日志记录上的判定结果，同一记录经过多个处理器时只计数一次
+_RATE_DECISION_ATTR = "_error_rate_allowed"
+
+# LogRecord 自带属性，其余属性视为 extra 字段
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", _RATE_DECISION_ATTR,
+}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(payload: Any) -> str:
+        """序列化日志字段为单行 JSON"""
+        return orjson.dumps(payload, default=_json_default, option=_ORJSON_OPTIONS).decode("utf-8")
+
+else:  # pragma: no cover - 无 orjson 时回退到预先构造的标准库编码器
+    _ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_json_default)
+
+    def dumps(payload: Any) -> str:
+        """序列化日志字段为单行 JSON"""
+        return _ENCODER.encode(payload)
+
+
+class JsonLogFormatter(logging.Formatter):
+    """单行 JSON 格式化器，extra 字段平铺到顶层"""
+
+    def __init__(self, fmt: Optional[str] = None, datefmt: Optional[str] = None, style: str = "%", **kwargs):
+        # fmt 仅为兼容 dictConfig 中的 format 配置，输出字段固定
+        super().__init__(fmt=fmt, datefmt=datefmt, style=style, **kwargs)
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return dumps(payload)
+
+
+class RouteSampler:
+    """按路由前缀为成功请求设定日志采样率
+
+    同一请求的开始与结束日志按 request_id 哈希一致采样；失败请求由调用方始终记录。
+    """
+
+    def __init__(self, rates: Optional[Mapping[str, float]] = None, default_rate: float = 1.0):
+        self.default_rate = default_rate
+        # 最长前缀优先
+        self._rates: List[Tuple[str, float]] = sorted(
+            ((prefix.rstrip("/") or "/", rate) for prefix, rate in (rates or {}).items()),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        self.rate_for: Callable[[str], float] = lru_cache(maxsize=2048)(self._rate_for)
+
+    @classmethod
+    def from_settings(cls) -> "RouteSampler":
+        settings = get_settings()
+        return cls(settings.log_sample_rates, settings.log_default_sample_rate)
+
+    def _rate_for(self, path: str) -> float:
+        for prefix, rate in self._rates:
+            if path == prefix or path.startswith(prefix + "/") or prefix == "/":
+                return rate
+        return self.default_rate
+
+    def should_log(self, path: str, request_id: str) -> bool:
+        rate = self.rate_for(path)
+        if rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        return zlib.crc32(request_id.encode("ascii")) < rate * 0xFFFFFFFF
+
+
+class ErrorRateLimitFilter(logging.Filter):
+    """重复错误限流：同一 (logger, 消息, 路径) 的 ERROR 日志在窗口内最多输出 burst 条
+
+    窗口结束后的第一条日志带上 suppressed 字段，记录期间被丢弃的条数。
+    挂在处理器上才能看到子 logger 传播上来的日志；同一实例挂在多个处理器上时，
+    每条日志只在第一次经过时计数，其余处理器沿用该判定。
+    """
+
+    def __init__(
+        self,
+        burst: int = 5,
+        window: float = 60.0,
+        max_keys: int = 1000,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.max_keys = max_keys
+        self._timer = timer
+        self._state: Dict[Tuple[Any, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.ERROR:
+            return True
+        decision = record.__dict__.get(_RATE_DECISION_ATTR)
+        if decision is None:
+            decision = self._decide(record)
+            setattr(record, _RATE_DECISION_ATTR, decision)
+        return decision
+
+    def _decide(self, record: logging.LogRecord) -> bool:
+        key = (record.name, str(record.msg), getattr(record, "path", None))
+        now = self._timer()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = int(state[2]) if state else 0
+                if state is None and len(self._state) >= self.max_keys:
+                    self._evict(now)
+                self._state[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            return False
+
+    def _evict(self, now: float) -> None:
+        expired = [key for key, state in self._state.items() if now - state[0] >= self.window]
+        for key in expired:
+            del self._state[key]
+        if len(self._state) >= self.max_keys:
+            self._state.clear()
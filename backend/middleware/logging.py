@@ -2,68 +2,165 @@
 日志中间件
 统一处理请求日志记录
 """
+import atexit
+import copy
+import json
 import logging
+import queue
 import time
 import uuid
-from typing import Callable
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.core.config import get_settings
+from backend.middleware.log_format import RouteSampler
+from backend.middleware.rate_limit import ClientAddressResolver
+from backend.services.log_service import request_log_scope
 
 logger = logging.getLogger(__name__)
 
+# 需要审计的接口前缀
+DEFAULT_AUDIT_PATHS = (
+    "/api/v1/auth/login",
+    "/api/v1/auth/logout",
+    "/api/v1/users",
+    "/api/v1/projects",
+    "/api/v1/ad-accounts",
+    "/api/v1/topups",
+    "/api/v1/reconciliations",
+    "/api/v1/daily-reports",
+)
+# 审计时脱敏的字段
+SENSITIVE_FIELDS = frozenset({"password", "token", "secret", "key", "authorization"})
+# 审计请求体最大留存字节数，超出部分不再缓存
+MAX_AUDIT_BODY_BYTES = 64 * 1024
+
+
+class PathPrefixMatcher:
+    """按路径段组织的前缀树，判断请求路径是否落在任一前缀之下"""
+
+    _END = None
+
+    def __init__(self, prefixes: Iterable[str] = ()):
+        self._root: Dict[Optional[str], Any] = {}
+        for prefix in prefixes:
+            self.add(prefix)
+
+    @staticmethod
+    def _segments(path: str) -> List[str]:
+        return [segment for segment in path.split("/") if segment]
+
+    def add(self, prefix: str) -> None:
+        node = self._root
+        for segment in self._segments(prefix):
+            node = node.setdefault(segment, {})
+        node[self._END] = True
+
+    def matches(self, path: str) -> bool:
+        node = self._root
+        if self._END in node:
+            return True
+        for segment in self._segments(path):
+            node = node.get(segment)
+            if node is None:
+                return False
+            if self._END in node:
+                return True
+        return False
+
+
+def _address_resolver(trusted_proxies: Optional[Iterable[str]]) -> ClientAddressResolver:
+    """转发头只在直连地址属于可信代理时采信，默认与限流使用同一份可信代理配置"""
+    if trusted_proxies is None:
+        trusted_proxies = get_settings().rate_limit_trusted_proxies
+    return ClientAddressResolver(trusted_proxies)
+
+
+def _get_user(scope: Scope) -> Tuple[Any, Any]:
+    """读取认证阶段写入 request.state 的用户信息"""
+    user = scope.get("state", {}).get("user")
+    if user is None:
+        return None, None
+    return getattr(user, "id", None), getattr(user, "email", None)
+
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """请求日志中间件"""
+class LoggingMiddleware:
+    """请求日志中间件（纯 ASGI 实现，不经过 BaseHTTPMiddleware 的任务与流转发）
+    成功请求按路由采样记录，失败请求始终记录
+    """
 
-    def __init__(self, app, logger_name: str = "api"):
-        super().__init__(app)
+    def __init__(
+        self,
+        app: ASGIApp,
+        logger_name: str = "api",
+        sampler: Optional[RouteSampler] = None,
+        trusted_proxies: Optional[Iterable[str]] = None,
+    ):
+        self.app = app
         self.logger = logging.getLogger(logger_name)
+        self.sampler = sampler or RouteSampler.from_settings()
+        self.addresses = _address_resolver(trusted_proxies)
         # 排除不需要记录日志的路径
         self.exclude_paths = {"/health", "/healthz", "/ready", "/readyz", "/metrics"}
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # 生成请求ID
         request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
+        scope.setdefault("state", {})["request_id"] = request_id
 
-        # 记录请求开始时间
-        start_time = time.time()
+        # 跳过健康检查等路径的日志
+        path = scope["path"]
+        if path in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
 
-        # 获取客户端信息
-        client_ip = self._get_client_ip(request)
-        user_agent = request.headers.get("user-agent", "")
+        # 记录请求开始时间
+        start_time = time.perf_counter()
+        method = scope["method"]
+        headers = Headers(scope=scope)
+        client_ip = self.addresses.resolve(scope)
+        user_id, user_email = _get_user(scope)
+        sampled = self.sampler.should_log(path, request_id)
 
-        # 获取用户信息（如果已认证）
-        user_id = None
-        user_email = None
-        if hasattr(request.state, "user"):
-            user_id = request.state.user.id
-            user_email = request.state.user.email
+        # 记录请求开始
+        if sampled and self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(
+                "Request started",
+                extra={
+                    "event": "request_start",
+                    "request_id": request_id,
+                    "method": method,
+                    "path": path,
+                    "query_params": scope.get("query_string", b"").decode("latin-1"),
+                    "client_ip": client_ip,
+                    "user_agent": headers.get("user-agent", ""),
+                    "user_id": user_id,
+                    "user_email": user_email,
+                }
+            )
 
-        # 跳过健康检查等路径的日志
-        if request.url.path in self.exclude_paths:
-            return await call_next(request)
+        status_code = 500
 
-        # 记录请求开始
-        self.logger.info(
-            "Request started",
-            extra={
-                "event": "request_start",
-                "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "query_params": str(request.query_params),
-                "client_ip": client_ip,
-                "user_agent": user_agent,
-                "user_id": user_id,
-                "user_email": user_email,
-            }
-        )
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # 添加响应头
+                response_headers = MutableHeaders(scope=message)
+                response_headers["X-Request-ID"] = request_id
+                response_headers["X-Process-Time"] = str(round(time.perf_counter() - start_time, 4))
+            await send(message)
 
         # 执行请求
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
             # 记录请求异常
             self.logger.error(
@@ -71,8 +168,8 @@ class LoggingMiddleware(BaseHTTPMiddleware):
                 extra={
                     "event": "request_error",
                     "request_id": request_id,
-                    "method": request.method,
-                    "path": request.url.path,
+                    "method": method,
+                    "path": path,
                     "client_ip": client_ip,
                     "user_id": user_id,
                     "error_type": type(e).__name__,
@@ -83,24 +180,27 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             raise
 
         # 计算响应时间
-        process_time = time.time() - start_time
+        process_time = time.perf_counter() - start_time
 
         # 记录请求完成
         log_level = logging.INFO
-        if response.status_code >= 400:
+        if status_code >= 400:
             log_level = logging.WARNING
-        if response.status_code >= 500:
+        if status_code >= 500:
             log_level = logging.ERROR
+        if log_level == logging.INFO and not sampled:
+            return
 
+        user_id, user_email = _get_user(scope)
         self.logger.log(
             log_level,
             "Request completed",
             extra={
                 "event": "request_end",
                 "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
+                "method": method,
+                "path": path,
+                "status_code": status_code,
                 "process_time": round(process_time, 4),
                 "client_ip": client_ip,
                 "user_id": user_id,
@@ -108,161 +208,204 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             }
         )
 
-        # 添加响应头
-        response.headers["X-Request-ID"] = request_id
-        response.headers["X-Process-Time"] = str(round(process_time, 4))
-
-        return response
-
-    def _get_client_ip(self, request: Request) -> str:
-        """获取客户端真实IP"""
-        # 检查代理头
-        forwarded_for = request.headers.get("x-forwarded-for")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-
-        real_ip = request.headers.get("x-real-ip")
-        if real_ip:
-            return real_ip
-
-        # 返回直接连接的IP
-        return request.client.host
 
-
-class AuditLogMiddleware(BaseHTTPMiddleware):
+class AuditLogMiddleware:
     """审计日志中间件
-    记录敏感操作的审计日志
+    记录敏感操作的审计日志；只对审计路径旁路复制请求体，且最多留存 max_body_bytes 字节
     """
 
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(
+        self,
+        app: ASGIApp,
+        audit_paths: Optional[Iterable[str]] = None,
+        max_body_bytes: int = MAX_AUDIT_BODY_BYTES,
+        trusted_proxies: Optional[Iterable[str]] = None,
+    ):
+        self.app = app
+        self.addresses = _address_resolver(trusted_proxies)
         # 需要审计的操作
         self.audit_methods = {"POST", "PUT", "PATCH", "DELETE"}
-        self.audit_paths = {
-            "/api/v1/auth/login",
-            "/api/v1/auth/logout",
-            "/api/v1/users",
-            "/api/v1/projects",
-            "/api/v1/ad-accounts",
-            "/api/v1/topups",
-            "/api/v1/reconciliations",
-            "/api/v1/daily-reports",
-        }
-
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # 获取请求前的状态
-        request_body = None
-        if request.method in self.audit_methods:
-            # 读取请求体（注意：这会消耗请求体，需要重新设置）
-            request_body = await request.body()
-
-        # 执行请求
-        response = await call_next(request)
-
-        # 判断是否需要审计
-        if self._should_audit(request):
-            # 记录审计日志
-            await self._log_audit(request, response, request_body)
-
-        return response
-
-    def _should_audit(self, request: Request) -> bool:
+        self.audit_paths = PathPrefixMatcher(DEFAULT_AUDIT_PATHS if audit_paths is None else audit_paths)
+        self.max_body_bytes = max_body_bytes
+        self.audit_logger = logging.getLogger("audit")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._should_audit(scope):
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        truncated = False
+        status_code = 500
+
+        async def receive_wrapper() -> Message:
+            # 旁路复制应用实际读取的请求体，不提前消费接收流
+            nonlocal truncated
+            message = await receive()
+            if message["type"] == "http.request" and not truncated:
+                chunk = message.get("body", b"")
+                if len(body) + len(chunk) > self.max_body_bytes:
+                    truncated = True
+                else:
+                    body.extend(chunk)
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        await self.app(scope, receive_wrapper, send_wrapper)
+        self._log_audit(scope, status_code, bytes(body), truncated)
+
+    def _should_audit(self, scope: Scope) -> bool:
         """判断是否需要审计"""
-        # 检查请求方法
-        if request.method not in self.audit_methods:
-            return False
+        return scope["method"] in self.audit_methods and self.audit_paths.matches(scope["path"])
 
-        # 检查路径
-        for path in self.audit_paths:
-            if request.url.path.startswith(path):
-                return True
-
-        return False
-
-    async def _log_audit(self, request: Request, response: Response, request_body: bytes):
+    def _log_audit(self, scope: Scope, status_code: int, request_body: bytes, truncated: bool) -> None:
         """记录审计日志"""
         try:
             # 获取用户信息
-            user_id = None
-            user_email = None
-            if hasattr(request.state, "user"):
-                user_id = request.state.user.id
-                user_email = request.state.user.email
+            user_id, user_email = _get_user(scope)
 
-            # 获取IP地址
-            client_ip = request.headers.get("x-forwarded-for", request.client.host)
-
-            # 解析请求体
+            # 解析请求体，超出留存上限的请求体只记录截断标记
             body_data = None
-            if request_body:
-                import json
-                try:
-                    body_data = json.loads(request_body.decode())
-                    # 脱敏处理：移除密码等敏感字段
-                    if isinstance(body_data, dict):
-                        body_data = self._sanitize_body(body_data)
-                except:
-                    pass
+            if request_body and not truncated:
+                body_data = self._parse_body(request_body)
 
             # 构建审计日志
             audit_log = {
                 "event": "api_call",
-                "request_id": getattr(request.state, "request_id", None),
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
+                "request_id": scope.get("state", {}).get("request_id"),
+                "method": scope["method"],
+                "path": scope["path"],
+                "status_code": status_code,
                 "user_id": user_id,
                 "user_email": user_email,
-                "client_ip": client_ip,
+                "client_ip": self.addresses.resolve(scope),
                 "request_body": body_data,
+                "request_body_truncated": truncated,
                 "timestamp": time.time(),
             }
 
             # 记录到专门的审计日志
-            audit_logger = logging.getLogger("audit")
-            audit_logger.info("API audit", extra=audit_log)
+            self.audit_logger.info("API audit", extra=audit_log)
 
         except Exception as e:
             # 审计日志记录失败不应影响主流程
             logger.error(f"Failed to log audit: {e}")
 
-    def _sanitize_body(self, body: dict) -> dict:
-        """脱敏处理请求体"""
-        sensitive_fields = {"password", "token", "secret", "key", "authorization"}
-        sanitized = {}
+    def _parse_body(self, request_body: bytes) -> Any:
+        """解析 JSON 请求体，解析过程中同步完成脱敏"""
+        try:
+            return json.loads(request_body, object_hook=self._sanitize_body)
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+    @staticmethod
+    def _sanitize_body(body: Dict[str, Any]) -> Dict[str, Any]:
+        """脱敏处理单层对象，嵌套对象由 json 的 object_hook 自底向上逐层处理"""
+        return {
+            key: "***" if key.lower() in SENSITIVE_FIELDS else value
+            for key, value in body.items()
+        }
+
+
+class LogFlushMiddleware:
+    """操作日志请求级缓冲
+    请求内以 async_write 写入的操作日志先进入缓冲，请求结束后整体交给后台批量写入线程
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with request_log_scope():
+            await self.app(scope, receive, send)
+
+
+_queue_listeners: List[QueueListener] = []
 
-        for key, value in body.items():
-            if key.lower() in sensitive_fields:
-                sanitized[key] = "***"
-            elif isinstance(value, dict):
-                sanitized[key] = self._sanitize_body(value)
-            else:
-                sanitized[key] = value
 
-        return sanitized
+def stop_queue_listeners() -> None:
+    """停止后台日志线程，并把队列中剩余的日志写完"""
+    while _queue_listeners:
+        _queue_listeners.pop().stop()
 
 
-def setup_logging(config: dict = None):
+atexit.register(stop_queue_listeners)
+
+
+class StructuredQueueHandler(QueueHandler):
+    """进程内队列处理器：入队前只合并消息参数并渲染异常堆栈，不把堆栈并入消息
+
+    标准库的 prepare 会把堆栈拼进 msg 并清空 exc_info，JSON 格式化器就无法输出独立的 exc_info 字段。
+    队列不跨进程，记录无需可序列化；堆栈在调用线程格式化为 exc_text，避免后台线程持有栈帧。
+    """
+
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _install_queue_handlers(logger_names: Iterable[str]) -> None:
+    """把各 logger 的处理器移到 QueueListener 后台线程，调用方只做入队，文件 I/O 不占用事件循环"""
+    for name in logger_names:
+        target = logging.getLogger(name or None)
+        handlers = [handler for handler in target.handlers if not isinstance(handler, QueueHandler)]
+        if not handlers:
+            continue
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        target.handlers = [StructuredQueueHandler(log_queue)]
+        listener.start()
+        _queue_listeners.append(listener)
+
+
+def setup_logging(config: dict = None, use_queue: bool = True):
     """配置日志系统
 
     Args:
         config: 日志配置字典
+        use_queue: 是否通过 QueueHandler/QueueListener 在后台线程输出日志
     """
     import os
     from logging.config import dictConfig
 
+    settings = get_settings()
+
     # 默认配置
     default_config = {
         "version": 1,
         "disable_existing_loggers": False,
+        "filters": {
+            # 相同错误在窗口内限流，避免故障时日志风暴；挂在处理器上，子 logger 传播上来的日志同样受限
+            "error_rate": {
+                "()": "backend.middleware.log_format.ErrorRateLimitFilter",
+                "burst": settings.log_error_burst,
+                "window": settings.log_error_window,
+            },
+        },
         "formatters": {
             "default": {
                 "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
                 "datefmt": "%Y-%m-%d %H:%M:%S",
             },
             "json": {
-                "()": "pythonjsonlogger.jsonlogger.JsonFormatter",
-                "format": "%(asctime)s %(name)s %(levelname)s %(message)s",
+                "()": "backend.middleware.log_format.JsonLogFormatter",
             },
             "detailed": {
                 "format": "%(asctime)s - %(name)s - %(levelname)s - %(module)s - %(funcName)s - %(message)s",
@@ -274,12 +417,14 @@ def setup_logging(config: dict = None):
                 "class": "logging.StreamHandler",
                 "level": "INFO",
                 "formatter": "default",
+                "filters": ["error_rate"],
                 "stream": "ext://sys.stdout",
             },
             "file": {
                 "class": "logging.handlers.RotatingFileHandler",
                 "level": "DEBUG",
                 "formatter": "json",
+                "filters": ["error_rate"],
                 "filename": "logs/app.log",
                 "maxBytes": 10485760,  # 10MB
                 "backupCount": 5,
@@ -289,6 +434,7 @@ def setup_logging(config: dict = None):
                 "class": "logging.handlers.RotatingFileHandler",
                 "level": "ERROR",
                 "formatter": "json",
+                "filters": ["error_rate"],
                 "filename": "logs/error.log",
                 "maxBytes": 10485760,  # 10MB
                 "backupCount": 5,
@@ -347,7 +493,10 @@ def setup_logging(config: dict = None):
     # 创建日志目录
     os.makedirs("logs", exist_ok=True)
 
-    # 应用配置
+    # 应用配置（先停掉旧的后台线程，dictConfig 会关闭原有处理器）
+    stop_queue_listeners()
     dictConfig(merged_config)
+    if use_queue:
+        _install_queue_handlers(merged_config.get("loggers", {}))
 
     logger.info("Logging system initialized")
\ No newline at end of file
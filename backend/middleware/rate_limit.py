@@ -0,0 +1,333 @@
+"""
+API 限流中间件
+按 GCRA（通用信元速率算法）限流：每个键只保存一个“理论到达时间”浮点数，
+效果等同于窗口内最多 limit 次的滑动窗口，且无需保存请求时间日志。
+令牌验签通过的请求按用户 ID 计数，匿名请求与无效令牌按客户端 IP 计数；导出、统计、自动对账、导入等重型接口使用独立预算。
+X-Forwarded-For / X-Real-IP 只在直连地址属于可信代理时采信。
+配置 redis_url 时多进程共享计数（Lua 脚本原子执行），Redis 不可用时降级为进程内计数
+"""
+import ipaddress
+import logging
+import math
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import jwt
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.core.cache import get_shared_backend
+from backend.core.config import get_settings
+from backend.core.response import StandardResponse
+
+logger = logging.getLogger(__name__)
+
+# 重型接口，按路径段完整匹配，* 匹配任意单个路径段
+DEFAULT_HEAVY_ROUTES = (
+    "/api/v1/*/export",
+    "/api/v1/*/export/excel",
+    "/api/v1/*/statistics",
+    "/api/v1/*/statistics/overview",
+    "/api/v1/*/dashboard",
+    "/api/v1/reconciliations/auto",
+    "/api/v1/reconciliation/batches/*/process",
+    "/api/v1/daily-reports/batch-import",
+    "/api/v1/daily-reports/import-file",
+    "/api/v1/import_jobs/upload",
+    "/api/v1/adspend/reports/bulk",
+)
+# 不参与限流的路径前缀
+DEFAULT_EXEMPT_PATHS = ("/health", "/healthz", "/docs", "/redoc", "/openapi.json")
+# 进程内计数超过该键数时清理已完全恢复的键
+MAX_MEMORY_KEYS = 100_000
+
+
+class RateLimitResult(NamedTuple):
+    """一次限流判定的结果，时间单位均为秒"""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float
+
+
+def _gcra_result(allowed: bool, limit: int, interval: float, tat: float, now: float, retry_after: float) -> RateLimitResult:
+    reset_after = max(tat - now, 0.0)
+    remaining = min(limit, int((limit * interval - reset_after) / interval + 1e-9)) if allowed else 0
+    return RateLimitResult(allowed, limit, max(remaining, 0), reset_after, retry_after)
+
+
+class MemoryRateLimitBackend:
+    """进程内 GCRA 计数"""
+
+    def __init__(self, timer: Callable[[], float] = time.monotonic, max_keys: int = MAX_MEMORY_KEYS):
+        self._timer = timer
+        self._max_keys = max_keys
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, window: float) -> RateLimitResult:
+        """记录一次请求；超出预算时不计数并返回需等待的时间"""
+        interval = window / limit
+        with self._lock:
+            now = self._timer()
+            tat = self._tats.get(key, now)
+            if tat < now:
+                tat = now
+            new_tat = tat + interval
+            allow_at = new_tat - window
+            if now < allow_at:
+                return _gcra_result(False, limit, interval, tat, now, allow_at - now)
+            self._tats[key] = new_tat
+            if len(self._tats) > self._max_keys:
+                self._prune(now)
+        return _gcra_result(True, limit, interval, new_tat, now, 0.0)
+
+    def _prune(self, now: float) -> None:
+        # 理论到达时间早于当前时间的键已完全恢复，删除后与从未请求等价
+        self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tats.clear()
+
+
+# KEYS[1]=计数键，ARGV=[请求间隔, 窗口]；返回 [是否放行, 理论到达时间-当前时间, 需等待时间]
+_GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if now < allow_at then
+  return {0, tostring(tat - now), tostring(allow_at - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, tostring(new_tat - now), '0'}
+"""
+
+
+class RedisRateLimitBackend:
+    """基于 Redis 协议的共享 GCRA 计数，以服务端时钟为准；出错时记录日志并降级为进程内计数"""
+
+    def __init__(self, client: Any, prefix: str = "aiad:ratelimit", fallback: Optional[MemoryRateLimitBackend] = None):
+        self.client = client
+        self.prefix = prefix
+        self.fallback = fallback or MemoryRateLimitBackend()
+        self._script = client.register_script(_GCRA_SCRIPT)
+
+    def hit(self, key: str, limit: int, window: float) -> RateLimitResult:
+        interval = window / limit
+        try:
+            allowed, reset_after, retry_after = self._script(keys=[f"{self.prefix}:{key}"], args=[interval, window])
+        except Exception as e:
+            logger.warning(f"Shared rate limit failed, falling back to local counter: {e}")
+            return self.fallback.hit(key, limit, window)
+        allowed = bool(int(allowed))
+        return _gcra_result(allowed, limit, interval, float(reset_after), 0.0, float(retry_after))
+
+
+def get_rate_limit_backend():
+    """配置 redis_url 时使用共享计数，否则使用进程内计数"""
+    shared = get_shared_backend()
+    if shared is None:
+        return MemoryRateLimitBackend()
+    try:
+        return RedisRateLimitBackend(shared.client)
+    except Exception as e:
+        logger.warning(f"Shared rate limit backend unavailable: {e}")
+        return MemoryRateLimitBackend()
+
+
+class RoutePatternMatcher:
+    """按路径段完整匹配路由模板，* 匹配任意单个路径段"""
+
+    _END = None
+    _ANY = "*"
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self._root: Dict[Optional[str], Any] = {}
+        for pattern in patterns:
+            node = self._root
+            for segment in pattern.strip("/").split("/"):
+                node = node.setdefault(segment, {})
+            node[self._END] = True
+        # 带路径参数的接口路径种类有限，按路径缓存匹配结果
+        self.matches = lru_cache(maxsize=4096)(self._matches)
+
+    def _matches(self, path: str) -> bool:
+        nodes = [self._root]
+        for segment in path.strip("/").split("/"):
+            nodes = [
+                child
+                for node in nodes
+                for child in (node.get(segment), node.get(self._ANY))
+                if child is not None
+            ]
+            if not nodes:
+                return False
+        return any(self._END in node for node in nodes)
+
+
+class ClientAddressResolver:
+    """按可信代理列表解析客户端 IP，限流与请求 / 审计日志共用，两处记录的地址一致"""
+
+    def __init__(self, trusted_proxies: Iterable[str] = ()):
+        self._proxies = tuple(ipaddress.ip_network(proxy, strict=False) for proxy in trusted_proxies)
+
+    def resolve(self, scope: Scope) -> str:
+        forwarded_for = real_ip = None
+        for name, value in scope.get("headers") or ():
+            if name == b"x-forwarded-for":
+                forwarded_for = value
+            elif name == b"x-real-ip":
+                real_ip = value
+        return self.client_ip(scope, forwarded_for, real_ip)
+
+    def _trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self._proxies)
+
+    def client_ip(self, scope: Scope, forwarded_for: Optional[bytes] = None, real_ip: Optional[bytes] = None) -> str:
+        """直连地址属于可信代理时按转发头取客户端 IP，否则使用直连地址"""
+        client = scope.get("client")
+        peer = client[0] if client else "unknown"
+        if not self._proxies or not self._trusted(peer):
+            return peer
+        if forwarded_for:
+            # 从右往左跳过可信代理，第一个不可信的地址即客户端，左侧由客户端自填的部分不采信
+            hops = [hop.strip().decode("latin-1") for hop in forwarded_for.split(b",") if hop.strip()]
+            for hop in reversed(hops):
+                if not self._trusted(hop):
+                    return hop
+            if hops:
+                return hops[0]
+        if real_ip:
+            return real_ip.strip().decode("latin-1")
+        return peer
+
+
+class ClientIdentifier:
+    """限流计数键：令牌验签通过时按用户 ID，否则按客户端 IP
+
+    只做一次 HMAC 验签，不查库；随机或伪造的令牌验签失败，与匿名请求共用 IP 预算，
+    同一用户持有多个令牌时也共用一份预算。
+    """
+
+    def __init__(self, secret: str, trusted_proxies: Iterable[str] = (), cache_size: int = 8192):
+        self._secret = secret
+        self._addresses = ClientAddressResolver(trusted_proxies)
+        self._claims = lru_cache(maxsize=cache_size)(self._decode)
+
+    def key(self, scope: Scope) -> str:
+        authorization = forwarded_for = real_ip = None
+        for name, value in scope.get("headers") or ():
+            if name == b"authorization":
+                authorization = value
+            elif name == b"x-forwarded-for":
+                forwarded_for = value
+            elif name == b"x-real-ip":
+                real_ip = value
+        if authorization and authorization[:7].lower() == b"bearer " and len(authorization) > 7:
+            subject = self.subject(authorization[7:].strip())
+            if subject is not None:
+                return f"user:{subject}"
+        return f"ip:{self._addresses.client_ip(scope, forwarded_for, real_ip)}"
+
+    def subject(self, token: bytes) -> Optional[str]:
+        """有效访问令牌的用户 ID，令牌无效或已过期时返回 None"""
+        subject, expires_at = self._claims(token)
+        if subject is None or (expires_at is not None and expires_at <= time.time()):
+            return None
+        return subject
+
+    def _decode(self, token: bytes) -> Tuple[Optional[str], Optional[float]]:
+        # 与认证依赖相同的密钥与算法；过期时间在读取缓存时判断，使缓存结果不会越过有效期
+        try:
+            payload = jwt.decode(token, self._secret, algorithms=["HS256"], options={"verify_exp": False})
+        except jwt.InvalidTokenError:
+            return None, None
+        subject = payload.get("sub") or payload.get("user_id")
+        if payload.get("type") != "access" or not subject:
+            return None, None
+        expires_at = payload.get("exp")
+        return str(subject), float(expires_at) if isinstance(expires_at, (int, float)) else None
+
+
+class RateLimitMiddleware:
+    """按用户 / IP 限流的纯 ASGI 中间件，所有响应附带 X-RateLimit-* 头，超限返回 429 与 Retry-After"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        backend: Any = None,
+        limit: Optional[int] = None,
+        window: Optional[float] = None,
+        heavy_limit: Optional[int] = None,
+        heavy_window: Optional[float] = None,
+        heavy_routes: Iterable[str] = DEFAULT_HEAVY_ROUTES,
+        exempt_paths: Iterable[str] = DEFAULT_EXEMPT_PATHS,
+        enabled: Optional[bool] = None,
+        trusted_proxies: Optional[Iterable[str]] = None,
+    ):
+        settings = get_settings()
+        self.app = app
+        self.enabled = settings.rate_limit_enabled if enabled is None else enabled
+        self.backend = backend if backend is not None else (get_rate_limit_backend() if self.enabled else None)
+        self.policies = {
+            "default": (limit or settings.rate_limit, window or settings.rate_window),
+            "heavy": (heavy_limit or settings.rate_limit_heavy, heavy_window or settings.rate_limit_heavy_window),
+        }
+        self._heavy = RoutePatternMatcher(heavy_routes)
+        self._exempt = tuple(exempt_paths)
+        self._identify = ClientIdentifier(
+            settings.jwt_secret,
+            settings.rate_limit_trusted_proxies if trusted_proxies is None else trusted_proxies,
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled or scope["path"].startswith(self._exempt):
+            await self.app(scope, receive, send)
+            return
+
+        policy = "heavy" if self._heavy.matches(scope["path"]) else "default"
+        limit, window = self.policies[policy]
+        result = self.backend.hit(f"{policy}:{self._identify.key(scope)}", limit, window)
+        headers = _rate_limit_headers(result)
+
+        if not result.allowed:
+            retry_after = str(max(math.ceil(result.retry_after), 1))
+            response = StandardResponse.error(
+                message="请求过于频繁，请稍后重试",
+                code="RATE_LIMIT_EXCEEDED",
+                status_code=429,
+                details={"retry_after": int(retry_after)},
+            )
+            response.headers["Retry-After"] = retry_after
+            for name, value in headers:
+                response.headers[name.decode("latin-1")] = value.decode("latin-1")
+            await response(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _rate_limit_headers(result: RateLimitResult) -> List[Tuple[bytes, bytes]]:
+    return [
+        (b"x-ratelimit-limit", str(result.limit).encode()),
+        (b"x-ratelimit-remaining", str(result.remaining).encode()),
+        (b"x-ratelimit-reset", str(math.ceil(result.reset_after)).encode()),
+    ]
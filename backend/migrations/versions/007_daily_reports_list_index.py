@@ -0,0 +1,39 @@
+"""日报列表分页覆盖索引
+
+Revision ID: 007
+Revises: 006
+Create Date: 2025-11-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 日报表数据量大，并发建索引避免阻塞写入（CONCURRENTLY 不能在事务内执行）
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_daily_reports_date_id',
+            'daily_reports',
+            [sa.text('report_date DESC'), sa.text('id DESC')],
+            postgresql_include=['ad_account_id', 'status', 'created_by'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_daily_reports_date_id',
+            table_name='daily_reports',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,75 @@
+"""热点筛选路径的组合、覆盖与部分索引
+
+Revision ID: 008
+Revises: 007
+Create Date: 2025-11-21 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+# (索引名, 表名, 键列, INCLUDE 列, 部分索引条件)
+HOT_PATH_INDEXES = [
+    # 充值列表、仪表板按状态筛选并按创建时间倒序
+    ('idx_topup_requests_status_created', 'topup_requests', ['status', 'created_at DESC'], [], None),
+    # 每日申请次数限制：同一账户、同一申请人当天的申请数
+    ('idx_topup_requests_account_requester_created', 'topup_requests',
+     ['ad_account_id', 'requested_by', 'created_at'], [], None),
+    # 待审核队列只占少量行，部分索引附带列表展示列
+    ('idx_topup_requests_pending', 'topup_requests', ['created_at DESC'],
+     ['ad_account_id', 'project_id', 'requested_amount'], "status = 'pending'"),
+    # 逾期统计只关心未完成的申请
+    ('idx_topup_requests_open_expected', 'topup_requests', ['expected_date'], [],
+     "status IN ('pending', 'data_review', 'finance_approve')"),
+    # 账户累计重算按账户汇总消耗与线索数，附带两列后可仅扫描索引
+    ('idx_ad_spend_daily_account_date_cover', 'ad_spend_daily', ['ad_account_id', 'date DESC'],
+     ['spend', 'leads_count'], None),
+    ('idx_reconciliations_status_created', 'reconciliations', ['status', 'created_at DESC'], [], None),
+    ('idx_import_jobs_status_created', 'import_jobs', ['status', 'created_at DESC'], [], None),
+    ('idx_ad_accounts_assigned_user_status', 'ad_accounts', ['assigned_user_id', 'status'], [], None),
+    # 预警计数按状态筛选、按严重程度分组
+    ('idx_account_alerts_status_severity', 'account_alerts', ['status', 'severity'], [], None),
+]
+
+
+def _applicable(inspector, table, keys, include) -> bool:
+    # reconciliations、import_jobs 等表由 Supabase 脚本维护，表或列不存在时跳过对应索引
+    if not inspector.has_table(table):
+        return False
+    columns = {column['name'] for column in inspector.get_columns(table)}
+    return {key.split()[0] for key in keys} | set(include) <= columns
+
+
+def upgrade() -> None:
+    context = op.get_context()
+    specs = HOT_PATH_INDEXES
+    if not context.as_sql:
+        inspector = sa.inspect(op.get_bind())
+        specs = [spec for spec in specs if _applicable(inspector, *spec[1:4])]
+
+    # 并发建索引避免阻塞写入（CONCURRENTLY 不能在事务内执行）
+    with context.autocommit_block():
+        for name, table, keys, include, where in specs:
+            op.create_index(
+                name,
+                table,
+                [sa.text(key) for key in keys],
+                postgresql_include=include,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, *_ in reversed(HOT_PATH_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,315 @@
+"""ad_spend_daily 与 daily_reports 按月范围分区
+
+Revision ID: 009
+Revises: 008
+Create Date: 2025-11-24 10:00:00.000000
+
+原表改名后以 LIKE 建同结构的分区父表，按数据覆盖的月份及未来若干月建分区并附兜底分区，
+搬迁数据后按原名重建约束、索引、触发器、RLS 策略、授权与依赖视图。
+
+分区表的主键与唯一约束必须包含分区键，主键改为 (id, 分区键)。引用这两张表 id 的外键
+（daily_report_audit_logs.daily_report_id、reconciliations.daily_spend_id）无法原样保留：
+引用表增加分区键列（report_date、daily_spend_date），由触发器按 id 从被引用行填充，
+改为 MATCH FULL 的复合外键 (id, 分区键)。引用不存在的行时分区键填为空，被 MATCH FULL 拒绝；
+删除日报仍级联删除审计日志。被引用行修改分区键时经 ON UPDATE CASCADE 同步，
+跨分区移动行需 PostgreSQL 15 及以上，更低版本会被外键拒绝而不会留下孤立引用。
+分区命名与 backend/services/partitioning.py 一致：<表名>_pYYYYMM、<表名>_default。
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+# 表名 -> 分区键
+PARTITIONED_TABLES = {
+    'ad_spend_daily': 'date',
+    'daily_reports': 'report_date',
+}
+
+# 迁移时预建的未来月份数，之后由应用启动与 scripts/manage_partitions.py 补建
+FUTURE_MONTHS = 3
+
+# 引用分区表 id 的外键：(表名, 约束名, 列, 被引用表, 引用表中的分区键列, ON DELETE)
+# 升级时改为 (列, 分区键列) 的复合外键，降级时恢复为单列外键
+REFERENCING_FOREIGN_KEYS = [
+    ('daily_report_audit_logs', 'daily_report_audit_logs_daily_report_id_fkey', 'daily_report_id',
+     'daily_reports', 'report_date', 'CASCADE'),
+    ('reconciliations', 'reconciliations_daily_spend_id_fkey', 'daily_spend_id', 'ad_spend_daily',
+     'daily_spend_date', None),
+]
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _quote(bind, name: str) -> str:
+    return bind.dialect.identifier_preparer.quote(name)
+
+
+def _rows(bind, sql: str, **params):
+    return bind.execute(sa.text(sql), params).all()
+
+
+def _snapshot(bind, table: str, key: str) -> dict:
+    """收集换表后需按原名重建的对象定义（均在改名前读取，定义中引用的仍是原表名）"""
+    params = {'table': table, 'key': key}
+    return {
+        'comment': bind.execute(
+            sa.text("SELECT obj_description(CAST(:table AS regclass), 'pg_class')"), params
+        ).scalar(),
+        'columns': bind.execute(sa.text("""
+            SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) FROM pg_attribute
+            WHERE attrelid = CAST(:table AS regclass) AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+        """), params).scalar(),
+        'sequences': _rows(bind, """
+            SELECT attname, pg_get_serial_sequence(:table, attname) AS sequence FROM pg_attribute
+            WHERE attrelid = CAST(:table AS regclass) AND attnum > 0 AND NOT attisdropped
+              AND pg_get_serial_sequence(:table, attname) IS NOT NULL
+        """, **params),
+        'constraints': _rows(bind, """
+            SELECT c.conname, c.contype, pg_get_constraintdef(c.oid) AS definition,
+                   ARRAY(
+                       SELECT a.attname FROM unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord)
+                       JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+                       ORDER BY k.ord
+                   )::text[] AS columns
+            FROM pg_constraint c
+            WHERE c.conrelid = CAST(:table AS regclass) AND c.contype IN ('p', 'u', 'f')
+            ORDER BY c.contype DESC
+        """, **params),
+        'indexes': _rows(bind, """
+            SELECT c.relname AS name, pg_get_indexdef(i.indexrelid) AS definition,
+                   i.indisunique AND NOT EXISTS (
+                       SELECT 1 FROM pg_attribute a
+                       WHERE a.attrelid = i.indrelid AND a.attname = :key AND a.attnum = ANY(i.indkey)
+                   ) AS lacks_key
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = CAST(:table AS regclass)
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid)
+        """, **params),
+        'referencing': _rows(bind, """
+            SELECT conrelid::regclass::text AS table_name, conname FROM pg_constraint
+            WHERE confrelid = CAST(:table AS regclass) AND contype = 'f'
+        """, **params),
+        'triggers': bind.execute(sa.text("""
+            SELECT pg_get_triggerdef(oid) FROM pg_trigger
+            WHERE tgrelid = CAST(:table AS regclass) AND NOT tgisinternal AND tgparentid = 0
+        """), params).scalars().all(),
+        'rls': bind.execute(sa.text("""
+            SELECT relrowsecurity, relforcerowsecurity FROM pg_class WHERE oid = CAST(:table AS regclass)
+        """), params).one(),
+        'policies': _rows(bind, """
+            SELECT policyname, permissive, array_to_string(roles, ', ') AS roles, cmd, qual, with_check
+            FROM pg_policies WHERE schemaname = current_schema() AND tablename = :table
+        """, **params),
+        'views': _rows(bind, """
+            SELECT DISTINCT v.relname AS name, pg_get_viewdef(v.oid) AS definition
+            FROM pg_depend d
+            JOIN pg_rewrite r ON r.oid = d.objid
+            JOIN pg_class v ON v.oid = r.ev_class
+            WHERE d.refobjid = CAST(:table AS regclass) AND v.oid <> d.refobjid AND v.relkind = 'v'
+        """, **params),
+    }
+
+
+def _grants(bind, relation: str):
+    return _rows(bind, """
+        SELECT grantee, string_agg(privilege_type, ', ') AS privileges
+        FROM information_schema.role_table_grants
+        WHERE table_schema = current_schema() AND table_name = :relation
+        GROUP BY grantee
+    """, relation=relation)
+
+
+def _restore_grants(bind, relation: str, grants) -> None:
+    for grantee, privileges in grants:
+        target = 'PUBLIC' if grantee == 'PUBLIC' else _quote(bind, grantee)
+        op.execute(f"GRANT {privileges} ON {relation} TO {target}")
+
+
+def _create_month_partitions(bind, table: str, key: str) -> None:
+    low, high = bind.execute(sa.text(f"SELECT min({key}), max({key}) FROM {table}_unpartitioned")).one()
+    current = date.today().replace(day=1)
+    month = low.replace(day=1) if low else current
+    last = max(_add_months(current, FUTURE_MONTHS), high.replace(day=1) if high else current)
+    while month <= last:
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        month = upper
+    # 尚未建分区的月份（如迟到的历史数据）落入兜底分区，补建分区时再移出
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+
+def _rebuild(table: str, key: str, partitioned: bool) -> None:
+    """以同结构新表替换原表并搬迁数据；partitioned 为 False 时还原为普通表"""
+    bind = op.get_bind()
+    snapshot = _snapshot(bind, table, key)
+    view_grants = {name: _grants(bind, name) for name, _ in snapshot['views']}
+    table_grants = _grants(bind, table)
+
+    for constraint in snapshot['constraints']:
+        if constraint.contype == 'u' and key not in constraint.columns and partitioned:
+            raise RuntimeError(f"{table}.{constraint.conname} 不含分区键 {key}，无法在分区表上保留")
+    for index in snapshot['indexes']:
+        if index.lacks_key and partitioned:
+            raise RuntimeError(f"唯一索引 {index.name} 不含分区键 {key}，无法在分区表上保留")
+
+    for ref_table, conname in snapshot['referencing']:
+        op.execute(f"ALTER TABLE {ref_table} DROP CONSTRAINT {_quote(bind, conname)}")
+    for name, _ in snapshot['views']:
+        op.execute(f"DROP VIEW {name}")
+
+    legacy = f"{table}_unpartitioned" if partitioned else f"{table}_partitioned"
+    op.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    op.execute(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED "
+        f"INCLUDING STORAGE INCLUDING COMMENTS)" + (f" PARTITION BY RANGE ({key})" if partitioned else "")
+    )
+    if partitioned:
+        _create_month_partitions(bind, table, key)
+
+    columns = snapshot['columns']
+    op.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {legacy}")
+
+    # 自增序列归属原表的列，删除原表前先解除归属
+    for column, sequence in snapshot['sequences']:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    # 降级时分区随父表一并删除；已分离归档的分区不在父表中，不会被搬回
+    op.execute(f"DROP TABLE {legacy}")
+    for column, sequence in snapshot['sequences']:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.{_quote(bind, column)}")
+
+    if snapshot['comment']:
+        op.execute(sa.text(f"COMMENT ON TABLE {table} IS :comment").bindparams(comment=snapshot['comment']))
+
+    for constraint in snapshot['constraints']:
+        definition = constraint.definition
+        if constraint.contype == 'p':
+            key_columns = [column for column in constraint.columns if column != key]
+            if partitioned:
+                key_columns.append(key)
+            definition = f"PRIMARY KEY ({', '.join(_quote(bind, column) for column in key_columns)})"
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {_quote(bind, constraint.conname)} {definition}")
+
+    for index in snapshot['indexes']:
+        # 分区父表上的索引定义带 ON ONLY，还原为普通表时去掉
+        op.execute(index.definition.replace(' ON ONLY ', ' ON '))
+    for definition in snapshot['triggers']:
+        op.execute(definition)
+
+    row_security, force_row_security = snapshot['rls']
+    if row_security:
+        op.execute(f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY")
+    if force_row_security:
+        op.execute(f"ALTER TABLE {table} FORCE ROW LEVEL SECURITY")
+    for policy in snapshot['policies']:
+        sql = f"CREATE POLICY {_quote(bind, policy.policyname)} ON {table} AS {policy.permissive} " \
+              f"FOR {policy.cmd} TO {policy.roles}"
+        if policy.qual:
+            sql += f" USING ({policy.qual})"
+        if policy.with_check:
+            sql += f" WITH CHECK ({policy.with_check})"
+        op.execute(sql)
+    _restore_grants(bind, table, table_grants)
+
+    for name, definition in snapshot['views']:
+        op.execute(f"CREATE VIEW {name} AS {definition}")
+        _restore_grants(bind, name, view_grants[name])
+
+
+def _carry_partition_key(ref_table: str, conname: str, column: str, target: str, key_column: str,
+                         on_delete) -> None:
+    """引用表增加分区键列并回填，触发器在写入时按 id 填充，外键改为 MATCH FULL 的 (id, 分区键)"""
+    key = PARTITIONED_TABLES[target]
+    fill = f"{ref_table}_{key_column}_fill"
+    op.execute(f"ALTER TABLE {ref_table} ADD COLUMN {key_column} date")
+    op.execute(f"UPDATE {ref_table} r SET {key_column} = t.{key} FROM {target} t WHERE t.id = r.{column}")
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION {fill}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.{key_column} := (SELECT {key} FROM {target} WHERE id = NEW.{column});
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute(
+        f"CREATE TRIGGER {fill} BEFORE INSERT OR UPDATE OF {column} ON {ref_table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {fill}()"
+    )
+    op.execute(
+        f"ALTER TABLE {ref_table} ADD CONSTRAINT {conname} FOREIGN KEY ({column}, {key_column}) "
+        f"REFERENCES {target} (id, {key}) MATCH FULL ON UPDATE CASCADE"
+        + (f" ON DELETE {on_delete}" if on_delete else "")
+    )
+
+
+def _drop_partition_key(ref_table: str, conname: str, key_column: str) -> None:
+    fill = f"{ref_table}_{key_column}_fill"
+    op.execute(f"ALTER TABLE {ref_table} DROP CONSTRAINT IF EXISTS {conname}")
+    op.execute(f"DROP TRIGGER IF EXISTS {fill} ON {ref_table}")
+    op.execute(f"DROP FUNCTION IF EXISTS {fill}()")
+    op.execute(f"ALTER TABLE {ref_table} DROP COLUMN IF EXISTS {key_column}")
+
+
+def _referencing_columns(inspector, ref_table: str, target: str):
+    """引用表与被引用表都存在时返回引用表的列名，否则返回 None"""
+    if not inspector.has_table(ref_table) or not inspector.has_table(target):
+        return None
+    return {item['name'] for item in inspector.get_columns(ref_table)}
+
+
+def _is_partitioned(bind, table: str) -> bool:
+    return bind.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"
+    ), {'table': table}).scalar()
+
+
+def upgrade() -> None:
+    # 数据搬迁期间持有原表锁，大表应在维护窗口执行
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    for table, key in PARTITIONED_TABLES.items():
+        # ad_spend_daily 由 Supabase 脚本创建，未建表的环境跳过
+        if inspector.has_table(table) and not _is_partitioned(bind, table):
+            _rebuild(table, key, partitioned=True)
+
+    for ref_table, conname, column, target, key_column, on_delete in REFERENCING_FOREIGN_KEYS:
+        columns = _referencing_columns(inspector, ref_table, target)
+        if not columns or column not in columns or key_column in columns or not _is_partitioned(bind, target):
+            continue
+        _carry_partition_key(ref_table, conname, column, target, key_column, on_delete)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    partitioned = {table for table in PARTITIONED_TABLES if inspector.has_table(table) and _is_partitioned(bind, table)}
+    restored = []
+    for ref_table, conname, column, target, key_column, on_delete in REFERENCING_FOREIGN_KEYS:
+        columns = _referencing_columns(inspector, ref_table, target)
+        if target in partitioned and columns and column in columns:
+            _drop_partition_key(ref_table, conname, key_column)
+            restored.append((ref_table, conname, column, target, on_delete))
+
+    for table, key in PARTITIONED_TABLES.items():
+        if table in partitioned:
+            _rebuild(table, key, partitioned=False)
+
+    for ref_table, conname, column, target, on_delete in restored:
+        op.execute(
+            f"ALTER TABLE {ref_table} ADD CONSTRAINT {conname} FOREIGN KEY ({column}) REFERENCES {target} (id)"
+            + (f" ON DELETE {on_delete}" if on_delete else "")
+        )
@@ -0,0 +1,95 @@
+"""user_profiles 增加邮箱列与唯一索引，供失败登录按邮箱查找用户
+
+Revision ID: 010
+Revises: 009
+Create Date: 2025-11-26 10:00:00.000000
+
+失败登录记录此前每次都通过 auth.admin.list_users() 拉取整个用户目录再线性查找邮箱。
+迁移在 user_profiles 上冗余一份小写邮箱，从 auth.users 回填，并由 auth.users 上的触发器
+在注册与改邮箱时同步；scripts/sync_user_emails.py 定期全量校正。
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+INDEX_NAME = 'idx_user_profiles_email'
+
+# 触发器名按字母序排在 on_auth_user_created 之后，插入时资料行已由 handle_new_user 建好
+SYNC_TRIGGER = 'on_auth_user_email_synced'
+
+
+def upgrade() -> None:
+    context = op.get_context()
+    has_auth_users = True
+    if not context.as_sql:
+        inspector = sa.inspect(op.get_bind())
+        # user_profiles 由 Supabase 认证迁移创建，未迁移的库跳过
+        if not inspector.has_table('user_profiles'):
+            return
+        has_auth_users = inspector.has_table('users', schema='auth')
+        columns = {column['name'] for column in inspector.get_columns('user_profiles')}
+        if 'email' not in columns:
+            op.add_column('user_profiles', sa.Column('email', sa.String(255), nullable=True, comment='登录邮箱（小写）'))
+    else:
+        op.add_column('user_profiles', sa.Column('email', sa.String(255), nullable=True, comment='登录邮箱（小写）'))
+
+    if has_auth_users:
+        op.execute("""
+            UPDATE public.user_profiles p
+            SET email = lower(u.email)
+            FROM auth.users u
+            WHERE u.id = p.id AND p.email IS DISTINCT FROM lower(u.email)
+        """)
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.sync_user_profile_email()
+            RETURNS TRIGGER
+            LANGUAGE plpgsql
+            SECURITY DEFINER
+            SET search_path = public
+            AS $$
+            BEGIN
+                UPDATE public.user_profiles
+                SET email = lower(new.email)
+                WHERE id = new.id AND email IS DISTINCT FROM lower(new.email);
+                RETURN new;
+            END;
+            $$;
+        """)
+        op.execute(f'DROP TRIGGER IF EXISTS {SYNC_TRIGGER} ON auth.users')
+        op.execute(f"""
+            CREATE TRIGGER {SYNC_TRIGGER}
+                AFTER INSERT OR UPDATE OF email ON auth.users
+                FOR EACH ROW EXECUTE FUNCTION public.sync_user_profile_email();
+        """)
+
+    # 并发建索引避免阻塞写入（CONCURRENTLY 不能在事务内执行）
+    with context.autocommit_block():
+        op.create_index(
+            INDEX_NAME,
+            'user_profiles',
+            ['email'],
+            unique=True,
+            postgresql_where=sa.text('email IS NOT NULL'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    context = op.get_context()
+    if not context.as_sql:
+        inspector = sa.inspect(op.get_bind())
+        if not inspector.has_table('user_profiles'):
+            return
+    with context.autocommit_block():
+        op.drop_index(INDEX_NAME, table_name='user_profiles', postgresql_concurrently=True, if_exists=True)
+    op.execute(f'DROP TRIGGER IF EXISTS {SYNC_TRIGGER} ON auth.users')
+    op.execute('DROP FUNCTION IF EXISTS public.sync_user_profile_email()')
+    op.drop_column('user_profiles', 'email')
@@ -0,0 +1,43 @@
+"""ledgers 增加 (created_at, id) 索引，供交易记录导出按键集分页
+
+Revision ID: 011
+Revises: 010
+Create Date: 2025-11-27 10:00:00.000000
+
+导出每页从上一页最后一条记录的 (created_at, id) 之后继续读取，索引使每页只扫描本页的行。
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+INDEX_NAME = 'idx_ledgers_created_at_id'
+
+
+def upgrade() -> None:
+    context = op.get_context()
+    if not context.as_sql:
+        # ledgers 由 Supabase 建表脚本维护，未建表的库跳过
+        if not sa.inspect(op.get_bind()).has_table('ledgers'):
+            return
+
+    # 并发建索引避免阻塞写入（CONCURRENTLY 不能在事务内执行）
+    with context.autocommit_block():
+        op.create_index(
+            INDEX_NAME,
+            'ledgers',
+            ['created_at', 'id'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX_NAME, table_name='ledgers', postgresql_concurrently=True, if_exists=True)
@@ -8,6 +8,7 @@ from .ad_accounts import AdAccount
 from .ad_spend_daily import AdSpendDaily
 from .channels import Channel
 from .daily_report import DailyReport, DailyReportAuditLog
+from .ledgers import Ledger
 from .project import Project, ProjectMember, ProjectExpense
 from .reconciliation import Reconciliation, ReconciliationLog
 from .topup import Topup
@@ -24,6 +25,7 @@ __all__ = [
     "Role",
     "DailyReport",
     "DailyReportAuditLog",
+    "Ledger",
     "Reconciliation",
     "ReconciliationLog",
     "Topup",
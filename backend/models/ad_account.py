@@ -120,6 +120,7 @@ class AdAccount(Base):
         Index("idx_ad_accounts_project", "project_id"),
         Index("idx_ad_accounts_channel", "channel_id"),
         Index("idx_ad_accounts_assigned_user", "assigned_user_id"),
+        Index("idx_ad_accounts_assigned_user_status", "assigned_user_id", "status"),
         Index("idx_ad_accounts_created_at", "created_at"),
         {"comment": "广告账户表"}
     )
@@ -270,6 +271,7 @@ class AccountAlert(Base):
         Index("idx_account_alerts_account", "account_id"),
         Index("idx_account_alerts_status", "status"),
         Index("idx_account_alerts_severity", "severity"),
+        Index("idx_account_alerts_status_severity", "status", "severity"),
         Index("idx_account_alerts_type", "alert_type"),
         Index("idx_account_alerts_created_at", "created_at"),
         {"comment": "账户预警表"}
@@ -6,13 +6,14 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     Text,
     UniqueConstraint,
 )
 from sqlalchemy.dialects.postgresql import UUID as PGUUID
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from sqlalchemy.types import CHAR, TypeDecorator
 
 from backend.core.db import Base
@@ -44,9 +45,17 @@ class GUID(TypeDecorator):
 
 
 class AdSpendDaily(Base):
+    # 数据库中按 date 月度范围分区（009 迁移），主键为 (id, date)
     __tablename__ = "ad_spend_daily"
     __table_args__ = (
         UniqueConstraint("ad_account_id", "date", name="ad_spend_daily_unique_account_date"),
+        # 账户累计重算按账户汇总消耗与线索数，可仅扫描索引
+        Index(
+            "idx_ad_spend_daily_account_date_cover",
+            "ad_account_id",
+            text("date DESC"),
+            postgresql_include=["spend", "leads_count"],
+        ),
     )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4, nullable=False)
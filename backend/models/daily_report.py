@@ -20,7 +20,11 @@ from core.database import Base
 
 
 class DailyReport(Base):
-    """日报主表"""
+    """日报主表
+
+    数据库中按 report_date 月度范围分区（009 迁移），主键为 (id, report_date)，
+    查询应以 report_date 范围筛选以便裁剪分区
+    """
     __tablename__ = "daily_reports"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -68,11 +72,18 @@ class DailyReport(Base):
         # 复合索引优化查询
         Index('idx_daily_reports_date_status', 'report_date', 'status'),
         Index('idx_daily_reports_account_date', 'ad_account_id', 'report_date'),
+        # 列表分页按 (report_date DESC, id DESC) 取当页 ID，附带常用筛选列可仅扫描索引
+        Index(
+            'idx_daily_reports_date_id',
+            report_date.desc(),
+            id.desc(),
+            postgresql_include=['ad_account_id', 'status', 'created_by'],
+        ),
         {'comment': '日报数据表'}
     )
 
     # 关联关系
-    ad_account = relationship("AdAccount", back_populates="daily_reports")
+    ad_account = relationship("AdAccount")
     creator = relationship("User", foreign_keys=[created_by])
     auditor = relationship("User", foreign_keys=[audit_user_id])
     audit_logs = relationship("DailyReportAuditLog", back_populates="daily_report")
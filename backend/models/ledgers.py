@@ -0,0 +1,35 @@
+"""
+财务流水模块
+ledgers 表由 Supabase 建表脚本维护，报表利润、自动对账、列式副本与交易记录导出共用
+"""
+
+import uuid
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Numeric, String, Text
+from sqlalchemy.sql import func
+
+from backend.core.db import Base
+from backend.models.ad_spend_daily import GUID
+
+
+class Ledger(Base):
+    """财务流水表"""
+    __tablename__ = "ledgers"
+    __table_args__ = (
+        # 导出按 (created_at, id) 键集分页（011 迁移）
+        Index("idx_ledgers_created_at_id", "created_at", "id"),
+    )
+
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4, nullable=False)
+    type = Column(String(20), nullable=False)  # income / expense 等
+    project_id = Column(GUID(), ForeignKey("projects.id"), index=True)
+    channel_id = Column(GUID(), ForeignKey("channels.id"))
+    ad_account_id = Column(GUID(), ForeignKey("ad_accounts.id"), index=True)
+    amount = Column(Numeric(18, 2), nullable=False)
+    currency = Column(String(3), nullable=False, server_default="USD")
+    occurred_at = Column(DateTime(timezone=True), nullable=False)
+    remark = Column(Text)
+    created_by = Column(GUID(), ForeignKey("users.id"))
+    updated_by = Column(GUID(), ForeignKey("users.id"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -11,7 +11,7 @@ from typing import Optional
 from sqlalchemy import Column, Integer, String, Text, DECIMAL, TIMESTAMP, ForeignKey, DATE, Index
 from sqlalchemy.dialects.postgresql import INET
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 
 from core.database import Base
 
@@ -82,6 +82,19 @@ class TopupRequest(Base):
         Index('idx_topup_requests_requested_by', 'requested_by'),
         Index('idx_topup_requests_created_at', 'created_at'),
         Index('idx_topup_requests_urgency', 'urgency_level'),
+        Index('idx_topup_requests_status_created', status, created_at.desc()),
+        Index('idx_topup_requests_account_requester_created', ad_account_id, requested_by, created_at),
+        Index(
+            'idx_topup_requests_pending',
+            created_at.desc(),
+            postgresql_include=['ad_account_id', 'project_id', 'requested_amount'],
+            postgresql_where=text("status = 'pending'"),
+        ),
+        Index(
+            'idx_topup_requests_open_expected',
+            expected_date,
+            postgresql_where=text("status IN ('pending', 'data_review', 'finance_approve')"),
+        ),
         {'comment': '充值申请表'}
     )
 
@@ -32,6 +32,7 @@ class UserProfile(Base):
 
     # 基本信息
     username = Column(String(50), unique=True, nullable=True, index=True, comment="用户名")
+    email = Column(String(255), nullable=True, comment="登录邮箱（小写，由 auth.users 同步）")
     full_name = Column(String(100), nullable=True, comment="全名")
     phone = Column(String(20), nullable=True, comment="手机号")
     avatar_url = Column(String(500), nullable=True, comment="头像URL")
@@ -135,13 +136,19 @@ class UserProfile(Base):
         Index("idx_user_profiles_last_login", "last_login_at"),
         Index("idx_user_profiles_department", "department"),
         Index("idx_user_profiles_position", "position"),
+        Index(
+            "idx_user_profiles_email",
+            "email",
+            unique=True,
+            postgresql_where=email.isnot(None)
+        ),
         {
             "comment": "用户资料表（与Supabase Auth关联）"
         }
     )
 
     def __repr__(self):
-        return f"<UserProfile(id={self.id}, email={self.id}, role={self.role})>"
+        return f"<UserProfile(id={self.id}, email={self.email}, role={self.role})>"
 
     @property
     def is_admin(self) -> bool:
@@ -4,13 +4,14 @@ Version: 1.0
 Author: Claude协作开发
 """
 
-from typing import List, Optional
+from datetime import datetime
+from typing import Iterator, List, Optional
 
 from fastapi import APIRouter, Depends, Query, HTTPException, status
-from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from core.database import get_db
+from core.db import get_session_factory
 from core.auth import get_current_user
 from models.user import User
 from models.ad_account import AdAccount, AccountAlert, AccountNote
@@ -33,7 +34,7 @@ from services.ad_account_service import AdAccountService
 from services.audit_log_service import AuditLogService
 from utils.decorators import require_role
 from utils.response import success_response, paginated_response
-from utils.export import export_to_excel, export_to_pdf
+from utils.export import xlsx_streaming_response
 from exceptions import ValidationError, NotFoundError, PermissionError
 
 
@@ -334,7 +335,7 @@ async def get_ad_accounts_statistics(
         start_date = datetime.strptime(date_from, "%Y-%m-%d").date() if date_from else None
         end_date = datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else None
 
-        statistics = await service.get_statistics(
+        statistics = await service.get_account_statistics(
             project_id=project_id,
             channel_id=channel_id,
             platform=platform,
@@ -582,33 +583,19 @@ async def delete_ad_account(
         )
 
 
-@router.get("/export/excel")
-@require_role(["admin", "finance", "data_operator", "account_manager"])
-async def export_ad_accounts(
-    status: Optional[str] = Query(None, description="账户状态"),
-    platform: Optional[str] = Query(None, description="广告平台"),
-    project_id: Optional[int] = Query(None, description="项目ID"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    service: AdAccountService = Depends(get_ad_account_service)
-):
-    """导出广告账户数据"""
-    try:
-        # 获取数据
-        accounts, _ = await service.get_accounts(
-            page=1,
-            page_size=10000,  # 大批量导出
-            status=status,
-            platform=platform,
-            project_id=project_id,
-            current_user_id=current_user.id,
-            user_role=current_user.role
-        )
+AD_ACCOUNT_EXPORT_HEADERS = [
+    "账户ID", "账户名称", "平台", "状态", "项目", "渠道", "负责投手", "日预算", "总预算",
+    "总消耗", "总潜在客户", "平均CPL", "最佳CPL", "货币", "创建时间", "激活时间"
+]
 
-        # 转换为导出格式
-        export_data = []
-        for account in accounts:
-            export_data.append({
+
+def _iter_ad_account_export_rows(**filters) -> Iterator[dict]:
+    """逐行生成导出数据，使用独立会话，响应流式发送完毕后关闭"""
+    db = get_session_factory()()
+    try:
+        service = AdAccountService(db)
+        for account in service.iter_accounts(**filters):
+            yield {
                 "账户ID": account.account_id,
                 "账户名称": account.name,
                 "平台": account.platform,
@@ -625,16 +612,35 @@ async def export_ad_accounts(
                 "货币": account.currency,
                 "创建时间": account.created_at.isoformat() if account.created_at else "",
                 "激活时间": account.activated_date.isoformat() if account.activated_date else ""
-            })
+            }
+    finally:
+        db.close()
+
 
-        # 导出Excel
-        file_content = export_to_excel(export_data, sheet_name="广告账户列表")
+@router.get("/export/excel")
+@require_role(["admin", "finance", "data_operator", "account_manager"])
+async def export_ad_accounts(
+    status: Optional[str] = Query(None, description="账户状态"),
+    platform: Optional[str] = Query(None, description="广告平台"),
+    project_id: Optional[int] = Query(None, description="项目ID"),
+    current_user: User = Depends(get_current_user)
+):
+    """导出广告账户数据"""
+    try:
         filename = f"ad_accounts_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx"
 
-        return StreamingResponse(
-            iter([file_content]),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        # 流式返回文件，导出行数不设上限
+        return xlsx_streaming_response(
+            _iter_ad_account_export_rows(
+                status=status,
+                platform=platform,
+                project_id=project_id,
+                current_user_id=current_user.id,
+                user_role=current_user.role
+            ),
+            filename,
+            sheet_name="广告账户列表",
+            headers=AD_ACCOUNT_EXPORT_HEADERS
         )
 
     except Exception as e:
@@ -84,11 +84,11 @@ def create_ad_account(
 ) -> dict:
     account = AdAccount(id=uuid4(), **payload.dict())
     db.add(account)
-    db.commit()
+    db.flush()
     db.refresh(account)
     data = AdAccountRead.model_validate(account, from_attributes=True).model_dump()
 
-    LogService.write(
+    LogService.stage(
         db,
         action="create_ad_account",
         operator_id=current_user.id,
@@ -96,6 +96,7 @@ def create_ad_account(
         target_id=account.id,
         detail=data,
     )
+    db.commit()
 
     return ok(data=data, status_code=status.HTTP_201_CREATED)
 
@@ -1,3 +1,4 @@
+import json
 import logging
 from math import ceil
 from datetime import date
@@ -5,22 +6,30 @@ from decimal import Decimal, ROUND_HALF_UP
 from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, ValidationError, validator
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from backend.core.db import get_db
 from backend.core.error_codes import ErrorCode
 from backend.core.response import fail, ok
-from backend.core.security import AuthenticatedUser, get_current_user
+from backend.core.security import AuthenticatedUser, get_current_user, require_roles
 from backend.models import AdAccount, AdSpendDaily
+from backend.services.account_metrics import refresh_account_metrics
+from backend.services.anomaly_service import SpendAnomalyService, mark_spend_points
 from backend.services.log_service import LogService
+from backend.services.report_cache import mark_report_changes
 
 router = APIRouter(prefix="/adspend", tags=["ad_spend"])
 
 MAX_SPEND = Decimal("10000000")
 MAX_LEADS = 1_000_000
+MAX_BULK_ROWS = 10000
+UPSERT_CHUNK_SIZE = 1000
 
 
 class AdSpendReportPayload(BaseModel):
@@ -48,31 +57,121 @@ class AdSpendReportPayload(BaseModel):
         return value
 
 
+class AnomalyRecomputePayload(BaseModel):
+    start_date: date
+    end_date: date
+    ad_account_ids: Optional[List[UUID]] = None
+
+    @validator("end_date")
+    def validate_range(cls, value: date, values: Dict[str, Any]) -> date:
+        start = values.get("start_date")
+        if start and value < start:
+            raise ValueError("end_date must not be earlier than start_date")
+        if start and (value - start).days > 366:
+            raise ValueError("date range must not exceed 366 days")
+        return value
+
+
 def _calculate_cost_per_lead(spend: Decimal, leads: int) -> Decimal:
     if leads <= 0:
         return Decimal("0")
     return (spend / Decimal(leads)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
-def _detect_anomaly(
-    current_spend: Decimal,
-    leads_count: int,
-    previous: Optional[AdSpendDaily],
-) -> Tuple[bool, Optional[str]]:
-    if leads_count == 0:
-        return True, "LEADS_COUNT_ZERO"
-    if previous is None:
-        return False, None
-    prev_spend = previous.spend or Decimal("0")
-    if prev_spend == 0:
-        if current_spend > 0:
-            return True, "SPEND_PREVIOUS_ZERO"
-        return False, None
-    change_ratio = (current_spend - prev_spend).copy_abs() / prev_spend.copy_abs()
-    if change_ratio > Decimal("0.30"):
-        percentage = (change_ratio * Decimal("100")).quantize(Decimal("0.01"))
-        return True, f"SPEND_CHANGE_{percentage}%"
-    return False, None
+def _is_duplicate_report(exc: IntegrityError) -> bool:
+    message = str(exc.orig)
+    return "ad_spend_daily_unique_account_date" in message or (
+        "UNIQUE" in message.upper() and "ad_spend_daily" in message
+    )
+
+
+def _parse_bulk_body(body: bytes, content_type: Optional[str]) -> List[Any]:
+    """解析 JSON 数组、{"rows": [...]} 或 NDJSON 请求体"""
+    text = body.decode("utf-8-sig").strip()
+    if not text:
+        raise ValueError("请求体为空")
+    if "ndjson" in (content_type or "") or "jsonlines" in (content_type or ""):
+        rows = []
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as exc:
+                raise ValueError(f"第 {line_no} 行不是合法 JSON") from exc
+    else:
+        try:
+            parsed = json.loads(text)
+        except ValueError as exc:
+            raise ValueError("请求体不是合法 JSON") from exc
+        rows = parsed.get("rows") if isinstance(parsed, dict) else parsed
+        if not isinstance(rows, list):
+            raise ValueError("请求体必须是数组或包含 rows 数组")
+    if len(rows) > MAX_BULK_ROWS:
+        raise ValueError(f"单次最多录入 {MAX_BULK_ROWS} 条")
+    return rows
+
+
+UPSERT_COLUMNS = ("spend", "leads_count", "cost_per_lead", "is_anomaly", "anomaly_reason", "note", "updated_by")
+
+
+def _upsert_ad_spend(db: Session, values: List[Dict[str, Any]]) -> Dict[Tuple[UUID, date], UUID]:
+    """按 (ad_account_id, date) 分块 upsert，返回每个账户日期最终的记录 ID"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return _upsert_ad_spend_by_lookup(db, values)
+
+    stored: Dict[Tuple[UUID, date], UUID] = {}
+    for offset in range(0, len(values), UPSERT_CHUNK_SIZE):
+        statement = insert(AdSpendDaily).values(values[offset:offset + UPSERT_CHUNK_SIZE])
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=[AdSpendDaily.ad_account_id, AdSpendDaily.date],
+            set_={
+                **{column: excluded[column] for column in UPSERT_COLUMNS},
+                "updated_at": func.now(),
+            },
+        ).returning(AdSpendDaily.id, AdSpendDaily.ad_account_id, AdSpendDaily.date)
+        for record_id, account_id, day in db.execute(statement):
+            stored[(account_id, day)] = record_id
+    return stored
+
+
+def _upsert_ad_spend_by_lookup(db: Session, values: List[Dict[str, Any]]) -> Dict[Tuple[UUID, date], UUID]:
+    """不支持 ON CONFLICT 的方言（如 MySQL）：每块先查已有记录，再批量更新命中行、批量插入其余行
+
+    查询与写入之间并发插入同一账户日期时由唯一约束拒绝，整批随事务回滚
+    """
+    stored: Dict[Tuple[UUID, date], UUID] = {}
+    for offset in range(0, len(values), UPSERT_CHUNK_SIZE):
+        chunk = values[offset:offset + UPSERT_CHUNK_SIZE]
+        existing = {
+            (account_id, day): record_id
+            for record_id, account_id, day in db.query(AdSpendDaily.id, AdSpendDaily.ad_account_id, AdSpendDaily.date)
+            .filter(
+                AdSpendDaily.ad_account_id.in_({value["ad_account_id"] for value in chunk}),
+                AdSpendDaily.date.in_({value["date"] for value in chunk}),
+            )
+            .all()
+        }
+        updates, inserts = [], []
+        for value in chunk:
+            key = (value["ad_account_id"], value["date"])
+            if key in existing:
+                updates.append({"id": existing[key], **{column: value[column] for column in UPSERT_COLUMNS}})
+                stored[key] = existing[key]
+            else:
+                inserts.append(value)
+                stored[key] = value["id"]
+        if updates:
+            db.execute(update(AdSpendDaily), updates)
+        if inserts:
+            db.execute(AdSpendDaily.__table__.insert(), inserts)
+    return stored
 
 
 def _serialize_report(record: AdSpendDaily) -> Dict[str, Any]:
@@ -154,33 +253,11 @@ def create_ad_spend_report(
     if account is None:
         return fail(ErrorCode.INVALID_PARAM, "广告账户不存在", status_code=status.HTTP_404_NOT_FOUND)
 
-    exists = (
-        db.query(AdSpendDaily)
-        .filter(
-            AdSpendDaily.ad_account_id == payload.ad_account_id,
-            AdSpendDaily.date == payload.date,
-        )
-        .first()
-    )
-    if exists:
-        return fail(
-            ErrorCode.INVALID_STATUS,
-            "同一广告账户该日期的日报已存在",
-            status_code=status.HTTP_409_CONFLICT,
-        )
-
-    previous = (
-        db.query(AdSpendDaily)
-        .filter(
-            AdSpendDaily.ad_account_id == payload.ad_account_id,
-            AdSpendDaily.date < payload.date,
-        )
-        .order_by(AdSpendDaily.date.desc())
-        .first()
-    )
-
     spend_amount = payload.spend
-    is_anomaly, anomaly_reason = _detect_anomaly(spend_amount, payload.leads_count, previous)
+    # 复用缓存的账户滚动状态，无需再单独查询前一日记录
+    is_anomaly, anomaly_reason = SpendAnomalyService(db).evaluate(
+        payload.ad_account_id, payload.date, spend_amount, payload.leads_count
+    )
     cost_per_lead = _calculate_cost_per_lead(spend_amount, payload.leads_count)
 
     record = AdSpendDaily(
@@ -197,12 +274,23 @@ def create_ad_spend_report(
         updated_by=actor_id,
     )
     db.add(record)
-    db.commit()
+    try:
+        db.flush()
+    except IntegrityError as exc:
+        # 依赖 (ad_account_id, date) 唯一约束判重，省去提交前的存在性查询
+        db.rollback()
+        if not _is_duplicate_report(exc):
+            raise
+        return fail(
+            ErrorCode.INVALID_STATUS,
+            "同一广告账户该日期的日报已存在",
+            status_code=status.HTTP_409_CONFLICT,
+        )
     db.refresh(record)
 
     serialized = jsonable_encoder(_serialize_report(record))
 
-    LogService.write(
+    LogService.stage(
         db,
         action="create_ad_spend_daily",
         operator_id=current_user.id,
@@ -210,5 +298,146 @@ def create_ad_spend_report(
         target_id=record.id,
         detail=serialized,
     )
+    db.commit()
 
     return ok(data=serialized, status_code=status.HTTP_201_CREATED)
+
+
+def _bulk_upsert(
+    db: Session, current_user: AuthenticatedUser, actor_id: UUID, raw_rows: List[Any]
+) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = [{"index": index, "status": "error"} for index in range(len(raw_rows))]
+    valid: Dict[Tuple[UUID, date], Tuple[int, AdSpendReportPayload]] = {}
+    for index, raw in enumerate(raw_rows):
+        try:
+            item = AdSpendReportPayload.parse_obj(raw)
+        except ValidationError as exc:
+            results[index]["error"] = jsonable_encoder(exc.errors())
+            continue
+        key = (item.ad_account_id, item.date)
+        if key in valid:
+            # 同批次内相同账户日期以最后一条为准
+            results[valid[key][0]]["error"] = "同批次中存在相同账户与日期的后续记录"
+        valid[key] = (index, item)
+
+    # 账户归属一次查询预加载
+    account_ids = list({account_id for account_id, _ in valid})
+    projects = dict(
+        db.query(AdAccount.id, AdAccount.project_id).filter(AdAccount.id.in_(account_ids)).all()
+    ) if account_ids else {}
+    entries = []
+    for (account_id, _), (index, item) in valid.items():
+        if account_id in projects:
+            entries.append((index, item))
+        else:
+            results[index]["error"] = "广告账户不存在"
+
+    # 历史窗口一次查询预加载，整批计算异常与 CPL
+    anomalies = SpendAnomalyService(db).evaluate_batch(
+        [(item.ad_account_id, item.date, item.spend, item.leads_count) for _, item in entries]
+    )
+    values = [
+        {
+            "id": uuid4(),
+            "ad_account_id": item.ad_account_id,
+            "user_id": actor_id,
+            "date": item.date,
+            "spend": item.spend,
+            "leads_count": item.leads_count,
+            "cost_per_lead": _calculate_cost_per_lead(item.spend, item.leads_count),
+            "is_anomaly": is_anomaly,
+            "anomaly_reason": anomaly_reason,
+            "note": item.note,
+            "created_by": actor_id,
+            "updated_by": actor_id,
+        }
+        for (_, item), (is_anomaly, anomaly_reason) in zip(entries, anomalies)
+    ]
+    stored = _upsert_ad_spend(db, values) if values else {}
+
+    for (index, item), value in zip(entries, values):
+        record_id = stored.get((item.ad_account_id, item.date))
+        results[index].update(
+            status="created" if record_id == value["id"] else "updated",
+            id=str(record_id) if record_id else None,
+            ad_account_id=str(item.ad_account_id),
+            date=item.date.isoformat(),
+            cost_per_lead=str(value["cost_per_lead"]),
+            is_anomaly=value["is_anomaly"],
+            anomaly_reason=value["anomaly_reason"],
+        )
+
+    # Core upsert 不经过 ORM flush，显式登记缓存失效与滚动状态
+    mark_spend_points(db, ((v["ad_account_id"], v["date"], v["spend"]) for v in values))
+    mark_report_changes(db, {(projects[v["ad_account_id"]], v["date"]) for v in values})
+    refresh_account_metrics(db, AdSpendDaily, (v["ad_account_id"] for v in values))
+
+    summary = {
+        "total": len(raw_rows),
+        "created": sum(1 for item in results if item["status"] == "created"),
+        "updated": sum(1 for item in results if item["status"] == "updated"),
+        "failed": sum(1 for item in results if item["status"] == "error"),
+        "anomalies": sum(1 for value in values if value["is_anomaly"]),
+    }
+    LogService.stage(
+        db,
+        action="bulk_upsert_ad_spend_daily",
+        operator_id=current_user.id,
+        target="ad_spend_daily",
+        target_id=None,
+        detail={
+            **summary,
+            "accounts": len({value["ad_account_id"] for value in values}),
+            "date_from": min((value["date"] for value in values), default=None),
+            "date_to": max((value["date"] for value in values), default=None),
+        },
+    )
+    db.commit()
+    return {"summary": summary, "results": results}
+
+
+@router.post("/reports/bulk", response_model=dict)
+async def bulk_upsert_ad_spend_reports(
+    request: Request,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """批量录入账户日消耗，支持 JSON 数组与 NDJSON，按 (ad_account_id, date) upsert"""
+    try:
+        actor_id = UUID(str(current_user.id))
+    except (TypeError, ValueError):
+        return fail(ErrorCode.INVALID_PARAM, "当前用户缺少有效 ID", status_code=status.HTTP_401_UNAUTHORIZED)
+    try:
+        raw_rows = _parse_bulk_body(await request.body(), request.headers.get("content-type"))
+    except ValueError as exc:
+        return fail(ErrorCode.INVALID_PARAM, str(exc), status_code=status.HTTP_400_BAD_REQUEST)
+
+    data = await run_in_threadpool(_bulk_upsert, db, current_user, actor_id, raw_rows)
+    return ok(data=data)
+
+
+@router.post("/anomalies/recompute", response_model=dict)
+def recompute_ad_spend_anomalies(
+    payload: AnomalyRecomputePayload,
+    # 重算会改写任意日期范围内的异常标记，与充值审批一样仅限经理与管理员
+    current_user: AuthenticatedUser = Depends(require_roles("manager", "admin")),
+    db: Session = Depends(get_db),
+):
+    result = SpendAnomalyService(db).recompute(
+        payload.start_date, payload.end_date, payload.ad_account_ids, commit=False
+    )
+    LogService.stage(
+        db,
+        action="recompute_ad_spend_anomalies",
+        operator_id=current_user.id,
+        target="ad_spend_daily",
+        target_id=None,
+        detail={
+            "start_date": payload.start_date.isoformat(),
+            "end_date": payload.end_date.isoformat(),
+            "ad_account_ids": [str(item) for item in payload.ad_account_ids or []],
+            **result,
+        },
+    )
+    db.commit()
+    return ok(data=result)
@@ -6,16 +6,15 @@ Author: Claude协作开发
 
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
-from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from io import BytesIO
 import pandas as pd
 import uuid
 
-from core.db import get_db
+from core.db import get_db, get_session_factory
 from core.dependencies import get_current_user, require_role
 from core.response import (
     success_response,
@@ -45,6 +44,7 @@ from schemas.daily_report import (
     DailyReportAuditLogResponse
 )
 from services.daily_report_service import DailyReportService
+from utils.export import xlsx_streaming_response
 
 router = APIRouter(prefix="/daily-reports", tags=["daily-reports"])
 
@@ -69,6 +69,7 @@ async def list_daily_reports(
     status: Optional[str] = Query(None, pattern="^(pending|approved|rejected)$", description="审核状态"),
     media_buyer_id: Optional[int] = Query(None, description="投手ID"),
     project_id: Optional[int] = Query(None, description="项目ID"),
+    with_total: bool = Query(True, description="是否统计总数，翻页时可关闭以省去计数查询"),
     service: DailyReportService = Depends(get_daily_report_service),
     current_user: User = Depends(get_current_user)
 ):
@@ -87,7 +88,7 @@ async def list_daily_reports(
         )
 
         # 获取日报列表
-        reports, total = service.get_daily_reports(params, current_user, page, page_size)
+        reports, total = service.get_daily_reports(params, current_user, page, page_size, with_total=with_total)
 
         # 转换为响应格式
         report_responses = [
@@ -97,10 +98,12 @@ async def list_daily_reports(
 
         # 返回分页响应
         return paginated_response(
-            items=report_responses,
+            data=report_responses,
             page=page,
             page_size=page_size,
-            total=total
+            total=total,
+            # 未统计总数时以当页是否取满判断，恰好取满时下一页可能为空
+            has_next=len(reports) == page_size
         )
 
     except (BusinessLogicError, ResourceNotFoundError, PermissionDeniedError) as e:
@@ -539,6 +542,47 @@ async def import_daily_reports_from_file(
         )
 
 
+DAILY_REPORT_EXPORT_HEADERS = [
+    'ID', '报表日期', '广告账户ID', '广告账户', '广告系列', '广告组', '广告创意',
+    '展示次数', '点击次数', '消耗金额', '转化次数', '新增粉丝', '状态',
+    '创建人', '创建时间', '审核人', '审核时间', '备注', '审核说明'
+]
+
+
+def _iter_daily_report_export_rows(params: DailyReportQueryParams, current_user: User) -> Iterator[dict]:
+    """逐行生成导出数据
+
+    响应流式发送时依赖注入的会话已关闭，因此这里使用独立会话并在迭代结束后关闭
+    """
+    db = get_session_factory()()
+    try:
+        service = DailyReportService(db)
+        for report in service.iter_daily_reports(params, current_user):
+            yield {
+                'ID': report.id,
+                '报表日期': report.report_date,
+                '广告账户ID': report.ad_account_id,
+                '广告账户': report.ad_account.name if report.ad_account else '',
+                '广告系列': report.campaign_name or '',
+                '广告组': report.ad_group_name or '',
+                '广告创意': report.ad_creative_name or '',
+                '展示次数': report.impressions,
+                '点击次数': report.clicks,
+                '消耗金额': float(report.spend),
+                '转化次数': report.conversions,
+                '新增粉丝': report.new_follows,
+                '状态': report.status,
+                '创建人': report.creator.nickname if report.creator else '',
+                '创建时间': report.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                '审核人': report.auditor.nickname if report.auditor else '',
+                '审核时间': report.audit_time.strftime('%Y-%m-%d %H:%M:%S') if report.audit_time else '',
+                '备注': report.notes or '',
+                '审核说明': report.audit_notes or ''
+            }
+    finally:
+        db.close()
+
+
 @router.get(
     "/export",
     summary="导出日报",
@@ -549,7 +593,6 @@ async def export_daily_reports(
     report_date_end: Optional[str] = Query(None, description="结束日期"),
     ad_account_id: Optional[int] = Query(None, description="广告账户ID"),
     status: Optional[str] = Query(None, description="审核状态"),
-    service: DailyReportService = Depends(get_daily_report_service),
     current_user: User = Depends(require_role(["finance", "admin", "data_operator", "account_manager"]))
 ):
     """
@@ -564,65 +607,15 @@ async def export_daily_reports(
             status=status
         )
 
-        # 获取所有符合条件的日报（不分页）
-        reports, _ = service.get_daily_reports(params, current_user, page=1, page_size=10000)
-
-        # 转换为DataFrame
-        data = []
-        for report in reports:
-            data.append({
-                'ID': report.id,
-                '报表日期': report.report_date,
-                '广告账户ID': report.ad_account_id,
-                '广告账户': report.ad_account.name if report.ad_account else '',
-                '广告系列': report.campaign_name or '',
-                '广告组': report.ad_group_name or '',
-                '广告创意': report.ad_creative_name or '',
-                '展示次数': report.impressions,
-                '点击次数': report.clicks,
-                '消耗金额': float(report.spend),
-                '转化次数': report.conversions,
-                '新增粉丝': report.new_follows,
-                '状态': report.status,
-                '创建人': report.creator.nickname if report.creator else '',
-                '创建时间': report.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                '审核人': report.auditor.nickname if report.auditor else '',
-                '审核时间': report.audit_time.strftime('%Y-%m-%d %H:%M:%S') if report.audit_time else '',
-                '备注': report.notes or '',
-                '审核说明': report.audit_notes or ''
-            })
-
-        df = pd.DataFrame(data)
-
-        # 创建Excel文件
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='日报数据')
-
-            # 调整列宽
-            worksheet = writer.sheets['日报数据']
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-
-        output.seek(0)
-
         # 生成文件名
         file_name = f"daily_reports_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
 
-        # 返回文件流
-        return StreamingResponse(
-            BytesIO(output.read()),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={file_name}"}
+        # 流式返回文件，导出行数不设上限
+        return xlsx_streaming_response(
+            _iter_daily_report_export_rows(params, current_user),
+            file_name,
+            sheet_name="日报数据",
+            headers=DAILY_REPORT_EXPORT_HEADERS
         )
 
     except Exception as e:
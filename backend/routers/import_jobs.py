@@ -122,10 +122,7 @@ async def upload_import_job(
         updated_by=created_by_uuid,
     )
     db.add(job)
-    db.commit()
-    db.refresh(job)
-
-    LogService.write(
+    LogService.stage(
         db,
         action="import_job_upload",
         operator_id=current_user.id,
@@ -133,6 +130,8 @@ async def upload_import_job(
         target_id=job.id,
         detail={"job_id": str(job.id), "status": status_value},
     )
+    db.commit()
+    db.refresh(job)
 
     return ok(
         data={
@@ -3,12 +3,13 @@
 处理财务流水、账户余额、预算分配等接口
 """
 
-from datetime import date, datetime
+from datetime import date
 from decimal import Decimal
 from typing import Dict, Any, List, Optional, Union
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, Query, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 
 from core.db import get_db
@@ -21,7 +22,10 @@ from core.response import (
 from core.error_codes import ErrorCode
 from models.users import User
 from models.ledger import TransactionType, TransactionStatus
+from backend.services.export_job_service import COMPLETED, PENDING, RUNNING, ExportJob, get_export_job_service
+from backend.services.ledger_export import LEDGER_EXPORT_KIND
 from services.ledger_service import get_ledger_service, LedgerService
+from utils.export import file_download_response
 
 
 # 定义分页响应类型
@@ -131,6 +135,7 @@ async def create_transaction(
             metadata=request.metadata,
             user_id=current_user.id
         )
+        get_export_job_service().bump_version(LEDGER_EXPORT_KIND)
 
         return success_response(
             data=TransactionResponse(**ledger_service._transaction_to_dict(transaction)),
@@ -209,6 +214,7 @@ async def update_transaction_status(
                 message="交易记录不存在",
                 status_code=404
             )
+        get_export_job_service().bump_version(LEDGER_EXPORT_KIND)
 
         return success_response(
             data=TransactionResponse(**ledger_service._transaction_to_dict(transaction)),
@@ -357,30 +363,34 @@ async def get_transaction_statistics(
 async def export_transactions(
     project_id: Optional[UUID] = Query(None, description="项目ID"),
     account_id: Optional[UUID] = Query(None, description="账户ID"),
-    transaction_type: Optional[TransactionType] = Query(None, description="交易类型"),
-    status: Optional[TransactionStatus] = Query(None, description="交易状态"),
+    transaction_type: Optional[str] = Query(None, max_length=20, description="流水类型"),
     start_date: Optional[date] = Query(None, description="开始日期"),
     end_date: Optional[date] = Query(None, description="结束日期"),
     format: str = Query("csv", pattern="^(csv|excel)$", description="导出格式"),
     request: Request = None,
-    ledger_service: LedgerService = Depends(get_ledger_service),
     current_user: User = Depends(require_role(["admin", "finance"]))
 ):
     """
-    导出交易记录
+    创建交易记录导出任务
+    任务在后台生成文件，通过状态接口查询进度，完成后从下载地址获取；
+    筛选条件与数据均未变化时复用已有导出
     需要权限: FINANCE 或 ADMIN
     """
     try:
-        # 获取所有符合条件的交易记录
-        result = ledger_service.get_transactions(
-            project_id=project_id,
-            account_id=account_id,
-            transaction_type=transaction_type,
-            status=status,
-            start_date=start_date,
-            end_date=end_date,
-            page=1,
-            size=10000  # 导出时使用较大的页面大小
+        filters = {
+            "project_id": str(project_id) if project_id else None,
+            "account_id": str(account_id) if account_id else None,
+            "transaction_type": transaction_type,
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None
+        }
+        # 版本查询与写入元数据均为阻塞操作，放到线程池执行
+        job, reused = await run_in_threadpool(
+            get_export_job_service().submit,
+            LEDGER_EXPORT_KIND,
+            filters,
+            format,
+            str(current_user.id),
         )
 
         # 记录导出操作到审计日志
@@ -389,26 +399,16 @@ async def export_transactions(
         audit_service.log_data_export(
             user_id=current_user.id,
             table_name="ledger_transactions",
-            record_count=result.total,
-            filters={
-                "project_id": str(project_id) if project_id else None,
-                "account_id": str(account_id) if account_id else None,
-                "transaction_type": transaction_type.value if transaction_type else None,
-                "status": status.value if status else None,
-                "start_date": start_date.isoformat() if start_date else None,
-                "end_date": end_date.isoformat() if end_date else None
-            },
+            filters=filters,
             request=request
         )
 
         return success_response(
             data={
-                "download_url": f"/api/v1/ledger/download/transactions/{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}",
-                "total_records": result.total,
-                "format": format,
-                "generated_at": datetime.now().isoformat()
+                **_export_job_payload(job),
+                "reused": reused,
             },
-            message="交易记录导出任务已创建"
+            message="交易记录导出任务已复用" if reused else "交易记录导出任务已创建"
         )
 
     except Exception as e:
@@ -416,4 +416,69 @@ async def export_transactions(
             code="EXPORT_ERROR",
             message=f"导出交易记录失败: {str(e)}",
             status_code=500
-        )
\ No newline at end of file
+        )
+
+
+def _export_job_payload(job: ExportJob) -> Dict[str, Any]:
+    payload = job.to_dict()
+    payload["status_url"] = f"/api/v1/ledger/export/jobs/{job.id}"
+    payload["download_url"] = f"/api/v1/ledger/export/jobs/{job.id}/download" if job.status == COMPLETED else None
+    return payload
+
+
+def _get_ledger_export_job(job_id: str) -> Optional[ExportJob]:
+    job = get_export_job_service().get(job_id)
+    if job is None or job.kind != LEDGER_EXPORT_KIND:
+        return None
+    return job
+
+
+@router.get("/export/jobs/{job_id}", response_model=StandardResponse[Dict[str, Any]])
+async def get_export_job(
+    job_id: str,
+    current_user: User = Depends(require_role(["admin", "finance"]))
+):
+    """
+    查询导出任务状态
+    需要权限: FINANCE 或 ADMIN
+    """
+    job = _get_ledger_export_job(job_id)
+    if job is None:
+        return error_response(
+            code="EXPORT_JOB_NOT_FOUND",
+            message="导出任务不存在或已过期",
+            status_code=404
+        )
+    return success_response(data=_export_job_payload(job), message="获取导出任务成功")
+
+
+@router.get("/export/jobs/{job_id}/download")
+async def download_export(
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(require_role(["admin", "finance"]))
+):
+    """
+    下载导出文件，支持 Range 断点续传
+    需要权限: FINANCE 或 ADMIN
+    """
+    job = _get_ledger_export_job(job_id)
+    if job is None:
+        return error_response(
+            code="EXPORT_JOB_NOT_FOUND",
+            message="导出任务不存在或已过期",
+            status_code=404
+        )
+    path = get_export_job_service().artifact_path(job)
+    if job.status != COMPLETED or not path.exists():
+        return error_response(
+            code="EXPORT_NOT_READY",
+            message="导出文件尚未生成" if job.status in (PENDING, RUNNING) else "导出任务失败",
+            status_code=409
+        )
+    return file_download_response(
+        str(path),
+        job.filename or path.name,
+        job.media_type,
+        range_header=request.headers.get("range"),
+    )
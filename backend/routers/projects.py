@@ -28,6 +28,7 @@ from schemas.project import (
     ProjectCreateRequest,
     ProjectUpdateRequest,
     ProjectResponse,
+    ProjectDetailResponse,
     ProjectListResponse,
     ProjectMemberResponse,
     ProjectExpenseRequest,
@@ -138,20 +139,34 @@ async def create_project(
 
 @router.get(
     "/{project_id}",
-    response_model=StandardResponse[ProjectResponse],
+    response_model=StandardResponse[ProjectDetailResponse],
     summary="获取项目详情"
 )
 async def get_project(
     project_id: int,
+    include: Optional[str] = Query(None, description="附带返回的关联数据，逗号分隔：members,expenses"),
     service: ProjectService = Depends(get_project_service),
     current_user: User = Depends(get_current_user)
 ):
     """获取项目详情API"""
     try:
-        project = service.get_project(project_id, current_user)
-        project_response = ProjectResponse.model_validate(project)
+        includes = {item.strip() for item in include.split(",") if item.strip()} if include else set()
+        project = service.get_project(project_id, current_user, include=includes)
+
+        detail = ProjectResponse.model_validate(project).model_dump()
+        if "members" in includes:
+            detail["members"] = [ProjectMemberResponse.model_validate(member) for member in project.members]
+        if "expenses" in includes:
+            detail["expenses"] = [ProjectExpenseResponse.model_validate(expense) for expense in project.expenses]
 
-        return success_response(data=project_response)
+        return success_response(data=ProjectDetailResponse.model_validate(detail))
+
+    except BusinessLogicError as e:
+        return error_response(
+            code=str(e.error_code) if hasattr(e, 'error_code') else "BIZ_ERROR",
+            message=str(e),
+            status_code=400
+        )
 
     except ResourceNotFoundError as e:
         return error_response(
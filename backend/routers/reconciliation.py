@@ -4,8 +4,10 @@ Version: 1.0
 Author: Claude协作开发
 """
 
+import json
 from datetime import date, datetime
 from decimal import Decimal
+from io import BytesIO
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, Query, HTTPException, status
@@ -35,7 +37,7 @@ from services.reconciliation_service import ReconciliationService
 from services.audit_log_service import AuditLogService
 from utils.decorators import require_role
 from utils.response import success_response, paginated_response
-from utils.export import export_to_excel, export_to_pdf, export_to_json
+from utils.export import CSV_MEDIA_TYPE, write_csv, xlsx_streaming_response
 from exceptions import ValidationError, NotFoundError, PermissionError
 
 
@@ -434,7 +436,7 @@ async def export_reconciliation_data(
     batch_id: Optional[int] = Query(None, description="批次ID"),
     date_from: Optional[date] = Query(None, description="开始日期"),
     date_to: Optional[date] = Query(None, description="结束日期"),
-    format_type: str = Query("excel", regex="^(excel|pdf|json)$", description="导出格式"),
+    format_type: str = Query("excel", regex="^(excel|csv|json)$", description="导出格式"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     service: ReconciliationService = Depends(get_reconciliation_service),
@@ -461,17 +463,18 @@ async def export_reconciliation_data(
         )
 
         # 根据格式类型导出
+        filename = f"reconciliation_{datetime.now().strftime('%Y%m%d%H%M%S')}"
         if format_type == "excel":
-            file_content = export_to_excel(export_data, sheet_name="对账数据")
-            filename = f"reconciliation_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx"
-            media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        elif format_type == "pdf":
-            file_content = export_to_pdf(export_data, title="对账数据报表")
-            filename = f"reconciliation_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
-            media_type = "application/pdf"
+            return xlsx_streaming_response(export_data, f"{filename}.xlsx", sheet_name="对账数据")
+        if format_type == "csv":
+            buffer = BytesIO()
+            write_csv(export_data, buffer)
+            file_content = buffer.getvalue()
+            filename = f"{filename}.csv"
+            media_type = CSV_MEDIA_TYPE
         else:  # json
-            file_content = export_to_json(export_data)
-            filename = f"reconciliation_{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
+            file_content = json.dumps(export_data, ensure_ascii=False, default=str).encode("utf-8")
+            filename = f"{filename}.json"
             media_type = "application/json"
 
         return StreamingResponse(
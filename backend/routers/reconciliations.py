@@ -1,9 +1,9 @@
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from typing import Dict, List, Optional, Set
 from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 from pydantic import BaseModel, validator
 from sqlalchemy.orm import Session
 
@@ -86,27 +86,37 @@ def create_reconciliation(
         date_diff=payload.date_diff,
     )
     db.add(record)
-    db.commit()
+    db.flush()
     db.refresh(record)
+    data = _serialize_reconciliation(record)
 
-    LogService.write(
+    LogService.stage(
         db,
         action="create_reconciliation",
         operator_id=current_user.id,
         target="reconciliations",
         target_id=record.id,
-        detail=_serialize_reconciliation(record),
+        detail=data,
     )
+    db.commit()
 
-    return ok(data=_serialize_reconciliation(record), status_code=status.HTTP_201_CREATED)
+    return ok(data=data, status_code=status.HTTP_201_CREATED)
 
 
 @router.post("/auto", response_model=dict, status_code=status.HTTP_200_OK)
 def auto_reconcile(
+    start: Optional[date] = Query(None, description="消耗起始日期（包含）"),
+    end: Optional[date] = Query(None, description="消耗结束日期（包含）"),
     current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    spends: List[AdSpendDaily] = db.query(AdSpendDaily).all()
+    # 分区键直接与日期常量比较，按月分区的 ad_spend_daily 只扫描范围内的分区
+    spend_query = db.query(AdSpendDaily)
+    if start:
+        spend_query = spend_query.filter(AdSpendDaily.date >= start)
+    if end:
+        spend_query = spend_query.filter(AdSpendDaily.date <= end)
+    spends: List[AdSpendDaily] = spend_query.all()
     ledgers: List[Ledger] = db.query(Ledger).all()
 
     used_finance_ids: Set[UUID] = set()
@@ -178,15 +188,14 @@ def auto_reconcile(
         detail=str(detail_payload),
     )
     db.add(log_entry)
-    db.commit()
-
-    LogService.write(
+    LogService.stage(
         db,
         action="auto_reconcile",
         operator_id=current_user.id,
         target="reconciliations",
         detail=detail_payload,
     )
+    db.commit()
 
     return ok(
         data=detail_payload,
@@ -1,24 +1,34 @@
+from contextvars import ContextVar
 from datetime import date
 from decimal import Decimal
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
 from pydantic import BaseModel
-from sqlalchemy import func
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 
 from backend.core.db import get_db
 from backend.core.error_codes import ErrorCode
 from backend.core.response import fail, ok
+from backend.core.singleflight import SingleFlight
 from backend.core.security import AuthenticatedUser, get_current_user
 from backend.models import AdAccount, AdSpendDaily, Ledger, Project, Reconciliation
+from backend.services import analytics_store
 from backend.services.log_service import LogService
+from backend.services.report_cache import ReportLookup, report_cache
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
+# 报表缓存未命中时合并相同 (缓存键, 版本) 的并发计算，结果由报表缓存保存
+_report_flight = SingleFlight()
+# 本次计算是否读取了列式副本：副本可能落后于主库，其结果对应不到当前版本号，不写入报表缓存
+_used_replica: ContextVar[bool] = ContextVar("report_used_replica", default=False)
+
 
 def _date_filter(query, column, start: Optional[date], end: Optional[date]):
+    # 日期列直接与常量比较（不对列套函数），按月分区的消耗表在规划阶段即可裁剪分区
     if start:
         query = query.filter(column >= start)
     if end:
@@ -26,6 +36,43 @@ def _date_filter(query, column, start: Optional[date], end: Optional[date]):
     return query
 
 
+def _cache_headers(lookup: ReportLookup) -> Dict[str, str]:
+    return {"ETag": lookup.etag, "Cache-Control": "private, no-cache"}
+
+
+def _serve_report(
+    request: Request,
+    current_user: AuthenticatedUser,
+    report: str,
+    compute: Callable[[], Any],
+    *,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    project_id: Optional[UUID] = None,
+):
+    """读取或计算报表结果，支持 If-None-Match 条件请求"""
+    lookup = report_cache.lookup(report, current_user, start=start, end=end, project_id=project_id)
+
+    def compute_and_store() -> ReportLookup:
+        reset = _used_replica.set(False)
+        try:
+            data = compute()
+            return report_cache.store(lookup, data, cache=not _used_replica.get())
+        finally:
+            _used_replica.reset(reset)
+
+    if not lookup.hit:
+        stored = _report_flight.do((lookup.key, lookup.token), compute_and_store)
+        lookup.data, lookup.etag = stored.data, stored.etag
+    if lookup.data is None:
+        return fail(code=ErrorCode.INVALID_PARAM, message="指定项目暂无报表数据", status_code=404)
+    if lookup.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=_cache_headers(lookup))
+    response = ok(data=lookup.data)
+    response.headers.update(_cache_headers(lookup))
+    return response
+
+
 class ReportRequestPayload(BaseModel):
     start: Optional[date] = None
     end: Optional[date] = None
@@ -35,6 +82,31 @@ class ReportRequestPayload(BaseModel):
 def _collect_performance(
     db: Session, start: Optional[date], end: Optional[date], project_id: Optional[UUID] = None
 ):
+    if start is None and end is None:
+        # 不限日期时汇总账户上维护的累计指标，无需扫描消耗明细
+        query = (
+            db.query(
+                Project.id.label("project_id"),
+                Project.name.label("project_name"),
+                func.coalesce(func.sum(AdAccount.total_spend), 0).label("total_spend"),
+                func.coalesce(func.sum(AdAccount.total_leads), 0).label("total_leads"),
+            )
+            .join(AdAccount, AdAccount.project_id == Project.id)
+            .filter(or_(AdAccount.total_spend != 0, AdAccount.total_leads != 0))
+            .group_by(Project.id, Project.name)
+        )
+        if project_id:
+            query = query.filter(Project.id == project_id)
+        return query.all()
+
+    if analytics_store.covers(start, end):
+        # 长区间改查列式副本，副本不可用时继续走主库
+        rows = analytics_store.project_performance(start, end, project_id)
+        if rows is not None:
+            _used_replica.set(True)
+            # 副本中的 ID 为字符串，转回 UUID 以便与利润行按项目合并
+            return [row._replace(project_id=UUID(row.project_id)) for row in rows]
+
     query = (
         db.query(
             Project.id.label("project_id"),
@@ -52,26 +124,80 @@ def _collect_performance(
     return query.all()
 
 
+def _profit_spend_side(
+    db: Session, start: Optional[date], end: Optional[date], project_id: Optional[UUID] = None
+):
+    """已匹配消耗按项目预聚合：每条消耗只计一次，与其对账记录条数无关。"""
+    matched_spend_ids = db.query(Reconciliation.daily_spend_id).filter(
+        Reconciliation.status == "matched"
+    )
+    query = (
+        db.query(
+            AdAccount.project_id.label("project_id"),
+            func.sum(AdSpendDaily.spend).label("spend_amount"),
+        )
+        .select_from(AdSpendDaily)
+        .join(AdAccount, AdAccount.id == AdSpendDaily.ad_account_id)
+        .filter(AdSpendDaily.id.in_(matched_spend_ids))
+        .group_by(AdAccount.project_id)
+    )
+    if project_id:
+        query = query.filter(AdAccount.project_id == project_id)
+    query = _date_filter(query, AdSpendDaily.date, start, end)
+    return query.cte("profit_spend")
+
+
+def _profit_ledger_side(
+    db: Session, start: Optional[date], end: Optional[date], project_id: Optional[UUID] = None
+):
+    """已匹配流水按项目预聚合：先对 (项目, 流水) 去重再求和，避免一笔流水对多条消耗时重复计入。"""
+    links = (
+        db.query(
+            AdAccount.project_id.label("project_id"),
+            Reconciliation.finance_txn_id.label("ledger_id"),
+        )
+        .select_from(Reconciliation)
+        .join(AdSpendDaily, AdSpendDaily.id == Reconciliation.daily_spend_id)
+        .join(AdAccount, AdAccount.id == AdSpendDaily.ad_account_id)
+        .filter(Reconciliation.status == "matched")
+        .distinct()
+    )
+    if project_id:
+        links = links.filter(AdAccount.project_id == project_id)
+    links = _date_filter(links, AdSpendDaily.date, start, end).subquery("profit_ledger_links")
+
+    return (
+        db.query(
+            links.c.project_id.label("project_id"),
+            func.sum(Ledger.amount).label("ledger_amount"),
+        )
+        .select_from(links)
+        .join(Ledger, Ledger.id == links.c.ledger_id)
+        .group_by(links.c.project_id)
+        .cte("profit_ledger")
+    )
+
+
 def _collect_profit(
     db: Session, start: Optional[date], end: Optional[date], project_id: Optional[UUID] = None
 ):
+    """按项目汇总已匹配消耗与对应财务流水。
+
+    消耗侧与流水侧分别在各自的 CTE 中聚合后再按 project_id 关联，
+    中间结果行数与 消耗数 × 对账数 无关，金额也不会因一对多对账被放大。
+    """
+    spend_side = _profit_spend_side(db, start, end, project_id)
+    ledger_side = _profit_ledger_side(db, start, end, project_id)
     query = (
         db.query(
             Project.id.label("project_id"),
             Project.name.label("project_name"),
-            func.coalesce(func.sum(Ledger.amount), 0).label("ledger_amount"),
-            func.coalesce(func.sum(AdSpendDaily.spend), 0).label("spend_amount"),
+            func.coalesce(ledger_side.c.ledger_amount, 0).label("ledger_amount"),
+            func.coalesce(spend_side.c.spend_amount, 0).label("spend_amount"),
         )
-        .join(AdAccount, AdAccount.project_id == Project.id)
-        .join(AdSpendDaily, AdSpendDaily.ad_account_id == AdAccount.id)
-        .join(Reconciliation, Reconciliation.daily_spend_id == AdSpendDaily.id)
-        .join(Ledger, Ledger.id == Reconciliation.finance_txn_id)
-        .filter(Reconciliation.status == "matched")
-        .group_by(Project.id, Project.name)
+        .join(spend_side, spend_side.c.project_id == Project.id)
+        .outerjoin(ledger_side, ledger_side.c.project_id == Project.id)
     )
-    if project_id:
-        query = query.filter(Project.id == project_id)
-    query = _date_filter(query, AdSpendDaily.date, start, end)
     return query.all()
 
 
@@ -125,17 +251,30 @@ def _merge_report_rows(perf_rows, profit_rows):
     return results
 
 
+def _compute_summary(
+    db: Session, start: Optional[date], end: Optional[date], project_id: Optional[UUID] = None
+) -> List[Dict[str, Any]]:
+    perf_rows = _collect_performance(db, start, end, project_id)
+    profit_rows = _collect_profit(db, start, end, project_id)
+    return _merge_report_rows(perf_rows, profit_rows)
+
+
 @router.get("", response_model=dict)
 def report_summary(
+    request: Request,
     start: Optional[date] = Query(None, description="起始日期（包含）"),
     end: Optional[date] = Query(None, description="结束日期（包含）"),
     current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ) -> Dict[str, Any]:
-    perf_rows = _collect_performance(db, start, end)
-    profit_rows = _collect_profit(db, start, end)
-    data = _merge_report_rows(perf_rows, profit_rows)
-    return ok(data=data)
+    return _serve_report(
+        request,
+        current_user,
+        "summary",
+        lambda: _compute_summary(db, start, end),
+        start=start,
+        end=end,
+    )
 
 
 @router.post("", response_model=dict, status_code=200)
@@ -144,9 +283,7 @@ def create_report_snapshot(
     current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ) -> Dict[str, Any]:
-    perf_rows = _collect_performance(db, payload.start, payload.end, payload.project_id)
-    profit_rows = _collect_profit(db, payload.start, payload.end, payload.project_id)
-    data = _merge_report_rows(perf_rows, profit_rows)
+    data = _compute_summary(db, payload.start, payload.end, payload.project_id)
     LogService.write(
         db,
         action="generate_report_snapshot",
@@ -159,71 +296,44 @@ def create_report_snapshot(
             "end": payload.end.isoformat() if payload.end else None,
             "records": len(data),
         },
+        async_write=True,
     )
     return ok(data=data)
 
 
-@router.get("/performance", response_model=dict)
-def report_performance(
-    start: Optional[date] = Query(None, description="起始日期（包含）"),
-    end: Optional[date] = Query(None, description="结束日期（包含）"),
-    current_user: AuthenticatedUser = Depends(get_current_user),
-    db: Session = Depends(get_db),
-) -> Dict[str, Any]:
-    query = (
-        db.query(
-            Project.id.label("project_id"),
-            Project.name.label("project_name"),
-            func.coalesce(func.sum(AdSpendDaily.spend), 0).label("total_spend"),
-            func.coalesce(func.sum(AdSpendDaily.leads_count), 0).label("total_leads"),
-        )
-        .join(AdAccount, AdAccount.project_id == Project.id)
-        .join(AdSpendDaily, AdSpendDaily.ad_account_id == AdAccount.id)
-        .group_by(Project.id, Project.name)
-    )
-    query = _date_filter(query, AdSpendDaily.date, start, end)
-
-    results = query.all()
-    data = [
+def _compute_performance(db: Session, start: Optional[date], end: Optional[date]) -> List[Dict[str, Any]]:
+    return [
         {
             "project_id": str(row.project_id),
             "project_name": row.project_name,
             "total_spend": str(Decimal(row.total_spend or 0).quantize(Decimal("0.01"))),
             "total_leads": int(row.total_leads or 0),
         }
-        for row in results
+        for row in _collect_performance(db, start, end)
     ]
 
-    return ok(data=data)
-
 
-@router.get("/profit", response_model=dict)
-def report_profit(
+@router.get("/performance", response_model=dict)
+def report_performance(
+    request: Request,
     start: Optional[date] = Query(None, description="起始日期（包含）"),
     end: Optional[date] = Query(None, description="结束日期（包含）"),
     current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ) -> Dict[str, Any]:
-    query = (
-        db.query(
-            Project.id.label("project_id"),
-            Project.name.label("project_name"),
-            func.coalesce(func.sum(Ledger.amount), 0).label("ledger_amount"),
-            func.coalesce(func.sum(AdSpendDaily.spend), 0).label("spend_amount"),
-        )
-        .join(AdAccount, AdAccount.project_id == Project.id)
-        .join(AdSpendDaily, AdSpendDaily.ad_account_id == AdAccount.id)
-        .join(Reconciliation, Reconciliation.daily_spend_id == AdSpendDaily.id)
-        .join(Ledger, Ledger.id == Reconciliation.finance_txn_id)
-        .filter(Reconciliation.status == "matched")
-        .group_by(Project.id, Project.name)
+    return _serve_report(
+        request,
+        current_user,
+        "performance",
+        lambda: _compute_performance(db, start, end),
+        start=start,
+        end=end,
     )
 
-    query = _date_filter(query, AdSpendDaily.date, start, end)
 
-    results = query.all()
+def _compute_profit(db: Session, start: Optional[date], end: Optional[date]) -> List[Dict[str, Any]]:
     data = []
-    for row in results:
+    for row in _collect_profit(db, start, end):
         spend = Decimal(row.spend_amount or 0)
         ledger_value = Decimal(row.ledger_amount or 0)
         profit = ledger_value - spend
@@ -236,21 +346,46 @@ def report_profit(
                 "profit": str(profit.quantize(Decimal("0.01"))),
             }
         )
+    return data
 
-    return ok(data=data)
+
+@router.get("/profit", response_model=dict)
+def report_profit(
+    request: Request,
+    start: Optional[date] = Query(None, description="起始日期（包含）"),
+    end: Optional[date] = Query(None, description="结束日期（包含）"),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    return _serve_report(
+        request,
+        current_user,
+        "profit",
+        lambda: _compute_profit(db, start, end),
+        start=start,
+        end=end,
+    )
 
 
 @router.get("/{project_id}", response_model=dict)
 def report_detail(
+    request: Request,
     project_id: UUID,
     start: Optional[date] = Query(None, description="起始日期（包含）"),
     end: Optional[date] = Query(None, description="结束日期（包含）"),
     current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ) -> Dict[str, Any]:
-    perf_rows = _collect_performance(db, start, end, project_id)
-    profit_rows = _collect_profit(db, start, end, project_id)
-    data = _merge_report_rows(perf_rows, profit_rows)
-    if not data:
-        return fail(code=ErrorCode.INVALID_PARAM, message="指定项目暂无报表数据", status_code=404)
-    return ok(data=data[0])
+    def compute() -> Optional[Dict[str, Any]]:
+        data = _compute_summary(db, start, end, project_id)
+        return data[0] if data else None
+
+    return _serve_report(
+        request,
+        current_user,
+        "detail",
+        compute,
+        start=start,
+        end=end,
+        project_id=project_id,
+    )
@@ -11,6 +11,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
 from sqlalchemy.orm import Session
 
 from core.db import get_db
+from core.singleflight import run_coalesced
 from core.dependencies import get_current_user, require_role, get_client_info
 from core.response import (
     success_response,
@@ -448,7 +449,7 @@ async def get_dashboard(
 ):
     """获取仪表板数据API"""
     try:
-        dashboard_data = service.get_dashboard_data(current_user)
+        dashboard_data = await run_coalesced(service.get_dashboard_data, current_user)
         dashboard_response = TopupDashboardResponse.model_validate(dashboard_data)
 
         return success_response(data=dashboard_response)
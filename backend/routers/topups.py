@@ -128,19 +128,21 @@ def create_topup(
         created_by=actor_id,
     )
     db.add(topup)
-    db.commit()
+    db.flush()
     db.refresh(topup)
+    data = _serialize_topup(topup)
 
-    LogService.write(
+    LogService.stage(
         db,
         action="create_topup",
         operator_id=current_user.id,
         target="topups",
         target_id=topup.id,
-        detail=_serialize_topup(topup),
+        detail=data,
     )
+    db.commit()
 
-    return ok(data=_serialize_topup(topup), status_code=status.HTTP_201_CREATED)
+    return ok(data=data, status_code=status.HTTP_201_CREATED)
 
 
 @router.post("/{topup_id}/approve", response_model=dict)
@@ -158,17 +160,19 @@ def approve_topup(
     if error_message:
         return fail(ErrorCode.INVALID_STATUS, error_message, status_code=status.HTTP_400_BAD_REQUEST)
 
-    db.commit()
+    db.flush()
     db.refresh(topup)
-    LogService.write(
+    data = _serialize_topup(topup)
+    LogService.stage(
         db,
         action="approve_topup",
         operator_id=current_user.id,
         target="topups",
         target_id=topup.id,
-        detail=_serialize_topup(topup),
+        detail=data,
     )
-    return ok(data=_serialize_topup(topup))
+    db.commit()
+    return ok(data=data)
 
 
 @router.post("/{topup_id}/pay", response_model=dict)
@@ -186,17 +190,19 @@ def pay_topup(
     if error_message:
         return fail(ErrorCode.INVALID_STATUS, error_message, status_code=status.HTTP_400_BAD_REQUEST)
 
-    db.commit()
+    db.flush()
     db.refresh(topup)
-    LogService.write(
+    data = _serialize_topup(topup)
+    LogService.stage(
         db,
         action="pay_topup",
         operator_id=current_user.id,
         target="topups",
         target_id=topup.id,
-        detail=_serialize_topup(topup),
+        detail=data,
     )
-    return ok(data=_serialize_topup(topup))
+    db.commit()
+    return ok(data=data)
 
 
 @router.post("/{topup_id}/confirm", response_model=dict)
@@ -214,16 +220,18 @@ def confirm_topup(
     if error_message:
         return fail(ErrorCode.INVALID_STATUS, error_message, status_code=status.HTTP_400_BAD_REQUEST)
 
-    db.commit()
+    db.flush()
     db.refresh(topup)
-    LogService.write(
+    data = _serialize_topup(topup)
+    LogService.stage(
         db,
         action="confirm_topup",
         operator_id=current_user.id,
         target="topups",
         target_id=topup.id,
-        detail=_serialize_topup(topup),
+        detail=data,
     )
-    return ok(data=_serialize_topup(topup))
+    db.commit()
+    return ok(data=data)
 
 
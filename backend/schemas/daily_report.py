@@ -202,9 +202,6 @@ class DailyReportStatisticsResponse(BaseModel):
     total_new_follows: int
     avg_cpa: Optional[Decimal]
     avg_roas: Optional[Decimal]
-    ctr: Decimal  # Overall click-through rate
-    conversion_rate: Decimal  # Overall conversion rate
-    cpc: Optional[Decimal]  # Cost per click
 
     @computed_field
     @property
@@ -8,7 +8,7 @@ from datetime import date, datetime
 from decimal import Decimal
 from typing import List, Optional, Dict, Any
 
-from pydantic import BaseModel, Field, ConfigDict, field_validator
+from pydantic import BaseModel, Field, ConfigDict, computed_field, field_validator
 
 
 class ProjectCreateRequest(BaseModel):
@@ -139,6 +139,12 @@ class ProjectExpenseResponse(BaseModel):
     created_at: datetime
 
 
+class ProjectDetailResponse(ProjectResponse):
+    """项目详情响应，成员与费用仅在请求 include 时返回"""
+    members: Optional[List[ProjectMemberResponse]] = None
+    expenses: Optional[List[ProjectExpenseResponse]] = None
+
+
 class ProjectListResponse(BaseModel):
     """项目列表响应"""
     items: List[ProjectResponse]
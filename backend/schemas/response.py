@@ -2,6 +2,7 @@
 响应模型定义
 """
 
+from datetime import date
 from typing import Any, Dict, Generic, List, Optional, TypeVar
 from pydantic import BaseModel, Field
 
@@ -12,12 +13,18 @@ class PaginationMeta(BaseModel):
     """分页元数据"""
     page: int = Field(..., description="当前页码")
     page_size: int = Field(..., description="每页数量")
-    total: int = Field(..., description="总记录数")
-    total_pages: int = Field(..., description="总页数")
+    total: Optional[int] = Field(..., description="总记录数，未统计时为空")
+    total_pages: Optional[int] = Field(..., description="总页数，未统计时为空")
     has_next: bool = Field(..., description="是否有下一页")
     has_prev: bool = Field(..., description="是否有上一页")
 
 
+class DateRange(BaseModel):
+    """日期范围"""
+    start_date: Optional[date] = Field(None, description="开始日期")
+    end_date: Optional[date] = Field(None, description="结束日期")
+
+
 class StandardResponse(BaseModel, Generic[T]):
     """标准响应格式"""
     success: bool = Field(..., description="操作是否成功")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+维护按月分区的 ad_spend_daily 与 daily_reports
+- ensure: 预建当月至未来若干月的分区，建议每天定时运行
+- archive: 把早于保留期的分区导出为 gzip 压缩的 CSV 后删除
+- restore: 从归档文件恢复分区
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root.parent))
+
+import click
+
+from backend.core.db import get_engine
+from backend.services.partitioning import (
+    PARTITIONED_TABLES,
+    archive_expired,
+    ensure_partitions,
+    restore_partition,
+)
+
+
+@click.group()
+def cli():
+    """按月分区维护"""
+
+
+@cli.command()
+@click.option('--months-ahead', type=int, default=None, help='预建的未来月份数，默认取 PARTITION_MONTHS_AHEAD')
+def ensure(months_ahead):
+    """预建未来月份的分区"""
+    with get_engine().begin() as connection:
+        created = ensure_partitions(connection, months_ahead=months_ahead)
+    print(f"新建 {len(created)} 个分区" + (f": {', '.join(created)}" if created else ""))
+
+
+@cli.command()
+@click.option('--retention-months', type=int, default=None, help='在线保留的月份数，默认取 PARTITION_RETENTION_MONTHS')
+@click.option('--directory', default=None, help='归档目录，默认取 PARTITION_ARCHIVE_DIR')
+@click.option('--today', default=None, help='按指定日期（YYYY-MM-DD）计算保留期，默认今天')
+def archive(retention_months, directory, today):
+    """归档并删除早于保留期的分区"""
+    reference = datetime.strptime(today, '%Y-%m-%d').date() if today else None
+    try:
+        with get_engine().begin() as connection:
+            paths = archive_expired(connection, retention_months, directory, today=reference)
+    except Exception as e:
+        print(f"归档失败: {e}")
+        sys.exit(1)
+    for path in paths:
+        print(f"已归档: {path}")
+    print(f"共归档 {len(paths)} 个分区")
+
+
+@cli.command()
+@click.argument('table', type=click.Choice(sorted(PARTITIONED_TABLES)))
+@click.argument('archive_file', type=click.Path(exists=True, dir_okay=False))
+def restore(table, archive_file):
+    """从归档文件恢复分区"""
+    try:
+        with get_engine().begin() as connection:
+            name = restore_partition(connection, table, archive_file)
+    except Exception as e:
+        print(f"恢复失败: {e}")
+        sys.exit(1)
+    print(f"已恢复分区 {name}")
+
+
+if __name__ == '__main__':
+    cli()
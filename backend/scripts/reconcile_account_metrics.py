@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+校准广告账户累计指标（total_spend / total_leads / avg_cpl / best_cpl）
+按账户分批比对消耗明细聚合与已存值，只修复发生漂移的账户；可定期运行
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root.parent))
+
+import click
+
+from backend.core.db import get_session_factory
+from backend.models import AdSpendDaily
+from backend.services.account_metrics import RECONCILE_BATCH_SIZE, reconcile_account_metrics
+
+
+@click.command()
+@click.option('--dry-run', is_flag=True, default=False, help='试运行模式，只统计漂移账户，不提交修复')
+@click.option('--batch-size', default=RECONCILE_BATCH_SIZE, help='每批校准的账户数量')
+def reconcile(dry_run, batch_size):
+    """校准广告账户累计指标"""
+
+    db = get_session_factory()()
+    try:
+        repaired = reconcile_account_metrics(db, AdSpendDaily, batch_size=batch_size)
+        if dry_run:
+            db.rollback()
+            print(f"发现 {repaired} 个账户的累计指标与明细不一致（试运行，未修复）")
+        else:
+            db.commit()
+            print(f"已修复 {repaired} 个账户的累计指标")
+    except Exception as e:
+        db.rollback()
+        print(f"校准失败: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    reconcile()
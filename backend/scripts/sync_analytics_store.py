@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+同步本地 DuckDB 列式分析副本（需安装可选依赖 duckdb）
+- sync: 按 updated_at 水位增量导出 ad_spend_daily、daily_reports、ledgers、topup_requests，
+  建议每 10～15 分钟定时运行；--full 全量重建，用于同步主库的物理删除，建议每天运行一次
+- status: 查看各表的同步水位与时间
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root.parent))
+
+import click
+
+from backend.core.db import get_engine
+from backend.services import analytics_store
+
+
+@click.group()
+def cli():
+    """列式分析副本维护"""
+
+
+@cli.command()
+@click.option('--table', 'tables', multiple=True, type=click.Choice(sorted(analytics_store.SOURCE_TABLES)),
+              help='只同步指定的表，可重复指定，默认全部')
+@click.option('--full', is_flag=True, help='忽略水位全量重建')
+def sync(tables, full):
+    """增量同步副本"""
+    try:
+        with get_engine().connect() as connection:
+            counts = analytics_store.sync(connection, tables or None, full=full)
+    except Exception as e:
+        print(f"同步失败: {e}")
+        sys.exit(1)
+    for table, count in counts.items():
+        print(f"{table}: {count} 行")
+
+
+@cli.command()
+def status():
+    """查看同步状态"""
+    try:
+        states = analytics_store.status()
+    except Exception as e:
+        print(f"读取失败: {e}")
+        sys.exit(1)
+    if not states:
+        print("副本尚未同步")
+    for state in states:
+        print(f"{state['table']}: 水位 {state['watermark'] or '-'}，同步于 {state['synced_at']:%Y-%m-%d %H:%M:%S} UTC，"
+              f"{state['rows']} 行")
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+校正 user_profiles.email（失败登录按邮箱查找用户所用的索引列）
+注册与改邮箱由 auth.users 上的触发器实时同步，本脚本分页读取 Supabase 用户目录做兜底，
+建议每天定时运行一次
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root.parent))
+
+import click
+
+from core.supabase_client import supabase_client
+from backend.services.login_history import sync_profile_emails
+
+
+@click.command()
+@click.option('--per-page', default=1000, show_default=True, type=click.IntRange(1, 1000),
+              help='每页读取的用户数')
+def sync(per_page):
+    """按 Supabase 用户目录校正 user_profiles.email"""
+    try:
+        counts = sync_profile_emails(supabase_client.get_admin_client(), per_page=per_page)
+    except Exception as e:
+        print(f"同步失败: {e}")
+        sys.exit(1)
+    print(f"用户 {counts['users']} 个，更新 {counts['updated']} 个，失败 {counts['failed']} 个")
+    if counts['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    sync()
@@ -0,0 +1,328 @@
+"""
+广告账户累计指标维护
+AdAccount 上的 total_spend / total_leads / avg_cpl / best_cpl 由消耗明细在同一事务内维护：
+flush 后按属性历史收集变更，只有新增明细的账户直接叠加增量，涉及修改、删除的账户按明细重新聚合；
+不经过 ORM flush 的写入（Core upsert、批量 update/delete）由调用方登记或在提交前整体校准。
+reconcile_account_metrics 按账户分批比对明细聚合与已存值，只写回发生漂移的账户。
+累计列只由一种明细维护（消耗明细 AdSpendDaily）；日报与消耗明细记录的是同一笔消耗，且账户 ID 类型不同，不计入。
+"""
+import logging
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Float, Integer, Numeric, bindparam, case, cast, column, event, func, inspect, select, table, update
+from sqlalchemy.orm import Session
+
+from backend.models import AdSpendDaily
+from backend.services.report_cache import mark_report_changes
+
+logger = logging.getLogger(__name__)
+
+MONEY_QUANT = Decimal("0.01")
+RECONCILE_BATCH_SIZE = 1000
+
+_PENDING_KEY = "account_metrics_reconcile"
+
+
+def _money(value: Any) -> Optional[Decimal]:
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(MONEY_QUANT, rounding=ROUND_HALF_UP)
+
+
+@dataclass(frozen=True)
+class MetricsSource:
+    """一种消耗明细来源
+
+    status_attr 为空时所有明细都计入；否则只计入状态属于 counted_statuses 的明细（如已审核日报）。
+    """
+
+    model: type
+    account_attr: str = "ad_account_id"
+    spend_attr: str = "spend"
+    leads_attr: str = "leads_count"
+    status_attr: Optional[str] = None
+    counted_statuses: Tuple[str, ...] = ()
+    accounts: Any = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self):
+        # 轻量表对象只声明维护的列，账户 ID 类型与明细外键一致
+        account_type = getattr(self.model, self.account_attr).property.columns[0].type
+        object.__setattr__(self, "accounts", table(
+            "ad_accounts",
+            column("id", account_type),
+            column("total_spend", Numeric(15, 2)),
+            column("total_leads", Integer),
+            column("avg_cpl", Numeric(10, 2)),
+            column("best_cpl", Numeric(10, 2)),
+        ))
+
+    @property
+    def tracked_attrs(self) -> Tuple[str, ...]:
+        return tuple(
+            attr for attr in (self.account_attr, self.spend_attr, self.leads_attr, self.status_attr) if attr
+        )
+
+    def counts(self, status: Any) -> bool:
+        return self.status_attr is None or status in self.counted_statuses
+
+
+_sources: Dict[type, MetricsSource] = {}
+
+
+def _keep_previous_account(target, value, oldvalue, initiator):
+    return value
+
+
+def register_metrics_source(source: MetricsSource) -> None:
+    """登记消耗明细模型，其写入将同步维护账户累计指标
+
+    累计列按单一来源整列重算，已有其他来源时拒绝登记，避免两种明细相互覆盖或重复计入。
+    """
+    others = [model.__name__ for model in _sources if model is not source.model]
+    if others:
+        raise ValueError(f"账户累计指标已由 {others[0]} 维护，不能再登记 {source.model.__name__}")
+    if source.model not in _sources:
+        # 改挂账户时即使属性已过期也加载旧值，保证原账户同样被重算
+        event.listen(
+            getattr(source.model, source.account_attr), "set", _keep_previous_account,
+            active_history=True, retval=True,
+        )
+    _sources[source.model] = source
+
+
+def unregister_metrics_source(model: type) -> Optional[MetricsSource]:
+    """取消登记，返回原来源（未登记时返回 None）"""
+    source = _sources.pop(model, None)
+    if source is not None:
+        event.remove(getattr(model, source.account_attr), "set", _keep_previous_account)
+    return source
+
+
+# 消耗明细：每条记录都计入账户累计
+register_metrics_source(MetricsSource(AdSpendDaily))
+
+
+def _source_for(model: type) -> MetricsSource:
+    source = _sources.get(model)
+    if source is None:
+        raise ValueError(f"{model.__name__} 未登记为账户指标来源")
+    return source
+
+
+@dataclass
+class _Delta:
+    spend: Decimal = Decimal("0")
+    leads: int = 0
+    best_cpl: Optional[Decimal] = None
+
+
+def _history_values(obj: Any, attr: str) -> List[Any]:
+    history = inspect(obj).attrs[attr].history
+    values = list(history.added or ()) + list(history.deleted or ()) + list(history.unchanged or ())
+    return [value for value in values if value is not None]
+
+
+def _collect_changes(
+    session: Session,
+) -> Tuple[Dict[MetricsSource, Dict[Any, _Delta]], Dict[MetricsSource, Set[Any]], Set[MetricsSource]]:
+    additions: Dict[MetricsSource, Dict[Any, _Delta]] = {}
+    recompute: Dict[MetricsSource, Set[Any]] = {}
+    full: Set[MetricsSource] = set()
+
+    for obj in session.new:
+        source = _sources.get(type(obj))
+        if source is None:
+            continue
+        values = obj.__dict__
+        account_id = values.get(source.account_attr)
+        if account_id is None or (source.status_attr and not source.counts(values.get(source.status_attr))):
+            continue
+        spend = Decimal(str(values.get(source.spend_attr) or 0))
+        leads = int(values.get(source.leads_attr) or 0)
+        delta = additions.setdefault(source, {}).setdefault(account_id, _Delta())
+        delta.spend += spend
+        delta.leads += leads
+        if leads > 0:
+            cpl = spend / leads
+            delta.best_cpl = cpl if delta.best_cpl is None else min(delta.best_cpl, cpl)
+
+    for obj in list(session.dirty) + list(session.deleted):
+        source = _sources.get(type(obj))
+        if source is None:
+            continue
+        if obj not in session.deleted and not any(
+            inspect(obj).attrs[attr].history.has_changes() for attr in source.tracked_attrs
+        ):
+            continue
+        # 修改或删除无法只靠增量得到新的最佳 CPL，涉及的新旧账户都按明细重算
+        account_ids = _history_values(obj, source.account_attr)
+        if account_ids:
+            recompute.setdefault(source, set()).update(account_ids)
+        else:
+            full.add(source)
+
+    return additions, recompute, full
+
+
+def _write_metrics(connection, source: MetricsSource, params: List[Dict[str, Any]]) -> None:
+    if params:
+        accounts = source.accounts
+        connection.execute(update(accounts).where(accounts.c.id == bindparam("b_id")), params)
+
+
+def _metrics_params(account_id: Any, spend: Decimal, leads: int, best_cpl: Optional[Decimal]) -> Dict[str, Any]:
+    return {
+        "b_id": account_id,
+        "total_spend": _money(spend),
+        "total_leads": leads,
+        "avg_cpl": _money(spend / leads) if leads > 0 else None,
+        "best_cpl": _money(best_cpl),
+    }
+
+
+def _apply_additions(connection, source: MetricsSource, deltas: Dict[Any, _Delta]) -> None:
+    """对只有新增明细的账户叠加增量；先锁定账户行，避免并发事务相互覆盖"""
+    accounts = source.accounts
+    rows = connection.execute(
+        select(accounts.c.id, accounts.c.total_spend, accounts.c.total_leads, accounts.c.best_cpl)
+        .where(accounts.c.id.in_(list(deltas)))
+        .with_for_update()
+    ).all()
+    params = []
+    for account_id, total_spend, total_leads, best_cpl in rows:
+        delta = deltas[account_id]
+        candidates = [value for value in (best_cpl, delta.best_cpl) if value is not None]
+        params.append(_metrics_params(
+            account_id,
+            Decimal(str(total_spend or 0)) + delta.spend,
+            int(total_leads or 0) + delta.leads,
+            min(candidates) if candidates else None,
+        ))
+    _write_metrics(connection, source, params)
+
+
+def _recompute_accounts(connection, source: MetricsSource, account_ids: List[Any]) -> int:
+    """按明细重新聚合一批账户，只写回与已存值不一致的账户，返回修复数"""
+    model = source.model
+    account_col = getattr(model, source.account_attr)
+    spend_col = getattr(model, source.spend_attr)
+    leads_col = getattr(model, source.leads_attr)
+    aggregates = (
+        select(
+            account_col.label("account_id"),
+            func.coalesce(func.sum(spend_col), 0).label("spend"),
+            func.coalesce(func.sum(leads_col), 0).label("leads"),
+            func.min(case((leads_col > 0, cast(spend_col, Float) / leads_col))).label("best_cpl"),
+        )
+        .where(account_col.in_(account_ids))
+        .group_by(account_col)
+    )
+    if source.status_attr:
+        aggregates = aggregates.where(getattr(model, source.status_attr).in_(source.counted_statuses))
+    actual = {row.account_id: row for row in connection.execute(aggregates)}
+
+    accounts = source.accounts
+    stored = connection.execute(
+        select(accounts.c.id, accounts.c.total_spend, accounts.c.total_leads, accounts.c.avg_cpl, accounts.c.best_cpl)
+        .where(accounts.c.id.in_(account_ids))
+        .with_for_update()
+    ).all()
+    params = []
+    for account_id, total_spend, total_leads, avg_cpl, best_cpl in stored:
+        row = actual.get(account_id)
+        expected = _metrics_params(
+            account_id,
+            Decimal(str(row.spend)) if row else Decimal("0"),
+            int(row.leads) if row else 0,
+            row.best_cpl if row else None,
+        )
+        current = {
+            "b_id": account_id,
+            "total_spend": _money(total_spend or 0),
+            "total_leads": int(total_leads or 0),
+            "avg_cpl": _money(avg_cpl),
+            "best_cpl": _money(best_cpl),
+        }
+        if current != expected:
+            params.append(expected)
+    _write_metrics(connection, source, params)
+    return len(params)
+
+
+def refresh_account_metrics(session: Session, model: type, account_ids: Iterable[Any]) -> int:
+    """按明细重算指定账户的累计指标，供不经过 ORM flush 的写入（如 Core upsert）在提交前调用"""
+    source = _source_for(model)
+    account_ids = list(dict.fromkeys(account_ids))
+    repaired = 0
+    for offset in range(0, len(account_ids), RECONCILE_BATCH_SIZE):
+        repaired += _recompute_accounts(session.connection(), source, account_ids[offset:offset + RECONCILE_BATCH_SIZE])
+    return repaired
+
+
+def reconcile_account_metrics(
+    session: Session, model: Optional[type] = None, batch_size: int = RECONCILE_BATCH_SIZE
+) -> int:
+    """全量校准：按账户分批比对明细聚合与已存值，修复漂移，返回修复的账户数（不提交）"""
+    sources = [_source_for(model)] if model is not None else list(_sources.values())
+    repaired = 0
+    for source in sources:
+        accounts = source.accounts
+        last_id = None
+        while True:
+            query = select(accounts.c.id).order_by(accounts.c.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(accounts.c.id > last_id)
+            account_ids = session.connection().execute(query).scalars().all()
+            if not account_ids:
+                break
+            repaired += _recompute_accounts(session.connection(), source, account_ids)
+            last_id = account_ids[-1]
+    if repaired:
+        logger.info(f"Repaired metrics drift on {repaired} ad accounts")
+        # 修复直接改写账户列，不经过明细写入，不限日期的报表缓存需整体失效
+        mark_report_changes(session, {(None, None)})
+    return repaired
+
+
+@event.listens_for(Session, "after_flush")
+def _maintain_account_metrics(session: Session, _flush_context) -> None:
+    if not _sources:
+        return
+    additions, recompute, full = _collect_changes(session)
+    if not (additions or recompute or full):
+        return
+    connection = session.connection()
+    for source, deltas in additions.items():
+        pending = recompute.get(source, set())
+        deltas = {account_id: delta for account_id, delta in deltas.items() if account_id not in pending}
+        if deltas:
+            _apply_additions(connection, source, deltas)
+    for source, account_ids in recompute.items():
+        refresh_account_metrics(session, source.model, account_ids)
+    if full:
+        session.info.setdefault(_PENDING_KEY, set()).update(full)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _track_bulk_metric_changes(context) -> None:
+    # 批量 update/delete 无法逐行定位账户，提交前整体校准
+    source = _sources.get(context.mapper.class_)
+    if source is not None:
+        context.session.info.setdefault(_PENDING_KEY, set()).add(source)
+
+
+@event.listens_for(Session, "before_commit")
+def _reconcile_pending_metrics(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        session.flush()
+        for source in pending:
+            reconcile_account_metrics(session, source.model)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_metrics(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
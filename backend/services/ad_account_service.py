@@ -6,10 +6,13 @@ Author: Claude协作开发
 
 from datetime import datetime, date
 from decimal import Decimal
-from typing import List, Optional, Dict, Any, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, select, desc
+from typing import Iterator, List, Optional, Dict, Any, Tuple
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, or_, func, select, desc, literal, union_all
 
+from core.cache import TTLCache, VersionCounter, get_shared_backend
+from core.config import get_settings
+from core.singleflight import single_flight
 from models.ad_account import (
     AdAccount, AccountStatusHistory, AccountPerformance,
     AccountAlert, AccountDocument, AccountNote
@@ -32,6 +35,41 @@ from schemas.ad_account import (
 from utils.response import success_response, error_response
 from exceptions import ValidationError, NotFoundError, PermissionError
 from services.audit_log_service import AuditLogService
+from services.permission_scope import SCOPED_ROLES, get_permission_scope
+
+# TOP / 低效账户展示数量
+PERFORMER_LIMIT = 10
+STATISTICS_VERSION_NAME = "accounts"
+
+# 账户统计缓存：条目带版本标识，账户或预警变更后递增版本使旧结果失效
+_statistics_cache = TTLCache(maxsize=256, ttl=get_settings().account_stats_cache_ttl)
+_statistics_versions = VersionCounter(backend=get_shared_backend(), namespace="account_stats")
+
+
+def _statistics_scope(current_user_id: Optional[int], user_role: Optional[str]) -> str:
+    """统计的数据范围：投手与账户管理员按用户隔离，其余角色共享全量范围"""
+    if user_role in ("media_buyer", "account_manager"):
+        return f"{user_role}:{current_user_id}"
+    return "global"
+
+
+def _statistics_key(
+    service: "AdAccountService",
+    project_id: Optional[int] = None,
+    channel_id: Optional[int] = None,
+    platform: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user_id: Optional[int] = None,
+    user_role: Optional[str] = None,
+) -> Tuple[Any, ...]:
+    # 统计基于账户上维护的累计字段，与日期范围无关，date_from/date_to 不参与缓存键
+    return _statistics_scope(current_user_id, user_role), project_id, channel_id, platform
+
+
+def invalidate_account_statistics() -> None:
+    """账户状态、预算、归属或预警变化后调用，使账户统计缓存失效"""
+    _statistics_versions.bump([STATISTICS_VERSION_NAME])
 
 
 class AdAccountService:
@@ -103,6 +141,7 @@ class AdAccountService:
 
         self.db.add(account)
         self.db.commit()
+        invalidate_account_statistics()
         self.db.refresh(account)
 
         # 创建初始状态历史
@@ -139,16 +178,66 @@ class AdAccountService:
         user_role: str = None
     ) -> Tuple[List[AdAccount], int]:
         """获取广告账户列表"""
+        query = self._build_accounts_query(
+            status=status,
+            platform=platform,
+            project_id=project_id,
+            channel_id=channel_id,
+            assigned_user_id=assigned_user_id,
+            current_user_id=current_user_id,
+            user_role=user_role
+        )
+
+        # 计算总数
+        total = query.count()
+
+        # 分页
+        accounts = query.order_by(
+            AdAccount.created_at.desc()
+        ).offset((page - 1) * page_size).limit(page_size).all()
+
+        return accounts, total
+
+    def iter_accounts(
+        self,
+        status: Optional[str] = None,
+        platform: Optional[str] = None,
+        project_id: Optional[int] = None,
+        current_user_id: int = None,
+        user_role: str = None,
+        batch_size: int = 1000
+    ) -> Iterator[AdAccount]:
+        """逐批迭代符合条件的广告账户，用于导出，不受分页上限限制"""
+        query = self._build_accounts_query(
+            status=status,
+            platform=platform,
+            project_id=project_id,
+            current_user_id=current_user_id,
+            user_role=user_role
+        ).options(
+            joinedload(AdAccount.project),
+            joinedload(AdAccount.channel),
+            joinedload(AdAccount.assigned_user)
+        )
+        return iter(query.order_by(AdAccount.created_at.desc()).yield_per(batch_size))
+
+    def _build_accounts_query(
+        self,
+        status: Optional[str] = None,
+        platform: Optional[str] = None,
+        project_id: Optional[int] = None,
+        channel_id: Optional[int] = None,
+        assigned_user_id: Optional[int] = None,
+        current_user_id: int = None,
+        user_role: str = None
+    ):
+        """构建带角色与筛选条件的账户查询"""
         query = self.db.query(AdAccount)
 
-        # 根据角色过滤数据
-        if user_role == "media_buyer":
-            query = query.filter(AdAccount.assigned_user_id == current_user_id)
-        elif user_role == "account_manager":
-            # 账户管理员只能看到自己项目的账户
-            query = query.join(Project).filter(
-                Project.account_manager_id == current_user_id
-            )
+        # 根据角色过滤数据：投手看分配给自己的账户，账户管理员看所管项目的账户
+        if user_role in SCOPED_ROLES:
+            scope = get_permission_scope(self.db, current_user_id, user_role)
+            query = query.filter(scope.account_filter(self.db, AdAccount.id))
 
         # 应用过滤条件
         if status:
@@ -162,15 +251,7 @@ class AdAccountService:
         if assigned_user_id:
             query = query.filter(AdAccount.assigned_user_id == assigned_user_id)
 
-        # 计算总数
-        total = query.count()
-
-        # 分页
-        accounts = query.order_by(
-            AdAccount.created_at.desc()
-        ).offset((page - 1) * page_size).limit(page_size).all()
-
-        return accounts, total
+        return query
 
     async def get_account_by_id(
         self,
@@ -186,12 +267,9 @@ class AdAccountService:
             raise NotFoundError("SYS_004", "广告账户不存在")
 
         # 权限检查
-        if user_role == "media_buyer" and account.assigned_user_id != current_user_id:
-            raise PermissionError("BIZ_403", "无权限访问此账户")
-        elif user_role == "account_manager":
-            # 检查是否是账户管理员的项目
-            project = self.db.query(Project).filter(Project.id == account.project_id).first()
-            if not project or project.account_manager_id != current_user_id:
+        if user_role in SCOPED_ROLES:
+            scope = get_permission_scope(self.db, current_user_id, user_role)
+            if not scope.can_access_account(account.id):
                 raise PermissionError("BIZ_403", "无权限访问此账户")
 
         return account
@@ -219,6 +297,7 @@ class AdAccountService:
             setattr(account, field, value)
 
         self.db.commit()
+        invalidate_account_statistics()
 
         # 记录审计日志
         if old_values:
@@ -267,6 +346,7 @@ class AdAccountService:
             account.archived_date = now
 
         self.db.commit()
+        invalidate_account_statistics()
 
         # 创建状态历史记录
         await self._create_status_history(
@@ -309,6 +389,7 @@ class AdAccountService:
             account.total_budget = request.total_budget
 
         self.db.commit()
+        invalidate_account_statistics()
 
         # 记录审计日志
         await self.audit_service.log_action(
@@ -321,6 +402,7 @@ class AdAccountService:
 
         return account
 
+    @single_flight(key=_statistics_key, ttl=0)
     async def get_account_statistics(
         self,
         project_id: Optional[int] = None,
@@ -331,141 +413,154 @@ class AdAccountService:
         current_user_id: int = None,
         user_role: str = None
     ) -> AdAccountStatisticsResponse:
-        """获取账户统计数据"""
-        query = self.db.query(AdAccount)
-
-        # 根据角色过滤
-        if user_role == "media_buyer":
-            query = query.filter(AdAccount.assigned_user_id == current_user_id)
-        elif user_role == "account_manager":
-            query = query.join(Project).filter(
-                Project.account_manager_id == current_user_id
-            )
-
-        # 应用过滤条件
-        if project_id:
-            query = query.filter(AdAccount.project_id == project_id)
-        if channel_id:
-            query = query.filter(AdAccount.channel_id == channel_id)
-        if platform:
-            query = query.filter(AdAccount.platform == platform)
+        """获取账户统计数据
 
-        # 总体统计
-        total_accounts = query.count()
-        active_accounts = query.filter(AdAccount.status == "active").count()
-        suspended_accounts = query.filter(AdAccount.status == "suspended").count()
-        dead_accounts = query.filter(AdAccount.status == "dead").count()
-        new_accounts = query.filter(AdAccount.status == "new").count()
+        汇总与分布、TOP/低效账户、预警数各用一条查询；结果按 (角色范围, 筛选条件) 短时缓存，
+        账户状态、预算或预警变化时失效；缓存未命中时相同键的并发请求只计算一次
+        """
+        cache_key = _statistics_key(
+            self, project_id, channel_id, platform, date_from, date_to, current_user_id, user_role
+        )
+        token = _statistics_versions.token([STATISTICS_VERSION_NAME])
+        cached = _statistics_cache.get(cache_key, None)
+        if cached is not None and cached[0] == token:
+            return cached[1].model_copy(deep=True)
+
+        query = self._build_accounts_query(
+            platform=platform,
+            project_id=project_id,
+            channel_id=channel_id,
+            current_user_id=current_user_id,
+            user_role=user_role
+        )
+        statistics = AdAccountStatisticsResponse(
+            **self._aggregate_accounts(query),
+            **self._rank_performers(query),
+            **self._count_alerts(current_user_id, user_role)
+        )
+        _statistics_cache.set(cache_key, (token, statistics))
+        return statistics.model_copy(deep=True)
 
-        # 性能统计
-        stats = query.with_entities(
+    def _aggregate_accounts(self, query) -> Dict[str, Any]:
+        """按 (平台, 状态) 分组一次聚合，在内存中合并出总数、状态计数与分布"""
+        rows = query.with_entities(
+            AdAccount.platform,
+            AdAccount.status,
+            func.count().label('count'),
             func.sum(AdAccount.total_spend).label('total_spend'),
             func.sum(AdAccount.total_leads).label('total_leads'),
-            func.avg(AdAccount.avg_cpl).label('avg_cpl'),
+            func.sum(AdAccount.avg_cpl).label('cpl_sum'),
+            func.count(AdAccount.avg_cpl).label('cpl_count'),
             func.min(AdAccount.best_cpl).label('best_cpl'),
             func.sum(AdAccount.total_budget).label('total_budget'),
             func.sum(AdAccount.daily_budget).label('total_daily_budget')
-        ).first()
-
-        total_spend = stats.total_spend or Decimal('0')
-        total_leads = stats.total_leads or 0
-        avg_cpl = stats.avg_cpl or Decimal('0')
-        best_cpl = stats.best_cpl or Decimal('0')
-        total_budget = stats.total_budget or Decimal('0')
-        total_daily_budget = stats.total_daily_budget or Decimal('0')
-
-        # 预算使用率
-        budget_utilization = float(total_spend / total_budget * 100) if total_budget > 0 else 0
-
-        # 平台分布
-        platform_dist = query.with_entities(
-            AdAccount.platform,
-            func.count().label('count')
-        ).group_by(AdAccount.platform).all()
-
-        platform_distribution = [
-            {"platform": p[0], "count": p[1]}
-            for p in platform_dist
-        ]
-
-        # 状态分布
-        status_dist = query.with_entities(
-            AdAccount.status,
-            func.count().label('count')
-        ).group_by(AdAccount.status).all()
-
-        status_distribution = [
-            {"status": s[0], "count": s[1]}
-            for s in status_dist
-        ]
-
-        # TOP表现账户
-        top_performers = query.order_by(
-            AdAccount.total_leads.desc()
-        ).limit(10).all()
-
-        low_performers = query.filter(
-            AdAccount.status == "active"
-        ).order_by(
-            AdAccount.avg_cpl.desc()
-        ).limit(10).all()
-
-        # 预警统计
-        alerts_query = self.db.query(AccountAlert)
-        if user_role == "media_buyer":
-            alerts_query = alerts_query.join(AdAccount).filter(
-                AdAccount.assigned_user_id == current_user_id
-            )
-        elif user_role == "account_manager":
-            alerts_query = alerts_query.join(AdAccount).join(Project).filter(
-                Project.account_manager_id == current_user_id
+        ).group_by(AdAccount.platform, AdAccount.status).all()
+
+        status_counts: Dict[str, int] = {}
+        platform_counts: Dict[str, int] = {}
+        total_spend = Decimal('0')
+        total_leads = 0
+        cpl_sum = Decimal('0')
+        cpl_count = 0
+        best_cpl: Optional[Decimal] = None
+        total_budget = Decimal('0')
+        total_daily_budget = Decimal('0')
+        for row in rows:
+            status_counts[row.status] = status_counts.get(row.status, 0) + row.count
+            platform_counts[row.platform] = platform_counts.get(row.platform, 0) + row.count
+            total_spend += Decimal(row.total_spend or 0)
+            total_leads += int(row.total_leads or 0)
+            cpl_sum += Decimal(row.cpl_sum or 0)
+            cpl_count += row.cpl_count
+            if row.best_cpl is not None and (best_cpl is None or row.best_cpl < best_cpl):
+                best_cpl = Decimal(row.best_cpl)
+            total_budget += Decimal(row.total_budget or 0)
+            total_daily_budget += Decimal(row.total_daily_budget or 0)
+
+        return {
+            "total_accounts": sum(status_counts.values()),
+            "active_accounts": status_counts.get("active", 0),
+            "suspended_accounts": status_counts.get("suspended", 0),
+            "dead_accounts": status_counts.get("dead", 0),
+            "new_accounts": status_counts.get("new", 0),
+            "total_spend": total_spend,
+            "total_leads": total_leads,
+            "avg_cpl": cpl_sum / cpl_count if cpl_count else Decimal('0'),
+            "best_cpl": best_cpl or Decimal('0'),
+            "total_budget": total_budget,
+            "total_daily_budget": total_daily_budget,
+            # 预算使用率
+            "budget_utilization": float(total_spend / total_budget * 100) if total_budget > 0 else 0,
+            "platform_distribution": [
+                {"platform": key, "count": count} for key, count in platform_counts.items()
+            ],
+            "status_distribution": [
+                {"status": key, "count": count} for key, count in status_counts.items()
+            ],
+        }
+
+    def _rank_performers(self, query, limit: int = PERFORMER_LIMIT) -> Dict[str, Any]:
+        """一次查询取出 TOP 账户（按线索数）与低效活跃账户（按平均单粉成本）
+
+        两个分支各自 ORDER BY + LIMIT（数据库可用 top-N 排序，无需对全表做窗口排名），
+        再在截取后的少量行上编号，以 UNION ALL 合并为一条语句
+        """
+        columns = (AdAccount.id, AdAccount.name, AdAccount.platform, AdAccount.total_leads, AdAccount.avg_cpl)
+
+        def _ranked(kind: str, branch, sort_column):
+            # 同值时按 ID 排序，保证结果稳定
+            limited = branch.with_entities(*columns).order_by(
+                sort_column.desc(), AdAccount.id
+            ).limit(limit).subquery()
+            return select(
+                literal(kind).label('kind'),
+                *limited.c,
+                func.row_number().over(
+                    order_by=(limited.c[sort_column.key].desc(), limited.c.id)
+                ).label('rank')
             )
 
-        active_alerts = alerts_query.filter(
-            AccountAlert.status == "active"
-        ).count()
-        critical_alerts = alerts_query.filter(
-            AccountAlert.status == "active",
-            AccountAlert.severity == "critical"
-        ).count()
-
-        return AdAccountStatisticsResponse(
-            total_accounts=total_accounts,
-            active_accounts=active_accounts,
-            suspended_accounts=suspended_accounts,
-            dead_accounts=dead_accounts,
-            new_accounts=new_accounts,
-            total_spend=total_spend,
-            total_leads=total_leads,
-            avg_cpl=avg_cpl,
-            best_cpl=best_cpl,
-            total_budget=total_budget,
-            total_daily_budget=total_daily_budget,
-            budget_utilization=budget_utilization,
-            platform_distribution=platform_distribution,
-            status_distribution=status_distribution,
-            top_performers=[
+        statement = union_all(
+            _ranked("top", query, AdAccount.total_leads),
+            _ranked("low", query.filter(AdAccount.status == "active"), AdAccount.avg_cpl)
+        )
+        rows = sorted(self.db.execute(statement).all(), key=lambda row: (row.kind, row.rank))
+        return {
+            "top_performers": [
                 {
-                    "id": a.id,
-                    "name": a.name,
-                    "platform": a.platform,
-                    "total_leads": a.total_leads,
-                    "avg_cpl": a.avg_cpl
+                    "id": row.id,
+                    "name": row.name,
+                    "platform": row.platform,
+                    "total_leads": row.total_leads,
+                    "avg_cpl": row.avg_cpl
                 }
-                for a in top_performers
+                for row in rows if row.kind == "top"
             ],
-            low_performers=[
+            "low_performers": [
                 {
-                    "id": a.id,
-                    "name": a.name,
-                    "platform": a.platform,
-                    "avg_cpl": a.avg_cpl
+                    "id": row.id,
+                    "name": row.name,
+                    "platform": row.platform,
+                    "avg_cpl": row.avg_cpl
                 }
-                for a in low_performers
+                for row in rows if row.kind == "low"
             ],
-            active_alerts=active_alerts,
-            critical_alerts=critical_alerts
+        }
+
+    def _count_alerts(self, current_user_id: int, user_role: str) -> Dict[str, int]:
+        """按严重程度分组统计活跃预警"""
+        alerts_query = self.db.query(AccountAlert.severity, func.count().label('count'))
+        if user_role in SCOPED_ROLES:
+            scope = get_permission_scope(self.db, current_user_id, user_role)
+            alerts_query = alerts_query.filter(scope.account_filter(self.db, AccountAlert.account_id))
+
+        counts = dict(
+            alerts_query.filter(AccountAlert.status == "active").group_by(AccountAlert.severity).all()
         )
+        return {
+            "active_alerts": sum(counts.values()),
+            "critical_alerts": counts.get("critical", 0),
+        }
 
     async def get_account_alerts(
         self,
@@ -514,6 +609,7 @@ class AdAccountService:
 
         self.db.add(alert)
         self.db.commit()
+        invalidate_account_statistics()
         self.db.refresh(alert)
 
         # 记录审计日志
@@ -555,6 +651,7 @@ class AdAccountService:
             alert.resolution = request.resolution
 
         self.db.commit()
+        invalidate_account_statistics()
 
         # 记录审计日志
         await self.audit_service.log_action(
@@ -644,6 +741,7 @@ class AdAccountService:
         account.notes = f"已删除 - {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"
 
         self.db.commit()
+        invalidate_account_statistics()
 
         # 记录审计日志
         await self.audit_service.log_action(
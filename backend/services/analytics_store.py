@@ -0,0 +1,383 @@
+"""
+本地列式分析副本
+把 ad_spend_daily、daily_reports、ledgers、topup_requests 按变更水位（updated_at）增量导出到嵌入式
+DuckDB 文件，统计区间超过 analytics_min_days 天的查询改在副本上按列扫描聚合，不占用主库：
+- 事实表每次只读取水位之后（回看 SYNC_OVERLAP，覆盖提交较晚的事务）的行，按 id 覆盖写入；
+  projects、ad_accounts 维表行数少，每次全量替换
+- 物理删除不会体现在增量同步中，需要定期执行一次全量同步
+- 副本未启用、未安装 duckdb、最近同步早于 analytics_max_staleness_minutes 或文件正被同步进程占用时，
+  查询函数返回 None，调用方回退到主库查询
+"""
+import csv
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from backend.core.config import get_settings
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover - duckdb 为可选依赖
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+# 增量同步向前回看的时间，水位附近提交较晚的行会被重新读取并覆盖
+SYNC_OVERLAP = timedelta(minutes=5)
+# 每批从主库读取并写入副本的行数
+BATCH_SIZE = 50000
+# 同步进程取得写锁的重试次数与间隔（查询进程以只读方式短暂打开文件）
+_LOCK_RETRIES = 20
+_LOCK_RETRY_INTERVAL = 0.5
+# CSV 中转文件里的空值标记
+_NULL = r"\N"
+
+
+@dataclass(frozen=True)
+class SourceTable:
+    """导出到副本的主库表：列名 -> DuckDB 列类型；watermark 为 None 的维表每次全量替换"""
+
+    name: str
+    columns: Dict[str, str]
+    watermark: Optional[str] = "updated_at"
+
+
+SOURCE_TABLES: Dict[str, SourceTable] = {
+    table.name: table
+    for table in (
+        SourceTable("projects", {"id": "VARCHAR", "name": "VARCHAR"}, watermark=None),
+        SourceTable("ad_accounts", {"id": "VARCHAR", "project_id": "VARCHAR"}, watermark=None),
+        SourceTable("ad_spend_daily", {
+            "id": "VARCHAR",
+            "ad_account_id": "VARCHAR",
+            "date": "DATE",
+            "spend": "DECIMAL(15, 2)",
+            "leads_count": "INTEGER",
+            "updated_at": "TIMESTAMP",
+        }),
+        SourceTable("daily_reports", {
+            "id": "VARCHAR",
+            "ad_account_id": "VARCHAR",
+            "report_date": "DATE",
+            "impressions": "BIGINT",
+            "clicks": "BIGINT",
+            "spend": "DECIMAL(15, 2)",
+            "conversions": "BIGINT",
+            "status": "VARCHAR",
+            "updated_at": "TIMESTAMP",
+        }),
+        SourceTable("ledgers", {
+            "id": "VARCHAR",
+            "type": "VARCHAR",
+            "project_id": "VARCHAR",
+            "ad_account_id": "VARCHAR",
+            "amount": "DECIMAL(18, 2)",
+            "currency": "VARCHAR",
+            "occurred_at": "TIMESTAMP",
+            "updated_at": "TIMESTAMP",
+        }),
+        SourceTable("topup_requests", {
+            "id": "VARCHAR",
+            "project_id": "VARCHAR",
+            "ad_account_id": "VARCHAR",
+            "requested_by": "VARCHAR",
+            "status": "VARCHAR",
+            "requested_amount": "DECIMAL(15, 2)",
+            "actual_amount": "DECIMAL(15, 2)",
+            "created_at": "TIMESTAMP",
+            "updated_at": "TIMESTAMP",
+        }),
+    )
+}
+
+
+class PerformanceRow(NamedTuple):
+    project_id: str
+    project_name: str
+    total_spend: Any
+    total_leads: int
+
+
+class MonthlyTopupRow(NamedTuple):
+    year: int
+    month: int
+    count: int
+    amount: Any
+
+
+def available() -> bool:
+    return duckdb is not None and get_settings().analytics_store_enabled
+
+
+def covers(start: Optional[date], end: Optional[date], today: Optional[date] = None) -> bool:
+    """统计区间是否应改查副本：已启用且跨度超过 analytics_min_days 天（不限起始日期视为全部历史）"""
+    if not available():
+        return False
+    if start is None:
+        return True
+    return ((end or today or date.today()) - start).days + 1 > get_settings().analytics_min_days
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _connect(read_only: bool):
+    path = Path(get_settings().analytics_store_path)
+    if read_only:
+        return duckdb.connect(str(path), read_only=True) if path.exists() else None
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for attempt in range(_LOCK_RETRIES):
+        try:
+            return duckdb.connect(str(path))
+        except duckdb.IOException:
+            if attempt == _LOCK_RETRIES - 1:
+                raise
+            time.sleep(_LOCK_RETRY_INTERVAL)
+
+
+# ---------------------------------------------------------------------------
+# 同步
+# ---------------------------------------------------------------------------
+
+def _ensure_schema(store) -> None:
+    store.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            table_name VARCHAR PRIMARY KEY,
+            watermark VARCHAR,
+            synced_at TIMESTAMP NOT NULL,
+            row_count BIGINT NOT NULL
+        )
+    """)
+    for source in SOURCE_TABLES.values():
+        columns = ", ".join(f"{name} {kind}" for name, kind in source.columns.items())
+        store.execute(f"CREATE TABLE IF NOT EXISTS {source.name} ({columns})")
+        for name, kind in source.columns.items():
+            store.execute(f"ALTER TABLE {source.name} ADD COLUMN IF NOT EXISTS {name} {kind}")
+
+
+def _load_watermark(store, table: str) -> Optional[datetime]:
+    row = store.execute("SELECT watermark FROM sync_state WHERE table_name = ?", [table]).fetchone()
+    return datetime.fromisoformat(row[0]) if row and row[0] else None
+
+
+def _as_datetime(value: Any) -> Optional[datetime]:
+    # SQLite 经 text() 查询返回的时间是字符串
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return _NULL
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        # 副本统一存 UTC 时间
+        return value.astimezone(timezone.utc).replace(tzinfo=None).isoformat(sep=" ")
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+
+def _load_batch(store, source: SourceTable, columns: Sequence[str], rows: Iterable[Sequence], replace: bool) -> None:
+    """经 CSV 中转批量写入副本（DuckDB 逐行 executemany 很慢），replace 时先删除同 id 的旧行"""
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as fileobj:
+            csv.writer(fileobj).writerows([_csv_value(value) for value in row] for row in rows)
+        types = ", ".join(f"'{name}': '{source.columns[name]}'" for name in columns)
+        store.execute(
+            f"CREATE OR REPLACE TEMP TABLE staging AS SELECT * FROM read_csv('{path}', "
+            f"header = false, columns = {{{types}}}, nullstr = '{_NULL}', quote = '\"', escape = '\"')"
+        )
+    finally:
+        os.unlink(path)
+
+    column_list = ", ".join(columns)
+    if replace:
+        store.execute(f"DELETE FROM {source.name} WHERE id IN (SELECT id FROM staging)")
+    store.execute(f"INSERT INTO {source.name} ({column_list}) SELECT {column_list} FROM staging")
+
+
+def sync_table(connection: Connection, store, source: SourceTable, full: bool = False) -> int:
+    """把一张主库表同步到副本，返回读取的行数；主库缺少该表或水位列时跳过"""
+    inspector = inspect(connection)
+    if not inspector.has_table(source.name):
+        logger.warning(f"Analytics sync skipped {source.name}: table not found")
+        return 0
+    available_columns = {column["name"] for column in inspector.get_columns(source.name)}
+    if source.watermark and source.watermark not in available_columns:
+        logger.warning(f"Analytics sync skipped {source.name}: no {source.watermark} column")
+        return 0
+    # 各部署的表结构不完全一致，主库没有的列在副本中保持为空
+    columns = [name for name in source.columns if name in available_columns]
+
+    since = None if full or source.watermark is None else _load_watermark(store, source.name)
+    sql = f"SELECT {', '.join(columns)} FROM {source.name}"
+    params: Dict[str, Any] = {}
+    if since is not None:
+        sql += f" WHERE {source.watermark} >= :since"
+        params["since"] = since - SYNC_OVERLAP
+    result = connection.execution_options(stream_results=True).execute(text(sql), params)
+
+    watermark_index = columns.index(source.watermark) if source.watermark else None
+    high, count = since, 0
+    store.execute("BEGIN TRANSACTION")
+    try:
+        if since is None:
+            store.execute(f"DELETE FROM {source.name}")
+        while True:
+            rows = result.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            _load_batch(store, source, columns, rows, replace=since is not None)
+            count += len(rows)
+            if watermark_index is not None:
+                batch_high = max(
+                    (_as_datetime(row[watermark_index]) for row in rows if row[watermark_index] is not None),
+                    default=None,
+                )
+                if batch_high is not None and (high is None or batch_high > high):
+                    high = batch_high
+        store.execute(
+            "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+            [source.name, high.isoformat() if high else None, _utcnow(), count],
+        )
+        store.execute("COMMIT")
+    except Exception:
+        store.execute("ROLLBACK")
+        raise
+    finally:
+        result.close()
+    return count
+
+
+def sync(connection: Connection, tables: Optional[Iterable[str]] = None, full: bool = False) -> Dict[str, int]:
+    """增量（full 时全量）同步副本，返回各表读取的行数"""
+    if duckdb is None:
+        raise RuntimeError("未安装 duckdb，无法同步列式分析副本")
+    names = list(tables) if tables else list(SOURCE_TABLES)
+    unknown = set(names) - set(SOURCE_TABLES)
+    if unknown:
+        raise ValueError(f"不支持同步的表: {', '.join(sorted(unknown))}")
+
+    store = _connect(read_only=False)
+    try:
+        _ensure_schema(store)
+        counts = {name: sync_table(connection, store, SOURCE_TABLES[name], full=full) for name in names}
+    finally:
+        store.close()
+    logger.info(f"Analytics store synced: {counts}")
+    return counts
+
+
+def status() -> List[Dict[str, Any]]:
+    """各表最近一次同步的水位、时间与行数"""
+    if duckdb is None:
+        raise RuntimeError("未安装 duckdb")
+    store = _connect(read_only=True)
+    if store is None:
+        return []
+    try:
+        rows = store.execute(
+            "SELECT table_name, watermark, synced_at, row_count FROM sync_state ORDER BY table_name"
+        ).fetchall()
+    finally:
+        store.close()
+    return [dict(zip(("table", "watermark", "synced_at", "rows"), row)) for row in rows]
+
+
+# ---------------------------------------------------------------------------
+# 查询
+# ---------------------------------------------------------------------------
+
+def _query(tables: Sequence[str], sql: str, params: Sequence[Any]) -> Optional[List[tuple]]:
+    """在副本上执行查询；依赖的表未同步或同步已过期、副本不可读时返回 None"""
+    if not available():
+        return None
+    try:
+        store = _connect(read_only=True)
+        if store is None:
+            return None
+        try:
+            synced = dict(store.execute(
+                "SELECT table_name, synced_at FROM sync_state WHERE list_contains(?, table_name)", [list(tables)]
+            ).fetchall())
+            cutoff = _utcnow() - timedelta(minutes=get_settings().analytics_max_staleness_minutes)
+            if any(synced.get(table) is None or synced[table] < cutoff for table in tables):
+                logger.info(f"Analytics store stale for {', '.join(tables)}, falling back to primary database")
+                return None
+            return store.execute(sql, list(params)).fetchall()
+        finally:
+            store.close()
+    except duckdb.Error as e:
+        logger.warning(f"Analytics store query failed, falling back to primary database: {e}")
+        return None
+
+
+def project_performance(
+    start: Optional[date], end: Optional[date], project_id: Optional[Any] = None
+) -> Optional[List[PerformanceRow]]:
+    """按项目汇总区间内的消耗与线索数，只包含区间内有消耗的项目"""
+    conditions, params = [], []
+    if start:
+        conditions.append("s.date >= ?")
+        params.append(start)
+    if end:
+        conditions.append("s.date <= ?")
+        params.append(end)
+    if project_id:
+        conditions.append("p.id = ?")
+        params.append(str(project_id))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = _query(("projects", "ad_accounts", "ad_spend_daily"), f"""
+        SELECT p.id, p.name, coalesce(sum(s.spend), 0), coalesce(sum(s.leads_count), 0)
+        FROM ad_spend_daily s
+        JOIN ad_accounts a ON a.id = s.ad_account_id
+        JOIN projects p ON p.id = a.project_id
+        {where}
+        GROUP BY p.id, p.name
+    """, params)
+    return None if rows is None else [PerformanceRow(*row) for row in rows]
+
+
+def topup_monthly_statistics(
+    start: Optional[datetime],
+    end: Optional[datetime],
+    project_ids: Optional[Iterable[Any]] = None,
+    requested_by: Optional[Any] = None,
+    limit: int = 12,
+) -> Optional[List[MonthlyTopupRow]]:
+    """按创建月份统计充值申请数与申请金额；project_ids、requested_by 为权限范围过滤"""
+    conditions, params = [], []
+    if start:
+        conditions.append("created_at >= ?")
+        params.append(start)
+    if end:
+        conditions.append("created_at <= ?")
+        params.append(end)
+    if project_ids is not None:
+        conditions.append("list_contains(?, project_id)")
+        params.append([str(value) for value in project_ids])
+    if requested_by is not None:
+        conditions.append("requested_by = ?")
+        params.append(str(requested_by))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = _query(("topup_requests",), f"""
+        SELECT year(created_at) AS year, month(created_at) AS month, count(id), sum(requested_amount)
+        FROM topup_requests
+        {where}
+        GROUP BY year, month
+        ORDER BY year, month
+        LIMIT ?
+    """, [*params, limit])
+    return None if rows is None else [MonthlyTopupRow(*row) for row in rows]
@@ -0,0 +1,407 @@
+"""
+广告消耗异常检测
+按广告账户在过去 N 天的滚动窗口上计算均值、标准差与中位数绝对偏差（MAD），
+支持批量重算并批量回写 is_anomaly / anomaly_reason；
+单条录入复用进程内缓存的账户滚动状态，避免每次查询历史记录；
+缓存条目带账户版本号，配置 Redis 时其他进程的写入通过共享版本计数器即时失效
+
+窗口内没有历史记录（新账户，或上一条记录早于窗口起点）时不再按消耗变化率标记异常，
+只保留线索数为 0 的判断
+"""
+import bisect
+import logging
+import statistics
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.core.cache import MISSING, TTLCache, VersionCounter, get_shared_backend
+from backend.models import AdSpendDaily
+
+logger = logging.getLogger(__name__)
+
+SpendPoint = Tuple[date, Decimal]
+
+
+@dataclass(frozen=True)
+class AnomalyConfig:
+    """异常检测参数"""
+
+    window_days: int = 28
+    # 历史样本不足时退化为与最近一条记录比较
+    min_history: int = 7
+    change_threshold: Decimal = Decimal("0.30")
+    zscore_threshold: float = 3.0
+    # 修正 Z 分数阈值（Iglewicz & Hoaglin 推荐 3.5）
+    mad_threshold: float = 3.5
+
+
+DEFAULT_CONFIG = AnomalyConfig()
+
+
+def _change_reason(current: Decimal, reference: Decimal, threshold: Decimal) -> Tuple[bool, Optional[str]]:
+    if reference == 0:
+        if current > 0:
+            return True, "SPEND_PREVIOUS_ZERO"
+        return False, None
+    change_ratio = (current - reference).copy_abs() / reference.copy_abs()
+    if change_ratio > threshold:
+        percentage = (change_ratio * Decimal("100")).quantize(Decimal("0.01"))
+        return True, f"SPEND_CHANGE_{percentage}%"
+    return False, None
+
+
+def evaluate_spend(
+    spend: Decimal,
+    leads_count: int,
+    history: Sequence[SpendPoint],
+    config: AnomalyConfig = DEFAULT_CONFIG,
+) -> Tuple[bool, Optional[str]]:
+    """根据窗口内历史消耗判断当日消耗是否异常
+
+    Args:
+        spend: 当日消耗
+        leads_count: 当日线索数
+        history: 窗口内按日期升序排列的 (日期, 消耗)
+
+    Returns:
+        (是否异常, 异常原因)
+    """
+    if leads_count == 0:
+        return True, "LEADS_COUNT_ZERO"
+    if not history:
+        return False, None
+    if len(history) < config.min_history:
+        return _change_reason(spend, history[-1][1] or Decimal("0"), config.change_threshold)
+
+    values = [float(value or 0) for _, value in history]
+    current = float(spend)
+    median = statistics.median(values)
+    mad = statistics.median([abs(value - median) for value in values])
+    if mad > 0:
+        score = 0.6745 * (current - median) / mad
+        if abs(score) > config.mad_threshold:
+            return True, f"SPEND_MAD_{score:.2f}"
+    else:
+        # 历史消耗几乎恒定，MAD 为 0 时按相对中位数的变化率判断
+        return _change_reason(spend, Decimal(str(median)), config.change_threshold)
+
+    mean = statistics.fmean(values)
+    stdev = statistics.pstdev(values, mean)
+    if stdev > 0:
+        zscore = (current - mean) / stdev
+        if abs(zscore) > config.zscore_threshold:
+            return True, f"SPEND_ZSCORE_{zscore:.2f}"
+    return False, None
+
+
+class RollingSpendState:
+    """单个账户的滚动消耗状态，覆盖 [covered_from, +∞) 区间内已知的全部记录
+
+    放入共享缓存后不再原地修改（请求线程会无锁读取），追加记录时用 extended 生成新状态。
+    """
+
+    __slots__ = ("covered_from", "dates", "spends")
+
+    def __init__(self, covered_from: date, points: Iterable[SpendPoint] = ()):
+        self.covered_from = covered_from
+        self.dates: List[date] = []
+        self.spends: List[Decimal] = []
+        for day, spend in sorted(points):
+            self.dates.append(day)
+            self.spends.append(spend)
+
+    def covers(self, day: date, window_days: int) -> bool:
+        return self.covered_from <= day - timedelta(days=window_days)
+
+    def window(self, day: date, window_days: int) -> List[SpendPoint]:
+        """返回 [day - window_days, day) 内的记录"""
+        lo = bisect.bisect_left(self.dates, day - timedelta(days=window_days))
+        hi = bisect.bisect_left(self.dates, day)
+        return list(zip(self.dates[lo:hi], self.spends[lo:hi]))
+
+    def add(self, day: date, spend: Decimal) -> None:
+        if day < self.covered_from:
+            return
+        index = bisect.bisect_left(self.dates, day)
+        if index < len(self.dates) and self.dates[index] == day:
+            self.spends[index] = spend
+        else:
+            self.dates.insert(index, day)
+            self.spends.insert(index, spend)
+
+    def trim(self, keep_from: date) -> None:
+        """丢弃早于 keep_from 的记录，控制状态体积"""
+        if keep_from <= self.covered_from:
+            return
+        index = bisect.bisect_left(self.dates, keep_from)
+        del self.dates[:index]
+        del self.spends[:index]
+        self.covered_from = keep_from
+
+    def extended(self, points: Iterable[SpendPoint], window_days: int) -> "RollingSpendState":
+        """返回追加 points 后的新状态，只保留最近两个窗口的记录"""
+        state = RollingSpendState(self.covered_from, zip(self.dates, self.spends))
+        for day, spend in points:
+            state.add(day, spend)
+        if state.dates:
+            state.trim(state.dates[-1] - timedelta(days=window_days * 2))
+        return state
+
+
+class CachedState(NamedTuple):
+    """缓存条目：全局与账户版本号一致时 state 才可用"""
+
+    base: str
+    version: str
+    state: RollingSpendState
+
+
+ALL_ACCOUNTS = "all"
+
+# 账户滚动状态缓存；同进程内的写入由下方的会话事件追加，其他进程的写入使账户版本号变化。
+# 未配置 Redis 时版本号只在本进程有效，缩短 TTL 限制其他进程写入后的陈旧时间
+_state_versions = VersionCounter(backend=get_shared_backend(), namespace="anomaly_state")
+rolling_state_cache = TTLCache(maxsize=20000, ttl=600 if _state_versions.backend is not None else 60)
+# 串行化提交后的读-改-写，避免并发提交互相覆盖追加的记录
+_state_lock = threading.Lock()
+
+
+def _version_name(account_id: Any) -> str:
+    return f"account:{account_id}"
+
+
+class SpendAnomalyService:
+    """广告消耗异常检测服务"""
+
+    def __init__(self, db: Session, config: AnomalyConfig = DEFAULT_CONFIG):
+        self.db = db
+        self.config = config
+
+    def _load_points(
+        self,
+        account_ids: Sequence[Any],
+        start: date,
+        end: Optional[date] = None,
+    ) -> Dict[Any, List[SpendPoint]]:
+        """一次查询加载多个账户在 [start, end] 内的消耗记录"""
+        query = self.db.query(AdSpendDaily.ad_account_id, AdSpendDaily.date, AdSpendDaily.spend).filter(
+            AdSpendDaily.date >= start
+        )
+        if account_ids:
+            query = query.filter(AdSpendDaily.ad_account_id.in_(list(account_ids)))
+        if end is not None:
+            query = query.filter(AdSpendDaily.date <= end)
+        points: Dict[Any, List[SpendPoint]] = {account_id: [] for account_id in account_ids}
+        for account_id, day, spend in query.order_by(AdSpendDaily.ad_account_id, AdSpendDaily.date):
+            points.setdefault(account_id, []).append((day, spend or Decimal("0")))
+        return points
+
+    def preload_states(self, account_ids: Iterable[Any], earliest_day: date) -> Dict[Any, RollingSpendState]:
+        """为一批账户准备覆盖 earliest_day 所需窗口的滚动状态，缺失的账户一次查询补齐"""
+        covered_from = earliest_day - timedelta(days=self.config.window_days)
+        account_ids = list(dict.fromkeys(account_ids))
+        # 先读版本号再查库：读取后发生的写入会使本次写入的缓存条目在下次读取时失效
+        versions = _state_versions.tokens([ALL_ACCOUNTS] + [_version_name(item) for item in account_ids])
+        base = versions[ALL_ACCOUNTS]
+        states: Dict[Any, RollingSpendState] = {}
+        missing = []
+        for account_id in account_ids:
+            entry = rolling_state_cache.get(account_id)
+            if (
+                entry is not MISSING
+                and entry.base == base
+                and entry.version == versions[_version_name(account_id)]
+                and entry.state.covers(earliest_day, self.config.window_days)
+            ):
+                states[account_id] = entry.state
+            else:
+                missing.append(account_id)
+        if missing:
+            loaded = self._load_points(missing, covered_from)
+            for account_id in missing:
+                state = RollingSpendState(covered_from, loaded.get(account_id, ()))
+                rolling_state_cache.set(account_id, CachedState(base, versions[_version_name(account_id)], state))
+                states[account_id] = state
+        return states
+
+    def evaluate(
+        self,
+        account_id: Any,
+        day: date,
+        spend: Decimal,
+        leads_count: int,
+        state: Optional[RollingSpendState] = None,
+    ) -> Tuple[bool, Optional[str]]:
+        """判断单条消耗记录是否异常，优先使用缓存的账户滚动状态"""
+        if state is None:
+            state = self.preload_states([account_id], day)[account_id]
+        history = state.window(day, self.config.window_days)
+        return evaluate_spend(spend, leads_count, history, self.config)
+
+    def evaluate_batch(
+        self, rows: Sequence[Tuple[Any, date, Decimal, int]]
+    ) -> List[Tuple[bool, Optional[str]]]:
+        """批量判断 (账户, 日期, 消耗, 线索数)，结果顺序与输入一致
+
+        缺失的账户状态一次查询补齐；同批次内较早日期的记录计入后续记录的窗口。
+        """
+        if not rows:
+            return []
+        earliest: Dict[Any, date] = {}
+        for account_id, day, _, _ in rows:
+            if account_id not in earliest or day < earliest[account_id]:
+                earliest[account_id] = day
+        states = self.preload_states(earliest, min(earliest.values()))
+        # 在副本上累积本批次记录，提交前不修改共享缓存
+        working = {
+            account_id: RollingSpendState(state.covered_from, zip(state.dates, state.spends))
+            for account_id, state in states.items()
+        }
+        results: List[Tuple[bool, Optional[str]]] = [(False, None)] * len(rows)
+        order = sorted(range(len(rows)), key=lambda index: (str(rows[index][0]), rows[index][1]))
+        for index in order:
+            account_id, day, spend, leads_count = rows[index]
+            state = working[account_id]
+            results[index] = evaluate_spend(
+                spend, leads_count, state.window(day, self.config.window_days), self.config
+            )
+            state.add(day, spend)
+        return results
+
+    def recompute(
+        self,
+        start: date,
+        end: date,
+        account_ids: Optional[Sequence[UUID]] = None,
+        commit: bool = True,
+    ) -> Dict[str, int]:
+        """批量重算 [start, end] 内记录的异常标记，仅回写发生变化的行
+
+        Returns:
+            扫描行数、异常行数、回写行数
+        """
+        window = timedelta(days=self.config.window_days)
+        query = self.db.query(
+            AdSpendDaily.id,
+            AdSpendDaily.ad_account_id,
+            AdSpendDaily.date,
+            AdSpendDaily.spend,
+            AdSpendDaily.leads_count,
+            AdSpendDaily.is_anomaly,
+            AdSpendDaily.anomaly_reason,
+        ).filter(AdSpendDaily.date >= start - window, AdSpendDaily.date <= end)
+        if account_ids:
+            query = query.filter(AdSpendDaily.ad_account_id.in_(list(account_ids)))
+        rows = query.order_by(AdSpendDaily.ad_account_id, AdSpendDaily.date).all()
+
+        updates: List[Dict[str, Any]] = []
+        scanned = flagged = 0
+        current_account = None
+        history: List[SpendPoint] = []
+        for row in rows:
+            if row.ad_account_id != current_account:
+                current_account = row.ad_account_id
+                history = []
+            spend = row.spend or Decimal("0")
+            if row.date >= start:
+                lower = row.date - window
+                trailing = [point for point in history if point[0] >= lower]
+                history = trailing
+                is_anomaly, reason = evaluate_spend(spend, row.leads_count or 0, trailing, self.config)
+                scanned += 1
+                flagged += int(is_anomaly)
+                if bool(row.is_anomaly) != is_anomaly or row.anomaly_reason != reason:
+                    updates.append({"id": row.id, "is_anomaly": is_anomaly, "anomaly_reason": reason})
+            history.append((row.date, spend))
+
+        if updates:
+            self.db.bulk_update_mappings(AdSpendDaily, updates)
+            if commit:
+                self.db.commit()
+        return {"scanned": scanned, "flagged": flagged, "updated": len(updates)}
+
+
+# ---------------------------------------------------------------------------
+# 会话事件：新增记录追加到已缓存的滚动状态，修改或删除则丢弃该账户状态
+# ---------------------------------------------------------------------------
+
+_PENDING_KEY = "anomaly_state_changes"
+
+
+def mark_spend_points(session: Session, points: Iterable[Tuple[Any, date, Decimal]]) -> None:
+    """登记不经过 ORM flush 写入的消耗记录，提交后追加到已缓存的滚动状态"""
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    pending.extend(("add", account_id, day, spend) for account_id, day, spend in points)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_spend_changes(session: Session, _flush_context) -> None:
+    pending = None
+    for obj in session.new:
+        if isinstance(obj, AdSpendDaily) and obj.ad_account_id is not None and obj.date is not None:
+            pending = pending if pending is not None else session.info.setdefault(_PENDING_KEY, [])
+            pending.append(("add", obj.ad_account_id, obj.date, obj.spend or Decimal("0")))
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, AdSpendDaily):
+            pending = pending if pending is not None else session.info.setdefault(_PENDING_KEY, [])
+            account_id = obj.__dict__.get("ad_account_id")
+            pending.append(("drop", account_id, None, None))
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _track_bulk_spend_changes(context) -> None:
+    if context.mapper.class_ is AdSpendDaily:
+        context.session.info.setdefault(_PENDING_KEY, []).append(("drop", None, None, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_spend_changes(session: Session) -> None:
+    changes = session.info.pop(_PENDING_KEY, ())
+    if not changes:
+        return
+    added: Dict[Any, List[SpendPoint]] = defaultdict(list)
+    dropped = set()
+    drop_all = False
+    for action, account_id, day, spend in changes:
+        if action == "add":
+            added[account_id].append((day, spend))
+        elif account_id is None:
+            drop_all = True
+        else:
+            dropped.add(account_id)
+
+    names = [_version_name(account_id) for account_id in set(added) | dropped]
+    bumped = _state_versions.bump(names + ([ALL_ACCOUNTS] if drop_all else []))
+    with _state_lock:
+        if drop_all:
+            rolling_state_cache.clear()
+            return
+        for account_id in dropped:
+            rolling_state_cache.delete(account_id)
+        for account_id, points in added.items():
+            if account_id in dropped:
+                continue
+            entry = rolling_state_cache.get(account_id)
+            if entry is MISSING:
+                continue
+            previous, current = bumped[_version_name(account_id)]
+            if entry.version != previous:
+                # 条目还错过了其他进程的写入，丢弃后由下次读取重新加载
+                rolling_state_cache.delete(account_id)
+                continue
+            state = entry.state.extended(points, DEFAULT_CONFIG.window_days)
+            rolling_state_cache.set(account_id, CachedState(entry.base, current, state))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_spend_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -8,10 +8,10 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_, func
-import bcrypt
 import secrets
 
 from models.user import User
+from core.passwords import get_password_hasher
 from core.security import jwt_manager, token_blacklist
 from exceptions import ValidationError, NotFoundError, AuthenticationError
 from utils.response import success_response
@@ -52,13 +52,14 @@ class AuthService:
             )
         ).first()
 
+        hasher = get_password_hasher()
         if not user:
-            # 使用恒定时间比较防止时序攻击
-            bcrypt.checkpw(password.encode(), bcrypt.gensalt().encode())
+            # 校验预先计算的哑哈希，使耗时与真实校验一致，防止时序攻击
+            await hasher.dummy_verify(password)
             raise AuthenticationError("AUTH_001", "用户名或密码错误")
 
-        # 检查密码
-        if not bcrypt.checkpw(password.encode(), user.password_hash.encode()):
+        # 检查密码（在哈希线程池中执行，不阻塞事件循环）
+        if not await hasher.verify(password, user.password_hash):
             raise AuthenticationError("AUTH_001", "用户名或密码错误")
 
         # 检查用户状态
@@ -222,7 +223,7 @@ class AuthService:
         self._validate_password_strength(password)
 
         # 生成密码哈希
-        password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        password_hash = await get_password_hasher().hash(password)
 
         # 创建用户
         user = User(
@@ -273,14 +274,15 @@ class AuthService:
             raise ValidationError("AUTH_008", "用户不存在")
 
         # 验证旧密码
-        if not bcrypt.checkpw(old_password.encode(), user.password_hash.encode()):
+        hasher = get_password_hasher()
+        if not await hasher.verify(old_password, user.password_hash):
             raise ValidationError("AUTH_009", "旧密码错误")
 
         # 验证新密码强度
         self._validate_password_strength(new_password)
 
         # 更新密码
-        user.password_hash = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
+        user.password_hash = await hasher.hash(new_password)
         user.password_changed_at = datetime.utcnow()
         user.updated_at = datetime.utcnow()
 
@@ -313,7 +315,7 @@ class AuthService:
 
         # 生成重置令牌
         reset_token = secrets.token_urlsafe(32)
-        reset_token_hash = bcrypt.hashpw(reset_token.encode(), bcrypt.gensalt()).decode()
+        reset_token_hash = await get_password_hasher().hash(reset_token)
 
         # 设置过期时间（1小时）
         expires_at = datetime.utcnow() + timedelta(hours=1)
@@ -351,9 +353,10 @@ class AuthService:
             User.reset_password_expires_at > datetime.utcnow()
         ).all()
 
+        hasher = get_password_hasher()
         user = None
         for u in users:
-            if bcrypt.checkpw(reset_token.encode(), u.reset_password_token.encode()):
+            if await hasher.verify(reset_token, u.reset_password_token):
                 user = u
                 break
 
@@ -364,7 +367,7 @@ class AuthService:
         self._validate_password_strength(new_password)
 
         # 更新密码
-        user.password_hash = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
+        user.password_hash = await hasher.hash(new_password)
         user.reset_password_token = None
         user.reset_password_expires_at = None
         user.password_changed_at = datetime.utcnow()
@@ -7,11 +7,11 @@ Author: Claude协作开发
 from contextlib import contextmanager
 from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import List, Optional, Tuple, Dict, Any
+from typing import Iterator, List, Optional, Tuple, Dict, Any
 
 from sqlalchemy import and_, or_, func, desc, text
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from core.database import get_db
 from core.response import error_response
@@ -21,6 +21,7 @@ from exceptions.custom_exceptions import (
     PermissionDeniedError,
     ResourceConflictError
 )
+from services.permission_scope import get_permission_scope
 from models.daily_report import DailyReport, DailyReportAuditLog
 from models.ad_account import AdAccount
 from models.user import User
@@ -127,30 +128,93 @@ class DailyReportService:
         params: DailyReportQueryParams,
         current_user: User,
         page: int = 1,
-        page_size: int = 20
-    ) -> Tuple[List[DailyReport], int]:
+        page_size: int = 20,
+        with_total: bool = True
+    ) -> Tuple[List[DailyReport], Optional[int]]:
         """
         获取日报列表
 
+        总数只在 daily_reports 单表上按筛选条件统计；分页先按 (report_date DESC, id DESC)
+        取当页 ID（走 idx_daily_reports_date_id），再按 ID 批量加载日报及关联的账户、创建人、审核人
+
         Args:
             params: 查询参数
             current_user: 当前用户
             page: 页码
             page_size: 每页数量
+            with_total: 是否统计总数，为 False 时跳过统计并返回 None
+
+        Returns:
+            Tuple[List[DailyReport], Optional[int]]: 日报列表和总数
+        """
+        conditions = self._report_conditions(params, current_user)
+
+        # 统计总数
+        total = None
+        if with_total:
+            total = self.db.query(func.count()).select_from(DailyReport).filter(*conditions).scalar()
+
+        # 分页和排序
+        page_ids = [
+            report_id for report_id, in self.db.query(DailyReport.id)
+            .filter(*conditions)
+            .order_by(desc(DailyReport.report_date), desc(DailyReport.id))
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+        ]
+        if not page_ids:
+            return [], total
+
+        reports = self.db.query(DailyReport).options(
+            selectinload(DailyReport.ad_account),
+            selectinload(DailyReport.creator),
+            selectinload(DailyReport.auditor)
+        ).filter(DailyReport.id.in_(page_ids)).all()
+        position = {report_id: index for index, report_id in enumerate(page_ids)}
+        reports.sort(key=lambda report: position[report.id])
+
+        return reports, total
+
+    def iter_daily_reports(
+        self,
+        params: DailyReportQueryParams,
+        current_user: User,
+        batch_size: int = 1000
+    ) -> Iterator[DailyReport]:
+        """
+        按查询条件逐批迭代日报，用于导出，不受分页上限限制
+
+        Args:
+            params: 查询参数
+            current_user: 当前用户
+            batch_size: 每批从数据库读取的行数
 
         Returns:
-            Tuple[List[DailyReport], int]: 日报列表和总数
+            Iterator[DailyReport]: 日报迭代器
         """
+        query = self._build_report_query(params, current_user)
+        return iter(query.order_by(desc(DailyReport.report_date)).yield_per(batch_size))
+
+    def _build_report_query(self, params: DailyReportQueryParams, current_user: User):
+        """构建带筛选条件的日报查询"""
         query = self.db.query(DailyReport).options(
             joinedload(DailyReport.ad_account),
             joinedload(DailyReport.creator),
             joinedload(DailyReport.auditor)
         )
 
-        # 构建查询条件
+        # 应用所有条件
+        where_conditions = self._report_conditions(params, current_user)
+        if where_conditions:
+            query = query.filter(and_(*where_conditions))
+
+        return query
+
+    def _report_conditions(self, params: DailyReportQueryParams, current_user: User) -> List[Any]:
+        """日报筛选与权限条件，只引用 daily_reports 表的列（项目筛选为子查询）"""
         where_conditions = []
 
-        # 日期范围
+        # 日期范围：分区键直接与日期常量比较，按月分区的 daily_reports 只扫描范围内的分区
         if params.report_date_start:
             where_conditions.append(DailyReport.report_date >= params.report_date_start)
         if params.report_date_end:
@@ -178,32 +242,14 @@ class DailyReportService:
                 )
             )
 
-        # 应用权限过滤
-        # TODO: 实现基于角色的数据过滤
-        # if not self._is_admin_or_data_operator(current_user):
-        #     if current_user.role == "media_buyer":
-        #         where_conditions.append(DailyReport.created_by == current_user.id)
-        #     elif current_user.role == "account_manager":
-        #         # 只能看所管项目的日报
-        #         where_conditions.append(
-        #             DailyReport.ad_account_id.in_(
-        #                 self._get_manager_accessible_accounts(current_user.id)
-        #             )
-        #         )
+        # 应用权限过滤：投手只看自己提交的日报，账户管理员只看所管项目账户的日报
+        if current_user.role == "media_buyer":
+            where_conditions.append(DailyReport.created_by == current_user.id)
+        elif current_user.role == "account_manager":
+            scope = get_permission_scope(self.db, current_user.id, current_user.role)
+            where_conditions.append(scope.account_filter(self.db, DailyReport.ad_account_id))
 
-        # 应用所有条件
-        if where_conditions:
-            query = query.filter(and_(*where_conditions))
-
-        # 统计总数
-        total = query.count()
-
-        # 分页和排序
-        reports = query.order_by(desc(DailyReport.report_date)).offset(
-            (page - 1) * page_size
-        ).limit(page_size).all()
-
-        return reports, total
+        return where_conditions
 
     def get_daily_report(
         self,
@@ -0,0 +1,326 @@
+"""
+异步导出任务服务
+导出请求入队后由后台线程把数据逐行写入本地产物目录（CSV/XLSX），任务元数据以 JSON 文件与产物并存，
+多进程共享同一目录时也能查询状态与下载；相同 (导出类型, 筛选条件, 格式, 数据版本) 的请求复用同一份产物，
+超过保留时间的产物定期清理
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+from backend.core.cache import VersionCounter, get_shared_backend
+from backend.core.config import get_settings
+from backend.utils.export import CSV_MEDIA_TYPE, XLSX_MEDIA_TYPE, write_csv, write_xlsx
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+FORMAT_SUFFIXES = {"csv": ".csv", "excel": ".xlsx"}
+MEDIA_TYPES = {"csv": CSV_MEDIA_TYPE, "excel": XLSX_MEDIA_TYPE}
+
+# 超过该时间仍未结束的任务视为执行进程已退出，允许重新提交
+STALE_JOB_SECONDS = 3600
+# 两次过期清理之间的最短间隔（秒）
+PURGE_INTERVAL = 300
+
+_JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+@dataclass
+class ExportSource:
+    """一种导出的数据来源
+
+    rows 按筛选条件逐行产出数据，可以是生成器；version 返回筛选范围内数据的版本标识，
+    版本不变时相同条件的导出直接复用已有产物。
+    """
+
+    headers: Sequence[str]
+    rows: Callable[[Mapping[str, Any]], Iterable[Mapping[str, Any]]]
+    version: Callable[[Mapping[str, Any]], str]
+    sheet_name: str = "Sheet1"
+    filename_prefix: str = "export"
+
+
+@dataclass
+class ExportJob:
+    """导出任务元数据"""
+
+    id: str
+    kind: str
+    format: str
+    filters: Dict[str, Any]
+    data_version: str
+    status: str = PENDING
+    created_by: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    row_count: Optional[int] = None
+    size: Optional[int] = None
+    error: Optional[str] = None
+    filename: Optional[str] = None
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self.format]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """对外展示的任务状态"""
+
+        def _iso(value: Optional[float]) -> Optional[str]:
+            return datetime.fromtimestamp(value, timezone.utc).isoformat() if value else None
+
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "format": self.format,
+            "status": self.status,
+            "filters": self.filters,
+            "row_count": self.row_count,
+            "size": self.size,
+            "filename": self.filename,
+            "error": self.error,
+            "created_at": _iso(self.created_at),
+            "started_at": _iso(self.started_at),
+            "finished_at": _iso(self.finished_at),
+        }
+
+
+class ArtifactStore:
+    """本地产物目录：``{job_id}.json`` 保存任务元数据，``{job_id}.csv|.xlsx`` 为导出文件"""
+
+    def __init__(self, root: str, retention_seconds: float, timer: Callable[[], float] = time.time):
+        self.root = Path(root)
+        self.retention_seconds = retention_seconds
+        self._timer = timer
+
+    def meta_path(self, job_id: str) -> Path:
+        return self.root / f"{job_id}.json"
+
+    def artifact_path(self, job: ExportJob) -> Path:
+        return self.root / f"{job.id}{FORMAT_SUFFIXES[job.format]}"
+
+    def load(self, job_id: str) -> Optional[ExportJob]:
+        """读取任务元数据，任务不存在或 ID 非法时返回 None"""
+        if not _JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            with open(self.meta_path(job_id), "r", encoding="utf-8") as fileobj:
+                return ExportJob(**json.load(fileobj))
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Corrupt export job metadata {job_id}: {e}")
+            return None
+
+    def save(self, job: ExportJob) -> None:
+        """原子写入任务元数据"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.meta_path(job.id)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as fileobj:
+            json.dump(asdict(job), fileobj, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+    def is_expired(self, job: ExportJob) -> bool:
+        return self._timer() - (job.finished_at or job.created_at) > self.retention_seconds
+
+    def remove(self, job: ExportJob) -> None:
+        for path in (self.artifact_path(job), self.meta_path(job.id)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def purge_expired(self) -> int:
+        """删除过期任务的元数据与产物，返回清理的任务数"""
+        if not self.root.is_dir():
+            return 0
+        removed = 0
+        for meta_path in self.root.glob("*.json"):
+            job = self.load(meta_path.stem)
+            if job is None or job.status in (PENDING, RUNNING) or not self.is_expired(job):
+                continue
+            self.remove(job)
+            removed += 1
+        # 异常中断遗留的临时文件
+        for tmp_path in list(self.root.glob("*.part")) + list(self.root.glob("*.tmp")):
+            try:
+                if self._timer() - tmp_path.stat().st_mtime > self.retention_seconds:
+                    tmp_path.unlink()
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+class ExportJobService:
+    """导出任务调度：去重、入队、后台写出产物"""
+
+    def __init__(
+        self,
+        store: ArtifactStore,
+        max_workers: int = 2,
+        versions: Optional[VersionCounter] = None,
+        timer: Callable[[], float] = time.time,
+    ):
+        self.store = store
+        self.versions = versions or VersionCounter(namespace="export")
+        self._timer = timer
+        self._sources: Dict[str, ExportSource] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export-job")
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def register(self, kind: str, source: ExportSource) -> None:
+        """注册导出类型"""
+        self._sources[kind] = source
+
+    def bump_version(self, kind: str) -> None:
+        """写路径调用，使该类型已有导出不再被复用"""
+        self.versions.bump([kind])
+
+    @staticmethod
+    def job_key(kind: str, fmt: str, filters: Mapping[str, Any], data_version: str) -> str:
+        """(导出类型, 格式, 规范化筛选条件, 数据版本) 的摘要，同时作为任务 ID"""
+        payload = json.dumps([kind, fmt, filters, data_version], sort_keys=True, default=str, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def submit(
+        self,
+        kind: str,
+        filters: Mapping[str, Any],
+        fmt: str = "csv",
+        created_by: Optional[str] = None,
+    ) -> Tuple[ExportJob, bool]:
+        """提交导出任务，返回 (任务, 是否复用已有任务)"""
+        source = self._sources.get(kind)
+        if source is None:
+            raise ValueError(f"未知的导出类型: {kind}")
+        if fmt not in FORMAT_SUFFIXES:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+
+        # 规范化为 JSON 可序列化的筛选条件，空条件不参与去重
+        filters = {key: value for key, value in json.loads(json.dumps(dict(filters), default=str)).items() if value is not None}
+        data_version = f"{self.versions.token([kind])}|{source.version(filters)}"
+        job_id = self.job_key(kind, fmt, filters, data_version)
+
+        self._maybe_purge()
+        with self._lock:
+            existing = self.store.load(job_id)
+            if existing is not None and self._reusable(existing):
+                return existing, True
+
+            job = ExportJob(
+                id=job_id,
+                kind=kind,
+                format=fmt,
+                filters=filters,
+                data_version=data_version,
+                created_by=created_by,
+                created_at=self._timer(),
+            )
+            self.store.save(job)
+            self._futures[job_id] = self._executor.submit(self._run, job, source)
+        return job, False
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        """查询任务，过期任务视为不存在"""
+        job = self.store.load(job_id)
+        if job is None or (job.status in (COMPLETED, FAILED) and self.store.is_expired(job)):
+            return None
+        return job
+
+    def artifact_path(self, job: ExportJob) -> Path:
+        return self.store.artifact_path(job)
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[ExportJob]:
+        """等待本进程内的任务结束并返回最新状态"""
+        future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout=timeout)
+        return self.store.load(job_id)
+
+    def _reusable(self, job: ExportJob) -> bool:
+        if job.status == FAILED or self.store.is_expired(job):
+            return False
+        if job.status == COMPLETED:
+            return self.store.artifact_path(job).exists()
+        return job.id in self._futures or self._timer() - job.created_at < STALE_JOB_SECONDS
+
+    def _run(self, job: ExportJob, source: ExportSource) -> None:
+        job.status = RUNNING
+        job.started_at = self._timer()
+        self.store.save(job)
+
+        path = self.store.artifact_path(job)
+        part_path = path.with_name(path.name + ".part")
+        try:
+            with open(part_path, "wb") as fileobj:
+                rows = source.rows(job.filters)
+                if job.format == "excel":
+                    job.row_count = write_xlsx(rows, fileobj, sheet_name=source.sheet_name, headers=source.headers)
+                else:
+                    job.row_count = write_csv(rows, fileobj, headers=source.headers)
+            os.replace(part_path, path)
+            job.size = path.stat().st_size
+            job.filename = (
+                f"{source.filename_prefix}_{datetime.fromtimestamp(job.created_at).strftime('%Y%m%d_%H%M%S')}"
+                f"{FORMAT_SUFFIXES[job.format]}"
+            )
+            job.status = COMPLETED
+        except Exception as e:
+            logger.exception(f"Export job {job.id} ({job.kind}) failed")
+            job.status = FAILED
+            job.error = str(e)
+            try:
+                part_path.unlink()
+            except FileNotFoundError:
+                pass
+        finally:
+            job.finished_at = self._timer()
+            self.store.save(job)
+            with self._lock:
+                self._futures.pop(job.id, None)
+
+    def _maybe_purge(self) -> None:
+        now = self._timer()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        try:
+            removed = self.store.purge_expired()
+        except OSError as e:
+            logger.warning(f"Export artifact purge failed: {e}")
+            return
+        if removed:
+            logger.info(f"Purged {removed} expired export artifacts")
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+@lru_cache(maxsize=1)
+def get_export_job_service() -> ExportJobService:
+    """按配置创建进程内唯一的导出任务服务"""
+    settings = get_settings()
+    store = ArtifactStore(settings.export_dir, settings.export_retention_hours * 3600)
+    return ExportJobService(
+        store,
+        max_workers=settings.export_max_workers,
+        versions=VersionCounter(backend=get_shared_backend(), namespace="export"),
+    )
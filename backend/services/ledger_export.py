@@ -0,0 +1,100 @@
+"""
+交易记录导出
+直接在 ledgers 表上读取：按 (created_at, id) 键集分页逐行产出，每页从上一页最后一条记录之后继续，
+导出期间的插入、删除不会造成重复或遗漏，也不随页数增加重复扫描偏移量；
+数据版本为筛选范围内的记录数与 max(updated_at)，其他入口的增删改任一发生都会生成新导出
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterator, List, Mapping
+from uuid import UUID
+
+from sqlalchemy import func, select, tuple_
+
+from backend.core.db import get_session_factory
+from backend.models import Ledger
+from backend.services.export_job_service import ExportSource, get_export_job_service
+
+LEDGER_EXPORT_KIND = "ledger_transactions"
+LEDGER_EXPORT_PAGE_SIZE = 1000
+LEDGER_EXPORT_COLUMNS = [
+    ("id", "流水ID"),
+    ("type", "类型"),
+    ("project_id", "项目ID"),
+    ("channel_id", "渠道ID"),
+    ("ad_account_id", "账户ID"),
+    ("amount", "金额"),
+    ("currency", "币种"),
+    ("occurred_at", "发生时间"),
+    ("remark", "备注"),
+    ("created_at", "创建时间"),
+    ("updated_at", "更新时间"),
+]
+
+
+def _conditions(filters: Mapping[str, Any]) -> List[Any]:
+    """把任务中保存的字符串筛选条件还原为 ledgers 上的过滤条件"""
+    conditions = []
+    if filters.get("project_id"):
+        conditions.append(Ledger.project_id == UUID(filters["project_id"]))
+    if filters.get("account_id"):
+        conditions.append(Ledger.ad_account_id == UUID(filters["account_id"]))
+    if filters.get("transaction_type"):
+        conditions.append(Ledger.type == filters["transaction_type"])
+    # 日期边界按发生时间，结束日期包含当天
+    if filters.get("start_date"):
+        conditions.append(Ledger.occurred_at >= datetime.combine(date.fromisoformat(filters["start_date"]), time.min))
+    if filters.get("end_date"):
+        end = date.fromisoformat(filters["end_date"]) + timedelta(days=1)
+        conditions.append(Ledger.occurred_at < datetime.combine(end, time.min))
+    return conditions
+
+
+def _export_value(value: Any) -> Any:
+    return str(value) if isinstance(value, UUID) else value
+
+
+def iter_ledger_export_rows(filters: Mapping[str, Any]) -> Iterator[Dict[str, Any]]:
+    """在后台线程中按 (created_at, id) 键集分页读取流水并逐行产出，使用独立会话"""
+    conditions = _conditions(filters)
+    page_size = LEDGER_EXPORT_PAGE_SIZE
+    db = get_session_factory()()
+    try:
+        after = None
+        while True:
+            query = select(Ledger).where(*conditions)
+            if after is not None:
+                query = query.where(tuple_(Ledger.created_at, Ledger.id) > after)
+            ledgers = db.execute(query.order_by(Ledger.created_at, Ledger.id).limit(page_size)).scalars().all()
+            for ledger in ledgers:
+                yield {header: _export_value(getattr(ledger, key)) for key, header in LEDGER_EXPORT_COLUMNS}
+            if len(ledgers) < page_size:
+                break
+            after = (ledgers[-1].created_at, ledgers[-1].id)
+            # 每页读取后释放已加载的对象，内存占用与导出行数无关
+            db.expunge_all()
+    finally:
+        db.close()
+
+
+def ledger_export_version(filters: Mapping[str, Any]) -> str:
+    """筛选范围内的数据版本：记录数与最近更新时间"""
+    db = get_session_factory()()
+    try:
+        total, last_updated = db.execute(
+            select(func.count(), func.max(Ledger.updated_at)).select_from(Ledger).where(*_conditions(filters))
+        ).one()
+        return f"{total}:{last_updated.isoformat() if last_updated else '-'}"
+    finally:
+        db.close()
+
+
+get_export_job_service().register(
+    LEDGER_EXPORT_KIND,
+    ExportSource(
+        headers=[header for _, header in LEDGER_EXPORT_COLUMNS],
+        rows=iter_ledger_export_rows,
+        version=ledger_export_version,
+        sheet_name="交易记录",
+        filename_prefix="ledger_transactions",
+    ),
+)
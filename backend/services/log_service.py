@@ -1,40 +1,200 @@
+"""
+操作日志服务
+默认把日志条目挂到调用方会话上，与业务写入在同一事务中提交；
+调用方也可以选择异步写入，由后台批量写入线程统一落库
+"""
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional
 from uuid import UUID, uuid4
 
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 
+from backend.core.config import get_settings
 from backend.models import Log
 
+logger = logging.getLogger(__name__)
+
+# 当前请求内待写入的异步日志，由 LogFlushMiddleware 在请求结束时统一提交给后台线程
+_request_buffer: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("log_request_buffer", default=None)
+
+
+class LogBatchWriter:
+    """后台批量写入线程：攒批后用一次 bulk insert + 一次 commit 落库"""
+
+    thread_name = "log-batch-writer"
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+    ):
+        self._session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _get_session(self) -> Session:
+        if self._session_factory is None:
+            from backend.core.db import get_session_factory
+
+            self._session_factory = get_session_factory()
+        return self._session_factory()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                self._thread.start()
+
+    def submit(self, rows: List[Dict[str, Any]]) -> None:
+        """提交一批日志行，队列满时丢弃并计数，不阻塞请求"""
+        if not rows:
+            return
+        self._ensure_started()
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                self.dropped += 1
+                logger.warning(f"{self.thread_name} queue full, entry dropped")
+
+    def flush(self) -> None:
+        """阻塞直到已提交的日志全部落库"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get(timeout=self.flush_interval))
+                    except queue.Empty:
+                        break
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        session = self._get_session()
+        try:
+            session.bulk_insert_mappings(Log, rows)
+            session.commit()
+        except Exception as e:
+            # 日志落库失败不应影响业务，记录后丢弃该批
+            session.rollback()
+            logger.error(f"Failed to write {len(rows)} log entries: {e}")
+        finally:
+            session.close()
+
+
+def _build_batch_writer() -> LogBatchWriter:
+    settings = get_settings()
+    return LogBatchWriter(batch_size=settings.log_batch_size, flush_interval=settings.log_flush_interval)
+
+
+log_batch_writer = _build_batch_writer()
+
+
+@contextmanager
+def request_log_scope() -> Iterator[List[Dict[str, Any]]]:
+    """开启请求级异步日志缓冲，退出时把缓冲整体交给后台线程"""
+    buffer: List[Dict[str, Any]] = []
+    token = _request_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _request_buffer.reset(token)
+        log_batch_writer.submit(buffer)
+
 
 class LogService:
     @staticmethod
-    def write(
-        db: Session,
+    def _build_row(
         *,
         action: str,
         operator_id: Optional[str],
         target: str,
         detail: Dict[str, Any],
         target_id: Optional[UUID] = None,
-    ) -> None:
+    ) -> Optional[Dict[str, Any]]:
         if operator_id is None:
-            return
+            return None
         try:
             operator_uuid = UUID(operator_id)
         except (TypeError, ValueError):
-            return
-        entry = Log(
-            id=uuid4(),
-            actor_id=operator_uuid,
-            action=action,
-            target_table=target,
-            target_id=target_id,
-            before_data=None,
-            after_data=jsonable_encoder(detail),
-            created_at=datetime.now(timezone.utc),
+            return None
+        return {
+            "id": uuid4(),
+            "actor_id": operator_uuid,
+            "action": action,
+            "target_table": target,
+            "target_id": target_id,
+            "before_data": None,
+            "after_data": jsonable_encoder(detail),
+            "created_at": datetime.now(timezone.utc),
+        }
+
+    @staticmethod
+    def stage(
+        db: Session,
+        *,
+        action: str,
+        operator_id: Optional[str],
+        target: str,
+        detail: Dict[str, Any],
+        target_id: Optional[UUID] = None,
+    ) -> bool:
+        """把日志条目加入调用方会话，随调用方下一次 commit 一起提交"""
+        row = LogService._build_row(
+            action=action, operator_id=operator_id, target=target, detail=detail, target_id=target_id
         )
-        db.add(entry)
-        db.commit()
+        if row is None:
+            return False
+        db.add(Log(**row))
+        return True
 
+    @staticmethod
+    def write(
+        db: Session,
+        *,
+        action: str,
+        operator_id: Optional[str],
+        target: str,
+        detail: Dict[str, Any],
+        target_id: Optional[UUID] = None,
+        async_write: bool = False,
+    ) -> None:
+        """立即写入日志；async_write=True 时交给后台批量写入，不占用调用方事务"""
+        if not async_write:
+            if LogService.stage(
+                db, action=action, operator_id=operator_id, target=target, detail=detail, target_id=target_id
+            ):
+                db.commit()
+            return
+
+        row = LogService._build_row(
+            action=action, operator_id=operator_id, target=target, detail=detail, target_id=target_id
+        )
+        if row is None:
+            return
+        buffer = _request_buffer.get()
+        if buffer is not None:
+            buffer.append(row)
+        else:
+            log_batch_writer.submit([row])
@@ -0,0 +1,113 @@
+"""
+登录历史记录
+- UserEmailIndex：失败登录按邮箱查找用户 ID，先查进程内缓存，未命中时按 user_profiles.email 唯一索引单行查询
+- LoginHistoryWriter：登录历史经后台线程攒批写入 user_login_history，不占用登录请求
+- sync_profile_emails：分页读取 Supabase 用户目录，校正 user_profiles.email
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from backend.core.cache import MISSING, TTLCache
+from backend.services.log_service import LogBatchWriter
+
+logger = logging.getLogger(__name__)
+
+
+class UserEmailIndex:
+    """邮箱到用户 ID 的查找，不存在的邮箱也短时缓存，撞库时同一邮箱的重复尝试不再查库"""
+
+    def __init__(self, client: Any, ttl: float = 300, negative_ttl: float = 60, maxsize: int = 10000):
+        self.client = client
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def normalize(email: Optional[str]) -> str:
+        return (email or "").strip().lower()
+
+    def lookup(self, email: Optional[str]) -> Optional[str]:
+        """返回邮箱对应的用户 ID，不存在时返回 None；查询失败时抛出异常且不缓存"""
+        key = self.normalize(email)
+        if not key:
+            return None
+        cached = self._cache.get(key)
+        if cached is not MISSING:
+            return cached
+        response = self.client.table("user_profiles")\
+            .select("id")\
+            .eq("email", key)\
+            .limit(1)\
+            .execute()
+        rows = response.data or []
+        user_id = str(rows[0]["id"]) if rows else None
+        self._store(key, user_id)
+        return user_id
+
+    def remember(self, email: Optional[str], user_id: str) -> None:
+        """注册等已知映射直接写入缓存，覆盖此前缓存的“不存在”"""
+        key = self.normalize(email)
+        if key:
+            self._store(key, str(user_id))
+
+    def forget(self, email: Optional[str]) -> None:
+        self._cache.delete(self.normalize(email))
+
+    def _store(self, key: str, user_id: Optional[str]) -> None:
+        ttl = self.ttl if user_id is not None else self.negative_ttl
+        if ttl > 0:
+            self._cache.set(key, user_id, ttl=ttl)
+
+
+class LoginHistoryWriter(LogBatchWriter):
+    """登录历史的后台批量写入，每批一次 Supabase insert"""
+
+    thread_name = "login-history-writer"
+
+    def __init__(self, client: Any, batch_size: int = 200, flush_interval: float = 1.0, max_queue: int = 10000):
+        super().__init__(batch_size=batch_size, flush_interval=flush_interval, max_queue=max_queue)
+        self.client = client
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        try:
+            self.client.table("user_login_history").insert(rows).execute()
+        except Exception as e:
+            # 登录历史落库失败不应影响登录，记录后丢弃该批
+            logger.error(f"Failed to write {len(rows)} login history entries: {e}")
+
+
+def _list_users_page(client: Any, page: int, per_page: int) -> List[Any]:
+    result = client.auth.admin.list_users(page=page, per_page=per_page)
+    # 不同版本的客户端分别返回用户列表或带 users 属性的响应
+    return list(getattr(result, "users", result) or [])
+
+
+def sync_profile_emails(client: Any, per_page: int = 1000) -> Dict[str, int]:
+    """分页读取用户目录，把邮箱有变化的用户写回 user_profiles.email，返回用户数、更新数与失败数"""
+    counts = {"users": 0, "updated": 0, "failed": 0}
+    page = 1
+    while True:
+        users = _list_users_page(client, page, per_page)
+        if not users:
+            break
+        counts["users"] += len(users)
+        emails = {str(user.id): UserEmailIndex.normalize(user.email) or None for user in users}
+        response = client.table("user_profiles")\
+            .select("id, email")\
+            .in_("id", list(emails))\
+            .execute()
+        # 没有资料行的用户（如注册触发器失败）跳过
+        for row in response.data or []:
+            user_id = str(row["id"])
+            if row.get("email") == emails[user_id]:
+                continue
+            try:
+                client.table("user_profiles").update({"email": emails[user_id]}).eq("id", user_id).execute()
+                counts["updated"] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                logger.error(f"Failed to sync email for user {user_id}: {e}")
+        if len(users) < per_page:
+            break
+        page += 1
+    return counts
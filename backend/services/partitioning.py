@@ -0,0 +1,245 @@
+"""
+按月范围分区表的维护
+ad_spend_daily、daily_reports 经 009 迁移改为按日期列的月度范围分区，分区名为 <表名>_pYYYYMM，
+另有 <表名>_default 兜底分区接收尚未建分区月份的数据：
+- 预建当月至未来若干月的分区（应用启动与定时任务调用），兜底分区中已落入该月的数据随之移入新分区
+- 早于保留期的分区导出为 gzip 压缩的 CSV 后分离删除，需要时可从归档文件恢复为分区
+"""
+import gzip
+import logging
+import os
+import re
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from backend.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# 分区表 -> 分区键
+PARTITIONED_TABLES: Dict[str, str] = {
+    "ad_spend_daily": "date",
+    "daily_reports": "report_date",
+}
+
+# 多个进程同时补建分区时以事务级咨询锁串行执行
+_ENSURE_LOCK_KEY = 0x50415254
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def iter_months(start: date, end: date) -> Iterator[date]:
+    """start 与 end 所在月份之间（含两端）每月的第一天"""
+    month = month_start(start)
+    while month <= end:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def parse_partition_month(table: str, name: str) -> Optional[date]:
+    """从分区名（或归档文件名）解析月份，不是该表的月度分区时返回 None"""
+    match = re.fullmatch(rf"{re.escape(table)}_p(\d{{4}})(\d{{2}})(?:\.csv\.gz)?", name)
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def _partition_key(table: str) -> str:
+    try:
+        return PARTITIONED_TABLES[table]
+    except KeyError:
+        raise ValueError(f"{table} 不是按月分区表") from None
+
+
+def _bounds(month: date) -> str:
+    return f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+
+
+def _in_month(table: str, month: date) -> str:
+    key = _partition_key(table)
+    return f"{key} >= '{month.isoformat()}' AND {key} < '{add_months(month, 1).isoformat()}'"
+
+
+def _exists(connection: Connection, relation: str) -> bool:
+    return connection.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": relation}).scalar()
+
+
+def _data_columns(connection: Connection, table: str) -> str:
+    """可写入的列（生成列除外），用于搬迁、导出与导入"""
+    return connection.execute(text("""
+        SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) FROM pg_attribute
+        WHERE attrelid = to_regclass(:table) AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+    """), {"table": table}).scalar()
+
+
+def is_partitioned(connection: Connection, table: str) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"
+    ), {"table": table}).scalar()
+
+
+def list_partitions(connection: Connection, table: str) -> List[date]:
+    """已挂载的月度分区月份，按时间升序"""
+    names = connection.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:table)
+    """), {"table": table}).scalars()
+    return sorted(month for month in (parse_partition_month(table, name) for name in names) if month)
+
+
+def create_month_partition(connection: Connection, table: str, month: date) -> bool:
+    """建立指定月份的分区，已存在时返回 False"""
+    month = month_start(month)
+    name = partition_name(table, month)
+    if _exists(connection, name):
+        return False
+
+    default = f"{table}_default"
+    in_month = _in_month(table, month)
+    stray = _exists(connection, default) and connection.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_month})")
+    ).scalar()
+    if not stray:
+        connection.execute(text(f"CREATE TABLE {name} PARTITION OF {table} {_bounds(month)}"))
+        return True
+
+    # 兜底分区已有该月数据时不能直接建分区：先分离兜底分区，建分区后把数据搬入再挂回
+    columns = _data_columns(connection, table)
+    connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    connection.execute(text(f"CREATE TABLE {name} PARTITION OF {table} {_bounds(month)}"))
+    moved = connection.execute(text(
+        f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {default} WHERE {in_month}"
+    )).rowcount
+    connection.execute(text(f"DELETE FROM {default} WHERE {in_month}"))
+    connection.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+    logger.warning(f"Moved {moved} rows of {month:%Y-%m} from {default} into {name}")
+    return True
+
+
+def ensure_partitions(
+    connection: Connection, months_ahead: Optional[int] = None, today: Optional[date] = None
+) -> List[str]:
+    """为各分区表补建当月至未来 months_ahead 个月的分区，返回新建的分区名；调用方负责提交事务"""
+    if connection.dialect.name != "postgresql":
+        return []
+    if months_ahead is None:
+        months_ahead = get_settings().partition_months_ahead
+    current = month_start(today or date.today())
+
+    connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ENSURE_LOCK_KEY})
+    created = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(connection, table):
+            continue
+        for month in iter_months(current, add_months(current, months_ahead)):
+            if create_month_partition(connection, table, month):
+                created.append(partition_name(table, month))
+    if created:
+        logger.info(f"Created partitions: {', '.join(created)}")
+    return created
+
+
+def archive_partition(
+    connection: Connection, table: str, month: date, directory: Union[str, Path, None] = None
+) -> Path:
+    """把指定月份的分区导出为 <分区名>.csv.gz，随后分离并删除该分区，返回归档文件路径
+
+    导出期间以 SHARE 锁阻止写入该分区，父表与其他分区的读写不受影响；
+    分离分区需要父表的排他锁，放在导出完成之后，持锁时间与数据量无关。
+    """
+    _partition_key(table)
+    month = month_start(month)
+    name = partition_name(table, month)
+    if not _exists(connection, name):
+        raise ValueError(f"分区 {name} 不存在")
+
+    root = Path(directory or get_settings().partition_archive_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    path = root / f"{name}.csv.gz"
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+    columns = _data_columns(connection, table)
+    connection.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+    cursor = connection.connection.cursor()
+    try:
+        with gzip.open(tmp_path, "wb") as fileobj:
+            cursor.copy_expert(f"COPY {name} ({columns}) TO STDOUT WITH (FORMAT csv, HEADER)", fileobj)
+        os.replace(tmp_path, path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        cursor.close()
+
+    attached = connection.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(:name))"), {"name": name}
+    ).scalar()
+    if attached:
+        connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+    connection.execute(text(f"DROP TABLE {name}"))
+    logger.info(f"Archived partition {name} to {path}")
+    return path
+
+
+def archive_expired(
+    connection: Connection,
+    retention_months: Optional[int] = None,
+    directory: Union[str, Path, None] = None,
+    today: Optional[date] = None,
+) -> List[Path]:
+    """归档早于保留期（当月往前 retention_months 个月）的全部月度分区"""
+    if retention_months is None:
+        retention_months = get_settings().partition_retention_months
+    cutoff = add_months(month_start(today or date.today()), -retention_months)
+    archived = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(connection, table):
+            continue
+        for month in list_partitions(connection, table):
+            if month < cutoff:
+                archived.append(archive_partition(connection, table, month, directory))
+    return archived
+
+
+def restore_partition(connection: Connection, table: str, path: Union[str, Path]) -> str:
+    """从归档文件恢复分区：建同结构的表导入数据，再挂载为对应月份的分区，返回分区名"""
+    _partition_key(table)
+    path = Path(path)
+    month = parse_partition_month(table, path.name)
+    if month is None:
+        raise ValueError(f"{path.name} 不是 {table} 的分区归档文件")
+    name = partition_name(table, month)
+    if _exists(connection, name):
+        raise ValueError(f"分区 {name} 已存在")
+
+    columns = _data_columns(connection, table)
+    connection.execute(text(
+        f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)"
+    ))
+    cursor = connection.connection.cursor()
+    try:
+        with gzip.open(path, "rb") as fileobj:
+            cursor.copy_expert(f"COPY {name} ({columns}) FROM STDIN WITH (FORMAT csv, HEADER)", fileobj)
+    finally:
+        cursor.close()
+    # 挂载时校验数据均落在该月范围内，并为分区补建父表上的索引
+    connection.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} {_bounds(month)}"))
+    logger.info(f"Restored partition {name} from {path}")
+    return name
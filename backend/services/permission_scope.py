@@ -0,0 +1,239 @@
+"""
+权限数据范围解析
+按用户一次性计算可见的项目 ID 与广告账户 ID 并缓存，列表、统计查询直接按 ID 集合过滤，
+不再为每次查询拼接负责人 / 成员 / 归属的子查询或连接；
+项目负责人、项目成员、账户归属变化提交后按用户、项目递增版本号使缓存失效；
+未配置 Redis 时版本号只在本进程内有效，缓存有效期收紧到 permission_scope_local_cache_ttl，限制撤销授权后其他进程的越权窗口
+"""
+from dataclasses import dataclass
+from typing import Any, FrozenSet, Iterable, List, Set, Tuple
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, delete, event, false, insert, inspect, select
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+
+from core.cache import MISSING, TTLCache, VersionCounter, get_shared_backend
+from core.config import get_settings
+from models.ad_account import AdAccount
+from models.project import Project, ProjectMember
+
+# 按数据范围过滤的角色，其余角色由调用方按各自规则处理（全量或拒绝）
+SCOPED_ROLES = ("account_manager", "media_buyer")
+# ID 数量超过该值时改为写入会话临时表，避免生成超长 IN 列表
+INLINE_ID_LIMIT = 1000
+# 任何无法定位用户 / 项目的变更都会递增该计数器，使所有范围失效
+ALL_SCOPES = "all"
+
+_PENDING_KEY = "permission_scope_changes"
+_STAGED_KEY = "permission_scope_staged"
+
+
+def _scope_cache_ttl(settings: Any, backend: Any) -> int:
+    """权限范围缓存有效期：没有共享版本号时其他进程的撤销通知不到本进程，只能靠短有效期兜底"""
+    if backend is None:
+        return min(settings.permission_scope_cache_ttl, settings.permission_scope_local_cache_ttl)
+    return settings.permission_scope_cache_ttl
+
+
+_shared_backend = get_shared_backend()
+_scope_cache = TTLCache(maxsize=4096, ttl=_scope_cache_ttl(get_settings(), _shared_backend))
+_scope_versions = VersionCounter(backend=_shared_backend, namespace="permission_scope")
+
+# 会话级临时表：大范围 ID 集合在事务内写入一次，查询以子查询关联
+_scope_ids = Table(
+    "tmp_permission_scope_ids",
+    MetaData(),
+    Column("scope_key", String(128), nullable=False),
+    Column("id", Integer, nullable=False),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DELETE ROWS",
+)
+
+
+@dataclass(frozen=True)
+class PermissionScope:
+    """一个用户可见的项目与广告账户 ID 集合"""
+
+    user_id: int
+    role: str
+    project_ids: FrozenSet[int]
+    account_ids: FrozenSet[int]
+    version: str = ""
+
+    def can_access_project(self, project_id: Any) -> bool:
+        return project_id in self.project_ids
+
+    def can_access_account(self, account_id: Any) -> bool:
+        return account_id in self.account_ids
+
+    def project_filter(self, db: Session, column):
+        """``column`` 属于可见项目的过滤条件"""
+        return self._filter(db, column, "project", self.project_ids)
+
+    def account_filter(self, db: Session, column):
+        """``column`` 属于可见广告账户的过滤条件"""
+        return self._filter(db, column, "account", self.account_ids)
+
+    def _filter(self, db: Session, column, kind: str, ids: FrozenSet[int]):
+        if not ids:
+            return false()
+        if len(ids) <= INLINE_ID_LIMIT:
+            return column.in_(sorted(ids))
+        scope_key = f"{self.role}:{self.user_id}:{kind}:{self.version}"
+        _stage_ids(db, scope_key, ids)
+        return column.in_(select(_scope_ids.c.id).where(_scope_ids.c.scope_key == scope_key))
+
+
+def _stage_ids(db: Session, scope_key: str, ids: FrozenSet[int]) -> None:
+    """把 ID 集合写入当前事务的临时表，同一事务内重复使用时不再写入"""
+    staged = db.info.setdefault(_STAGED_KEY, set())
+    if scope_key in staged:
+        return
+    connection = db.connection()
+    connection.execute(CreateTable(_scope_ids, if_not_exists=True))
+    connection.execute(delete(_scope_ids).where(_scope_ids.c.scope_key == scope_key))
+    connection.execute(insert(_scope_ids), [{"scope_key": scope_key, "id": value} for value in ids])
+    staged.add(scope_key)
+
+
+def _version_names(user_id: int, project_ids: Iterable[int]) -> List[str]:
+    return [ALL_SCOPES, f"user:{user_id}"] + [f"project:{project_id}" for project_id in sorted(project_ids)]
+
+
+def _scope_token(names: List[str]) -> str:
+    base, extra = names[:2], names[2:]
+    token = _scope_versions.token(base)
+    return f"{token}|{_scope_versions.token(extra)}" if extra else token
+
+
+def _resolve(db: Session, user_id: int, role: str) -> Tuple[FrozenSet[int], FrozenSet[int], List[str]]:
+    if role == "account_manager":
+        project_ids = frozenset(
+            db.execute(select(Project.id).where(Project.account_manager_id == user_id)).scalars()
+        )
+        account_ids = frozenset(
+            db.execute(select(AdAccount.id).where(AdAccount.project_id.in_(sorted(project_ids)))).scalars()
+        ) if project_ids else frozenset()
+        # 账户进出所管项目时按项目失效
+        return project_ids, account_ids, _version_names(user_id, project_ids)
+
+    project_ids = frozenset(
+        db.execute(select(ProjectMember.project_id).where(ProjectMember.user_id == user_id)).scalars()
+    )
+    account_ids = frozenset(
+        db.execute(select(AdAccount.id).where(AdAccount.assigned_user_id == user_id)).scalars()
+    )
+    return project_ids, account_ids, _version_names(user_id, ())
+
+
+def get_permission_scope(db: Session, user_id: int, role: str) -> PermissionScope:
+    """获取用户的数据范围，仅适用于 SCOPED_ROLES 中的角色"""
+    if role not in SCOPED_ROLES:
+        raise ValueError(f"角色 {role} 不按数据范围过滤")
+
+    cache_key = (role, user_id)
+    entry = _scope_cache.get(cache_key)
+    if entry is not MISSING:
+        names, token, scope = entry
+        if _scope_token(names) == token:
+            return scope
+
+    # 先取用户级版本再计算，计算期间发生的变更会使本次结果在下次读取时失效
+    base_names = _version_names(user_id, ())
+    base_token = _scope_token(base_names)
+    project_ids, account_ids, names = _resolve(db, user_id, role)
+    extra = names[len(base_names):]
+    token = f"{base_token}|{_scope_versions.token(extra)}" if extra else base_token
+    scope = PermissionScope(user_id, role, project_ids, account_ids, version=token)
+    _scope_cache.set(cache_key, (names, token, scope))
+    return scope
+
+
+def invalidate_permission_scopes(user_ids: Iterable[Any] = (), project_ids: Iterable[Any] = ()) -> None:
+    """递增相关用户、项目的版本号；不指定时使所有范围失效"""
+    names = {f"user:{user_id}" for user_id in user_ids} | {f"project:{project_id}" for project_id in project_ids}
+    _scope_versions.bump(names or [ALL_SCOPES])
+
+
+# ---------------------------------------------------------------------------
+# 写入驱动的失效：flush 时收集受影响的用户与项目，提交后统一递增版本
+# ---------------------------------------------------------------------------
+
+_TRACKED_ATTRS = {
+    Project: ("account_manager_id",),
+    ProjectMember: ("user_id", "project_id"),
+    AdAccount: ("assigned_user_id", "project_id"),
+}
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+# 修改归属时即使属性已过期也加载旧值，保证原用户 / 项目同样失效
+for _model, _attrs in _TRACKED_ATTRS.items():
+    for _attr in _attrs:
+        event.listen(getattr(_model, _attr), "set", _load_previous_value, active_history=True, retval=True)
+
+
+def _history_values(obj: Any, attr: str) -> List[Any]:
+    history = inspect(obj).attrs[attr].history
+    values = list(history.added or ()) + list(history.deleted or ()) + list(history.unchanged or ())
+    return [value for value in values if value is not None]
+
+
+def _collect_changes(session: Session) -> Set[str]:
+    names: Set[str] = set()
+    candidates = [(obj, False) for obj in list(session.new) + list(session.deleted)]
+    candidates += [(obj, True) for obj in session.dirty]
+    for obj, dirty in candidates:
+        attrs = _TRACKED_ATTRS.get(type(obj))
+        if attrs is None:
+            continue
+        state = inspect(obj)
+        if dirty and not any(state.attrs[attr].history.has_changes() for attr in attrs):
+            continue
+
+        if isinstance(obj, Project):
+            user_ids = _history_values(obj, "account_manager_id")
+            project_ids = [obj.id] if obj in session.deleted and obj.id is not None else []
+        elif isinstance(obj, ProjectMember):
+            user_ids, project_ids = _history_values(obj, "user_id"), []
+        else:
+            user_ids, project_ids = _history_values(obj, "assigned_user_id"), _history_values(obj, "project_id")
+
+        if not (user_ids or project_ids):
+            # 无法定位受影响的范围
+            names.add(ALL_SCOPES)
+        names.update(f"user:{user_id}" for user_id in user_ids)
+        names.update(f"project:{project_id}" for project_id in project_ids)
+    return names
+
+
+@event.listens_for(Session, "after_flush")
+def _track_scope_changes(session: Session, _flush_context) -> None:
+    names = _collect_changes(session)
+    if names:
+        session.info.setdefault(_PENDING_KEY, set()).update(names)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _track_bulk_scope_changes(context) -> None:
+    # 批量 update/delete 无法逐行定位，按全量失效处理
+    if context.mapper.class_ in _TRACKED_ATTRS:
+        context.session.info.setdefault(_PENDING_KEY, set()).add(ALL_SCOPES)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_scope_invalidation(session: Session) -> None:
+    session.info.pop(_STAGED_KEY, None)
+    names = session.info.pop(_PENDING_KEY, None)
+    if names:
+        _scope_versions.bump(names)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_scope_changes(session: Session) -> None:
+    session.info.pop(_STAGED_KEY, None)
+    session.info.pop(_PENDING_KEY, None)
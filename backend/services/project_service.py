@@ -6,10 +6,10 @@ Author: Claude协作开发
 
 from datetime import date, datetime
 from decimal import Decimal
-from typing import List, Optional, Dict, Any
+from typing import Iterable, List, Optional, Dict, Any
 
-from sqlalchemy import and_, or_, func, desc, asc
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, or_, func, desc, asc, select
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy.exc import IntegrityError
 
 from core.response import success_response, error_response, paginated_response
@@ -19,8 +19,10 @@ from exceptions.custom_exceptions import (
     PermissionDeniedError,
     ResourceConflictError
 )
+from models.ad_account import AdAccount
 from models.project import Project, ProjectMember, ProjectExpense
 from models.user import User
+from services.permission_scope import SCOPED_ROLES, get_permission_scope
 from schemas.project import (
     ProjectCreateRequest,
     ProjectUpdateRequest,
@@ -29,6 +31,10 @@ from schemas.project import (
 )
 
 
+# 项目详情可按需附带的关联数据
+PROJECT_INCLUDES = ("members", "expenses")
+
+
 class ProjectService:
     """项目管理服务类"""
 
@@ -108,26 +114,47 @@ class ProjectService:
 
         return projects, total
 
-    def get_project(self, project_id: int, current_user: User) -> Project:
-        """获取项目详情"""
-        project = self.db.query(Project).options(
+    def get_project(
+        self,
+        project_id: int,
+        current_user: User,
+        include: Iterable[str] = ()
+    ) -> Project:
+        """获取项目详情
+
+        账户数、活跃账户数与总费用由标量子查询随项目一次取回；
+        成员与费用明细仅在 include 中指定时加载
+        """
+        include = set(include)
+        unknown = include.difference(PROJECT_INCLUDES)
+        if unknown:
+            raise BusinessLogicError(f"不支持的关联数据: {', '.join(sorted(unknown))}")
+
+        options = [
             joinedload(Project.account_manager),
-            joinedload(Project.creator),
-            joinedload(Project.members),
-            joinedload(Project.expenses)
+            joinedload(Project.creator)
+        ]
+        if "members" in include:
+            options.append(selectinload(Project.members).joinedload(ProjectMember.user))
+        if "expenses" in include:
+            options.append(selectinload(Project.expenses).joinedload(ProjectExpense.creator))
+
+        row = self.db.query(Project, *self._project_aggregates()).options(
+            *options
         ).filter(Project.id == project_id).first()
 
-        if not project:
+        if not row:
             raise ResourceNotFoundError(f"项目 {project_id} 不存在")
+        project, total_accounts, active_accounts, total_spent = row
 
         # 检查权限
         if not self._can_user_access_project(current_user, project):
             raise PermissionDeniedError("无权限查看该项目")
 
-        # 计算统计信息
-        project.total_accounts = len(project.ad_accounts) if hasattr(project, 'ad_accounts') else 0
-        project.active_accounts = len([a for a in project.ad_accounts if hasattr(a, 'status') and a.status == 'active']) if hasattr(project, 'ad_accounts') else 0
-        project.total_spent = sum(e.amount for e in project.expenses) if hasattr(project, 'expenses') else 0
+        # 统计信息
+        project.total_accounts = total_accounts or 0
+        project.active_accounts = active_accounts or 0
+        project.total_spent = Decimal(str(total_spent or 0))
 
         return project
 
@@ -178,7 +205,7 @@ class ProjectService:
         project = self.get_project(project_id, current_user)
 
         # 检查是否可以删除（有关联的账户等）
-        if hasattr(project, 'ad_accounts') and len(project.ad_accounts) > 0:
+        if project.total_accounts > 0:
             raise BusinessLogicError("项目下还有广告账户，无法删除")
 
         # 删除相关记录
@@ -352,18 +379,27 @@ class ProjectService:
         return result
 
     # 私有方法
+    @staticmethod
+    def _project_aggregates():
+        """项目账户数、活跃账户数与总费用的关联标量子查询"""
+        accounts = select(func.count(AdAccount.id)).where(AdAccount.project_id == Project.id)
+        spent = select(func.coalesce(func.sum(ProjectExpense.amount), 0)).where(
+            ProjectExpense.project_id == Project.id
+        )
+        return (
+            accounts.scalar_subquery().label("total_accounts"),
+            accounts.where(AdAccount.status == "active").scalar_subquery().label("active_accounts"),
+            spent.scalar_subquery().label("total_spent"),
+        )
+
     def _apply_permission_filter(self, query, current_user: User):
         """应用权限过滤"""
-        if current_user.role == "admin":
-            return query
-        elif current_user.role == "account_manager":
-            return query.filter(Project.account_manager_id == current_user.id)
-        elif current_user.role == "media_buyer":
-            # 投手只能看到自己参与的项目
-            return query.join(ProjectMember).filter(ProjectMember.user_id == current_user.id)
-        else:
-            # finance和data_operator可以查看所有项目
-            return query
+        if current_user.role in SCOPED_ROLES:
+            # 账户管理员看自己负责的项目，投手只能看到自己参与的项目
+            scope = get_permission_scope(self.db, current_user.id, current_user.role)
+            return query.filter(scope.project_filter(self.db, Project.id))
+        # admin、finance和data_operator可以查看所有项目
+        return query
 
     def _can_user_access_project(self, user: User, project: Project) -> bool:
         """检查用户是否可以访问项目"""
@@ -372,7 +408,7 @@ class ProjectService:
         elif user.role == "account_manager":
             return project.account_manager_id == user.id
         elif user.role == "media_buyer":
-            return any(m.user_id == user.id for m in project.members)
+            return get_permission_scope(self.db, user.id, user.role).can_access_project(project.id)
         else:
             return True  # finance和data_operator可以查看所有项目
 
@@ -0,0 +1,298 @@
+"""
+报表结果缓存
+按 (报表类型, 规范化参数, 数据范围) 缓存报表结果，
+AdSpendDaily / Ledger / Reconciliation 写入提交后按项目、月份递增版本号使旧结果失效，
+广告账户改挂项目或删除时新旧项目的报表整体失效
+"""
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from backend.core.cache import MISSING, TTLCache, VersionCounter, get_shared_backend
+from backend.core.config import get_settings
+from backend.core.security import AuthenticatedUser
+from backend.models import AdAccount, AdSpendDaily, Ledger, Reconciliation
+
+logger = logging.getLogger(__name__)
+
+# 可查看全部报表数据的角色共享同一缓存范围
+GLOBAL_SCOPE_ROLES = {"admin", "manager", "finance"}
+# 有界日期区间超过该月数时退化为按范围整体失效
+MAX_MONTH_KEYS = 24
+
+_PENDING_KEY = "report_cache_changes"
+
+ChangeKey = Tuple[Optional[UUID], Optional[date]]
+
+
+def _month(value: date) -> str:
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def _months_between(start: date, end: date) -> List[str]:
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{year:04d}-{month:02d}")
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return months
+
+
+def _etag_for(data: Any) -> str:
+    payload = json.dumps(data, sort_keys=True, default=str, separators=(",", ":"))
+    return '"' + hashlib.sha1(payload.encode("utf-8")).hexdigest() + '"'
+
+
+@dataclass
+class ReportLookup:
+    """一次缓存查询的结果，命中时 data 为缓存值，否则为 MISSING"""
+
+    key: str
+    token: str
+    data: Any = MISSING
+    etag: Optional[str] = None
+
+    @property
+    def hit(self) -> bool:
+        return self.data is not MISSING
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """判断客户端 If-None-Match 是否与当前 ETag 一致"""
+        if not if_none_match or self.etag is None:
+            return False
+        candidates = [item.strip() for item in if_none_match.split(",")]
+        return "*" in candidates or self.etag in candidates or f"W/{self.etag}" in candidates
+
+
+@dataclass
+class ReportCache:
+    """报表缓存：进程内 LRU+TTL 为一级缓存，配置 Redis 时作为共享二级缓存"""
+
+    maxsize: int = 512
+    ttl: float = 300
+    backend: Any = None
+    local: TTLCache = field(init=False)
+    versions: VersionCounter = field(init=False)
+
+    def __post_init__(self):
+        self.local = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+        self.versions = VersionCounter(backend=self.backend, namespace="report")
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @staticmethod
+    def scope_for(user: AuthenticatedUser) -> str:
+        """调用方的数据范围：全局角色共享缓存，其余按用户隔离"""
+        if (user.role or "").lower() in GLOBAL_SCOPE_ROLES:
+            return "global"
+        return f"user:{user.id}"
+
+    @staticmethod
+    def version_names(
+        project_id: Optional[UUID], start: Optional[date], end: Optional[date]
+    ) -> List[str]:
+        """报表结果依赖的版本计数器名称"""
+        scope = f"project:{project_id}" if project_id else "all"
+        if start and end and start <= end:
+            months = _months_between(start, end)
+            if len(months) <= MAX_MONTH_KEYS:
+                return ["unscoped", scope] + [f"{scope}:{month}" for month in months]
+        return ["unscoped", f"{scope}:any"]
+
+    @staticmethod
+    def bump_names(changes: Iterable[ChangeKey]) -> Set[str]:
+        """写入变更对应需要递增的计数器名称"""
+        names: Set[str] = set()
+        for project_id, day in changes:
+            scopes = ["all"] + ([f"project:{project_id}"] if project_id else [])
+            for scope in scopes:
+                names.add(f"{scope}:any")
+                # 无法确定日期的变更（如流水金额调整）使该范围所有月份失效
+                names.add(f"{scope}:{_month(day)}" if day else scope)
+            if project_id is None:
+                # 无法归属项目的变更使所有报表缓存失效
+                names.add("unscoped")
+        return names
+
+    def build_key(
+        self,
+        report: str,
+        user: AuthenticatedUser,
+        *,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        project_id: Optional[UUID] = None,
+    ) -> str:
+        """规范化参数生成缓存键"""
+        return "|".join(
+            [
+                report,
+                self.scope_for(user),
+                start.isoformat() if start else "-",
+                end.isoformat() if end else "-",
+                str(project_id) if project_id else "-",
+            ]
+        )
+
+    def lookup(
+        self,
+        report: str,
+        user: AuthenticatedUser,
+        *,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        project_id: Optional[UUID] = None,
+    ) -> ReportLookup:
+        key = self.build_key(report, user, start=start, end=end, project_id=project_id)
+        token = self.versions.token(self.version_names(project_id, start, end))
+        result = ReportLookup(key=key, token=token)
+        if not self.enabled:
+            return result
+
+        entry = self.local.get(key)
+        if entry is MISSING and self.backend is not None:
+            entry = self.backend.get_json(f"report:{key}")
+            if entry is not MISSING:
+                self.local.set(key, entry)
+        if entry is not MISSING and entry["token"] == token:
+            result.data = entry["data"]
+            result.etag = entry["etag"]
+        return result
+
+    def store(self, lookup: ReportLookup, data: Any, cache: bool = True) -> ReportLookup:
+        """写入计算结果并补全 ETag；cache 为 False 时只补全 ETag，不写入缓存"""
+        lookup.data = data
+        lookup.etag = _etag_for(data)
+        if self.enabled and cache:
+            entry = {"token": lookup.token, "data": data, "etag": lookup.etag}
+            self.local.set(lookup.key, entry)
+            if self.backend is not None:
+                self.backend.set_json(f"report:{lookup.key}", entry, self.ttl)
+        return lookup
+
+    def invalidate(self, changes: Iterable[ChangeKey]) -> None:
+        """按 (项目, 日期) 变更递增版本号"""
+        self.versions.bump(self.bump_names(changes))
+
+    def clear(self) -> None:
+        self.local.clear()
+
+
+def _build_report_cache() -> ReportCache:
+    settings = get_settings()
+    return ReportCache(
+        maxsize=settings.report_cache_max_entries,
+        ttl=settings.report_cache_ttl,
+        backend=get_shared_backend(),
+    )
+
+
+report_cache = _build_report_cache()
+
+
+# ---------------------------------------------------------------------------
+# 写入驱动的失效：flush 时收集受影响的 (项目, 日期)，提交后统一递增版本
+# ---------------------------------------------------------------------------
+
+def _history_values(obj: Any, attr: str) -> List[Any]:
+    history = inspect(obj).attrs[attr].history
+    values = list(history.added or ()) + list(history.deleted or ()) + list(history.unchanged or ())
+    return [value for value in values if value is not None]
+
+
+def _collect_changes(session: Session) -> Set[ChangeKey]:
+    changes: Set[ChangeKey] = set()
+    spend_accounts: Dict[Any, Set[Optional[date]]] = {}
+    spend_ids: Set[Any] = set()
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, AdSpendDaily):
+            days = _history_values(obj, "date") or [None]
+            account_ids = _history_values(obj, "ad_account_id")
+            if not account_ids:
+                # 属性已过期未加载，无法定位账户
+                changes.add((None, None))
+            for account_id in account_ids:
+                spend_accounts.setdefault(account_id, set()).update(days)
+        elif isinstance(obj, Ledger):
+            project_ids = _history_values(obj, "project_id") or [None]
+            changes.update((project_id, None) for project_id in project_ids)
+        elif isinstance(obj, AdAccount):
+            # 新建账户尚无消耗；改挂项目或删除时新旧项目的报表都受影响
+            if obj in session.new:
+                continue
+            if obj in session.deleted or inspect(obj).attrs["project_id"].history.has_changes():
+                project_ids = _history_values(obj, "project_id") or [None]
+                changes.update((project_id, None) for project_id in project_ids)
+        elif isinstance(obj, Reconciliation):
+            daily_spend_ids = _history_values(obj, "daily_spend_id")
+            if not daily_spend_ids:
+                changes.add((None, None))
+            spend_ids.update(daily_spend_ids)
+
+    if spend_ids:
+        rows = session.connection().execute(
+            select(AdSpendDaily.ad_account_id, AdSpendDaily.date).where(AdSpendDaily.id.in_(spend_ids))
+        ).all()
+        for account_id, day in rows:
+            spend_accounts.setdefault(account_id, set()).add(day)
+        if len(rows) < len(spend_ids):
+            # 关联消耗与对账记录在同一次提交中删除时已查不到消耗行，无法定位项目
+            changes.add((None, None))
+    if spend_accounts:
+        rows = session.connection().execute(
+            select(AdAccount.id, AdAccount.project_id).where(AdAccount.id.in_(list(spend_accounts)))
+        ).all()
+        projects = {account_id: project_id for account_id, project_id in rows}
+        for account_id, days in spend_accounts.items():
+            project_id = projects.get(account_id)
+            changes.update((project_id, day) for day in days)
+    return changes
+
+
+def mark_report_changes(session: Session, changes: Iterable[ChangeKey]) -> None:
+    """登记不经过 ORM flush 的写入（如 Core 批量 upsert），提交后统一失效"""
+    session.info.setdefault(_PENDING_KEY, set()).update(changes)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_report_changes(session: Session, _flush_context) -> None:
+    try:
+        changes = _collect_changes(session)
+    except Exception as e:
+        # 无法解析归属时按全量失效处理，保证不返回过期数据
+        logger.warning(f"Report cache change tracking failed: {e}")
+        changes = {(None, None)}
+    if changes:
+        session.info.setdefault(_PENDING_KEY, set()).update(changes)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _track_bulk_report_changes(context) -> None:
+    # 批量 update/delete 不经过 flush，无法逐行定位，按全量失效处理
+    if context.mapper.class_ in (AdSpendDaily, Ledger, Reconciliation, AdAccount):
+        context.session.info.setdefault(_PENDING_KEY, set()).add((None, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_report_invalidation(session: Session) -> None:
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        report_cache.invalidate(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_report_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
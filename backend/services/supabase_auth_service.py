@@ -12,6 +12,8 @@ from sqlalchemy.orm import Session
 
 from core.supabase_client import supabase_client
 from core.db import get_db
+from core.config import get_settings
+from backend.services.login_history import LoginHistoryWriter, UserEmailIndex
 
 
 class SupabaseAuthService:
@@ -20,6 +22,17 @@ class SupabaseAuthService:
     def __init__(self):
         self.client = supabase_client.supabase
         self.admin_client = supabase_client.get_admin_client()
+        settings = get_settings()
+        self.email_index = UserEmailIndex(
+            self.admin_client,
+            ttl=settings.login_email_cache_ttl,
+            negative_ttl=settings.login_email_negative_ttl
+        )
+        self.login_history_writer = LoginHistoryWriter(
+            self.admin_client,
+            batch_size=settings.log_batch_size,
+            flush_interval=settings.log_flush_interval
+        )
 
     async def register_user(
         self,
@@ -74,6 +87,8 @@ class SupabaseAuthService:
                     detail="注册失败"
                 )
 
+            self.email_index.remember(email, response.user.id)
+
             # 记录注册日志
             await self._record_login(
                 response.user.id,
@@ -450,15 +465,9 @@ class SupabaseAuthService:
         """记录登录历史"""
         try:
             self.admin_client.table("user_login_history")\
-                .insert({
-                    "user_id": user_id,
-                    "email": email,
-                    "login_type": login_type,
-                    "status": status,
-                    "login_time": datetime.now(timezone.utc).isoformat(),
-                    "ip_address": ip_address,
-                    "user_agent": user_agent
-                })\
+                .insert(self._login_history_row(
+                    user_id, login_type, status, email, ip_address, user_agent
+                ))\
                 .execute()
         except Exception:
             pass  # 忽略记录错误
@@ -471,24 +480,38 @@ class SupabaseAuthService:
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None
     ) -> None:
-        """通过邮箱记录登录尝试"""
+        """通过邮箱记录登录尝试，交给后台线程批量写入"""
         try:
-            # 先通过邮箱查找用户
-            users = self.admin_client.auth.admin.list_users()
-            user = next((u for u in users.users if u.email == email), None)
-
-            if user:
-                await self._record_login(
-                    user.id,
-                    login_type,
-                    status,
-                    email=email,
-                    ip_address=ip_address,
-                    user_agent=user_agent
-                )
+            # 按 user_profiles.email 索引查找用户，结果带缓存
+            user_id = self.email_index.lookup(email)
+
+            # user_login_history.user_id 非空，不存在的邮箱不记录
+            if user_id:
+                self.login_history_writer.submit([self._login_history_row(
+                    user_id, login_type, status, email, ip_address, user_agent
+                )])
         except Exception:
             pass
 
+    @staticmethod
+    def _login_history_row(
+        user_id: str,
+        login_type: str,
+        status: str,
+        email: Optional[str] = None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return {
+            "user_id": user_id,
+            "email": email,
+            "login_type": login_type,
+            "status": status,
+            "login_time": datetime.now(timezone.utc).isoformat(),
+            "ip_address": ip_address,
+            "user_agent": user_agent
+        }
+
     async def _update_login_logout(self, user_id: str) -> None:
         """更新登出时间"""
         try:
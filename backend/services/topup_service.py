@@ -33,9 +33,26 @@ from exceptions.custom_exceptions import (
     BusinessLogicError,
     ResourceConflictError
 )
+from core.singleflight import single_flight
+from services import analytics_store
+from services.permission_scope import get_permission_scope
 from utils.id_generator import generate_request_no
 from utils.audit import create_audit_log
 
+# 可查看全部充值申请的角色
+GLOBAL_TOPUP_ROLES = ("admin", "finance", "data_operator")
+
+
+def _dashboard_key(service: "TopupService", current_user: User) -> Tuple[str, date]:
+    """仪表板的数据范围：全局角色共享，账户管理员与投手按用户隔离；跨天后不再合并"""
+    if current_user.role in GLOBAL_TOPUP_ROLES:
+        scope = "global"
+    elif current_user.role in ("account_manager", "media_buyer"):
+        scope = f"{current_user.role}:{current_user.id}"
+    else:
+        scope = "none"
+    return scope, date.today()
+
 
 class TopupService:
     """充值管理服务类"""
@@ -469,7 +486,7 @@ class TopupService:
         avg_processing_time, success_rate = self._calculate_processing_metrics(base_query)
 
         # 获取趋势数据
-        monthly_stats = self._get_monthly_statistics(base_query)
+        monthly_stats = self._get_monthly_statistics(base_query, current_user, start_date, end_date)
         top_projects = self._get_top_projects(base_query)
         top_accounts = self._get_top_accounts(base_query)
 
@@ -497,8 +514,9 @@ class TopupService:
             top_accounts=top_accounts
         )
 
+    @single_flight(key=_dashboard_key)
     def get_dashboard_data(self, current_user: User) -> TopupDashboardResponse:
-        """获取仪表板数据"""
+        """获取仪表板数据，相同数据范围的并发请求合并为一次计算"""
         # 应用权限过滤
         base_query = self.db.query(TopupRequest)
         base_query = self._apply_permission_filter(base_query, current_user)
@@ -746,17 +764,13 @@ class TopupService:
     def _apply_permission_filter(self, query, current_user: User):
         """应用权限过滤"""
         # 管理员和财务可以查看所有
-        if current_user.role in ["admin", "finance", "data_operator"]:
+        if current_user.role in GLOBAL_TOPUP_ROLES:
             return query
 
         # 账户管理员查看自己项目的申请
         if current_user.role == "account_manager":
-            project_ids = (
-                self.db.query(Project.id)
-                .filter(Project.account_manager_id == current_user.id)
-                .subquery()
-            )
-            return query.filter(TopupRequest.project_id.in_(project_ids))
+            scope = get_permission_scope(self.db, current_user.id, current_user.role)
+            return query.filter(scope.project_filter(self.db, TopupRequest.project_id))
 
         # 媒体买家查看自己的申请
         if current_user.role == "media_buyer":
@@ -857,9 +871,49 @@ class TopupService:
 
         return round(avg_processing_time, 2), round(success_rate, 2)
 
-    def _get_monthly_statistics(self, query) -> List[dict]:
-        """获取月度统计"""
-        monthly_data = (
+    def _get_monthly_statistics(
+        self,
+        query,
+        current_user: Optional[User] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> List[dict]:
+        """获取月度统计，长区间且列式副本可用时改查副本"""
+        monthly_data = None
+        if current_user is not None and analytics_store.covers(start_date, end_date):
+            monthly_data = self._get_monthly_statistics_from_store(current_user, start_date, end_date)
+        if monthly_data is None:
+            monthly_data = self._query_monthly_statistics(query)
+
+        return [
+            {
+                "month": f"{int(row.year)}-{int(row.month):02d}",
+                "count": row.count,
+                "amount": float(row.amount) if row.amount else 0
+            }
+            for row in monthly_data
+        ]
+
+    def _get_monthly_statistics_from_store(
+        self, current_user: User, start_date: Optional[date], end_date: Optional[date]
+    ):
+        """在列式副本上按与 _apply_permission_filter 相同的权限范围统计，副本不可用时返回 None"""
+        filters = {}
+        if current_user.role == "account_manager":
+            scope = get_permission_scope(self.db, current_user.id, current_user.role)
+            filters["project_ids"] = scope.project_ids
+        elif current_user.role == "media_buyer":
+            filters["requested_by"] = current_user.id
+        elif current_user.role not in GLOBAL_TOPUP_ROLES:
+            return []
+
+        # 日期边界与 get_statistics 中的主库过滤条件一致
+        start = datetime.combine(start_date, datetime.min.time()) if start_date else None
+        end = datetime.combine(end_date + timedelta(days=1), datetime.min.time()) if end_date else None
+        return analytics_store.topup_monthly_statistics(start, end, **filters)
+
+    def _query_monthly_statistics(self, query):
+        return (
             query
             .with_entities(
                 extract('year', TopupRequest.created_at).label('year'),
@@ -879,15 +933,6 @@ class TopupService:
             .all()
         )
 
-        return [
-            {
-                "month": f"{int(row.year)}-{int(row.month):02d}",
-                "count": row.count,
-                "amount": float(row.amount) if row.amount else 0
-            }
-            for row in monthly_data
-        ]
-
     def _get_top_projects(self, query) -> List[dict]:
         """获取充值金额TOP5项目"""
         top_projects = (
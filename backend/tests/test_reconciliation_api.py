@@ -266,20 +266,20 @@ class TestReconciliationAPI:
         assert "attachment" in response.headers["content-disposition"]
 
     @pytest.mark.asyncio
-    async def test_export_reconciliation_data_pdf(
+    async def test_export_reconciliation_data_csv(
         self, client: AsyncClient, admin_token
     ):
-        """测试导出对账数据为PDF"""
+        """测试导出对账数据为CSV"""
         headers = {"Authorization": f"Bearer {admin_token}"}
         params = {
-            "format_type": "pdf",
+            "format_type": "csv",
             "batch_id": 1
         }
 
         response = await client.get("/api/v1/reconciliations/export", params=params, headers=headers)
 
         assert response.status_code == 200
-        assert response.headers["content-type"] == "application/pdf"
+        assert response.headers["content-type"] == "text/csv; charset=utf-8"
 
     @pytest.mark.asyncio
     async def test_export_reconciliation_data_insufficient_permissions(
@@ -0,0 +1,241 @@
+"""
+导出工具模块
+以 xlsxwriter constant_memory 模式逐行写出 Excel（字符串内联、行数据落临时文件），列宽按样本行估算，
+生成的文件先落到溢出式临时文件再分块输出，内存占用与导出行数无关；
+另提供逐行 CSV 写出与支持 Range 的文件下载响应
+"""
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from io import BytesIO
+from itertools import chain, islice
+from typing import IO, Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+import xlsxwriter
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+
+# 估算列宽使用的样本行数
+WIDTH_SAMPLE_ROWS = 200
+MAX_COLUMN_WIDTH = 50
+# 输出分块大小
+STREAM_CHUNK_SIZE = 64 * 1024
+# 临时文件超过该大小后落盘
+SPOOL_MAX_SIZE = 1024 * 1024
+
+DATE_FORMAT = "yyyy-mm-dd"
+DATETIME_FORMAT = "yyyy-mm-dd hh:mm:ss"
+
+_CELL_TYPES = (str, int, float, Decimal, bool, date, datetime)
+
+# 仅支持单个字节区间，多区间请求按完整文件返回
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _cell_value(value: Any) -> Any:
+    """转换为 xlsxwriter 可直接写入的值"""
+    if value is None or isinstance(value, _CELL_TYPES):
+        return value
+    return str(value)
+
+
+def _column_widths(headers: Sequence[str], sample: List[Mapping[str, Any]]) -> List[int]:
+    widths = []
+    for header in headers:
+        max_length = len(str(header))
+        for row in sample:
+            value = row.get(header)
+            if value is not None:
+                max_length = max(max_length, len(str(value)))
+        widths.append(min(max_length + 2, MAX_COLUMN_WIDTH))
+    return widths
+
+
+def write_xlsx(
+    rows: Iterable[Mapping[str, Any]],
+    fileobj: IO[bytes],
+    sheet_name: str = "Sheet1",
+    headers: Optional[Sequence[str]] = None,
+    sample_size: int = WIDTH_SAMPLE_ROWS,
+) -> int:
+    """把行数据写入 fileobj，返回写出的数据行数
+
+    Args:
+        rows: 行数据，可以是生成器，只遍历一次
+        fileobj: 可写的二进制文件对象
+        sheet_name: 工作表名称
+        headers: 列名，默认取第一行的键
+        sample_size: 估算列宽使用的样本行数
+    """
+    iterator = iter(rows)
+    sample = list(islice(iterator, sample_size))
+    if headers is None:
+        headers = list(sample[0].keys()) if sample else []
+
+    workbook = xlsxwriter.Workbook(
+        fileobj,
+        {
+            "constant_memory": True,
+            "remove_timezone": True,
+            # 导出内容按原样写入，不把以 = 开头的文本当作公式
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        },
+    )
+    date_format = workbook.add_format({"num_format": DATE_FORMAT})
+    datetime_format = workbook.add_format({"num_format": DATETIME_FORMAT})
+    worksheet = workbook.add_worksheet(sheet_name)
+    for index, width in enumerate(_column_widths(headers, sample)):
+        worksheet.set_column(index, index, width)
+
+    worksheet.write_row(0, 0, list(headers))
+    count = 0
+    for count, row in enumerate(chain(sample, iterator), start=1):
+        for column, header in enumerate(headers):
+            value = _cell_value(row.get(header))
+            if value is None:
+                continue
+            if isinstance(value, datetime):
+                worksheet.write_datetime(count, column, value, datetime_format)
+            elif isinstance(value, date):
+                worksheet.write_datetime(count, column, value, date_format)
+            else:
+                worksheet.write(count, column, value)
+    workbook.close()
+    return count
+
+
+def stream_xlsx(
+    rows: Iterable[Mapping[str, Any]],
+    sheet_name: str = "Sheet1",
+    headers: Optional[Sequence[str]] = None,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    spool_max_size: int = SPOOL_MAX_SIZE,
+) -> Iterator[bytes]:
+    """生成 Excel 文件并按块输出"""
+    with tempfile.SpooledTemporaryFile(max_size=spool_max_size) as buffer:
+        write_xlsx(rows, buffer, sheet_name=sheet_name, headers=headers)
+        buffer.seek(0)
+        while True:
+            chunk = buffer.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def xlsx_streaming_response(
+    rows: Iterable[Mapping[str, Any]],
+    filename: str,
+    sheet_name: str = "Sheet1",
+    headers: Optional[Sequence[str]] = None,
+) -> StreamingResponse:
+    """以附件形式流式返回 Excel 文件"""
+    return StreamingResponse(
+        stream_xlsx(rows, sheet_name=sheet_name, headers=headers),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+
+def write_csv(
+    rows: Iterable[Mapping[str, Any]],
+    fileobj: IO[bytes],
+    headers: Optional[Sequence[str]] = None,
+) -> int:
+    """把行数据逐行写入 fileobj（UTF-8 带 BOM，便于 Excel 识别中文），返回写出的数据行数"""
+    iterator = iter(rows)
+    if headers is None:
+        first = next(iterator, None)
+        headers = list(first.keys()) if first is not None else []
+        if first is not None:
+            iterator = chain([first], iterator)
+
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        writer = csv.writer(text)
+        writer.writerow(headers)
+        count = 0
+        for count, row in enumerate(iterator, start=1):
+            writer.writerow([_csv_value(row.get(header)) for header in headers])
+        text.flush()
+    finally:
+        # 不随包装器关闭底层文件
+        text.detach()
+    return count
+
+
+def _iter_file_range(path: str, start: int, end: int, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, "rb") as fileobj:
+        fileobj.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fileobj.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_download_response(
+    path: str,
+    filename: str,
+    media_type: str,
+    range_header: Optional[str] = None,
+) -> Response:
+    """以附件形式返回文件，支持单区间 Range 请求（206）以便断点续传"""
+    size = os.path.getsize(path)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename={filename}",
+    }
+    match = _RANGE_PATTERN.match(range_header.strip()) if range_header else None
+    if match is None or match.group(1) == match.group(2) == "":
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # bytes=-N 表示最后 N 个字节
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or start > end:
+        return Response(
+            status_code=416,
+            headers={**headers, "Content-Range": f"bytes */{size}"},
+        )
+    return StreamingResponse(
+        _iter_file_range(path, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers={
+            **headers,
+            "Content-Range": f"bytes {start}-{end}/{size}",
+            "Content-Length": str(end - start + 1),
+        },
+    )
+
+
+def export_to_excel(data: List[Dict[str, Any]], sheet_name: str = "Sheet1") -> bytes:
+    """把少量数据导出为 Excel 字节串"""
+    output = BytesIO()
+    write_xlsx(data, output, sheet_name=sheet_name)
+    return output.getvalue()
@@ -2,29 +2,77 @@
 ID生成器工具
 Version: 1.0
 Author: Claude协作开发
+
+单号格式：PREFIX + YYYYMMDDHHMMSS + 4位主机号 + 7位进程号 + 6位序号，例如 TOP2025111214304500420031337000017
+- 主机号取 settings.id_node_id（每台主机 / 每个容器配置一个），未配置时取主机名哈希后4位
+- 进程号区分同一主机上的多个 worker：uvicorn --workers / gunicorn 的 worker 继承同一配置，
+  但进程号在主机内唯一；fork 后在子进程中重新取进程号并从 0 计数
+- 序号为进程内单调递增计数器（itertools.count 的 next 在 GIL 下原子执行，无需加锁），
+  不按秒归零，同一进程同一秒内超过百万个单号或主机号重复时才可能冲突
 """
+import itertools
+import os
+import socket
+import time
+import zlib
+from typing import Optional, Tuple
 
-from datetime import datetime
+from backend.core.config import get_settings
 
+HOST_DIGITS = 4
+# Linux pid_max 上限为 4194304
+WORKER_DIGITS = 7
+SEQUENCE_DIGITS = 6
 
-def generate_request_no(prefix: str) -> str:
-    """生成申请单号"""
-    """
-    生成格式：PREFIX + YYYYMMDD + HHMMSS + 3位随机数
-    例如：TOP20251112143045001
-    """
-    now = datetime.now()
-    timestamp = now.strftime("%Y%m%d%H%M%S")
+_HOST_MODULUS = 10 ** HOST_DIGITS
+_WORKER_MODULUS = 10 ** WORKER_DIGITS
+_SEQUENCE_MODULUS = 10 ** SEQUENCE_DIGITS
+
+
+def _default_host_id() -> int:
+    # 容器内进程号都很小、各副本相同，主机名（容器 ID）才能区分副本；哈希仍可能重复，多副本部署应显式配置
+    return zlib.crc32(socket.gethostname().encode("utf-8"))
+
+
+class RequestNoGenerator:
+    """按 时间戳 + 主机号 + 进程号 + 序号 生成单号"""
+
+    def __init__(self, node_id: Optional[int] = None):
+        self._configured_host = node_id
+        self._reset()
 
-    # 使用微秒的后3位作为随机数
-    random_suffix = str(now.microsecond)[-3:].zfill(3)
+    def _reset(self) -> None:
+        host = self._configured_host if self._configured_host is not None else _default_host_id()
+        self.node = f"{host % _HOST_MODULUS:0{HOST_DIGITS}d}{os.getpid() % _WORKER_MODULUS:0{WORKER_DIGITS}d}"
+        self._counter = itertools.count()
+        # (秒, 格式化后的时间戳)，整体替换，读写无需加锁
+        self._second: Tuple[int, str] = (-1, "")
 
-    return f"{prefix}{timestamp}{random_suffix}"
+    def _timestamp(self) -> str:
+        now = int(time.time())
+        second, text = self._second
+        if second != now:
+            text = time.strftime("%Y%m%d%H%M%S", time.localtime(now))
+            self._second = (now, text)
+        return text
+
+    def __call__(self, prefix: str) -> str:
+        sequence = next(self._counter) % _SEQUENCE_MODULUS
+        return f"{prefix}{self._timestamp()}{self.node}{sequence:0{SEQUENCE_DIGITS}d}"
+
+
+_generator = RequestNoGenerator(get_settings().id_node_id)
+
+if hasattr(os, "register_at_fork"):
+    # 预加载后 fork 的工作进程继承了父进程的计数器，需按自己的进程号重新生成节点段
+    os.register_at_fork(after_in_child=_generator._reset)
+
+
+def generate_request_no(prefix: str) -> str:
+    """生成申请单号"""
+    return _generator(prefix)
 
 
 def generate_transaction_no() -> str:
     """生成交易流水号"""
-    """
-    生成格式：TXN + YYYYMMDD + HHMMSS + 3位随机数
-    """
-    return generate_request_no("TXN")
\ No newline at end of file
+    return generate_request_no("TXN")
@@ -97,6 +97,35 @@ def run_performance_tests(verbose=False):
     return run_command(cmd, "性能测试")
 
 
+def run_benchmark_tests(verbose=False, output=None, baseline=None, threshold=10.0):
+    """运行基准测试，结果写入 JSON；指定基线时比对并在回归超过阈值时失败"""
+    output = Path(output or ".benchmarks/latest.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    cmd = ["python", "-m", "pytest", "tests/benchmarks", "--benchmark-only",
+           f"--benchmark-json={output}", "--tb=short"]
+
+    if verbose:
+        cmd.append("-v")
+
+    if not run_command(cmd, "基准测试"):
+        return False
+    if not baseline:
+        return True
+
+    cmd = ["python", "-m", "tests.benchmarks.compare", str(baseline), str(output),
+           "--threshold", str(threshold)]
+    return run_command(cmd, "基准比对")
+
+
+def run_load_tests(baseline=None, threshold=10.0):
+    """准备数据集并启动本地服务，按角色混合流量做负载测试；指定基线时按 p95 比对"""
+    cmd = ["python", "-m", "tests.load.run"]
+    if baseline:
+        cmd.extend(["--baseline", str(baseline), "--threshold", str(threshold)])
+
+    return run_command(cmd, "负载测试")
+
+
 def run_smoke_tests(verbose=False):
     """运行冒烟测试"""
     cmd = ["python", "-m", "pytest", "-m", "smoke"]
@@ -201,7 +230,7 @@ def main():
     parser.add_argument(
         "--type", "-t",
         choices=["unit", "integration", "functional", "security",
-                "performance", "smoke", "database", "all"],
+                "performance", "benchmark", "load", "smoke", "database", "all"],
         default="all",
         help="要运行的测试类型"
     )
@@ -241,6 +270,23 @@ def main():
         help="并行运行的进程数"
     )
 
+    parser.add_argument(
+        "--benchmark-json",
+        help="基准测试结果输出路径，默认 .benchmarks/latest.json"
+    )
+
+    parser.add_argument(
+        "--baseline",
+        help="与之比对的基准或负载测试结果 JSON"
+    )
+
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="基准与负载测试的回归阈值（百分比），默认 10"
+    )
+
     args = parser.parse_args()
 
     # 检查依赖
@@ -267,6 +313,10 @@ def main():
         success = run_security_tests(args.verbose)
     elif args.type == "performance":
         success = run_performance_tests(args.verbose)
+    elif args.type == "benchmark":
+        success = run_benchmark_tests(args.verbose, args.benchmark_json, args.baseline, args.threshold)
+    elif args.type == "load":
+        success = run_load_tests(args.baseline, args.threshold)
     elif args.type == "smoke":
         success = run_smoke_tests(args.verbose)
     elif args.type == "database":
@@ -0,0 +1,5 @@
+"""
+服务热点路径基准测试
+在按固定种子生成的合成数据集上，用 pytest-benchmark 对报表、消耗、账户指标、导出、列式副本与响应序列化等热点路径计时，
+结果保存为 JSON，并可用 compare 命令与基线比对、标记回归。
+"""
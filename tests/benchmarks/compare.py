@@ -0,0 +1,123 @@
+"""
+基准结果比对
+读取 pytest-benchmark 输出的两份 JSON（--benchmark-json）或两份负载测试报告（tests.load），
+按用例比较指定统计量，超过阈值的变慢记为回归。
+
+    python -m tests.benchmarks.compare .benchmarks/baseline.json .benchmarks/latest.json --threshold 10
+
+退出码：0 无回归；1 存在回归；2 两次运行的数据集不同，结果不可比
+"""
+import argparse
+import json
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+STATS = ("min", "max", "mean", "median", "iqr", "stddev", "ops")
+# 只有负载测试报告包含的延迟分位
+PERCENTILES = ("p90", "p95", "p99")
+
+
+@dataclass
+class Comparison:
+    name: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        """相对基线的变化百分比，正数表示变慢"""
+        if not self.baseline:
+            return 0.0
+        return (self.current - self.baseline) / self.baseline * 100
+
+
+def load_results(path: Path) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _stats_by_name(results: Dict[str, Any], stat: str) -> Dict[str, float]:
+    values = {}
+    for bench in results.get("benchmarks", []):
+        value = bench["stats"].get(stat)
+        if value is None:
+            continue
+        # ops 越大越快，取倒数后与时间类统计量同向比较
+        values[bench["fullname"]] = 1 / value if stat == "ops" and value else value
+    return values
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], stat: str = "median") -> Dict[str, Any]:
+    """按用例全名比对，返回各用例的变化及新增、缺失的用例"""
+    before = _stats_by_name(baseline, stat)
+    after = _stats_by_name(current, stat)
+    return {
+        "comparisons": [Comparison(name, before[name], after[name]) for name in sorted(before.keys() & after.keys())],
+        "added": sorted(after.keys() - before.keys()),
+        "missing": sorted(before.keys() - after.keys()),
+    }
+
+
+def _dataset_mismatch(baseline: Dict[str, Any], current: Dict[str, Any]) -> Optional[str]:
+    before = baseline.get("dataset") or {}
+    after = current.get("dataset") or {}
+    if before.get("fingerprint") != after.get("fingerprint") or before.get("database") != after.get("database"):
+        return (
+            f"基线 {before.get('fingerprint')}（{before.get('database')}），"
+            f"本次 {after.get('fingerprint')}（{after.get('database')}）"
+        )
+    return None
+
+
+def _format_seconds(value: float) -> str:
+    if value >= 1:
+        return f"{value:.3f}s"
+    if value >= 1e-3:
+        return f"{value * 1e3:.2f}ms"
+    return f"{value * 1e6:.1f}us"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="比对两次基准测试结果，超过阈值的变慢视为回归")
+    parser.add_argument("baseline", type=Path, help="基线结果 JSON")
+    parser.add_argument("current", type=Path, help="本次结果 JSON")
+    parser.add_argument("--threshold", type=float, default=10.0, help="回归阈值（百分比），默认 10")
+    parser.add_argument("--stat", choices=STATS + PERCENTILES, default="median", help="比较的统计量，默认 median")
+    parser.add_argument("--allow-dataset-mismatch", action="store_true", help="数据集不同时仍然比对")
+    args = parser.parse_args(argv)
+
+    baseline = load_results(args.baseline)
+    current = load_results(args.current)
+    mismatch = _dataset_mismatch(baseline, current)
+    if mismatch:
+        print(f"数据集不一致: {mismatch}")
+        if not args.allow_dataset_mismatch:
+            return 2
+
+    result = compare(baseline, current, args.stat)
+    regressions = []
+    width = max([len(item.name) for item in result["comparisons"]] + [10])
+    print(f"{'用例':<{width - 2}} {'基线':>8} {'本次':>8} {'变化':>7}")
+    for item in result["comparisons"]:
+        flag = ""
+        if item.change > args.threshold:
+            regressions.append(item)
+            flag = "  回归"
+        print(f"{item.name:<{width}} {_format_seconds(item.baseline):>10} {_format_seconds(item.current):>10} "
+              f"{item.change:>+8.1f}%{flag}")
+    for name in result["added"]:
+        print(f"新增: {name}")
+    for name in result["missing"]:
+        print(f"缺失: {name}")
+
+    if regressions:
+        print(f"\n{len(regressions)} 个用例的 {args.stat} 变慢超过 {args.threshold:g}%")
+        return 1
+    print(f"\n无超过 {args.threshold:g}% 的回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
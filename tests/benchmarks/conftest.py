@@ -0,0 +1,59 @@
+"""
+基准测试 fixtures
+- BENCHMARK_SCALE：数据规模，预设 10k/100k/1m/10m 或每日消耗行数，默认 10k
+- BENCHMARK_SEED：随机种子
+- BENCHMARK_DATABASE_URL：目标数据库；默认是 BENCHMARK_DATA_DIR（默认 .benchmarks）下按规模与种子命名的 SQLite 文件
+目标库中的数据集标记与当前规模、种子一致时直接复用，否则清空重建。
+"""
+import os
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import backend.models  # noqa: F401  注册全部模型，供 create_all 建表
+from backend.core.db import Base
+from tests.benchmarks.datagen import DatasetGenerator, dataset_from_env, dataset_loaded, describe_dataset, load_dataset
+
+DATA_DIR = Path(os.environ.get("BENCHMARK_DATA_DIR", ".benchmarks"))
+
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+    # pytest-benchmark 在 requirements-test.txt 中，未安装时不收集基准用例
+    collect_ignore_glob = ["test_*.py"]
+else:
+    def pytest_benchmark_update_json(config, benchmarks, output_json):
+        """结果 JSON 中记录数据集，比对时据此判断基线是否可比"""
+        output_json["dataset"] = describe_dataset(dataset_from_env(), os.environ.get("BENCHMARK_DATABASE_URL"))
+
+
+@pytest.fixture(scope="session")
+def dataset() -> DatasetGenerator:
+    return dataset_from_env()
+
+
+@pytest.fixture(scope="session")
+def bench_engine(dataset: DatasetGenerator):
+    url = os.environ.get("BENCHMARK_DATABASE_URL")
+    if not url:
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        url = f"sqlite:///{DATA_DIR / f'dataset-{dataset.scale.spend_rows}-{dataset.seed}.db'}"
+    engine = create_engine(url)
+    if not dataset_loaded(engine, dataset.fingerprint):
+        Base.metadata.create_all(engine)
+        load_dataset(engine, dataset)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def bench_session(bench_engine):
+    session = Session(bind=bench_engine)
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
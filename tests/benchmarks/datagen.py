@@ -0,0 +1,425 @@
+"""
+基准测试数据生成
+按固定种子生成可复现的合成数据集：用户、项目、渠道、广告账户、一年的每日消耗、财务流水、对账记录与充值。
+规模以每日消耗行数计（10k～10M），其余各表按比例推算；ID 由种子与序号派生，
+同一规模与种子每次生成完全相同的数据。各表逐行生成、分块写入，内存占用只与块大小有关。
+"""
+import csv
+import hashlib
+import io
+import math
+import os
+import random
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import MetaData, Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+DEFAULT_SEED = 20240101
+# 数据集固定结束于该日，保证不同日期运行的结果可比
+DEFAULT_END = date(2024, 12, 31)
+# 数据集格式有变化时递增，已缓存的旧数据集随之失效
+DATASET_VERSION = 2
+MARKER_TABLE = "benchmark_dataset"
+# 除管理员与各项目投手外，每种角色生成的员工数
+STAFF_ROLES = {"finance": 5, "manager": 5, "data_operator": 2}
+
+CENT = Decimal("0.01")
+
+
+@dataclass(frozen=True)
+class Scale:
+    """数据集规模：每日消耗总行数及各表相对比例"""
+
+    spend_rows: int
+    days: int = 365
+    accounts_per_project: int = 20
+    accounts_per_channel: int = 50
+    ledgers_per_account_month: int = 2
+    topups_per_account_month: int = 1
+    reconciled_ratio: float = 0.3
+
+    @property
+    def accounts(self) -> int:
+        return max(1, math.ceil(self.spend_rows / self.days))
+
+    @property
+    def projects(self) -> int:
+        return math.ceil(self.accounts / self.accounts_per_project)
+
+    @property
+    def channels(self) -> int:
+        return math.ceil(self.accounts / self.accounts_per_channel)
+
+    @property
+    def months(self) -> int:
+        return math.ceil(self.days / 30)
+
+
+SCALES: Dict[str, Scale] = {
+    "10k": Scale(10_000),
+    "100k": Scale(100_000),
+    "1m": Scale(1_000_000),
+    "10m": Scale(10_000_000),
+}
+
+
+def parse_scale(value: str) -> Scale:
+    """预设名（10k/100k/1m/10m）或每日消耗行数（如 250000、250k、2.5m）"""
+    value = value.strip().lower()
+    if value in SCALES:
+        return SCALES[value]
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([km]?)", value.replace("_", ""))
+    if not match:
+        raise ValueError(f"无法识别的数据规模: {value}")
+    rows = float(match.group(1)) * {"": 1, "k": 1_000, "m": 1_000_000}[match.group(2)]
+    return Scale(int(rows))
+
+
+class DatasetGenerator:
+    """逐表生成数据行（字典），列为各部署表结构的并集，写入时只保留目标表存在的列"""
+
+    TABLES = ("users", "projects", "channels", "ad_accounts", "ad_spend_daily", "ledgers", "reconciliations", "topups")
+
+    def __init__(self, scale: Scale, seed: int = DEFAULT_SEED, end: date = DEFAULT_END):
+        self.scale = scale
+        self.seed = seed
+        self.end = end
+        self.start = end - timedelta(days=scale.days - 1)
+        self.created_at = datetime.combine(self.start - timedelta(days=30), time(9))
+        self._prefixes: Dict[str, int] = {}
+
+    @property
+    def fingerprint(self) -> str:
+        return f"v{DATASET_VERSION}:{self.scale.spend_rows}:{self.scale.days}:{self.seed}:{self.end.isoformat()}"
+
+    # ---- 确定性的 ID 与随机数 ----
+
+    def _random(self, table: str) -> random.Random:
+        # 每张表独立的随机序列，只生成部分表时其余表的数据不变
+        return random.Random(f"{self.seed}:{table}")
+
+    def id(self, kind: str, index: int) -> str:
+        prefix = self._prefixes.get(kind)
+        if prefix is None:
+            digest = hashlib.blake2b(f"{self.seed}:{kind}".encode(), digest_size=8).digest()
+            prefix = self._prefixes[kind] = int.from_bytes(digest, "big")
+        return str(uuid.UUID(int=(prefix << 64) | index))
+
+    def admin_id(self) -> str:
+        return self.id("user", 0)
+
+    def buyer_id(self, project: int) -> str:
+        return self.id("user", project + 1)
+
+    def staff_id(self, role: str, index: int) -> str:
+        return self.id(f"staff:{role}", index)
+
+    def project_of(self, account: int) -> int:
+        return account // self.scale.accounts_per_project
+
+    def month_start(self, month: int) -> date:
+        return self.start + timedelta(days=month * 30)
+
+    def spend_id(self, account: int, day: int) -> str:
+        return self.id("spend", account * self.scale.days + day)
+
+    def ledger_id(self, account: int, month: int, slot: int) -> str:
+        return self.id("ledger", (account * self.scale.months + month) * self.scale.ledgers_per_account_month + slot)
+
+    def span(self, name: str) -> Tuple[date, date]:
+        """数据集末尾的一个月（month）、一个季度（quarter）或全部日期（year）"""
+        days = {"month": 30, "quarter": 91, "year": self.scale.days}[name]
+        return self.end - timedelta(days=days - 1), self.end
+
+    def rows(self, table: str) -> Iterator[Dict[str, Any]]:
+        if table not in self.TABLES:
+            raise ValueError(f"不支持生成的表: {table}")
+        return getattr(self, f"_{table}")()
+
+    # ---- 各表 ----
+
+    def _audit(self, at: datetime) -> Dict[str, Any]:
+        return {"created_by": self.admin_id(), "updated_by": self.admin_id(), "created_at": at, "updated_at": at}
+
+    def _users(self) -> Iterator[Dict[str, Any]]:
+        yield {
+            "id": self.admin_id(), "email": "bench-admin@example.com", "name": "Benchmark Admin", "role": "admin",
+            "is_active": True, "created_at": self.created_at, "updated_at": self.created_at,
+        }
+        for project in range(self.scale.projects):
+            yield {
+                "id": self.buyer_id(project), "email": f"bench-buyer-{project:05d}@example.com",
+                "name": f"Buyer {project:05d}", "role": "media_buyer", "is_active": True,
+                "created_at": self.created_at, "updated_at": self.created_at,
+            }
+        for role, count in STAFF_ROLES.items():
+            for index in range(count):
+                yield {
+                    "id": self.staff_id(role, index), "email": f"bench-{role.replace('_', '-')}-{index:02d}@example.com",
+                    "name": f"{role.title()} {index:02d}", "role": role, "is_active": True,
+                    "created_at": self.created_at, "updated_at": self.created_at,
+                }
+
+    def _projects(self) -> Iterator[Dict[str, Any]]:
+        rng = self._random("projects")
+        for project in range(self.scale.projects):
+            yield {
+                "id": self.id("project", project),
+                "name": f"Benchmark Project {project:05d}",
+                "client_name": f"Client {project:05d}",
+                "client_company": f"Client Company {project % 97:02d}",
+                "currency": "USD",
+                "status": "active" if rng.random() < 0.9 else "paused",
+                **self._audit(self.created_at),
+            }
+
+    def _channels(self) -> Iterator[Dict[str, Any]]:
+        rng = self._random("channels")
+        for channel in range(self.scale.channels):
+            yield {
+                "id": self.id("channel", channel),
+                "name": f"Channel {channel:05d}",
+                "code": f"CH{channel:05d}",
+                "company_name": f"Channel Company {channel:05d}",
+                "service_fee_rate": Decimal(rng.randint(2, 8)) / 100,
+                "status": "active",
+                **self._audit(self.created_at),
+            }
+
+    def _ad_accounts(self) -> Iterator[Dict[str, Any]]:
+        rng = self._random("ad_accounts")
+        for account in range(self.scale.accounts):
+            project = self.project_of(account)
+            draw = rng.random()
+            yield {
+                "id": self.id("account", account),
+                "account_id": f"act_{self.seed}_{account:08d}",
+                "name": f"Account {account:08d}",
+                "platform": ("facebook", "google", "tiktok")[account % 3],
+                "project_id": self.id("project", project),
+                "channel_id": self.id("channel", account // self.scale.accounts_per_channel),
+                "assigned_user_id": self.buyer_id(project),
+                "status": "active" if draw < 0.9 else "paused" if draw < 0.97 else "banned",
+                **self._audit(self.created_at),
+            }
+
+    def _account_profile(self, rng: random.Random):
+        # 账户日均消耗与 CPL 呈长尾分布
+        return Decimal(str(round(min(rng.lognormvariate(5, 0.8), 5000), 2))), rng.uniform(8, 80)
+
+    def _ad_spend_daily(self) -> Iterator[Dict[str, Any]]:
+        rng = self._random("ad_spend_daily")
+        for account in range(self.scale.accounts):
+            base, cpl = self._account_profile(rng)
+            buyer = self.buyer_id(self.project_of(account))
+            account_id = self.id("account", account)
+            for day in range(self.scale.days):
+                current = self.start + timedelta(days=day)
+                # 周末消耗偏低，另有约 3% 的停投日
+                factor = 0 if rng.random() < 0.03 else rng.uniform(0.6, 1.4) * (0.8 if current.weekday() >= 5 else 1)
+                spend = (base * Decimal(str(round(factor, 4)))).quantize(CENT)
+                leads = int(float(spend) / cpl * rng.uniform(0.7, 1.3))
+                at = datetime.combine(current + timedelta(days=1), time(2))
+                yield {
+                    "id": self.spend_id(account, day),
+                    "ad_account_id": account_id,
+                    "user_id": buyer,
+                    "date": current,
+                    "spend": spend,
+                    "leads_count": leads,
+                    "cost_per_lead": (spend / leads).quantize(CENT) if leads else Decimal("0.00"),
+                    "is_anomaly": factor > 1.35,
+                    **self._audit(at),
+                }
+
+    def _ledgers(self) -> Iterator[Dict[str, Any]]:
+        rng = self._random("ledgers")
+        per_month = self.scale.ledgers_per_account_month
+        for account in range(self.scale.accounts):
+            project = self.project_of(account)
+            for month in range(self.scale.months):
+                for slot in range(per_month):
+                    occurred = datetime.combine(self.month_start(month) + timedelta(days=rng.randrange(30)), time(12))
+                    income = rng.random() < 0.85
+                    yield {
+                        "id": self.ledger_id(account, month, slot),
+                        "type": "income" if income else "expense",
+                        "project_id": self.id("project", project),
+                        "channel_id": self.id("channel", account // self.scale.accounts_per_channel),
+                        "ad_account_id": self.id("account", account),
+                        "amount": Decimal(str(round(rng.uniform(50, 3000), 2))),
+                        "currency": "USD",
+                        "occurred_at": occurred,
+                        "remark": "income" if income else "expense",
+                        **self._audit(occurred),
+                    }
+
+    def _reconciliations(self) -> Iterator[Dict[str, Any]]:
+        rng = self._random("reconciliations")
+        index = 0
+        for account in range(self.scale.accounts):
+            for day in range(self.scale.days):
+                if rng.random() >= self.scale.reconciled_ratio:
+                    continue
+                month = min(day // 30, self.scale.months - 1)
+                matched = rng.random() < 0.9
+                at = datetime.combine(self.start + timedelta(days=day + 2), time(3))
+                yield {
+                    "id": self.id("reconciliation", index),
+                    "ad_account_id": self.id("account", account),
+                    "daily_spend_id": self.spend_id(account, day),
+                    "finance_txn_id": self.ledger_id(account, month, rng.randrange(self.scale.ledgers_per_account_month)),
+                    "match_type": "auto",
+                    "status": "matched" if matched else "manual_review",
+                    "amount_diff": Decimal("0.00") if matched else Decimal(str(round(rng.uniform(1, 200), 2))),
+                    "date_diff": rng.randrange(3),
+                    "created_at": at,
+                    "updated_at": at,
+                }
+                index += 1
+
+    def _topups(self) -> Iterator[Dict[str, Any]]:
+        rng = self._random("topups")
+        statuses = ("completed",) * 14 + ("paid", "pending", "rejected", "finance_approve", "data_review")
+        for account in range(self.scale.accounts):
+            project = self.project_of(account)
+            for month in range(self.scale.months):
+                for slot in range(self.scale.topups_per_account_month):
+                    at = datetime.combine(self.month_start(month) + timedelta(days=rng.randrange(30)), time(10))
+                    yield {
+                        "id": self.id("topup", (account * self.scale.months + month) * self.scale.topups_per_account_month + slot),
+                        "project_id": self.id("project", project),
+                        "ad_account_id": self.id("account", account),
+                        "amount": Decimal(rng.choice((500, 1000, 2000, 5000))),
+                        "status": rng.choice(statuses),
+                        "requested_by": self.buyer_id(project),
+                        **self._audit(at),
+                    }
+
+
+def dataset_from_env() -> DatasetGenerator:
+    """按环境变量 BENCHMARK_SCALE（默认 10k）与 BENCHMARK_SEED 构造数据集"""
+    scale = parse_scale(os.environ.get("BENCHMARK_SCALE", "10k"))
+    return DatasetGenerator(scale, seed=int(os.environ.get("BENCHMARK_SEED", DEFAULT_SEED)))
+
+
+def describe_dataset(generator: DatasetGenerator, database_url: Optional[str]) -> Dict[str, Any]:
+    """写入结果 JSON 的数据集信息，比对时据此判断两次结果是否可比"""
+    return {
+        "fingerprint": generator.fingerprint,
+        "spend_rows": generator.scale.spend_rows,
+        "seed": generator.seed,
+        "database": "postgresql" if (database_url or "").startswith("postgresql") else "sqlite",
+    }
+
+
+# ---------------------------------------------------------------------------
+# 写入
+# ---------------------------------------------------------------------------
+
+def _chunks(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _copy_chunk(connection: Connection, table: str, columns: Sequence[str], chunk: List[Dict[str, Any]]) -> None:
+    """PostgreSQL 以 COPY 批量写入，千万级消耗明细的写入耗时比逐批 INSERT 少一个数量级"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in chunk:
+        writer.writerow([r"\N" if row.get(name) is None else row[name] for name in columns])
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+        )
+    finally:
+        cursor.close()
+
+
+def dataset_loaded(engine: Engine, fingerprint: str) -> bool:
+    with engine.connect() as connection:
+        if not inspect(connection).has_table(MARKER_TABLE):
+            return False
+        return connection.execute(
+            text(f"SELECT count(*) FROM {MARKER_TABLE} WHERE fingerprint = :fingerprint"), {"fingerprint": fingerprint}
+        ).scalar() > 0
+
+
+def load_dataset(
+    engine: Engine,
+    generator: DatasetGenerator,
+    tables: Optional[Iterable[str]] = None,
+    chunk_size: int = 20000,
+) -> Dict[str, int]:
+    """清空并写入数据集，返回各表写入行数；目标库没有的表跳过（记为 0），没有的列忽略"""
+    names = list(tables or DatasetGenerator.TABLES)
+    postgres = engine.dialect.name == "postgresql"
+    with engine.begin() as connection:
+        existing = [name for name in names if inspect(connection).has_table(name)]
+        for name in reversed(existing):
+            connection.execute(text(f"DELETE FROM {name}"))
+        connection.execute(text(f"CREATE TABLE IF NOT EXISTS {MARKER_TABLE} (fingerprint VARCHAR(200) NOT NULL)"))
+        connection.execute(text(f"DELETE FROM {MARKER_TABLE}"))
+
+    loaded: Dict[str, int] = {}
+    for name in names:
+        if name not in existing:
+            loaded[name] = 0
+            continue
+        with engine.begin() as connection:
+            target = Table(name, MetaData(), autoload_with=connection)
+            count = 0
+            columns: List[str] = []
+            for chunk in _chunks(generator.rows(name), chunk_size):
+                if not columns:
+                    columns = [column for column in chunk[0] if column in target.c]
+                if postgres:
+                    _copy_chunk(connection, name, columns, chunk)
+                else:
+                    connection.execute(target.insert(), [{column: row[column] for column in columns} for row in chunk])
+                count += len(chunk)
+            loaded[name] = count
+
+    _finalize(engine, generator, existing)
+    return loaded
+
+
+def _finalize(engine: Engine, generator: DatasetGenerator, tables: Sequence[str]) -> None:
+    """按明细回填账户累计指标，刷新统计信息，最后写入数据集标记"""
+    from backend.models import AdSpendDaily
+    from backend.services.account_metrics import reconcile_account_metrics
+
+    if "ad_accounts" in tables and "ad_spend_daily" in tables:
+        with Session(bind=engine) as session:
+            reconcile_account_metrics(session, AdSpendDaily)
+            session.commit()
+
+    with engine.connect() as connection:
+        if engine.dialect.name == "postgresql":
+            connection.execution_options(isolation_level="AUTOCOMMIT")
+            for name in tables:
+                connection.execute(text(f"VACUUM ANALYZE {name}"))
+        else:
+            connection.execute(text("ANALYZE"))
+            connection.commit()
+
+    with engine.begin() as connection:
+        connection.execute(
+            text(f"INSERT INTO {MARKER_TABLE} (fingerprint) VALUES (:fingerprint)"),
+            {"fingerprint": generator.fingerprint},
+        )
@@ -0,0 +1,17 @@
+import pytest
+from sqlalchemy import select
+
+from backend.models import AdAccount, AdSpendDaily
+from backend.services.account_metrics import reconcile_account_metrics, refresh_account_metrics
+
+pytestmark = pytest.mark.performance
+
+
+def test_reconcile_account_metrics(benchmark, bench_session) -> None:
+    """全量校准：数据集的累计指标已与明细一致，只计比对开销"""
+    assert benchmark(reconcile_account_metrics, bench_session, AdSpendDaily) == 0
+
+
+def test_refresh_account_metrics(benchmark, bench_session) -> None:
+    account_ids = bench_session.execute(select(AdAccount.id).order_by(AdAccount.id).limit(100)).scalars().all()
+    assert benchmark(refresh_account_metrics, bench_session, AdSpendDaily, account_ids) == 0
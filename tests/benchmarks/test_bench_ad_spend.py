@@ -0,0 +1,64 @@
+from datetime import timedelta
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+from sqlalchemy import delete, select
+
+from backend.core.security import AuthenticatedUser
+from backend.models import AdAccount, AdSpendDaily
+from backend.routers.ad_spend import _bulk_upsert, list_ad_spend_reports
+from backend.services.account_metrics import refresh_account_metrics
+
+pytestmark = pytest.mark.performance
+
+BULK_ROWS = 500
+
+
+def _list(session, **filters):
+    params = {"page": 1, "page_size": 20, "ad_account_id": None, "start_date": None, "end_date": None}
+    params.update(filters)
+    return list_ad_spend_reports(current_user=None, db=session, **params)
+
+
+def test_list_first_page(benchmark, bench_session) -> None:
+    assert benchmark(_list, bench_session).status_code == 200
+
+
+def test_list_account_month_deep_page(benchmark, bench_session, dataset) -> None:
+    account_id = bench_session.execute(select(AdAccount.id).order_by(AdAccount.id).limit(1)).scalar_one()
+    start, end = dataset.span("quarter")
+    response = benchmark(_list, bench_session, page=3, ad_account_id=account_id, start_date=start, end_date=end)
+    assert response.status_code == 200
+
+
+@pytest.fixture
+def future_rows(bench_session, dataset):
+    """写入数据集结束日之后的日期，测试结束后删除并恢复账户累计指标，保持数据集不变"""
+    account_ids = bench_session.execute(
+        select(AdAccount.id).order_by(AdAccount.id).limit(BULK_ROWS // 10)
+    ).scalars().all()
+    rows = [
+        {
+            "ad_account_id": str(account_id),
+            "date": (dataset.end + timedelta(days=day + 1)).isoformat(),
+            "spend": str(Decimal("100.00") + index + day),
+            "leads_count": 5 + day,
+        }
+        for index, account_id in enumerate(account_ids)
+        for day in range(BULK_ROWS // len(account_ids))
+    ]
+    yield rows
+    bench_session.rollback()
+    bench_session.execute(delete(AdSpendDaily).where(AdSpendDaily.date > dataset.end))
+    refresh_account_metrics(bench_session, AdSpendDaily, account_ids)
+    bench_session.commit()
+
+
+def test_bulk_upsert(benchmark, bench_session, dataset, future_rows) -> None:
+    """首轮插入、其余各轮更新同一批账户日期"""
+    user = AuthenticatedUser(id=dataset.admin_id(), role="admin", email="bench-admin@example.com", raw_claims={})
+    result = benchmark.pedantic(
+        _bulk_upsert, args=(bench_session, user, UUID(dataset.admin_id()), future_rows), rounds=5, iterations=1
+    )
+    assert result["summary"]["failed"] == 0
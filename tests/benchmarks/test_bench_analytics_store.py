@@ -0,0 +1,45 @@
+import pytest
+
+from backend.core.config import get_settings
+from backend.services import analytics_store
+
+pytest.importorskip("duckdb")
+
+pytestmark = pytest.mark.performance
+
+
+@pytest.fixture(scope="module")
+def synced_store(bench_engine, tmp_path_factory):
+    """把数据集全量同步到临时副本，模块内的用例共用"""
+    settings = get_settings()
+    previous = settings.analytics_store_enabled, settings.analytics_store_path
+    settings.analytics_store_enabled = True
+    settings.analytics_store_path = str(tmp_path_factory.mktemp("analytics") / "analytics.duckdb")
+    with bench_engine.connect() as connection:
+        analytics_store.sync(connection, full=True)
+    yield settings.analytics_store_path
+    settings.analytics_store_enabled, settings.analytics_store_path = previous
+
+
+def test_full_sync(benchmark, bench_engine, synced_store) -> None:
+    def _sync():
+        with bench_engine.connect() as connection:
+            return analytics_store.sync(connection, ["ad_spend_daily"], full=True)
+
+    counts = benchmark.pedantic(_sync, rounds=3, iterations=1)
+    assert counts["ad_spend_daily"] > 0
+
+
+def test_incremental_sync_without_changes(benchmark, bench_engine, synced_store) -> None:
+    """无变更时的增量同步只读回看窗口"""
+    def _sync():
+        with bench_engine.connect() as connection:
+            return analytics_store.sync(connection, ["ad_spend_daily"])
+
+    benchmark(_sync)
+
+
+@pytest.mark.parametrize("span", ["quarter", "year"])
+def test_project_performance(benchmark, dataset, synced_store, span) -> None:
+    start, end = dataset.span(span)
+    assert benchmark(analytics_store.project_performance, start, end)
@@ -0,0 +1,58 @@
+from datetime import date
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+
+from backend.core.cache import TTLCache
+from backend.core.response import render_json
+from backend.core.security import AuthenticatedUser
+from backend.services.report_cache import ReportCache
+from backend.utils.id_generator import generate_request_no
+
+pytestmark = pytest.mark.performance
+
+
+@pytest.fixture(scope="module")
+def report_page(dataset):
+    """与报表接口返回结构相同的一页数据"""
+    return [
+        {
+            "project_id": UUID(dataset.id("project", index)),
+            "project_name": f"Project {index}",
+            "date": date(2024, 1, 1),
+            "total_spend": Decimal("12345.67") + index,
+            "total_leads": index * 3,
+            "ledger_amount": Decimal("23456.78"),
+            "profit": Decimal("11111.11"),
+        }
+        for index in range(1000)
+    ]
+
+
+def test_render_json(benchmark, report_page) -> None:
+    assert benchmark(render_json, {"success": True, "data": report_page})
+
+
+def test_report_cache_lookup_hit(benchmark, dataset) -> None:
+    cache = ReportCache()
+    user = AuthenticatedUser(id=dataset.admin_id(), role="admin", email=None, raw_claims={})
+    start, end = dataset.span("year")
+    cache.store(cache.lookup("summary", user, start=start, end=end), [{"total_spend": "1.00"}])
+    assert benchmark(cache.lookup, "summary", user, start=start, end=end).hit
+
+
+def test_ttl_cache_churn(benchmark) -> None:
+    """超出容量的写入与读取交替，覆盖 LRU 淘汰路径"""
+    cache = TTLCache(maxsize=512, ttl=300)
+
+    def _churn():
+        for index in range(2000):
+            cache.set(index, index)
+            cache.get(index - 256)
+
+    benchmark(_churn)
+
+
+def test_generate_request_no(benchmark) -> None:
+    assert benchmark(generate_request_no, "TOP").startswith("TOP")
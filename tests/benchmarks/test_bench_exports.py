@@ -0,0 +1,42 @@
+import io
+
+import pytest
+
+from backend.models import AdSpendDaily
+from backend.utils.export import write_csv, write_xlsx
+
+pytestmark = pytest.mark.performance
+
+
+@pytest.fixture(scope="module")
+def month_rows(bench_engine, dataset):
+    """最近一个月的消耗明细，按导出接口的列组织"""
+    from sqlalchemy.orm import Session
+
+    start, end = dataset.span("month")
+    with Session(bind=bench_engine) as session:
+        records = (
+            session.query(AdSpendDaily)
+            .filter(AdSpendDaily.date >= start, AdSpendDaily.date <= end)
+            .order_by(AdSpendDaily.date, AdSpendDaily.ad_account_id)
+            .all()
+        )
+        return [
+            {
+                "ad_account_id": str(record.ad_account_id),
+                "date": record.date,
+                "spend": record.spend,
+                "leads_count": record.leads_count,
+                "cost_per_lead": record.cost_per_lead,
+                "is_anomaly": record.is_anomaly,
+            }
+            for record in records
+        ]
+
+
+def test_write_xlsx(benchmark, month_rows) -> None:
+    assert benchmark(lambda: write_xlsx(month_rows, io.BytesIO(), sheet_name="消耗")) == len(month_rows)
+
+
+def test_write_csv(benchmark, month_rows) -> None:
+    assert benchmark(lambda: write_csv(month_rows, io.BytesIO())) == len(month_rows)
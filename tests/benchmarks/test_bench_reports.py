@@ -0,0 +1,28 @@
+import pytest
+
+from backend.routers.reports import _compute_performance, _compute_profit, _compute_summary
+
+pytestmark = pytest.mark.performance
+
+
+@pytest.mark.parametrize("span", ["month", "quarter", "year"])
+def test_report_summary(benchmark, bench_session, dataset, span) -> None:
+    start, end = dataset.span(span)
+    assert benchmark(_compute_summary, bench_session, start, end)
+
+
+@pytest.mark.parametrize("span", ["month", "year"])
+def test_report_performance(benchmark, bench_session, dataset, span) -> None:
+    start, end = dataset.span(span)
+    assert benchmark(_compute_performance, bench_session, start, end)
+
+
+def test_report_performance_all_time(benchmark, bench_session) -> None:
+    """不限日期时读取账户累计指标"""
+    assert benchmark(_compute_performance, bench_session, None, None)
+
+
+@pytest.mark.parametrize("span", ["month", "year"])
+def test_report_profit(benchmark, bench_session, dataset, span) -> None:
+    start, end = dataset.span(span)
+    assert benchmark(_compute_profit, bench_session, start, end)
@@ -26,10 +26,12 @@ import redis
 import json
 from unittest.mock import Mock, patch
 
-# 把项目根目录加入 Python 搜索路径
+# 把项目根目录与 backend 目录加入 Python 搜索路径（旧模块按 core./models./services. 导入）
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
-if ROOT_DIR not in sys.path:
-    sys.path.insert(0, ROOT_DIR)
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+for path in (BACKEND_DIR, ROOT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
 
 # 设置测试环境变量
 os.environ['TESTING'] = 'true'
@@ -0,0 +1,4 @@
+"""
+负载测试
+基于 locust 的按角色混合流量场景，复用 tests.benchmarks 的种子数据集与结果比对
+"""
@@ -0,0 +1,240 @@
+"""
+按角色混合的负载测试场景（locust）
+- 投手 media_buyer：录入单日消耗、批量录入、查看消耗明细与日报列表
+- 财务 finance：审批待处理的充值申请，查看流水与统计
+- 经理 manager：轮询报表汇总、业绩、利润与各类仪表板
+- 管理员 admin：导出日报、充值与流水，创建并执行对账批次
+各角色的用户数比例由 --mix（环境变量 LOAD_MIX）指定，如 media_buyer=6,finance=2,manager=3,admin=1。
+身份取自基准数据集（tests.benchmarks.datagen）的合成用户，令牌由 JWTManager 签发，
+服务端与压测端需使用同一份 JWT_SECRET 与数据集规模、种子。
+结束时按接口汇总吞吐与延迟分位写入 --report-json（环境变量 LOAD_REPORT_JSON）。
+
+通常通过 python -m tests.load.run 启动，也可直接运行：
+    locust -f tests/load/locustfile.py --host http://127.0.0.1:8000 --headless -u 50 -r 10 -t 2m
+"""
+import itertools
+import random
+import sys
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+# locust 只把本文件所在目录加入路径
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from locust import HttpUser, between, events, task
+
+from tests.benchmarks.datagen import STAFF_ROLES, dataset_from_env
+from tests.load.report import DEFAULT_MIX, parse_mix, write_report
+
+API = "/api/v1"
+# 压测期间令牌不过期
+TOKEN_TTL = timedelta(hours=12)
+# 投手录入的日期落在数据集结束日之后，不改动报表基线区间内的数据
+WRITE_DAYS = 365
+
+dataset = dataset_from_env()
+_jwt_manager = None
+_identities = {role: itertools.count() for role in ("media_buyer", "admin", *STAFF_ROLES)}
+
+
+def issue_token(role: str) -> tuple:
+    """按角色轮流取一个合成用户并签发访问令牌，返回 (序号, 用户 ID, 令牌)；投手的序号即所负责的项目"""
+    global _jwt_manager
+    if _jwt_manager is None:
+        from backend.core.security import JWTManager
+
+        _jwt_manager = JWTManager()
+    index = next(_identities[role])
+    if role == "admin":
+        user_id, email = dataset.admin_id(), "bench-admin@example.com"
+    elif role == "media_buyer":
+        index %= dataset.scale.projects
+        user_id, email = dataset.buyer_id(index), f"bench-buyer-{index:05d}@example.com"
+    else:
+        index %= STAFF_ROLES[role]
+        user_id, email = dataset.staff_id(role, index), f"bench-{role.replace('_', '-')}-{index:02d}@example.com"
+    token = _jwt_manager.create_access_token({"sub": user_id, "role": role, "email": email}, expires_delta=TOKEN_TTL)
+    return index, user_id, token
+
+
+class RoleUser(HttpUser):
+    abstract = True
+    role = ""
+
+    def on_start(self) -> None:
+        self.index, self.user_id, token = issue_token(self.role)
+        self.client.headers["Authorization"] = f"Bearer {token}"
+
+    def _span(self) -> dict:
+        start, end = dataset.span(random.choice(("month", "quarter", "year")))
+        return {"start": start.isoformat(), "end": end.isoformat()}
+
+
+class MediaBuyer(RoleUser):
+    role = "media_buyer"
+    wait_time = between(1, 3)
+
+    def on_start(self) -> None:
+        super().on_start()
+        first = self.index * dataset.scale.accounts_per_project
+        last = min(first + dataset.scale.accounts_per_project, dataset.scale.accounts)
+        self.accounts = [dataset.id("account", account) for account in range(first, last)]
+
+    def _write_date(self) -> str:
+        return (dataset.end + timedelta(days=random.randint(1, WRITE_DAYS))).isoformat()
+
+    @task(3)
+    def submit_report(self) -> None:
+        payload = {
+            "ad_account_id": random.choice(self.accounts),
+            "date": self._write_date(),
+            "spend": str(Decimal(random.randint(5000, 500000)) / 100),
+            "leads_count": random.randint(0, 80),
+        }
+        with self.client.post(f"{API}/adspend/report", json=payload, name="/adspend/report",
+                              catch_response=True) as response:
+            # 同一账户日期已录入时返回 409，属于正常业务结果
+            if response.status_code == 409:
+                response.success()
+
+    @task(1)
+    def bulk_submit(self) -> None:
+        day = self._write_date()
+        rows = [
+            {"ad_account_id": account, "date": day, "spend": str(Decimal(random.randint(5000, 500000)) / 100),
+             "leads_count": random.randint(0, 80)}
+            for account in self.accounts
+        ]
+        self.client.post(f"{API}/adspend/reports/bulk", json=rows, name="/adspend/reports/bulk")
+
+    @task(3)
+    def list_spend(self) -> None:
+        start, end = dataset.span("month")
+        self.client.get(f"{API}/adspend/reports", name="/adspend/reports", params={
+            "ad_account_id": random.choice(self.accounts), "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+        })
+
+    @task(1)
+    def list_daily_reports(self) -> None:
+        self.client.get(f"{API}/daily-reports", name="/daily-reports", params={"page": 1, "with_total": "false"})
+
+
+class Finance(RoleUser):
+    role = "finance"
+    wait_time = between(2, 5)
+
+    @task(3)
+    def approve_topup(self) -> None:
+        response = self.client.get(f"{API}/topups", name="/topups", params={"status": "data_review", "page_size": 20})
+        if not response.ok:
+            return
+        pending = (response.json() or {}).get("data") or []
+        if not pending:
+            return
+        topup = random.choice(pending)
+        payload = {"action": "approve", "actual_amount": str(topup.get("requested_amount") or "100.00"),
+                   "notes": "load test"}
+        with self.client.put(f"{API}/topups/{topup['id']}/approve", json=payload, name="/topups/[id]/approve",
+                             catch_response=True) as approval:
+            # 并发审批同一申请时后到者返回 400
+            if approval.status_code == 400:
+                approval.success()
+
+    @task(2)
+    def list_transactions(self) -> None:
+        self.client.get(f"{API}/ledger/transactions", name="/ledger/transactions", params={"page": 1})
+
+    @task(1)
+    def ledger_statistics(self) -> None:
+        self.client.get(f"{API}/ledger/statistics", name="/ledger/statistics")
+
+    @task(1)
+    def topup_statistics(self) -> None:
+        self.client.get(f"{API}/topups/statistics", name="/topups/statistics")
+
+
+class Manager(RoleUser):
+    role = "manager"
+    wait_time = between(2, 6)
+
+    @task(3)
+    def report_summary(self) -> None:
+        self.client.get(f"{API}/reports", name="/reports", params=self._span())
+
+    @task(2)
+    def report_performance(self) -> None:
+        self.client.get(f"{API}/reports/performance", name="/reports/performance", params=self._span())
+
+    @task(2)
+    def report_profit(self) -> None:
+        self.client.get(f"{API}/reports/profit", name="/reports/profit", params=self._span())
+
+    @task(1)
+    def topup_dashboard(self) -> None:
+        self.client.get(f"{API}/topups/dashboard", name="/topups/dashboard")
+
+    @task(1)
+    def daily_report_statistics(self) -> None:
+        self.client.get(f"{API}/daily-reports/statistics", name="/daily-reports/statistics")
+
+
+class Admin(RoleUser):
+    role = "admin"
+    wait_time = between(5, 15)
+
+    @task(2)
+    def export_daily_reports(self) -> None:
+        start, end = dataset.span("month")
+        self.client.get(f"{API}/daily-reports/export", name="/daily-reports/export",
+                        params={"report_date_start": start.isoformat(), "report_date_end": end.isoformat()})
+
+    @task(1)
+    def export_topups(self) -> None:
+        start, end = dataset.span("quarter")
+        self.client.get(f"{API}/topups/export", name="/topups/export",
+                        params={"start_date": start.isoformat(), "end_date": end.isoformat()})
+
+    @task(1)
+    def export_ledger(self) -> None:
+        start, end = dataset.span("quarter")
+        self.client.get(f"{API}/ledger/export", name="/ledger/export",
+                        params={"start_date": start.isoformat(), "end_date": end.isoformat(), "format": "csv"})
+
+    @task(1)
+    def reconcile(self) -> None:
+        start, end = dataset.span("month")
+        response = self.client.post(f"{API}/reconciliation/batches", name="/reconciliation/batches", json={
+            "name": f"load-{self.user_id[:8]}-{random.randrange(10 ** 6)}",
+            "start_date": start.isoformat(), "end_date": end.isoformat(),
+        })
+        batch = (response.json() or {}).get("data") if response.ok else None
+        if batch and batch.get("id"):
+            self.client.post(f"{API}/reconciliation/batches/{batch['id']}/process",
+                             name="/reconciliation/batches/[id]/process")
+
+
+ROLE_CLASSES = {"media_buyer": MediaBuyer, "finance": Finance, "manager": Manager, "admin": Admin}
+
+
+@events.init_command_line_parser.add_listener
+def _add_arguments(parser) -> None:
+    parser.add_argument("--mix", env_var="LOAD_MIX", default=DEFAULT_MIX,
+                        help="各角色用户数比例，如 media_buyer=6,finance=2,manager=3,admin=1")
+    parser.add_argument("--report-json", env_var="LOAD_REPORT_JSON", default=".benchmarks/load-latest.json",
+                        help="按接口汇总的吞吐与延迟分位输出路径")
+
+
+@events.init.add_listener
+def _apply_mix(environment, **_kwargs) -> None:
+    mix = parse_mix(environment.parsed_options.mix)
+    for role, user_class in ROLE_CLASSES.items():
+        user_class.weight = mix.get(role, 0)
+    # 比例为 0 的角色不参与，与 locust 自身的过滤一样原地修改
+    environment.user_classes[:] = [user_class for role, user_class in ROLE_CLASSES.items() if mix.get(role)]
+
+
+@events.quitting.add_listener
+def _write_report(environment, **_kwargs) -> None:
+    write_report(environment, dataset, Path(environment.parsed_options.report_json))
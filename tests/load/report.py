@@ -0,0 +1,101 @@
+"""
+负载测试报告
+按接口汇总请求数、失败数、吞吐与延迟分位，写成与 pytest-benchmark 结果相同结构的 JSON
+（benchmarks[].fullname / stats，时间单位为秒），可直接用 tests.benchmarks.compare 比对两次提交：
+
+    python -m tests.benchmarks.compare .benchmarks/load-baseline.json .benchmarks/load-latest.json --stat p95
+"""
+import json
+import os
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from tests.benchmarks.datagen import DatasetGenerator, describe_dataset
+
+ROLES = ("media_buyer", "finance", "manager", "admin")
+DEFAULT_MIX = "media_buyer=6,finance=2,manager=3,admin=1"
+PERCENTILES = {"p90": 0.90, "p95": 0.95, "p99": 0.99}
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """解析 role=weight 形式的角色比例，未列出的角色比例为 0"""
+    mix: Dict[str, int] = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        role, _, weight = item.partition("=")
+        role = role.strip()
+        if role not in ROLES:
+            raise ValueError(f"未知角色 {role}，可选: {', '.join(ROLES)}")
+        try:
+            mix[role] = int(weight)
+        except ValueError:
+            raise ValueError(f"角色比例必须是整数: {item}") from None
+        if mix[role] < 0:
+            raise ValueError(f"角色比例不能为负数: {item}")
+    if not any(mix.values()):
+        raise ValueError("至少一个角色的比例需大于 0")
+    return mix
+
+
+def _commit() -> Optional[str]:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def _entry_stats(entry) -> Dict[str, Any]:
+    # locust 以毫秒计时，换算成秒与基准结果保持一致
+    stats = {
+        "min": (entry.min_response_time or 0) / 1000,
+        "max": entry.max_response_time / 1000,
+        "mean": entry.avg_response_time / 1000,
+        "median": entry.median_response_time / 1000,
+        "ops": entry.total_rps,
+    }
+    for name, percentile in PERCENTILES.items():
+        stats[name] = entry.get_response_time_percentile(percentile) / 1000
+    return stats
+
+
+def build_report(environment, dataset: DatasetGenerator) -> Dict[str, Any]:
+    stats = environment.stats
+    options = environment.parsed_options
+    benchmarks = []
+    for entry in sorted(stats.entries.values(), key=lambda item: (item.name, item.method)):
+        if not entry.num_requests:
+            continue
+        benchmarks.append({
+            "fullname": f"{entry.method} {entry.name}",
+            "requests": entry.num_requests,
+            "failures": entry.num_failures,
+            "fail_ratio": entry.fail_ratio,
+            "stats": _entry_stats(entry),
+        })
+    total = stats.total
+    return {
+        "datetime": datetime.now(timezone.utc).isoformat(),
+        "commit": _commit(),
+        "dataset": describe_dataset(dataset, os.environ.get("BENCHMARK_DATABASE_URL")),
+        "load": {
+            "host": environment.host,
+            "mix": options.mix,
+            "users": options.num_users,
+            "spawn_rate": options.spawn_rate,
+            "duration": (total.last_request_timestamp or total.start_time) - total.start_time,
+            "requests": total.num_requests,
+            "failures": total.num_failures,
+            "rps": total.total_rps,
+        },
+        "benchmarks": benchmarks,
+    }
+
+
+def write_report(environment, dataset: DatasetGenerator, path: Path) -> Dict[str, Any]:
+    report = build_report(environment, dataset)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
@@ -0,0 +1,164 @@
+"""
+本地负载测试
+准备基准数据集，启动 uvicorn，运行 locust 场景，输出 HTML 与 JSON 报告，可选与基线比对。
+
+    # 默认 10k 行 SQLite，50 个用户跑 2 分钟
+    python -m tests.load.run
+
+    # 本地 PostgreSQL，1M 行，自定义角色比例，与基线按 p95 比对
+    python -m tests.load.run --database-url postgresql://... --scale 1m \\
+        --mix media_buyer=10,finance=2,manager=5,admin=1 --baseline .benchmarks/load-baseline.json
+
+SQLite 上的写入是串行的，并发写入的结果只适合做同一环境下的相对比较。
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from tests.benchmarks.datagen import DEFAULT_SEED, DatasetGenerator, dataset_loaded, load_dataset, parse_scale
+from tests.benchmarks.compare import PERCENTILES, STATS, main as compare
+from tests.load.report import DEFAULT_MIX, parse_mix
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT_DIR / "backend"
+LOCUSTFILE = Path(__file__).resolve().parent / "locustfile.py"
+STARTUP_TIMEOUT = 60
+
+
+def prepare_database(url: str, generator: DatasetGenerator, reuse: bool) -> None:
+    """建表并写入数据集；压测会写入数据，默认每次重新写入以保证各次运行起点一致"""
+    from sqlalchemy import create_engine
+
+    import backend.models  # noqa: F401  注册全部模型，供 create_all 建表
+    from backend.core.db import Base
+
+    engine = create_engine(url)
+    try:
+        if reuse and dataset_loaded(engine, generator.fingerprint):
+            print(f"复用已有数据集 {generator.fingerprint}")
+            return
+        Base.metadata.create_all(engine)
+        began = time.perf_counter()
+        counts = load_dataset(engine, generator)
+        print(f"数据集写入完成（{time.perf_counter() - began:.1f}s）: {counts}")
+    finally:
+        engine.dispose()
+
+
+def _wait_until_ready(server: subprocess.Popen, host: str) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"服务启动失败，退出码 {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"{host}/healthz", timeout=2):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    raise RuntimeError(f"服务在 {STARTUP_TIMEOUT} 秒内未就绪")
+
+
+def start_server(env: Dict[str, str], port: int, workers: int) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning"]
+    server = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env)
+    try:
+        _wait_until_ready(server, f"http://127.0.0.1:{port}")
+    except RuntimeError:
+        server.terminate()
+        server.wait(timeout=10)
+        raise
+    return server
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.terminate()
+    try:
+        server.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="按角色混合流量对本地服务做负载测试")
+    parser.add_argument("--users", "-u", type=int, default=50, help="并发用户数，默认 50")
+    parser.add_argument("--spawn-rate", "-r", type=float, default=10, help="每秒启动的用户数，默认 10")
+    parser.add_argument("--run-time", "-t", default="2m", help="运行时长，如 30s、2m，默认 2m")
+    parser.add_argument("--mix", default=os.environ.get("LOAD_MIX", DEFAULT_MIX), help=f"角色比例，默认 {DEFAULT_MIX}")
+    parser.add_argument("--scale", default=os.environ.get("BENCHMARK_SCALE", "10k"), help="数据规模，默认 10k")
+    parser.add_argument("--seed", type=int, default=int(os.environ.get("BENCHMARK_SEED", DEFAULT_SEED)), help="随机种子")
+    parser.add_argument("--database-url", help="服务使用的数据库，默认数据目录下的 SQLite 文件")
+    parser.add_argument("--data-dir", type=Path, default=Path(".benchmarks"), help="数据与报告目录，默认 .benchmarks")
+    parser.add_argument("--reuse-dataset", action="store_true", help="数据集标记一致时不重新写入")
+    parser.add_argument("--host", help="压测已在运行的服务（不准备数据、不启动 uvicorn）")
+    parser.add_argument("--port", type=int, default=8765, help="启动 uvicorn 的端口，默认 8765")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn 工作进程数，默认 1")
+    parser.add_argument("--keep-rate-limit", action="store_true", help="保留 API 限流（默认压测时关闭）")
+    parser.add_argument("--report-json", type=Path, help="JSON 报告路径，默认 <data-dir>/load-latest.json")
+    parser.add_argument("--html", type=Path, help="HTML 报告路径，默认 <data-dir>/load-latest.html")
+    parser.add_argument("--baseline", type=Path, help="与之比对的负载测试 JSON 报告")
+    parser.add_argument("--threshold", type=float, default=10.0, help="回归阈值（百分比），默认 10")
+    parser.add_argument("--stat", choices=STATS + PERCENTILES, default="p95", help="比对的统计量，默认 p95")
+    args = parser.parse_args(argv)
+    try:
+        parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    generator = DatasetGenerator(parse_scale(args.scale), seed=args.seed)
+    args.data_dir.mkdir(parents=True, exist_ok=True)
+    url = args.database_url or f"sqlite:///{args.data_dir / f'load-{generator.scale.spend_rows}-{generator.seed}.db'}"
+    report_json = args.report_json or args.data_dir / "load-latest.json"
+    html = args.html or args.data_dir / "load-latest.html"
+
+    env = dict(os.environ)
+    env.update(
+        BENCHMARK_SCALE=str(generator.scale.spend_rows),
+        BENCHMARK_SEED=str(generator.seed),
+        BENCHMARK_DATABASE_URL=url,
+        DATABASE_URL=url,
+        LOAD_MIX=args.mix,
+        LOAD_REPORT_JSON=str(report_json),
+        # 服务入口使用 backend 目录下的相对导入，新模块使用 backend. 前缀
+        PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT_DIR), str(BACKEND_DIR), env.get("PYTHONPATH")])),
+    )
+    if not args.keep_rate_limit:
+        env["RATE_LIMIT_ENABLED"] = "false"
+    os.environ.update(DATABASE_URL=url)
+
+    server = None
+    host = args.host
+    if host is None:
+        prepare_database(url, generator, args.reuse_dataset)
+        server = start_server(env, args.port, args.workers)
+        host = f"http://127.0.0.1:{args.port}"
+    # 避免把上一次运行的报告当作本次结果
+    report_json.unlink(missing_ok=True)
+    try:
+        cmd = [sys.executable, "-m", "locust", "-f", str(LOCUSTFILE), "--headless", "--only-summary",
+               "--host", host, "-u", str(args.users), "-r", str(args.spawn_rate), "-t", args.run_time,
+               "--html", str(html)]
+        # 有失败请求时 locust 以 1 退出，失败率已记录在报告中
+        subprocess.run(cmd, cwd=ROOT_DIR, env=env)
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    if not report_json.exists():
+        print("未生成负载测试报告")
+        return 1
+    print(f"报告: {report_json}，{html}")
+    if args.baseline is None:
+        return 0
+    return compare([str(args.baseline), str(report_json), "--threshold", str(args.threshold), "--stat", args.stat])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import Column, Date, ForeignKey, Integer, Numeric, String, create_engine, update
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from backend.models import AdSpendDaily
+from backend.services import account_metrics
+
+Base = declarative_base()
+
+
+class _Account(Base):
+    __tablename__ = "ad_accounts"
+
+    id = Column(Integer, primary_key=True)
+    total_spend = Column(Numeric(15, 2), default=0)
+    total_leads = Column(Integer, default=0)
+    avg_cpl = Column(Numeric(10, 2))
+    best_cpl = Column(Numeric(10, 2))
+
+
+class _Report(Base):
+    __tablename__ = "metric_reports"
+
+    id = Column(Integer, primary_key=True)
+    ad_account_id = Column(Integer, ForeignKey("ad_accounts.id"), nullable=False)
+    report_date = Column(Date, nullable=False)
+    spend = Column(Numeric(18, 2), nullable=False)
+    leads_count = Column(Integer, nullable=False)
+    status = Column(String, default="pending")
+
+
+@pytest.fixture(autouse=True)
+def report_source():
+    # 累计列只能有一种明细来源，测试期间以 _Report 替换消耗明细，结束后恢复
+    previous = account_metrics.unregister_metrics_source(AdSpendDaily)
+    source = account_metrics.MetricsSource(_Report, status_attr="status", counted_statuses=("approved",))
+    account_metrics.register_metrics_source(source)
+    yield source
+    account_metrics.unregister_metrics_source(_Report)
+    if previous is not None:
+        account_metrics.register_metrics_source(previous)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([_Account(id=1), _Account(id=2)])
+    session.commit()
+    yield session
+    session.close()
+
+
+def _metrics(session, account_id):
+    session.expire_all()
+    account = session.get(_Account, account_id)
+    return account.total_spend, account.total_leads, account.avg_cpl, account.best_cpl
+
+
+def _report(account_id, day, spend, leads, status="approved"):
+    return _Report(
+        ad_account_id=account_id,
+        report_date=date(2024, 1, 1) + timedelta(days=day),
+        spend=Decimal(spend),
+        leads_count=leads,
+        status=status,
+    )
+
+
+def test_new_rows_apply_deltas_in_same_transaction(session) -> None:
+    session.add_all([_report(1, 0, "100", 10), _report(1, 1, "30", 5), _report(1, 2, "999", 1, status="pending")])
+    session.flush()
+    assert _metrics(session, 1) == (Decimal("130.00"), 15, Decimal("8.67"), Decimal("6.00"))
+
+    session.rollback()
+    assert _metrics(session, 1) == (Decimal("0.00"), 0, None, None)
+
+    session.add(_report(1, 0, "100", 10))
+    session.commit()
+    session.add(_report(1, 1, "20", 5))
+    session.commit()
+    assert _metrics(session, 1) == (Decimal("120.00"), 15, Decimal("8.00"), Decimal("4.00"))
+
+
+def test_updates_approvals_and_deletes_recompute_accounts(session) -> None:
+    cheap, pending = _report(1, 0, "10", 5), _report(1, 1, "90", 10, status="pending")
+    session.add_all([cheap, pending, _report(1, 2, "100", 10)])
+    session.commit()
+    assert _metrics(session, 1) == (Decimal("110.00"), 15, Decimal("7.33"), Decimal("2.00"))
+
+    # 审核通过后计入
+    pending.status = "approved"
+    session.commit()
+    assert _metrics(session, 1) == (Decimal("200.00"), 25, Decimal("8.00"), Decimal("2.00"))
+
+    # 删除最佳 CPL 的明细后重新取最小值
+    session.delete(cheap)
+    session.commit()
+    assert _metrics(session, 1) == (Decimal("190.00"), 20, Decimal("9.50"), Decimal("9.00"))
+
+    # 改挂账户时新旧账户都更新
+    pending.ad_account_id = 2
+    session.commit()
+    assert _metrics(session, 1) == (Decimal("100.00"), 10, Decimal("10.00"), Decimal("10.00"))
+    assert _metrics(session, 2) == (Decimal("90.00"), 10, Decimal("9.00"), Decimal("9.00"))
+
+
+def test_bulk_writes_and_drift_are_reconciled(session) -> None:
+    session.add_all([_report(1, 0, "50", 5), _report(2, 0, "40", 4)])
+    session.commit()
+
+    session.query(_Report).filter(_Report.ad_account_id == 2).delete(synchronize_session=False)
+    session.commit()
+    assert _metrics(session, 2) == (Decimal("0.00"), 0, None, None)
+
+    # 绕过明细直接改坏的累计值由校准修复，未漂移的账户不写回
+    session.execute(update(_Account).where(_Account.id == 1).values(total_spend=1, avg_cpl=None))
+    session.commit()
+    assert account_metrics.reconcile_account_metrics(session, _Report, batch_size=1) == 1
+    session.commit()
+    assert _metrics(session, 1) == (Decimal("50.00"), 5, Decimal("10.00"), Decimal("10.00"))
+    assert account_metrics.reconcile_account_metrics(session, _Report) == 0
+
+
+def test_second_metrics_source_is_rejected(report_source) -> None:
+    with pytest.raises(ValueError):
+        account_metrics.register_metrics_source(account_metrics.MetricsSource(AdSpendDaily))
+    # 重复登记同一来源不受影响
+    account_metrics.register_metrics_source(report_source)
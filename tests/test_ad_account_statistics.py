@@ -0,0 +1,162 @@
+import asyncio
+import random
+import statistics
+import time
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from core.database import Base
+from models.ad_account import AccountAlert, AdAccount
+from models.project import Project
+from services import ad_account_service, permission_scope
+
+AdAccountService = ad_account_service.AdAccountService
+
+STATUSES = ["new", "testing", "active", "suspended", "dead", "archived"]
+PLATFORMS = ["facebook", "google", "tiktok"]
+
+
+def _seed(count: int, seed: int = 1):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    rnd = random.Random(seed)
+    with engine.begin() as conn:
+        conn.execute(insert(Project), [{"id": i, "name": f"p{i}", "account_manager_id": i % 5} for i in range(1, 21)])
+        accounts = []
+        for index in range(1, count + 1):
+            cpl = Decimal(rnd.randint(100, 9999)) / 100 if rnd.random() > 0.1 else None
+            accounts.append({
+                "id": index,
+                "account_id": f"act_{index}",
+                "name": f"账户{index}",
+                "platform": rnd.choice(PLATFORMS),
+                "project_id": rnd.randint(1, 20),
+                "channel_id": rnd.randint(1, 5),
+                "assigned_user_id": rnd.randint(1, 50),
+                "status": rnd.choice(STATUSES),
+                "total_spend": Decimal(rnd.randint(0, 10 ** 6)) / 100,
+                "total_leads": rnd.randint(0, 5000),
+                "avg_cpl": cpl,
+                "best_cpl": cpl / 2 if cpl else None,
+                "daily_budget": Decimal("100"),
+                "total_budget": Decimal(rnd.randint(1000, 10 ** 5)),
+                "created_by": 1,
+            })
+        conn.execute(insert(AdAccount), accounts)
+        conn.execute(insert(AccountAlert), [
+            {
+                "account_id": rnd.randint(1, count),
+                "alert_type": "spend",
+                "severity": rnd.choice(["low", "critical"]),
+                "title": "消耗异常",
+                "message": "消耗超出阈值",
+                "status": rnd.choice(["active", "resolved"]),
+            }
+            for _ in range(max(count // 10, 1))
+        ])
+    return engine, accounts
+
+
+def _query_counter(engine) -> list:
+    counter = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_args):
+        counter[0] += 1
+
+    return counter
+
+
+@pytest.fixture(autouse=True)
+def _clear_statistics_cache():
+    ad_account_service._statistics_cache.clear()
+    permission_scope._scope_cache.clear()
+    yield
+    ad_account_service._statistics_cache.clear()
+    permission_scope._scope_cache.clear()
+
+
+def _statistics(session_factory, **kwargs):
+    db = session_factory()
+    try:
+        return asyncio.run(AdAccountService(db).get_account_statistics(**kwargs))
+    finally:
+        db.close()
+
+
+def test_account_statistics_matches_raw_rows_in_three_queries() -> None:
+    engine, accounts = _seed(500)
+    session_factory = sessionmaker(bind=engine)
+    counter = _query_counter(engine)
+
+    result = _statistics(session_factory, platform="google")
+    assert counter[0] == 3
+
+    rows = [row for row in accounts if row["platform"] == "google"]
+    assert result.total_accounts == len(rows)
+    assert result.active_accounts == sum(row["status"] == "active" for row in rows)
+    assert result.total_leads == sum(row["total_leads"] for row in rows)
+    assert result.total_spend == sum(row["total_spend"] for row in rows)
+    assert {item["status"]: item["count"] for item in result.status_distribution} == {
+        status: sum(row["status"] == status for row in rows) for status in STATUSES
+    }
+    assert result.platform_distribution == [{"platform": "google", "count": len(rows)}]
+
+    top = sorted(rows, key=lambda row: (-row["total_leads"], row["id"]))[:10]
+    assert [item["id"] for item in result.top_performers] == [row["id"] for row in top]
+    assert all(
+        item["id"] in {row["id"] for row in rows if row["status"] == "active"}
+        for item in result.low_performers
+    )
+    assert len(result.low_performers) == 10
+
+
+def test_account_statistics_cached_per_scope_and_invalidated() -> None:
+    engine, _ = _seed(200)
+    session_factory = sessionmaker(bind=engine)
+    counter = _query_counter(engine)
+
+    first = _statistics(session_factory)
+    counter[0] = 0
+    assert _statistics(session_factory) == first
+    assert counter[0] == 0
+
+    # 不同角色范围不共享缓存
+    buyer = _statistics(session_factory, current_user_id=3, user_role="media_buyer")
+    # 另有 2 次查询解析投手的数据范围
+    assert counter[0] == 5
+    assert buyer.total_accounts < first.total_accounts
+
+    ad_account_service.invalidate_account_statistics()
+    counter[0] = 0
+    _statistics(session_factory)
+    assert counter[0] == 3
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+def test_account_statistics_benchmark_100k_accounts() -> None:
+    engine, _ = _seed(100_000)
+    session_factory = sessionmaker(bind=engine)
+    counter = _query_counter(engine)
+
+    samples = []
+    for _ in range(3):
+        ad_account_service._statistics_cache.clear()
+        counter[0] = 0
+        start = time.perf_counter()
+        _statistics(session_factory)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert counter[0] == 3
+    cold_ms = statistics.median(samples)
+
+    start = time.perf_counter()
+    for _ in range(100):
+        _statistics(session_factory)
+    cached_ms = (time.perf_counter() - start) * 10
+
+    assert cold_ms < 2000, f"uncached statistics {cold_ms:.1f}ms at 100k accounts"
+    assert cached_ms < 5, f"cached statistics {cached_ms:.2f}ms"
@@ -1,12 +1,14 @@
+import json
 from datetime import date, timedelta
 from decimal import Decimal
 from uuid import UUID, uuid4
 
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 from backend.core.error_codes import ErrorCode
-from backend.models import AdAccount, Channel, Project, User
+from backend.models import AdAccount, Channel, Log, Project, User
 
 
 def _create_account(db: Session, user_id: UUID) -> AdAccount:
@@ -179,3 +181,278 @@ def test_list_and_detail_reports(client: TestClient, db_session: Session, test_u
     detail = detail_resp.json()["data"]
     assert detail["id"] == report_id
 
+
+
+def test_anomaly_uses_rolling_window(client: TestClient, db_session: Session, test_user) -> None:
+    from backend.services.anomaly_service import rolling_state_cache
+
+    user_id = UUID(test_user.id)
+    account = _create_account(db_session, user_id)
+    start = date.today() - timedelta(days=20)
+
+    for offset in range(14):
+        payload = {
+            "ad_account_id": str(account.id),
+            "date": (start + timedelta(days=offset)).isoformat(),
+            "spend": str(100 + (offset % 3) * 5),
+            "leads_count": 10,
+        }
+        assert client.post("/api/v1/adspend/report", json=payload).status_code == 201
+
+    # 历史记录由会话事件追加到缓存状态，不需要再次查询
+    state = rolling_state_cache.get(account.id).state
+    assert len(state.dates) == 14
+
+    spike = {
+        "ad_account_id": str(account.id),
+        "date": (start + timedelta(days=14)).isoformat(),
+        "spend": "300.00",
+        "leads_count": 10,
+    }
+    data = client.post("/api/v1/adspend/report", json=spike).json()["data"]
+    assert data["is_anomaly"] is True
+    assert data["anomaly_reason"].startswith("SPEND_MAD_")
+
+    normal = dict(spike, date=(start + timedelta(days=15)).isoformat(), spend="105.00")
+    data = client.post("/api/v1/adspend/report", json=normal).json()["data"]
+    assert data["is_anomaly"] is False
+
+
+def test_recompute_anomalies_bulk(client: TestClient, db_session: Session, test_user) -> None:
+    from backend.models import AdSpendDaily
+
+    user_id = UUID(test_user.id)
+    account = _create_account(db_session, user_id)
+    start = date(2024, 1, 1)
+    rows = [
+        AdSpendDaily(
+            id=uuid4(),
+            ad_account_id=account.id,
+            user_id=user_id,
+            date=start + timedelta(days=offset),
+            spend=Decimal("500.00") if offset == 10 else Decimal("100.00") + offset,
+            leads_count=10,
+            cost_per_lead=Decimal("10.00"),
+            is_anomaly=False,
+        )
+        for offset in range(12)
+    ]
+    db_session.add_all(rows)
+    db_session.commit()
+
+    response = client.post(
+        "/api/v1/adspend/anomalies/recompute",
+        json={"start_date": "2024-01-01", "end_date": "2024-01-31", "ad_account_ids": [str(account.id)]},
+    )
+    assert response.status_code == 200
+    result = response.json()["data"]
+    assert result["scanned"] == 12
+    assert result["updated"] >= 1
+
+    db_session.expire_all()
+    spike = db_session.query(AdSpendDaily).filter(AdSpendDaily.id == rows[10].id).one()
+    assert spike.is_anomaly is True
+    assert spike.anomaly_reason.startswith("SPEND_")
+
+
+def test_recompute_anomalies_requires_manager_role(client: TestClient, db_session: Session) -> None:
+    from backend.core.security import AuthenticatedUser, get_current_user
+
+    original_dependency = client.app.dependency_overrides[get_current_user]
+
+    def media_buyer():
+        return AuthenticatedUser(id=str(uuid4()), role="media_buyer", email="buyer@example.com", raw_claims={})
+
+    try:
+        client.app.dependency_overrides[get_current_user] = media_buyer
+        response = client.post(
+            "/api/v1/adspend/anomalies/recompute",
+            json={"start_date": "2024-01-01", "end_date": "2024-01-31"},
+        )
+        assert response.status_code == 403
+    finally:
+        client.app.dependency_overrides[get_current_user] = original_dependency
+
+
+def test_history_outside_window_is_not_compared(client: TestClient, db_session: Session, test_user) -> None:
+    """上一条记录早于 28 天窗口时不再按变化率标记（原实现与任意早的上一条记录比较）"""
+    user_id = UUID(test_user.id)
+    account = _create_account(db_session, user_id)
+    today = date.today()
+
+    old = {
+        "ad_account_id": str(account.id),
+        "date": (today - timedelta(days=40)).isoformat(),
+        "spend": "100.00",
+        "leads_count": 10,
+    }
+    assert client.post("/api/v1/adspend/report", json=old).status_code == 201
+
+    spike = dict(old, date=today.isoformat(), spend="500.00")
+    data = client.post("/api/v1/adspend/report", json=spike).json()["data"]
+    assert data["is_anomaly"] is False
+    assert data["anomaly_reason"] is None
+
+
+def test_bulk_upsert_reports(client: TestClient, db_session: Session, test_user) -> None:
+    from backend.models import AdSpendDaily
+
+    user_id = UUID(test_user.id)
+    account = _create_account(db_session, user_id)
+    start = date(2024, 2, 1)
+    rows = [
+        {
+            "ad_account_id": str(account.id),
+            "date": (start + timedelta(days=offset)).isoformat(),
+            "spend": "100.00",
+            "leads_count": 10,
+        }
+        for offset in range(30)
+    ]
+    rows.append({"ad_account_id": str(uuid4()), "date": "2024-02-01", "spend": "10.00", "leads_count": 1})
+    rows.append({"ad_account_id": str(account.id), "date": "2024-03-05", "spend": "-1", "leads_count": 1})
+
+    response = client.post("/api/v1/adspend/reports/bulk", json=rows)
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["summary"] == {"total": 32, "created": 30, "updated": 0, "failed": 2, "anomalies": 0}
+    assert data["results"][0]["status"] == "created"
+    assert data["results"][0]["cost_per_lead"] == "10.00"
+    assert data["results"][30]["error"] == "广告账户不存在"
+    assert data["results"][31]["status"] == "error"
+
+    # NDJSON 更新已有记录
+    ndjson = "\n".join(
+        json.dumps({"ad_account_id": str(account.id), "date": day, "spend": "50.00", "leads_count": 5})
+        for day in ("2024-02-01", "2024-02-02")
+    )
+    response = client.post(
+        "/api/v1/adspend/reports/bulk",
+        content=ndjson,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    result = response.json()["data"]["results"][0]
+    assert result["status"] == "updated"
+    assert result["id"] == data["results"][0]["id"]
+
+    record = db_session.query(AdSpendDaily).filter(AdSpendDaily.id == UUID(result["id"])).one()
+    db_session.refresh(record)
+    assert record.spend == Decimal("50.00")
+    assert db_session.query(AdSpendDaily).filter(AdSpendDaily.ad_account_id == account.id).count() == 30
+
+
+def test_bulk_upsert_without_on_conflict(client: TestClient, db_session: Session, test_user, monkeypatch) -> None:
+    from backend.models import AdSpendDaily
+    from backend.routers import ad_spend
+
+    # 不支持 ON CONFLICT 的方言走先查后写的分支
+    monkeypatch.setattr(ad_spend, "_upsert_ad_spend", ad_spend._upsert_ad_spend_by_lookup)
+    account = _create_account(db_session, UUID(test_user.id))
+    rows = [
+        {"ad_account_id": str(account.id), "date": day, "spend": "100.00", "leads_count": 10}
+        for day in ("2024-02-01", "2024-02-02")
+    ]
+    first = client.post("/api/v1/adspend/reports/bulk", json=rows).json()["data"]
+    assert first["summary"]["created"] == 2
+
+    rows[1].update(spend="96.00", leads_count=8)
+    rows.append({"ad_account_id": str(account.id), "date": "2024-02-03", "spend": "100.00", "leads_count": 10})
+    response = client.post("/api/v1/adspend/reports/bulk", json=rows)
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["summary"] == {"total": 3, "created": 1, "updated": 2, "failed": 0, "anomalies": 0}
+    assert [result["id"] for result in data["results"][:2]] == [result["id"] for result in first["results"]]
+
+    record = db_session.query(AdSpendDaily).filter(AdSpendDaily.id == UUID(data["results"][1]["id"])).one()
+    db_session.refresh(record)
+    assert (record.spend, record.leads_count, record.cost_per_lead) == (Decimal("96.00"), 8, Decimal("12.00"))
+    assert db_session.query(AdSpendDaily).filter(AdSpendDaily.ad_account_id == account.id).count() == 3
+
+
+def test_bulk_upsert_rejects_malformed_body(client: TestClient) -> None:
+    response = client.post(
+        "/api/v1/adspend/reports/bulk",
+        content="{not json",
+        headers={"Content-Type": "application/json"},
+    )
+    assert response.status_code == 400
+
+
+def test_submit_report_single_commit_with_log(client: TestClient, db_session: Session, test_user, engine) -> None:
+    user_id = UUID(test_user.id)
+    account = _create_account(db_session, user_id)
+
+    commits = []
+
+    def _count_commit(_conn) -> None:
+        commits.append(1)
+
+    event.listen(engine, "commit", _count_commit)
+    try:
+        response = client.post(
+            "/api/v1/adspend/report",
+            json={
+                "ad_account_id": str(account.id),
+                "date": date.today().isoformat(),
+                "spend": "100.00",
+                "leads_count": 10,
+            },
+        )
+    finally:
+        event.remove(engine, "commit", _count_commit)
+
+    assert response.status_code == 201
+    # 操作日志与日报在同一事务中提交
+    assert len(commits) == 1
+    entry = db_session.query(Log).filter(Log.action == "create_ad_spend_daily").one()
+    assert str(entry.target_id) == response.json()["data"]["id"]
+
+
+def test_cached_state_is_not_mutated_after_commit() -> None:
+    from backend.services import anomaly_service
+    from backend.services.anomaly_service import RollingSpendState, SpendAnomalyService
+
+    account_id = uuid4()
+    day = date(2024, 3, 1)
+    state = RollingSpendState(day - timedelta(days=28), [(day - timedelta(days=1), Decimal("100"))])
+    versions = anomaly_service._state_versions.tokens(
+        [anomaly_service.ALL_ACCOUNTS, anomaly_service._version_name(account_id)]
+    )
+    anomaly_service.rolling_state_cache.set(account_id, anomaly_service.CachedState(
+        versions[anomaly_service.ALL_ACCOUNTS], versions[anomaly_service._version_name(account_id)], state
+    ))
+    held = SpendAnomalyService(db=None).preload_states([account_id], day)[account_id]
+    assert held is state
+
+    class _Session:
+        info = {anomaly_service._PENDING_KEY: [("add", account_id, day, Decimal("120"))]}
+
+    anomaly_service._apply_spend_changes(_Session())
+
+    # 请求线程持有的旧状态不变，缓存换成追加后的新状态且版本号同步更新
+    assert held.dates == [day - timedelta(days=1)]
+    refreshed = SpendAnomalyService(db=None).preload_states([account_id], day + timedelta(days=1))[account_id]
+    assert refreshed is not held
+    assert refreshed.dates == [day - timedelta(days=1), day]
+
+
+def test_cached_state_dropped_when_other_process_wrote() -> None:
+    from backend.services import anomaly_service
+    from backend.services.anomaly_service import RollingSpendState
+
+    account_id = uuid4()
+    day = date(2024, 3, 1)
+    name = anomaly_service._version_name(account_id)
+    versions = anomaly_service._state_versions.tokens([anomaly_service.ALL_ACCOUNTS, name])
+    anomaly_service.rolling_state_cache.set(account_id, anomaly_service.CachedState(
+        versions[anomaly_service.ALL_ACCOUNTS], versions[name], RollingSpendState(day - timedelta(days=28))
+    ))
+    # 模拟其他进程的写入：版本号变化，而本进程没有收到对应记录
+    anomaly_service._state_versions.bump([name])
+
+    class _Session:
+        info = {anomaly_service._PENDING_KEY: [("add", account_id, day, Decimal("120"))]}
+
+    anomaly_service._apply_spend_changes(_Session())
+    assert anomaly_service.rolling_state_cache.get(account_id) is anomaly_service.MISSING
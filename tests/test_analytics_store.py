@@ -0,0 +1,275 @@
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from backend.core.config import get_settings
+from backend.models import AdAccount, AdSpendDaily, Project, User
+from backend.services import analytics_store
+
+duckdb = pytest.importorskip("duckdb")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "analytics_store_enabled", True)
+    monkeypatch.setattr(settings, "analytics_store_path", str(tmp_path / "analytics.duckdb"))
+    monkeypatch.setattr(settings, "analytics_min_days", 90)
+    return tmp_path / "analytics.duckdb"
+
+
+# ---------------------------------------------------------------------------
+# 独立的 SQLite 主库：只建副本需要的列，ledgers、daily_reports 不建表
+# ---------------------------------------------------------------------------
+
+_SOURCE_TABLES = [
+    "CREATE TABLE projects (id TEXT PRIMARY KEY, name TEXT)",
+    "CREATE TABLE ad_accounts (id TEXT PRIMARY KEY, project_id TEXT, name TEXT)",
+    """CREATE TABLE ad_spend_daily (
+        id TEXT PRIMARY KEY, ad_account_id TEXT, date DATE, spend NUMERIC, leads_count INTEGER, updated_at TIMESTAMP
+    )""",
+    """CREATE TABLE topup_requests (
+        id INTEGER PRIMARY KEY, project_id INTEGER, ad_account_id INTEGER, requested_by INTEGER, status TEXT,
+        requested_amount NUMERIC, created_at TIMESTAMP, updated_at TIMESTAMP
+    )""",
+]
+_START = date(2024, 1, 1)
+
+
+@pytest.fixture
+def source(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'source.db'}")
+    with engine.begin() as conn:
+        for ddl in _SOURCE_TABLES:
+            conn.execute(text(ddl))
+        conn.execute(text("INSERT INTO projects VALUES ('p1', 'Alpha'), ('p2', 'Beta')"))
+        conn.execute(text("INSERT INTO ad_accounts VALUES ('a1', 'p1', 'A1'), ('a2', 'p1', 'A2'), ('a3', 'p2', 'A3')"))
+        conn.execute(
+            text("INSERT INTO ad_spend_daily VALUES (:id, :account, :date, :spend, :leads, :updated_at)"),
+            [
+                {
+                    "id": f"{account}-{day}",
+                    "account": account,
+                    "date": _START + timedelta(days=day),
+                    "spend": str(Decimal("10.25") * (index + 1)),
+                    "leads": index + 1,
+                    # 每行的更新时间互不相同，最后一行水位最高
+                    "updated_at": datetime.combine(_START + timedelta(days=day + 1), datetime.min.time())
+                    + timedelta(hours=index),
+                }
+                for day in range(200)
+                for index, account in enumerate(("a1", "a2", "a3"))
+            ],
+        )
+        conn.execute(
+            text("INSERT INTO topup_requests VALUES (:id, :project, 1, :requester, 'pending', :amount, :at, :at)"),
+            [
+                {
+                    "id": index + 1,
+                    "project": 1 + index % 2,
+                    "requester": 10 + index % 3,
+                    "amount": str(Decimal("100.00") + index),
+                    "at": datetime(2024, 1, 1, 8) + timedelta(days=index * 3),
+                }
+                for index in range(120)
+            ],
+        )
+    yield engine
+    engine.dispose()
+
+
+_PERFORMANCE_SQL = """
+    SELECT p.id, p.name, sum(s.spend), sum(s.leads_count)
+    FROM ad_spend_daily s JOIN ad_accounts a ON a.id = s.ad_account_id JOIN projects p ON p.id = a.project_id
+    WHERE s.date >= :start AND s.date <= :end
+    GROUP BY p.id, p.name ORDER BY p.id
+"""
+
+
+def _performance(rows):
+    return sorted((row[0], row[1], Decimal(str(row[2])).quantize(Decimal("0.01")), int(row[3])) for row in rows)
+
+
+def test_covers_long_ranges_only(store, monkeypatch) -> None:
+    assert not analytics_store.covers(date(2024, 1, 1), date(2024, 3, 30))
+    assert analytics_store.covers(date(2024, 1, 1), date(2024, 3, 31))
+    assert analytics_store.covers(date(2024, 1, 1), None, today=date(2024, 6, 1))
+    assert analytics_store.covers(None, None)
+
+    monkeypatch.setattr(get_settings(), "analytics_store_enabled", False)
+    assert not analytics_store.covers(date(2020, 1, 1), date(2024, 1, 1))
+
+
+def test_incremental_sync_reads_only_changed_rows(source, store) -> None:
+    with source.connect() as conn:
+        counts = analytics_store.sync(conn)
+    assert counts == {
+        "projects": 2, "ad_accounts": 3, "ad_spend_daily": 600,
+        "daily_reports": 0, "ledgers": 0, "topup_requests": 120,
+    }
+
+    changed_at = datetime.combine(_START + timedelta(days=400), datetime.min.time())
+    with source.begin() as conn:
+        conn.execute(text("UPDATE ad_spend_daily SET spend = 999, updated_at = :at WHERE id = 'a1-0'"), {"at": changed_at})
+        conn.execute(text(
+            "INSERT INTO ad_spend_daily VALUES ('a3-new', 'a3', '2024-07-01', 5, 1, :at)"
+        ), {"at": changed_at})
+
+    with source.connect() as conn:
+        counts = analytics_store.sync(conn, ["ad_spend_daily"])
+    # 回看窗口只覆盖上次水位所在的最后一行，加上变更的两行
+    assert counts == {"ad_spend_daily": 3}
+
+    with duckdb.connect(str(store), read_only=True) as conn:
+        assert conn.execute("SELECT count(*), count(DISTINCT id) FROM ad_spend_daily").fetchone() == (601, 601)
+        assert conn.execute("SELECT spend FROM ad_spend_daily WHERE id = 'a1-0'").fetchone() == (Decimal("999.00"),)
+
+    start, end = _START, _START + timedelta(days=365)
+    with source.connect() as conn:
+        expected = _performance(conn.execute(text(_PERFORMANCE_SQL), {"start": start, "end": end}))
+    assert _performance(analytics_store.project_performance(start, end)) == expected
+    assert _performance(analytics_store.project_performance(start, end, "p2")) == [expected[1]]
+
+
+def test_queries_fall_back_when_store_missing_or_stale(source, store, monkeypatch) -> None:
+    start, end = _START, _START + timedelta(days=365)
+    assert analytics_store.project_performance(start, end) is None
+
+    with source.connect() as conn:
+        analytics_store.sync(conn, ["ad_spend_daily"])
+    # 维表尚未同步
+    assert analytics_store.project_performance(start, end) is None
+
+    with source.connect() as conn:
+        analytics_store.sync(conn, ["projects", "ad_accounts"])
+    assert analytics_store.project_performance(start, end) is not None
+
+    later = datetime.utcnow() + timedelta(minutes=get_settings().analytics_max_staleness_minutes + 1)
+    monkeypatch.setattr(analytics_store, "_utcnow", lambda: later)
+    assert analytics_store.project_performance(start, end) is None
+
+
+def test_topup_monthly_statistics_respects_scope(source, store) -> None:
+    with source.connect() as conn:
+        analytics_store.sync(conn, ["topup_requests"])
+        expected = conn.execute(text("""
+            SELECT CAST(strftime('%Y', created_at) AS INTEGER), CAST(strftime('%m', created_at) AS INTEGER),
+                   count(id), sum(requested_amount)
+            FROM topup_requests
+            WHERE created_at >= '2024-02-01' AND created_at <= '2024-09-01' AND requested_by = 11 AND project_id IN (2)
+            GROUP BY 1, 2 ORDER BY 1, 2
+        """)).all()
+
+    rows = analytics_store.topup_monthly_statistics(
+        datetime(2024, 2, 1), datetime(2024, 9, 1), project_ids=[2], requested_by=11
+    )
+    assert [(row.year, row.month, row.count, float(row.amount)) for row in rows] == [
+        (year, month, count, float(amount)) for year, month, count, amount in expected
+    ]
+    assert len(analytics_store.topup_monthly_statistics(None, None, limit=3)) == 3
+    assert analytics_store.topup_monthly_statistics(None, None, project_ids=[]) == []
+
+
+# ---------------------------------------------------------------------------
+# 报表路由：长区间经副本汇总，短区间仍查主库
+# ---------------------------------------------------------------------------
+
+def _seed_spend(db: Session, accounts: int, days: int, start: date):
+    user_id = uuid4()
+    db.add(User(id=user_id, email="analytics@example.com", name="Analytics", role="admin"))
+    project_ids = [uuid4(), uuid4(), uuid4()]
+    db.add_all(
+        Project(id=project_id, name=f"Project {index}", currency="USD", status="active",
+                created_by=user_id, updated_by=user_id)
+        for index, project_id in enumerate(project_ids)
+    )
+    account_ids = [uuid4() for _ in range(accounts)]
+    db.add_all(
+        AdAccount(id=account_id, name=f"Account {index}", project_id=project_ids[index % 3], channel_id=uuid4(),
+                  assigned_user_id=user_id, status="active", created_by=user_id, updated_by=user_id)
+        for index, account_id in enumerate(account_ids)
+    )
+    db.commit()
+
+    db.execute(AdSpendDaily.__table__.insert(), [
+        {
+            "id": uuid4(),
+            "ad_account_id": account_id,
+            "user_id": user_id,
+            "date": start + timedelta(days=day),
+            "spend": Decimal(index % 7 + day % 11) + Decimal("0.50"),
+            "leads_count": (index + day) % 4,
+            "cost_per_lead": Decimal("0"),
+            "is_anomaly": False,
+        }
+        for index, account_id in enumerate(account_ids)
+        for day in range(days)
+    ])
+    db.commit()
+    return user_id, account_ids
+
+
+def _performance_rows(rows):
+    return sorted(
+        (row.project_id, row.project_name, Decimal(row.total_spend).quantize(Decimal("0.01")), int(row.total_leads))
+        for row in rows
+    )
+
+
+def test_collect_performance_routes_long_ranges_to_store(db_session: Session, store, monkeypatch) -> None:
+    from backend.routers.reports import _collect_performance
+
+    user_id, account_ids = _seed_spend(db_session, accounts=6, days=200, start=_START)
+    year_end = _START + timedelta(days=364)
+    monkeypatch.setattr(get_settings(), "analytics_store_enabled", False)
+    expected = _performance_rows(_collect_performance(db_session, _START, year_end))
+
+    monkeypatch.setattr(get_settings(), "analytics_store_enabled", True)
+    analytics_store.sync(db_session.connection())
+    db_session.commit()
+    assert _performance_rows(_collect_performance(db_session, _START, year_end)) == expected
+
+    # 同步之后写入的消耗：长区间读副本暂不可见，短区间直接查主库可见
+    late = _START + timedelta(days=250)
+    db_session.add(AdSpendDaily(
+        id=uuid4(), ad_account_id=account_ids[0], user_id=user_id, date=late, spend=Decimal("1000.00"),
+        leads_count=0, cost_per_lead=Decimal("0"), is_anomaly=False,
+    ))
+    db_session.commit()
+    assert _performance_rows(_collect_performance(db_session, _START, year_end)) == expected
+    short = _performance_rows(_collect_performance(db_session, late, late + timedelta(days=30)))
+    assert [row[2] for row in short] == [Decimal("1000.00")]
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+def test_year_over_year_project_aggregates_benchmark(db_session: Session, store, monkeypatch) -> None:
+    """两年消耗明细上按项目逐年汇总：列式副本与主库结果一致，且耗时更短"""
+    from backend.routers.reports import _collect_performance
+
+    start = date(2023, 1, 1)
+    _seed_spend(db_session, accounts=200, days=730, start=start)
+    analytics_store.sync(db_session.connection())
+    db_session.commit()
+    years = [(start, date(2023, 12, 31)), (date(2024, 1, 1), date(2024, 12, 31))]
+
+    def _run(enabled: bool):
+        monkeypatch.setattr(get_settings(), "analytics_store_enabled", enabled)
+        samples, result = [], None
+        for _ in range(5):
+            began = time.perf_counter()
+            result = [_performance_rows(_collect_performance(db_session, first, last)) for first, last in years]
+            samples.append(time.perf_counter() - began)
+        return statistics.median(samples), result
+
+    primary_time, primary = _run(False)
+    store_time, columnar = _run(True)
+    print(f"year-over-year: primary {primary_time * 1000:.1f}ms, columnar {store_time * 1000:.1f}ms")
+    assert columnar == primary
+    assert store_time < primary_time
@@ -0,0 +1,232 @@
+import os
+import re
+import statistics
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, desc, event, insert, inspect, text
+from sqlalchemy.dialects.postgresql import INET
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from core.database import Base
+from models.ad_account import AdAccount
+from models.channel import Channel  # noqa: F401  ad_accounts 外键引用
+from models.daily_report import DailyReport
+from models.project import Project  # noqa: F401
+from models.user import User
+from schemas.daily_report import DailyReportQueryParams
+from services import daily_report_service
+
+DailyReportService = daily_report_service.DailyReportService
+
+
+@compiles(INET, "sqlite")
+def compile_inet_sqlite(*_args, **_kwargs):
+    return "VARCHAR(45)"
+
+
+ADMIN = SimpleNamespace(id=1, role="admin")
+BUYER = SimpleNamespace(id=2, role="media_buyer")
+ACCOUNTS = 50
+START = date(2024, 1, 1)
+
+
+def _seed(engine, days: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1}, {"id": 2}, {"id": 3}])
+        conn.execute(insert(AdAccount), [
+            {
+                "id": index,
+                "account_id": f"act_{index}",
+                "name": f"账户{index}",
+                "platform": "facebook",
+                "project_id": 1,
+                "channel_id": 1,
+                "assigned_user_id": 2,
+                "status": "active",
+                "created_by": 1,
+            }
+            for index in range(1, ACCOUNTS + 1)
+        ])
+        conn.execute(insert(DailyReport), [
+            {
+                "report_date": START + timedelta(days=day),
+                "ad_account_id": account,
+                "status": "approved" if account % 3 else "pending",
+                "created_by": 2 if account % 2 else 3,
+                "audit_user_id": 1,
+                "spend": 10,
+            }
+            for day in range(days)
+            for account in range(1, ACCOUNTS + 1)
+        ])
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    _seed(engine, days=10)
+    return engine
+
+
+def _capture(engine) -> list:
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _record(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    return statements
+
+
+def test_list_counts_bare_table_and_pages_by_id(engine) -> None:
+    statements = _capture(engine)
+    db = sessionmaker(bind=engine)()
+    params = DailyReportQueryParams(status="approved")
+
+    reports, total = DailyReportService(db).get_daily_reports(params, ADMIN, page=2, page_size=7)
+
+    expected = db.query(DailyReport.id).filter(DailyReport.status == "approved").order_by(
+        desc(DailyReport.report_date), desc(DailyReport.id)
+    ).offset(7).limit(7).all()
+    assert [report.id for report in reports] == [row.id for row in expected]
+    assert total == 10 * len([a for a in range(1, ACCOUNTS + 1) if a % 3])
+
+    count_sql, page_sql = statements[0], statements[1]
+    assert "count" in count_sql.lower() and "JOIN" not in count_sql.upper()
+    assert "JOIN" not in page_sql.upper()
+
+    # 关联实体已批量加载，关闭会话后仍可访问
+    db.close()
+    assert all(
+        not {"ad_account", "creator", "auditor"} & inspect(report).unloaded
+        for report in reports
+    )
+    assert {report.ad_account.id for report in reports} <= set(range(1, ACCOUNTS + 1))
+
+
+def test_list_without_total_skips_count(engine) -> None:
+    db = sessionmaker(bind=engine)()
+    statements = _capture(engine)
+
+    reports, total = DailyReportService(db).get_daily_reports(
+        DailyReportQueryParams(), BUYER, page=1, page_size=20, with_total=False
+    )
+    assert total is None
+    assert len(reports) == 20 and {report.created_by for report in reports} == {2}
+    assert not any("count(" in statement.lower() for statement in statements)
+
+    empty, total = DailyReportService(db).get_daily_reports(DailyReportQueryParams(), BUYER, page=1000)
+    assert empty == [] and total == 10 * (ACCOUNTS // 2)
+    db.close()
+
+
+# ---------------------------------------------------------------------------
+# 基准：500 万行日报。设置 BENCHMARK_DATABASE_URL（PostgreSQL）时以 EXPLAIN ANALYZE 的执行时间为准，
+# 否则在 SQLite 上以墙钟时间与查询计划对比
+# ---------------------------------------------------------------------------
+
+BENCHMARK_ROWS = int(os.environ.get("BENCHMARK_DAILY_REPORT_ROWS", 5_000_000))
+BENCHMARK_ACCOUNTS = 500
+
+_SEED_SQL = {
+    "postgresql": """
+        INSERT INTO daily_reports (report_date, ad_account_id, status, created_by, audit_user_id, spend)
+        SELECT DATE '2000-01-01' + (n / {accounts}), n % {accounts} + 1,
+               CASE WHEN n % 3 = 0 THEN 'pending' ELSE 'approved' END, 2 + n % 2, 1, 10
+        FROM generate_series(0, {rows} - 1) AS n
+    """,
+    "sqlite": """
+        WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < {rows} - 1)
+        INSERT INTO daily_reports (report_date, ad_account_id, status, created_by, audit_user_id, spend)
+        SELECT date('2000-01-01', '+' || (n / {accounts}) || ' days'), n % {accounts} + 1,
+               CASE WHEN n % 3 = 0 THEN 'pending' ELSE 'approved' END, 2 + n % 2, 1, 10
+        FROM seq
+    """,
+}
+
+
+def _legacy_page(db, params, page: int, page_size: int):
+    """改造前的实现：带三个 joinedload 的查询上直接 count 与分页"""
+    query = db.query(DailyReport).options(
+        joinedload(DailyReport.ad_account),
+        joinedload(DailyReport.creator),
+        joinedload(DailyReport.auditor),
+    )
+    conditions = DailyReportService(db)._report_conditions(params, ADMIN)
+    if conditions:
+        query = query.filter(*conditions)
+    total = query.count()
+    reports = query.order_by(desc(DailyReport.report_date)).offset((page - 1) * page_size).limit(page_size).all()
+    return reports, total
+
+
+def _explain_ms(db, sql: str) -> float:
+    plan = "\n".join(row[0] for row in db.execute(text(f"EXPLAIN ANALYZE {sql}")))
+    return float(re.search(r"Execution Time: ([\d.]+) ms", plan).group(1))
+
+
+@pytest.fixture(scope="module")
+def benchmark_engine():
+    url = os.environ.get("BENCHMARK_DATABASE_URL", "sqlite://")
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1}, {"id": 2}, {"id": 3}])
+        conn.execute(insert(AdAccount), [
+            {
+                "id": index, "account_id": f"act_{index}", "name": f"账户{index}", "platform": "facebook",
+                "project_id": 1, "channel_id": 1, "assigned_user_id": 2, "status": "active", "created_by": 1,
+            }
+            for index in range(1, BENCHMARK_ACCOUNTS + 1)
+        ])
+        conn.execute(text(_SEED_SQL[engine.dialect.name].format(rows=BENCHMARK_ROWS, accounts=BENCHMARK_ACCOUNTS)))
+        conn.execute(text("ANALYZE daily_reports" if engine.dialect.name == "postgresql" else "ANALYZE"))
+    yield engine
+    if engine.dialect.name != "sqlite":
+        Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+def test_list_benchmark_5m_daily_reports(benchmark_engine) -> None:
+    db = sessionmaker(bind=benchmark_engine)()
+    service = DailyReportService(db)
+    params = DailyReportQueryParams(status="approved")
+
+    def _timed(func):
+        samples = []
+        for _ in range(3):
+            start = time.perf_counter()
+            reports, _total = func()
+            samples.append((time.perf_counter() - start) * 1000)
+            assert len(reports) == 20
+        return statistics.median(samples)
+
+    new_ms = _timed(lambda: service.get_daily_reports(params, ADMIN, page=3, page_size=20))
+    legacy_ms = _timed(lambda: _legacy_page(db, params, page=3, page_size=20))
+    skip_total_ms = _timed(lambda: service.get_daily_reports(params, ADMIN, page=3, page_size=20, with_total=False))
+
+    page_ids_sql = (
+        "SELECT id FROM daily_reports WHERE status = 'approved' "
+        "ORDER BY report_date DESC, id DESC LIMIT 20 OFFSET 40"
+    )
+    if benchmark_engine.dialect.name == "postgresql":
+        page_ms = _explain_ms(db, page_ids_sql)
+        assert page_ms < 5, f"page id query {page_ms:.2f}ms"
+    else:
+        plan = " ".join(row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {page_ids_sql}")))
+        # 按索引顺序取当页 ID，无需对筛选结果排序
+        assert "INDEX" in plan and "TEMP B-TREE" not in plan, plan
+    db.close()
+
+    # 计数本身仍需扫描筛选结果；跳过计数后翻页只读索引中的一页
+    assert skip_total_ms < 50, f"page without total {skip_total_ms:.1f}ms at {BENCHMARK_ROWS} rows"
+    assert skip_total_ms * 5 < legacy_ms, f"page without total {skip_total_ms:.1f}ms vs legacy {legacy_ms:.1f}ms"
+    assert new_ms < legacy_ms * 1.25, f"list {new_ms:.1f}ms vs legacy {legacy_ms:.1f}ms at {BENCHMARK_ROWS} rows"
@@ -0,0 +1,66 @@
+import tracemalloc
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from io import BytesIO
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("xlsxwriter")
+openpyxl = pytest.importorskip("openpyxl")
+
+from backend.utils.export import export_to_excel, stream_xlsx, write_xlsx
+
+
+def _rows(count: int):
+    for index in range(count):
+        yield {
+            "ID": uuid4(),
+            "报表日期": date(2024, 1, 1),
+            "消耗金额": Decimal("123.45"),
+            "备注": "x" * (index % 80),
+            "创建时间": datetime(2024, 1, 1, 8, 0, tzinfo=timezone.utc),
+        }
+
+
+def test_write_xlsx_streams_generator_rows() -> None:
+    output = BytesIO()
+    count = write_xlsx(_rows(500), output, sheet_name="日报数据", headers=["ID", "消耗金额", "备注", "创建时间"])
+    assert count == 500
+
+    output.seek(0)
+    worksheet = openpyxl.load_workbook(output)["日报数据"]
+    assert [cell.value for cell in worksheet[1]] == ["ID", "消耗金额", "备注", "创建时间"]
+    assert worksheet.max_row == 501
+    assert worksheet["B2"].value == pytest.approx(123.45)
+    assert worksheet["D2"].value == datetime(2024, 1, 1, 8, 0)
+    # 列宽按样本估算并封顶
+    assert round(worksheet.column_dimensions["A"].width) == 39
+    assert round(worksheet.column_dimensions["B"].width) == 9
+    assert round(worksheet.column_dimensions["C"].width) == 51
+
+
+def test_stream_xlsx_yields_chunks_and_handles_empty() -> None:
+    chunks = list(stream_xlsx(_rows(2000), chunk_size=4096))
+    assert len(chunks) > 1
+    assert openpyxl.load_workbook(BytesIO(b"".join(chunks))).active.max_row == 2001
+
+    empty = export_to_excel([], sheet_name="空")
+    assert openpyxl.load_workbook(BytesIO(empty))["空"].max_row == 1
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+def test_stream_xlsx_memory_does_not_grow_with_rows() -> None:
+    def _peak(count: int) -> int:
+        tracemalloc.start()
+        for _ in stream_xlsx(_rows(count), spool_max_size=64 * 1024):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    small = _peak(5000)
+    large = _peak(50000)
+    # 行数增加 10 倍，峰值内存基本不变
+    assert large < small * 2, f"peak {small} -> {large} bytes"
@@ -0,0 +1,136 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from backend.services.export_job_service import (
+    COMPLETED,
+    FAILED,
+    ArtifactStore,
+    ExportJobService,
+    ExportSource,
+)
+from backend.utils.export import CSV_MEDIA_TYPE, file_download_response
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> _Clock:
+    return _Clock()
+
+
+@pytest.fixture
+def service(tmp_path, clock):
+    service = ExportJobService(ArtifactStore(str(tmp_path), retention_seconds=3600, timer=clock), timer=clock)
+    yield service
+    service.shutdown()
+
+
+def _register(service: ExportJobService, data: dict, calls: list) -> None:
+    def _rows(filters):
+        calls.append(filters)
+        for index in range(data["count"]):
+            if data.get("fail"):
+                raise RuntimeError("db down")
+            yield {"编号": index, "项目": filters.get("project_id"), "备注": {"k": "中文"}}
+
+    service.register(
+        "ledger",
+        ExportSource(headers=["编号", "项目", "备注"], rows=_rows, version=lambda filters: str(data["count"])),
+    )
+
+
+def test_export_job_writes_csv_and_reuses_unchanged_exports(service, clock) -> None:
+    data, calls = {"count": 3}, []
+    _register(service, data, calls)
+
+    job, reused = service.submit("ledger", {"project_id": "p1", "status": None}, "csv", created_by="u1")
+    assert reused is False
+    job = service.wait(job.id, timeout=5)
+    assert job.status == COMPLETED
+    assert job.row_count == 3
+    assert job.filters == {"project_id": "p1"}
+
+    content = service.artifact_path(job).read_bytes()
+    assert content.startswith(b"\xef\xbb\xbf")
+    rows = list(csv.reader(io.StringIO(content.decode("utf-8-sig"))))
+    assert rows[0] == ["编号", "项目", "备注"]
+    assert rows[1] == ["0", "p1", json.dumps({"k": "中文"}, ensure_ascii=False)]
+
+    # 条件与数据版本不变：复用，不重新生成
+    again, reused = service.submit("ledger", {"project_id": "p1"}, "csv")
+    assert reused is True and again.id == job.id
+    assert len(calls) == 1
+
+    # 格式、条件或数据变化时生成新任务
+    assert service.submit("ledger", {"project_id": "p1"}, "excel")[0].id != job.id
+    assert service.submit("ledger", {"project_id": "p2"}, "csv")[0].id != job.id
+    data["count"] = 4
+    assert service.submit("ledger", {"project_id": "p1"}, "csv")[0].id != job.id
+    data["count"] = 3
+    service.bump_version("ledger")
+    assert service.submit("ledger", {"project_id": "p1"}, "csv")[0].id != job.id
+
+
+def test_export_job_failures_and_retention(service, clock, tmp_path) -> None:
+    data, calls = {"count": 2, "fail": True}, []
+    _register(service, data, calls)
+
+    job, _ = service.submit("ledger", {}, "csv")
+    job = service.wait(job.id, timeout=5)
+    assert job.status == FAILED
+    assert job.error == "db down"
+    assert not list(tmp_path.glob("*.part"))
+
+    # 失败任务不复用
+    data["fail"] = False
+    retry, reused = service.submit("ledger", {}, "csv")
+    assert reused is False and retry.id == job.id
+    retry = service.wait(retry.id, timeout=5)
+    assert retry.status == COMPLETED
+
+    clock.now += 3601
+    assert service.get(retry.id) is None
+    assert service.store.purge_expired() == 1
+    assert list(tmp_path.iterdir()) == []
+    assert service.get("../../etc/passwd") is None
+
+
+def test_file_download_response_supports_ranges(tmp_path) -> None:
+    path = tmp_path / "export.csv"
+    path.write_bytes(bytes(range(100)))
+    app = FastAPI()
+
+    @app.get("/download")
+    async def download(request: Request):
+        return file_download_response(str(path), "export.csv", CSV_MEDIA_TYPE, request.headers.get("range"))
+
+    client = TestClient(app)
+
+    full = client.get("/download")
+    assert full.status_code == 200
+    assert full.content == bytes(range(100))
+    assert full.headers["accept-ranges"] == "bytes"
+    assert full.headers["content-disposition"] == "attachment; filename=export.csv"
+
+    partial = client.get("/download", headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == bytes(range(10, 20))
+    assert partial.headers["content-range"] == "bytes 10-19/100"
+
+    assert client.get("/download", headers={"Range": "bytes=95-"}).content == bytes(range(95, 100))
+    assert client.get("/download", headers={"Range": "bytes=-3"}).content == bytes(range(97, 100))
+
+    unsatisfiable = client.get("/download", headers={"Range": "bytes=200-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == "bytes */100"
@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+import re
+import threading
+
+import pytest
+
+from backend.utils.id_generator import RequestNoGenerator, generate_request_no, generate_transaction_no
+
+TOTAL = 1_000_000
+PROCESSES = 4
+THREADS = 16
+
+
+def _generate_in_threads(count: int, threads: int = THREADS) -> list:
+    per_thread = count // threads
+    chunks = [None] * threads
+
+    def _worker(index: int) -> None:
+        chunks[index] = [generate_request_no("TOP") for _ in range(per_thread)]
+
+    workers = [threading.Thread(target=_worker, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return [number for chunk in chunks for number in chunk]
+
+
+def test_request_no_format() -> None:
+    number = generate_request_no("TOP")
+    assert re.fullmatch(r"TOP\d{14}\d{4}\d{7}\d{6}", number)
+    assert len(number) <= 50
+    assert generate_transaction_no().startswith("TXN")
+
+    generator = RequestNoGenerator(node_id=12345)
+    first, second = generator("REC"), generator("REC")
+    assert first[17:21] == second[17:21] == "2345"
+    assert int(first[21:28]) == os.getpid() % 10_000_000
+    assert int(second[-6:]) == int(first[-6:]) + 1
+
+
+def _generate_with_node(node_id: int, count: int) -> list:
+    generator = RequestNoGenerator(node_id=node_id)
+    return [generator("TOP") for _ in range(count)]
+
+
+def test_workers_sharing_configured_node_id_never_collide() -> None:
+    # 同一主机上的 worker 继承同一个 ID_NODE_ID，各自从 0 计数
+    with multiprocessing.get_context("spawn").Pool(2) as pool:
+        batches = pool.starmap(_generate_with_node, [(7, 20_000), (7, 20_000)])
+    numbers = [number for batch in batches for number in batch]
+    assert len(set(numbers)) == len(numbers)
+    assert {number[17:21] for number in numbers} == {"0007"}
+    assert len({number[17:28] for number in numbers}) == 2
+
+
+def test_threads_never_collide_within_one_second() -> None:
+    numbers = _generate_in_threads(64_000)
+    assert len(set(numbers)) == len(numbers)
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+def test_one_million_numbers_across_threads_and_processes() -> None:
+    # fork 出的子进程继承父进程的生成器状态，需依赖 fork 后的重置保证唯一
+    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    generate_request_no("TOP")
+    with multiprocessing.get_context(method).Pool(PROCESSES) as pool:
+        batches = pool.map(_generate_in_threads, [TOTAL // PROCESSES] * PROCESSES)
+
+    numbers = [number for batch in batches for number in batch]
+    assert len(numbers) == TOTAL
+    assert len(set(numbers)) == TOTAL
+    assert len({number[17:28] for number in numbers}) == PROCESSES
@@ -0,0 +1,107 @@
+import csv
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.models import Ledger
+from backend.services import ledger_export
+from backend.services.export_job_service import COMPLETED, ArtifactStore, ExportJobService, get_export_job_service
+from backend.services.ledger_export import LEDGER_EXPORT_KIND
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Ledger.__table__.create(engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    # 导出来源在后台线程中通过应用的会话工厂打开独立会话
+    monkeypatch.setattr(ledger_export, "get_session_factory", lambda: factory)
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = ExportJobService(ArtifactStore(str(tmp_path), retention_seconds=3600))
+    # 使用模块导入时登记到应用导出服务上的真实来源
+    service.register(LEDGER_EXPORT_KIND, get_export_job_service()._sources[LEDGER_EXPORT_KIND])
+    yield service
+    service.shutdown()
+
+
+def _add(db, project_id, created_at, amount="10.00", type="expense", ledger_id=None):
+    ledger = Ledger(
+        id=ledger_id or uuid.uuid4(),
+        type=type,
+        project_id=project_id,
+        amount=Decimal(amount),
+        currency="USD",
+        occurred_at=datetime(2025, 11, 3, 12, 0),
+        created_at=created_at,
+        updated_at=created_at,
+    )
+    db.add(ledger)
+    db.commit()
+    return ledger
+
+
+def _export(service, filters):
+    job, reused = service.submit(LEDGER_EXPORT_KIND, filters, "csv", created_by="u1")
+    job = service.wait(job.id, timeout=5)
+    assert job.status == COMPLETED, job.error
+    with open(service.artifact_path(job), encoding="utf-8-sig", newline="") as handle:
+        return job, reused, list(csv.DictReader(handle))
+
+
+def test_ledger_export_pages_by_created_at_and_id(session_factory, service, monkeypatch) -> None:
+    monkeypatch.setattr(ledger_export, "LEDGER_EXPORT_PAGE_SIZE", 2)
+    project_id, other_project = uuid.uuid4(), uuid.uuid4()
+    ids = sorted(uuid.uuid4() for _ in range(5))
+    with session_factory() as db:
+        # 同一 created_at 的记录按 id 决定先后，跨页不重复不遗漏
+        for index, ledger_id in enumerate(reversed(ids)):
+            _add(db, project_id, datetime(2025, 11, 3, 9, index // 2), ledger_id=ledger_id)
+        _add(db, other_project, datetime(2025, 11, 3, 8, 0))
+        _add(db, project_id, datetime(2025, 11, 3, 8, 0), type="income")
+
+    job, _, rows = _export(service, {"project_id": str(project_id), "transaction_type": "expense"})
+
+    assert [row["流水ID"] for row in rows] == [str(ids[i]) for i in (3, 4, 1, 2, 0)]
+    assert job.row_count == 5
+    assert {row["项目ID"] for row in rows} == {str(project_id)}
+    assert rows[0]["金额"] == "10.00"
+
+
+def test_ledger_export_version_follows_count_and_updated_at(session_factory, service) -> None:
+    project_id = uuid.uuid4()
+    filters = {"project_id": str(project_id), "start_date": "2025-11-01", "end_date": "2025-11-03"}
+    with session_factory() as db:
+        ledger = _add(db, project_id, datetime(2025, 11, 3, 9, 0))
+        ledger_id = ledger.id
+
+    first, reused, rows = _export(service, filters)
+    assert reused is False and len(rows) == 1
+    job, reused = service.submit(LEDGER_EXPORT_KIND, filters, "csv", created_by="u2")
+    assert reused is True and job.id == first.id
+
+    # 其他入口修改金额推进 updated_at，生成新导出
+    with session_factory() as db:
+        ledger = db.get(Ledger, ledger_id)
+        ledger.amount = Decimal("25.50")
+        ledger.updated_at = datetime(2025, 11, 4, 9, 0)
+        db.commit()
+    second, reused, rows = _export(service, filters)
+    assert reused is False and second.id != first.id
+    assert rows[0]["金额"] == "25.50"
+
+    # 新增记录改变记录数，同样生成新导出
+    with session_factory() as db:
+        _add(db, project_id, datetime(2025, 11, 2, 9, 0))
+    third, reused, rows = _export(service, filters)
+    assert reused is False and third.id != second.id
+    assert len(rows) == 2
@@ -0,0 +1,193 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from backend.services.login_history import LoginHistoryWriter, UserEmailIndex, sync_profile_emails
+
+USER_COUNT = 100_000
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = []
+        self.payload = None
+        self.action = "select"
+
+    def select(self, *_columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, [value]))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append((column, list(values)))
+        return self
+
+    def limit(self, _count):
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def update(self, values):
+        self.action, self.payload = "update", values
+        return self
+
+    def execute(self):
+        self.client.queries += 1
+        if self.action == "insert":
+            self.client.inserts.append(list(self.payload))
+            return SimpleNamespace(data=self.payload)
+        profiles = self.client.profiles
+        column, values = self.filters[0]
+        if column == "email":
+            # 模拟 user_profiles.email 唯一索引的单行查找
+            ids = [self.client.email_index[v] for v in values if v in self.client.email_index]
+        else:
+            ids = [v for v in values if v in profiles]
+        if self.action == "update":
+            for user_id in ids:
+                profiles[user_id].update(self.payload)
+            return SimpleNamespace(data=[])
+        return SimpleNamespace(data=[dict(profiles[user_id]) for user_id in ids])
+
+
+class FakeAdminClient:
+    """带 10 万用户的 Supabase 管理员客户端"""
+
+    def __init__(self, count=USER_COUNT):
+        self.users = [SimpleNamespace(id=f"user-{i:06d}", email=f"User{i}@Example.com") for i in range(count)]
+        self.profiles = {u.id: {"id": u.id, "email": u.email.lower()} for u in self.users}
+        self.email_index = {profile["email"]: user_id for user_id, profile in self.profiles.items()}
+        self.queries = 0
+        self.directory_fetches = 0
+        self.inserts = []
+        self.auth = SimpleNamespace(admin=SimpleNamespace(list_users=self.list_users))
+
+    def list_users(self, page=None, per_page=None):
+        self.directory_fetches += 1
+        if page is None:
+            # 旧实现：一次取回整个用户目录（远端序列化开销以复制列表近似）
+            return SimpleNamespace(users=[SimpleNamespace(id=u.id, email=u.email) for u in self.users])
+        return self.users[(page - 1) * per_page:page * per_page]
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def scan_directory(client, email):
+    """改造前 _record_login_by_email 的查找方式"""
+    users = client.auth.admin.list_users()
+    return next((u.id for u in users.users if u.email == email), None)
+
+
+@pytest.fixture(scope="module")
+def admin_client():
+    return FakeAdminClient()
+
+
+def test_lookup_is_case_insensitive_and_cached(admin_client):
+    index = UserEmailIndex(admin_client, ttl=300, negative_ttl=60)
+    queries = admin_client.queries
+
+    assert index.lookup("  USER42@example.COM ") == "user-000042"
+    assert index.lookup("user42@example.com") == "user-000042"
+    assert admin_client.queries == queries + 1
+    assert admin_client.directory_fetches == 0
+
+
+def test_unknown_email_is_negatively_cached(admin_client):
+    now = [0.0]
+    index = UserEmailIndex(admin_client, ttl=300, negative_ttl=60)
+    index._cache._timer = lambda: now[0]
+    queries = admin_client.queries
+
+    for _ in range(1000):
+        assert index.lookup("nobody@example.com") is None
+    assert admin_client.queries == queries + 1
+
+    now[0] = 61
+    assert index.lookup("nobody@example.com") is None
+    assert admin_client.queries == queries + 2
+
+
+def test_remember_overrides_negative_entry(admin_client):
+    index = UserEmailIndex(admin_client, ttl=300, negative_ttl=60)
+    assert index.lookup("new@example.com") is None
+
+    index.remember("New@example.com", "user-new")
+    assert index.lookup("new@example.com") == "user-new"
+
+    index.forget("new@example.com")
+    assert index.lookup("new@example.com") is None
+
+
+def test_zero_ttl_disables_cache(admin_client):
+    index = UserEmailIndex(admin_client, ttl=0, negative_ttl=0)
+    queries = admin_client.queries
+    index.lookup("user1@example.com")
+    index.lookup("user1@example.com")
+    assert admin_client.queries == queries + 2
+    assert len(index._cache) == 0
+
+
+def test_failed_logins_are_written_in_batches():
+    client = FakeAdminClient(count=10)
+    writer = LoginHistoryWriter(client, batch_size=50, flush_interval=0.05)
+
+    for i in range(120):
+        writer.submit([{"user_id": f"user-{i % 10:06d}", "login_type": "password", "status": "failed"}])
+    writer.flush()
+
+    assert sum(len(batch) for batch in client.inserts) == 120
+    assert len(client.inserts) < 120
+    assert max(len(batch) for batch in client.inserts) <= 50
+
+
+def test_sync_profile_emails_updates_changed_rows():
+    client = FakeAdminClient(count=2500)
+    client.users[7].email = "Renamed@Example.com"
+    client.profiles["user-000011"]["email"] = None
+    del client.profiles["user-000012"]
+
+    counts = sync_profile_emails(client, per_page=1000)
+
+    assert counts == {"users": 2500, "updated": 2, "failed": 0}
+    assert client.profiles["user-000007"]["email"] == "renamed@example.com"
+    assert client.profiles["user-000011"]["email"] == "user11@example.com"
+    assert client.directory_fetches == 3
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+def test_indexed_lookup_cost_per_attempt(admin_client):
+    """撞库场景下每次失败登录的查找开销：全目录扫描 vs 索引查找"""
+    emails = [f"user{i}@example.com" for i in range(USER_COUNT - 200, USER_COUNT)]
+
+    attempts = 5
+    start = time.perf_counter()
+    for email in emails[:attempts]:
+        assert scan_directory(admin_client, email.replace("user", "User").replace("example", "Example"))
+    scan_cost = (time.perf_counter() - start) / attempts
+
+    index = UserEmailIndex(admin_client, ttl=300, negative_ttl=60)
+    start = time.perf_counter()
+    for email in emails:
+        assert index.lookup(email)
+    miss_cost = (time.perf_counter() - start) / len(emails)
+
+    start = time.perf_counter()
+    for _ in range(5):
+        for email in emails:
+            index.lookup(email)
+    hit_cost = (time.perf_counter() - start) / (5 * len(emails))
+
+    print(f"\n每次尝试: 全目录扫描 {scan_cost * 1e3:.2f}ms，索引查找 {miss_cost * 1e6:.1f}µs，"
+          f"缓存命中 {hit_cost * 1e6:.1f}µs")
+    assert miss_cost * 100 < scan_cost
+    assert hit_cost < scan_cost
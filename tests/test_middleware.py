@@ -0,0 +1,272 @@
+import io
+import json
+import logging
+import queue
+import statistics
+import sys
+import time
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from backend.middleware.log_format import ErrorRateLimitFilter, JsonLogFormatter, RouteSampler
+from backend.middleware.logging import (
+    AuditLogMiddleware,
+    LoggingMiddleware,
+    PathPrefixMatcher,
+    StructuredQueueHandler,
+)
+
+
+def _build_app(*middlewares) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/v1/users")
+    async def create_user(request: Request) -> dict:
+        return {"received": len(await request.body())}
+
+    @app.post("/api/v1/reports")
+    async def create_report(request: Request) -> dict:
+        return {"received": len(await request.body())}
+
+    @app.get("/ping")
+    async def ping() -> dict:
+        return {"ok": True}
+
+    for middleware, options in middlewares:
+        app.add_middleware(middleware, **options)
+    return app
+
+
+def _audit_records(caplog) -> list:
+    return [record for record in caplog.records if record.name == "audit"]
+
+
+def test_path_prefix_matcher_matches_segments() -> None:
+    matcher = PathPrefixMatcher(["/api/v1/users", "/api/v1/auth/login"])
+
+    assert matcher.matches("/api/v1/users")
+    assert matcher.matches("/api/v1/users/123/roles")
+    assert matcher.matches("/api/v1/auth/login/")
+    assert not matcher.matches("/api/v1/usersettings")
+    assert not matcher.matches("/api/v1/auth")
+    assert not matcher.matches("/api/v1/reports")
+
+
+def test_audit_captures_sanitized_body_only_for_audited_paths(caplog) -> None:
+    client = TestClient(_build_app((AuditLogMiddleware, {})))
+    caplog.set_level(logging.INFO, logger="audit")
+
+    response = client.post("/api/v1/users", json={"email": "a@b.com", "password": "pw", "profile": {"token": "t"}})
+    assert response.status_code == 200
+    assert response.json()["received"] > 0
+
+    records = _audit_records(caplog)
+    assert len(records) == 1
+    assert records[0].status_code == 200
+    assert records[0].request_body == {"email": "a@b.com", "password": "***", "profile": {"token": "***"}}
+
+    caplog.clear()
+    response = client.post("/api/v1/reports", json={"password": "pw"})
+    assert response.status_code == 200
+    assert _audit_records(caplog) == []
+
+
+def test_audit_body_capture_is_bounded(caplog) -> None:
+    client = TestClient(_build_app((AuditLogMiddleware, {"max_body_bytes": 16})))
+    caplog.set_level(logging.INFO, logger="audit")
+
+    response = client.post("/api/v1/users", json={"note": "x" * 100})
+    # 应用仍能读到完整请求体
+    assert response.json()["received"] > 100
+
+    records = _audit_records(caplog)
+    assert records[0].request_body is None
+    assert records[0].request_body_truncated is True
+
+
+def test_audit_client_ip_trusts_forwarded_headers_only_from_proxies(caplog) -> None:
+    app = _build_app((AuditLogMiddleware, {"trusted_proxies": ["172.16.0.0/12"]}))
+    caplog.set_level(logging.INFO, logger="audit")
+
+    def _client_ip(peer: str, headers: dict) -> str:
+        async def from_peer(scope, receive, send):
+            scope["client"] = (peer, 50000)
+            await app(scope, receive, send)
+
+        caplog.clear()
+        TestClient(from_peer).post("/api/v1/users", json={}, headers=headers)
+        return _audit_records(caplog)[0].client_ip
+
+    # 经可信代理转发时取代理追加的地址，客户端自填在最左侧的地址不采信
+    assert _client_ip("172.16.0.9", {"X-Forwarded-For": "1.2.3.4, 10.0.0.1"}) == "10.0.0.1"
+    assert _client_ip("172.16.0.9", {"X-Real-IP": "10.0.0.2"}) == "10.0.0.2"
+    # 直连客户端伪造的转发头被忽略
+    assert _client_ip("203.0.113.7", {"X-Forwarded-For": "10.0.0.1"}) == "203.0.113.7"
+    assert _client_ip("203.0.113.7", {"X-Real-IP": "10.0.0.2"}) == "203.0.113.7"
+
+
+def test_logging_middleware_sets_request_headers() -> None:
+    client = TestClient(_build_app((LoggingMiddleware, {})))
+
+    response = client.get("/ping")
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"]
+    assert float(response.headers["X-Process-Time"]) >= 0
+
+
+def test_logging_middleware_samples_successful_requests_only(caplog) -> None:
+    sampler = RouteSampler({"/api/v1/reports": 0.0})
+    client = TestClient(_build_app((LoggingMiddleware, {"sampler": sampler})))
+    caplog.set_level(logging.INFO, logger="api")
+
+    client.post("/api/v1/reports", json={})
+    assert [record for record in caplog.records if record.name == "api"] == []
+
+    client.get("/api/v1/reports")
+    records = [record for record in caplog.records if record.name == "api"]
+    # 405 等失败请求不受采样影响
+    assert [record.status_code for record in records] == [405]
+
+    client.get("/ping")
+    assert len([record for record in caplog.records if record.name == "api"]) == 3
+
+
+def test_route_sampler_is_consistent_per_request() -> None:
+    sampler = RouteSampler({"/api/v1/adspend": 0.25, "/api/v1/adspend/reports/bulk": 1.0}, default_rate=1.0)
+
+    assert sampler.rate_for("/api/v1/adspend/reports") == 0.25
+    assert sampler.rate_for("/api/v1/adspend/reports/bulk") == 1.0
+    assert sampler.rate_for("/api/v1/projects") == 1.0
+
+    request_ids = [str(uuid4()) for _ in range(4000)]
+    decisions = [sampler.should_log("/api/v1/adspend/reports", request_id) for request_id in request_ids]
+    assert decisions == [sampler.should_log("/api/v1/adspend/reports", request_id) for request_id in request_ids]
+    assert 0.2 < sum(decisions) / len(decisions) < 0.3
+
+
+def test_error_rate_limit_filter_suppresses_repeats() -> None:
+    now = [0.0]
+    limiter = ErrorRateLimitFilter(burst=2, window=10, timer=lambda: now[0])
+
+    def _record(msg: str, level: int = logging.ERROR) -> logging.LogRecord:
+        return logging.LogRecord("api", level, __file__, 1, msg, (), None)
+
+    assert [limiter.filter(_record("db down")) for _ in range(4)] == [True, True, False, False]
+    assert limiter.filter(_record("other failure")) is True
+    assert limiter.filter(_record("db down", logging.WARNING)) is True
+
+    now[0] = 11.0
+    record = _record("db down")
+    assert limiter.filter(record) is True
+    assert record.suppressed == 2
+
+
+def test_json_log_formatter_flattens_extra() -> None:
+    record = logging.LogRecord("api", logging.INFO, __file__, 1, "Request completed", (), None)
+    record.event = "request_end"
+    record.status_code = 200
+    record.request_id = uuid4()
+
+    payload = json.loads(JsonLogFormatter().format(record))
+    assert payload["message"] == "Request completed"
+    assert payload["level"] == "INFO"
+    assert payload["event"] == "request_end"
+    assert payload["status_code"] == 200
+    assert payload["request_id"] == str(record.request_id)
+
+
+class _CollectingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def test_error_rate_limit_on_handlers_sees_propagated_records() -> None:
+    limiter = ErrorRateLimitFilter(burst=2, window=60)
+    handlers = [_CollectingHandler(), _CollectingHandler()]
+    for handler in handlers:
+        handler.addFilter(limiter)
+    parent = logging.getLogger("storm_test")
+    parent.propagate = False
+    for handler in handlers:
+        parent.addHandler(handler)
+    try:
+        # 子 logger 的日志经传播到达父 logger 的处理器
+        child = logging.getLogger("storm_test.services.child")
+        for _ in range(5):
+            child.error("db down")
+    finally:
+        for handler in handlers:
+            parent.removeHandler(handler)
+
+    # 同一过滤器挂在两个处理器上，每条日志只计数一次
+    assert [len(handler.records) for handler in handlers] == [2, 2]
+
+
+def test_queue_handler_keeps_structured_exc_info() -> None:
+    log_queue = queue.SimpleQueue()
+    handler = StructuredQueueHandler(log_queue)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("api", logging.ERROR, __file__, 1, "failed %s", ("job",), sys.exc_info())
+    handler.handle(record)
+
+    payload = json.loads(JsonLogFormatter().format(log_queue.get_nowait()))
+    assert payload["message"] == "failed job"
+    assert "ValueError: boom" in payload["exc_info"]
+    assert "_error_rate_allowed" not in payload
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+def test_request_log_throughput_at_5k_rps() -> None:
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonLogFormatter())
+    bench_logger = logging.getLogger("bench.api")
+    bench_logger.handlers = [handler]
+    bench_logger.propagate = False
+    bench_logger.setLevel(logging.INFO)
+    sampler = RouteSampler({"/api/v1/adspend/reports": 0.1})
+
+    start = time.perf_counter()
+    for index in range(5000):
+        request_id = str(uuid4())
+        path = "/api/v1/adspend/reports" if index % 2 else "/api/v1/projects"
+        if sampler.should_log(path, request_id):
+            extra = {"event": "request_end", "request_id": request_id, "path": path, "status_code": 200}
+            bench_logger.info("Request started", extra=extra)
+            bench_logger.info("Request completed", extra=extra)
+    elapsed = time.perf_counter() - start
+
+    # 5000 次请求的日志处理须在 1 秒内完成，即可支撑 5k req/s
+    assert elapsed < 1.0, f"5000 requests logged in {elapsed:.3f}s"
+    assert 2500 < len(stream.getvalue().splitlines()) / 2 < 3000
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+def test_logging_middleware_overhead_per_request() -> None:
+    bare = TestClient(_build_app())
+    wrapped = TestClient(_build_app((AuditLogMiddleware, {}), (LoggingMiddleware, {})))
+    logging.getLogger("api").setLevel(logging.WARNING)
+
+    def _median_ms(client: TestClient) -> float:
+        samples = []
+        for _ in range(200):
+            start = time.perf_counter()
+            client.post("/api/v1/reports", json={"value": 1})
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    _median_ms(bare)
+    _median_ms(wrapped)
+    overhead = _median_ms(wrapped) - _median_ms(bare)
+    assert overhead < 1.0, f"Middleware overhead {overhead:.3f}ms per request"
@@ -0,0 +1,359 @@
+import gzip
+import importlib.util
+import json
+import os
+import statistics
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+
+from backend.services.partitioning import (
+    add_months,
+    archive_partition,
+    ensure_partitions,
+    iter_months,
+    list_partitions,
+    parse_partition_month,
+    partition_name,
+    restore_partition,
+)
+
+DATABASE_URL = os.environ.get("BENCHMARK_DATABASE_URL", "")
+SCHEMA = "partition_check"
+MIGRATION = Path(__file__).resolve().parents[1] / "backend/migrations/versions/009_partition_daily_tables.py"
+ACCOUNTS = 500
+DAYS = 3 * 365
+
+requires_postgres = pytest.mark.skipif(
+    not DATABASE_URL.startswith("postgresql"), reason="需要 BENCHMARK_DATABASE_URL 指向 PostgreSQL"
+)
+
+
+def test_month_helpers() -> None:
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert list(iter_months(date(2024, 11, 15), date(2025, 1, 3))) == [
+        date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1)
+    ]
+
+    name = partition_name("ad_spend_daily", date(2024, 3, 17))
+    assert name == "ad_spend_daily_p202403"
+    assert parse_partition_month("ad_spend_daily", name) == date(2024, 3, 1)
+    assert parse_partition_month("ad_spend_daily", f"{name}.csv.gz") == date(2024, 3, 1)
+    assert parse_partition_month("ad_spend_daily", "ad_spend_daily_default") is None
+    assert parse_partition_month("daily_reports", name) is None
+
+
+def test_ensure_partitions_is_noop_off_postgres() -> None:
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        assert ensure_partitions(connection) == []
+
+
+# ---------------------------------------------------------------------------
+# PostgreSQL：在独立 schema 中建 3 年消耗数据，执行 009 迁移改为按月分区，
+# 另留一份同数据同索引的普通表作对照
+# ---------------------------------------------------------------------------
+
+_TABLE = """
+    CREATE TABLE ad_spend_daily (
+        id BIGSERIAL PRIMARY KEY,
+        ad_account_id INTEGER NOT NULL,
+        date DATE NOT NULL,
+        spend NUMERIC(15, 2) NOT NULL CHECK (spend >= 0),
+        leads_count INTEGER NOT NULL DEFAULT 0,
+        leads_confirmed INTEGER,
+        leads_diff INTEGER GENERATED ALWAYS AS (leads_confirmed - leads_count) STORED,
+        CONSTRAINT uk_ad_spend_daily_account_date UNIQUE (ad_account_id, date)
+    );
+    CREATE INDEX idx_ad_spend_daily_date ON ad_spend_daily (date);
+    COMMENT ON TABLE ad_spend_daily IS '每日消耗';
+"""
+
+_SEED = """
+    INSERT INTO ad_spend_daily (ad_account_id, date, spend, leads_count, leads_confirmed)
+    SELECT account, CURRENT_DATE - day, (account % 97) + day % 13, account % 5, account % 7
+    FROM generate_series(1, {accounts}) AS account, generate_series(0, {days} - 1) AS day
+"""
+
+
+def _load_migration():
+    spec = importlib.util.spec_from_file_location("partition_daily_tables", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def partitioned_engine():
+    admin = create_engine(DATABASE_URL, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+
+    engine = create_engine(DATABASE_URL, connect_args={"options": f"-csearch_path={SCHEMA}"})
+    with engine.begin() as conn:
+        conn.execute(text(_TABLE))
+        conn.execute(text(_SEED.format(accounts=ACCOUNTS, days=DAYS)))
+        conn.execute(text("CREATE TABLE ad_spend_plain AS SELECT * FROM ad_spend_daily"))
+        conn.execute(text("CREATE INDEX idx_ad_spend_plain_date ON ad_spend_plain (date)"))
+        conn.execute(text("CREATE UNIQUE INDEX uk_ad_spend_plain_account_date ON ad_spend_plain (ad_account_id, date)"))
+
+    with engine.connect() as conn:
+        context = MigrationContext.configure(conn)
+        with context.begin_transaction(), Operations.context(context):
+            _load_migration().upgrade()
+
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text("VACUUM ANALYZE ad_spend_daily"))
+        conn.execute(text("VACUUM ANALYZE ad_spend_plain"))
+
+    yield engine
+    engine.dispose()
+    with admin.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    admin.dispose()
+
+
+def _plan(conn, sql: str, analyze: bool = False) -> dict:
+    options = "ANALYZE, FORMAT JSON" if analyze else "FORMAT JSON"
+    plan = conn.execute(text(f"EXPLAIN ({options}) {sql}")).scalar()
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]
+
+
+def _scanned_relations(node: dict) -> set:
+    relations = {node["Relation Name"]} if "Relation Name" in node else set()
+    for child in node.get("Plans", []):
+        relations |= _scanned_relations(child)
+    return relations
+
+
+@requires_postgres
+def test_migration_moves_rows_into_monthly_partitions(partitioned_engine) -> None:
+    with partitioned_engine.connect() as conn:
+        months = list_partitions(conn, "ad_spend_daily")
+        assert months[0] == (date.today() - timedelta(days=DAYS - 1)).replace(day=1)
+        assert months[-1] >= add_months(date.today().replace(day=1), 3)
+        assert months == list(iter_months(months[0], months[-1]))
+
+        counts = conn.execute(text(
+            "SELECT (SELECT count(*) FROM ad_spend_daily), (SELECT count(*) FROM ad_spend_plain),"
+            " (SELECT count(*) FROM ad_spend_daily_default)"
+        )).one()
+        assert counts == (ACCOUNTS * DAYS, ACCOUNTS * DAYS, 0)
+
+        # 主键改为含分区键，唯一约束、生成列、表注释与序列随新表保留
+        primary_key = conn.execute(text(
+            "SELECT pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = 'ad_spend_daily'::regclass AND contype = 'p'"
+        )).scalar()
+        assert primary_key == "PRIMARY KEY (id, date)"
+        assert conn.execute(text(
+            "SELECT count(*) FROM ad_spend_daily WHERE leads_diff IS DISTINCT FROM leads_confirmed - leads_count"
+        )).scalar() == 0
+        assert conn.execute(text("SELECT obj_description('ad_spend_daily'::regclass, 'pg_class')")).scalar() == "每日消耗"
+        new_id = conn.execute(text(
+            "INSERT INTO ad_spend_daily (ad_account_id, date, spend) VALUES (9999, CURRENT_DATE, 1) RETURNING id"
+        )).scalar()
+        assert new_id > ACCOUNTS * DAYS
+        conn.rollback()
+
+
+@requires_postgres
+def test_range_queries_prune_partitions(partitioned_engine) -> None:
+    month = add_months(date.today().replace(day=1), -6)
+    sql = (
+        "SELECT ad_account_id, sum(spend) FROM ad_spend_daily "
+        f"WHERE date >= '{month}' AND date <= '{add_months(month, 1) - timedelta(days=1)}' "
+        "GROUP BY ad_account_id"
+    )
+    with partitioned_engine.connect() as conn:
+        assert _scanned_relations(_plan(conn, sql)["Plan"]) == {partition_name("ad_spend_daily", month)}
+        # 不带日期条件时扫描全部分区
+        assert len(_scanned_relations(_plan(conn, "SELECT count(*) FROM ad_spend_daily")["Plan"])) > 36
+
+
+@requires_postgres
+def test_new_month_rows_move_out_of_default_partition(partitioned_engine) -> None:
+    future = add_months(date.today().replace(day=1), 8)
+    with partitioned_engine.connect() as conn:
+        conn.execute(text(
+            f"INSERT INTO ad_spend_daily (ad_account_id, date, spend) VALUES (1, '{future}', 5), (2, '{future}', 6)"
+        ))
+        assert conn.execute(text("SELECT count(*) FROM ad_spend_daily_default")).scalar() == 2
+
+        created = ensure_partitions(conn, months_ahead=8)
+        assert partition_name("ad_spend_daily", future) in created
+        assert conn.execute(text("SELECT count(*) FROM ad_spend_daily_default")).scalar() == 0
+        assert conn.execute(text(f"SELECT count(*) FROM {partition_name('ad_spend_daily', future)}")).scalar() == 2
+        conn.rollback()
+
+
+@requires_postgres
+def test_archive_and_restore_oldest_partition(partitioned_engine, tmp_path) -> None:
+    with partitioned_engine.connect() as conn:
+        oldest = list_partitions(conn, "ad_spend_daily")[0]
+        name = partition_name("ad_spend_daily", oldest)
+        rows = conn.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+        total = conn.execute(text(f"SELECT sum(spend) FROM {name}")).scalar()
+
+        path = archive_partition(conn, "ad_spend_daily", oldest, tmp_path)
+        assert path == tmp_path / f"{name}.csv.gz"
+        with gzip.open(path, "rt") as fileobj:
+            assert sum(1 for _ in fileobj) == rows + 1
+        assert oldest not in list_partitions(conn, "ad_spend_daily")
+        assert conn.execute(text(f"SELECT to_regclass('{name}')")).scalar() is None
+
+        assert restore_partition(conn, "ad_spend_daily", path) == name
+        assert conn.execute(text(
+            f"SELECT sum(spend) FROM ad_spend_daily WHERE date >= '{oldest}' AND date < '{add_months(oldest, 1)}'"
+        )).scalar() == total
+        conn.rollback()
+
+
+_REFERENCING_TABLES = """
+    CREATE TABLE ad_spend_daily (
+        id BIGSERIAL PRIMARY KEY,
+        ad_account_id INTEGER NOT NULL,
+        date DATE NOT NULL,
+        spend NUMERIC(15, 2) NOT NULL
+    );
+    CREATE TABLE reconciliations (
+        id BIGSERIAL PRIMARY KEY,
+        daily_spend_id BIGINT REFERENCES ad_spend_daily (id)
+    );
+    CREATE TABLE daily_reports (id SERIAL PRIMARY KEY, report_date DATE NOT NULL);
+    CREATE TABLE daily_report_audit_logs (
+        id SERIAL PRIMARY KEY,
+        daily_report_id INTEGER NOT NULL REFERENCES daily_reports (id) ON DELETE CASCADE
+    );
+    INSERT INTO ad_spend_daily (ad_account_id, date, spend) VALUES (1, '2024-01-15', 10), (1, '2024-02-15', 20);
+    INSERT INTO reconciliations (daily_spend_id) VALUES (1), (NULL);
+    INSERT INTO daily_reports (report_date) VALUES ('2024-01-15'), ('2024-02-15');
+    INSERT INTO daily_report_audit_logs (daily_report_id) VALUES (1), (2);
+"""
+
+
+def _run_migration(engine, step: str) -> None:
+    with engine.connect() as conn:
+        context = MigrationContext.configure(conn)
+        with context.begin_transaction(), Operations.context(context):
+            getattr(_load_migration(), step)()
+
+
+def _foreign_keys(conn) -> dict:
+    return dict(conn.execute(text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE contype = 'f' AND connamespace = current_schema()::regnamespace"
+    )).all())
+
+
+def _violates_foreign_key(conn, sql: str) -> bool:
+    savepoint = conn.begin_nested()
+    try:
+        conn.execute(text(sql))
+    except IntegrityError:
+        savepoint.rollback()
+        return True
+    savepoint.rollback()
+    return False
+
+
+@requires_postgres
+def test_migration_keeps_referencing_foreign_keys() -> None:
+    """分区后引用表改为 (id, 分区键) 复合外键，孤立引用被拒绝，降级后恢复单列外键"""
+    schema = "partition_fk_check"
+    admin = create_engine(DATABASE_URL, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_engine(DATABASE_URL, connect_args={"options": f"-csearch_path={schema}"})
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(_REFERENCING_TABLES))
+        _run_migration(engine, "upgrade")
+
+        with engine.connect() as conn:
+            assert _foreign_keys(conn) == {
+                "reconciliations_daily_spend_id_fkey": "FOREIGN KEY (daily_spend_id, daily_spend_date) "
+                "REFERENCES ad_spend_daily(id, date) MATCH FULL ON UPDATE CASCADE",
+                "daily_report_audit_logs_daily_report_id_fkey": "FOREIGN KEY (daily_report_id, report_date) "
+                "REFERENCES daily_reports(id, report_date) MATCH FULL ON UPDATE CASCADE ON DELETE CASCADE",
+            }
+            # 已有引用回填分区键，新写入由触发器按 id 填充
+            assert conn.execute(text(
+                "SELECT daily_spend_id, daily_spend_date FROM reconciliations ORDER BY id"
+            )).all() == [(1, date(2024, 1, 15)), (None, None)]
+            conn.execute(text("INSERT INTO reconciliations (daily_spend_id) VALUES (2)"))
+            assert conn.execute(text(
+                "SELECT daily_spend_date FROM reconciliations WHERE daily_spend_id = 2"
+            )).scalar() == date(2024, 2, 15)
+
+            # 引用不存在的行、删除仍被引用的消耗都被拒绝
+            assert _violates_foreign_key(conn, "INSERT INTO reconciliations (daily_spend_id) VALUES (999)")
+            assert _violates_foreign_key(conn, "DELETE FROM ad_spend_daily WHERE id = 1")
+            # 删除日报级联删除审计日志，修改日期同步到引用行
+            conn.execute(text("DELETE FROM daily_reports WHERE id = 1"))
+            assert conn.execute(text("SELECT daily_report_id FROM daily_report_audit_logs")).scalars().all() == [2]
+            conn.execute(text("UPDATE daily_reports SET report_date = '2024-02-20' WHERE id = 2"))
+            assert conn.execute(text("SELECT report_date FROM daily_report_audit_logs")).scalar() == date(2024, 2, 20)
+            conn.commit()
+
+        _run_migration(engine, "downgrade")
+        with engine.connect() as conn:
+            assert _foreign_keys(conn) == {
+                "reconciliations_daily_spend_id_fkey": "FOREIGN KEY (daily_spend_id) REFERENCES ad_spend_daily(id)",
+                "daily_report_audit_logs_daily_report_id_fkey": "FOREIGN KEY (daily_report_id) "
+                "REFERENCES daily_reports(id) ON DELETE CASCADE",
+            }
+            assert conn.execute(text(
+                "SELECT count(*) FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND column_name IN ('daily_spend_date', 'report_date') "
+                "AND table_name IN ('reconciliations', 'daily_report_audit_logs')"
+            )).scalar() == 0
+            assert _violates_foreign_key(conn, "INSERT INTO reconciliations (daily_spend_id) VALUES (999)")
+
+        # 降级后可再次升级
+        _run_migration(engine, "upgrade")
+        with engine.connect() as conn:
+            assert "MATCH FULL" in _foreign_keys(conn)["reconciliations_daily_spend_id_fkey"]
+    finally:
+        engine.dispose()
+        with admin.connect() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        admin.dispose()
+
+
+@requires_postgres
+@pytest.mark.performance
+@pytest.mark.slow
+def test_range_query_benchmark_partitioned_vs_plain(partitioned_engine) -> None:
+    """3 年数据上按月、按季度的范围汇总：分区表只扫描范围内的分区"""
+    month = add_months(date.today().replace(day=1), -12)
+    ranges = {
+        "month": (month, add_months(month, 1) - timedelta(days=1)),
+        "quarter": (month, add_months(month, 3) - timedelta(days=1)),
+    }
+    query = (
+        "SELECT ad_account_id, sum(spend), sum(leads_count) FROM {table} "
+        "WHERE date >= '{start}' AND date <= '{end}' GROUP BY ad_account_id"
+    )
+
+    results = {}
+    with partitioned_engine.connect() as conn:
+        for label, (start, end) in ranges.items():
+            for table in ("ad_spend_daily", "ad_spend_plain"):
+                sql = query.format(table=table, start=start, end=end)
+                samples = [_plan(conn, sql, analyze=True)["Execution Time"] for _ in range(5)]
+                results[(label, table)] = statistics.median(samples)
+
+    for label in ranges:
+        partitioned_ms, plain_ms = results[(label, "ad_spend_daily")], results[(label, "ad_spend_plain")]
+        print(f"{label}: partitioned {partitioned_ms:.2f}ms, plain {plain_ms:.2f}ms")
+        assert partitioned_ms < plain_ms, f"{label}: partitioned {partitioned_ms:.2f}ms vs plain {plain_ms:.2f}ms"
@@ -0,0 +1,96 @@
+import asyncio
+import math
+import time
+
+import bcrypt
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from backend.core.passwords import PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(max_workers=4, rounds=4)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify_run_in_pool(hasher) -> None:
+    async def _scenario():
+        hashed = await hasher.hash("S3cret!pass")
+        assert hashed.startswith("$2b$04$")
+        assert await hasher.verify("S3cret!pass", hashed) is True
+        assert await hasher.verify("wrong", hashed) is False
+        # 哈希缺失或格式非法时不抛异常
+        assert await hasher.verify("S3cret!pass", None) is False
+        assert await hasher.verify("S3cret!pass", "not-a-hash") is False
+        assert await hasher.dummy_verify("S3cret!pass") is False
+
+    asyncio.run(_scenario())
+    # 哑哈希只计算一次，轮数与真实哈希一致
+    assert hasher._dummy().startswith(b"$2b$04$")
+    assert hasher._dummy() is hasher._dummy()
+
+
+def _p99(samples) -> float:
+    ordered = sorted(samples)
+    return ordered[math.ceil(len(ordered) * 0.99) - 1]
+
+
+async def _login_storm(app: FastAPI, logins: int = 50) -> list:
+    """并发登录期间持续请求无关接口，返回其延迟（毫秒）"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        done = asyncio.Event()
+        latencies = []
+
+        async def _probe():
+            # 按固定节奏到达的请求，延迟从计划到达时间算起，事件循环被阻塞的等待也计入
+            scheduled = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                await client.get("/ping")
+                latencies.append((time.perf_counter() - scheduled) * 1000)
+                scheduled += 0.005
+
+        async def _storm():
+            await asyncio.gather(*(client.post("/login") for _ in range(logins)))
+            done.set()
+
+        await asyncio.gather(_probe(), _storm())
+        return latencies
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+def test_login_storm_does_not_stall_unrelated_endpoints() -> None:
+    rounds = 10
+    hasher = PasswordHasher(max_workers=4, rounds=rounds)
+    stored = bcrypt.hashpw(b"correct horse", bcrypt.gensalt(rounds)).decode()
+
+    def _app(offloaded: bool) -> FastAPI:
+        app = FastAPI()
+
+        @app.get("/ping")
+        async def ping():
+            return {"ok": True}
+
+        @app.post("/login")
+        async def login():
+            if offloaded:
+                return {"ok": await hasher.verify("correct horse", stored)}
+            return {"ok": bcrypt.checkpw(b"correct horse", stored.encode())}
+
+        return app
+
+    try:
+        blocking = _p99(asyncio.run(_login_storm(_app(offloaded=False))))
+        pooled = _p99(asyncio.run(_login_storm(_app(offloaded=True))))
+    finally:
+        hasher.shutdown()
+
+    # 哈希线程与事件循环共享 CPU 时仍有调度抖动，上限取单次默认轮数哈希的耗时量级
+    assert pooled < 250, f"p99 of unrelated endpoint {pooled:.1f}ms during 50 concurrent logins"
+    assert pooled * 10 < blocking, f"pooled p99 {pooled:.1f}ms vs blocking p99 {blocking:.1f}ms"
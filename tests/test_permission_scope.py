@@ -0,0 +1,146 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from core.database import Base
+from models.ad_account import AdAccount
+from models.project import Project, ProjectMember
+from services import permission_scope
+
+get_permission_scope = permission_scope.get_permission_scope
+
+
+@pytest.fixture
+def session():
+    permission_scope._scope_cache.clear()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Project), [
+            {"id": 1, "name": "p1", "account_manager_id": 10},
+            {"id": 2, "name": "p2", "account_manager_id": 10},
+            {"id": 3, "name": "p3", "account_manager_id": 11},
+        ])
+        conn.execute(insert(ProjectMember), [
+            {"project_id": 1, "user_id": 20},
+            {"project_id": 3, "user_id": 20},
+        ])
+        conn.execute(insert(AdAccount), [
+            {
+                "id": index,
+                "account_id": f"act_{index}",
+                "name": f"账户{index}",
+                "platform": "facebook",
+                "project_id": index % 3 + 1,
+                "channel_id": 1,
+                "assigned_user_id": 20 if index % 2 else 21,
+                "status": "active",
+                "created_by": 1,
+            }
+            for index in range(1, 31)
+        ])
+    counter = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_args):
+        counter[0] += 1
+
+    session = sessionmaker(bind=engine)()
+    session.query_count = counter
+    yield session
+    session.close()
+    permission_scope._scope_cache.clear()
+
+
+def _accounts(**filters):
+    return frozenset(
+        index for index in range(1, 31)
+        if all(value(index) for value in filters.values())
+    )
+
+
+def test_scope_resolved_once_and_cached(session) -> None:
+    manager = get_permission_scope(session, 10, "account_manager")
+    assert manager.project_ids == {1, 2}
+    assert manager.account_ids == _accounts(project=lambda i: i % 3 + 1 in (1, 2))
+
+    buyer = get_permission_scope(session, 20, "media_buyer")
+    assert buyer.project_ids == {1, 3}
+    assert buyer.account_ids == _accounts(assigned=lambda i: i % 2 == 1)
+
+    session.query_count[0] = 0
+    assert get_permission_scope(session, 10, "account_manager") is manager
+    assert get_permission_scope(session, 20, "media_buyer") is buyer
+    assert session.query_count[0] == 0
+
+    with pytest.raises(ValueError):
+        get_permission_scope(session, 1, "admin")
+
+
+def test_membership_and_assignment_changes_invalidate_affected_users(session) -> None:
+    manager = get_permission_scope(session, 10, "account_manager")
+    get_permission_scope(session, 11, "account_manager")
+    buyer = get_permission_scope(session, 20, "media_buyer")
+
+    # 账户移入其他项目：新旧项目负责人失效，未涉及的投手不受影响
+    account = session.get(AdAccount, 2)
+    session.expire(account)
+    account.project_id = 1
+    session.commit()
+    assert 2 in get_permission_scope(session, 10, "account_manager").account_ids
+    assert 2 not in get_permission_scope(session, 11, "account_manager").account_ids
+    assert get_permission_scope(session, 20, "media_buyer") is buyer
+
+    # 账户改派：旧属性已过期时仍能使原投手失效
+    account = session.get(AdAccount, 1)
+    session.expire(account)
+    account.assigned_user_id = 22
+    session.commit()
+    assert 1 not in get_permission_scope(session, 20, "media_buyer").account_ids
+
+    # 项目成员与负责人变化
+    session.add(ProjectMember(project_id=2, user_id=20))
+    session.get(Project, 3).account_manager_id = 10
+    session.commit()
+    assert get_permission_scope(session, 20, "media_buyer").project_ids == {1, 2, 3}
+    assert get_permission_scope(session, 10, "account_manager").project_ids == {1, 2, 3}
+    assert get_permission_scope(session, 11, "account_manager").project_ids == frozenset()
+
+    # 回滚的变更不失效
+    current = get_permission_scope(session, 10, "account_manager")
+    session.get(Project, 1).account_manager_id = 11
+    session.flush()
+    session.rollback()
+    assert current is not manager
+    assert get_permission_scope(session, 10, "account_manager") is current
+
+
+def test_large_scopes_filter_through_temp_table(session, monkeypatch) -> None:
+    scope = get_permission_scope(session, 20, "media_buyer")
+    inline = set(session.execute(select(AdAccount.id).where(scope.account_filter(session, AdAccount.id))).scalars())
+
+    monkeypatch.setattr(permission_scope, "INLINE_ID_LIMIT", 2)
+    clause = scope.account_filter(session, AdAccount.id)
+    staged = set(session.execute(select(AdAccount.id).where(clause)).scalars())
+    assert staged == inline == scope.account_ids
+
+    # 同一事务内复用已写入的 ID，提交后重新写入
+    session.query_count[0] = 0
+    scope.account_filter(session, AdAccount.id)
+    assert session.query_count[0] == 0
+    session.commit()
+    assert set(session.execute(select(AdAccount.id).where(scope.account_filter(session, AdAccount.id))).scalars()) == inline
+
+    empty = get_permission_scope(session, 99, "media_buyer")
+    assert session.execute(select(AdAccount.id).where(empty.account_filter(session, AdAccount.id))).all() == []
+
+
+def test_cache_ttl_is_short_without_shared_backend() -> None:
+    settings = SimpleNamespace(permission_scope_cache_ttl=300, permission_scope_local_cache_ttl=5)
+    # 版本号只在本进程内时，撤销授权对其他进程最长延迟本地有效期
+    assert permission_scope._scope_cache_ttl(settings, None) == 5
+    assert permission_scope._scope_cache_ttl(settings, object()) == 300
+    settings.permission_scope_cache_ttl = 0
+    assert permission_scope._scope_cache_ttl(settings, None) == 0
@@ -0,0 +1,120 @@
+import random
+import statistics
+import time
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event, insert, inspect
+from sqlalchemy.orm import sessionmaker
+
+from core.database import Base
+from exceptions.custom_exceptions import BusinessLogicError
+from models.ad_account import AdAccount
+from models.channel import Channel  # noqa: F401  ad_accounts 外键引用
+from models.project import Project, ProjectExpense, ProjectMember
+from models.user import User
+from services import project_service
+
+ProjectService = project_service.ProjectService
+
+ADMIN = SimpleNamespace(id=1, role="admin")
+
+
+def _seed(accounts: int, expenses: int, seed: int = 1):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    rnd = random.Random(seed)
+    amounts = [Decimal(rnd.randint(1, 100000)) / 100 for _ in range(expenses)]
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1}, {"id": 2}])
+        conn.execute(insert(Project), [
+            {"id": 1, "name": "大项目", "account_manager_id": 2, "created_by": 1},
+            {"id": 2, "name": "空项目", "account_manager_id": 2, "created_by": 1},
+        ])
+        conn.execute(insert(ProjectMember), [{"project_id": 1, "user_id": 2}])
+        conn.execute(insert(AdAccount), [
+            {
+                "id": index,
+                "account_id": f"act_{index}",
+                "name": f"账户{index}",
+                "platform": "facebook",
+                "project_id": 1,
+                "channel_id": 1,
+                "assigned_user_id": 2,
+                "status": "active" if index % 4 else "suspended",
+                "created_by": 1,
+            }
+            for index in range(1, accounts + 1)
+        ])
+        if expenses:
+            conn.execute(insert(ProjectExpense), [
+                {"project_id": 1, "expense_type": "ads", "amount": amount, "expense_date": date(2024, 1, 1), "created_by": 1}
+                for amount in amounts
+            ])
+    return engine, sum(amounts, Decimal("0"))
+
+
+def _query_counter(engine) -> list:
+    counter = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_args):
+        counter[0] += 1
+
+    return counter
+
+
+def test_get_project_aggregates_without_loading_collections() -> None:
+    engine, total = _seed(accounts=40, expenses=300)
+    counter = _query_counter(engine)
+    db = sessionmaker(bind=engine)()
+
+    project = ProjectService(db).get_project(1, ADMIN)
+    assert counter[0] == 1
+    assert (project.total_accounts, project.active_accounts, project.total_spent) == (40, 30, total)
+    unloaded = inspect(project).unloaded
+    assert {"members", "expenses", "ad_accounts"} <= unloaded
+
+    empty = ProjectService(db).get_project(2, ADMIN)
+    assert (empty.total_accounts, empty.active_accounts, empty.total_spent) == (0, 0, Decimal("0"))
+    db.close()
+
+
+def test_get_project_loads_requested_collections() -> None:
+    engine, _ = _seed(accounts=5, expenses=20)
+    db = sessionmaker(bind=engine)()
+
+    project = ProjectService(db).get_project(1, ADMIN, include=["members", "expenses"])
+    assert not {"members", "expenses"} & inspect(project).unloaded
+    assert [member.user_id for member in project.members] == [2]
+    assert len(project.expenses) == 20
+
+    with pytest.raises(BusinessLogicError):
+        ProjectService(db).get_project(1, ADMIN, include=["ad_accounts"])
+    db.close()
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+def test_get_project_benchmark_50k_expenses_2k_accounts() -> None:
+    engine, total = _seed(accounts=2_000, expenses=50_000)
+    session_factory = sessionmaker(bind=engine)
+
+    def _detail(**kwargs):
+        db = session_factory()
+        try:
+            start = time.perf_counter()
+            project = ProjectService(db).get_project(1, ADMIN, **kwargs)
+            elapsed = (time.perf_counter() - start) * 1000
+            assert project.total_spent == total
+            return elapsed
+        finally:
+            db.close()
+
+    summary_ms = statistics.median(_detail() for _ in range(5))
+    full_ms = statistics.median(_detail(include=["members", "expenses"]) for _ in range(3))
+
+    assert summary_ms < 100, f"project detail {summary_ms:.1f}ms with 50k expenses"
+    assert summary_ms * 5 < full_ms, f"summary {summary_ms:.1f}ms vs full {full_ms:.1f}ms"
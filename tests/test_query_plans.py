@@ -0,0 +1,228 @@
+"""
+热点筛选路径的查询计划校验
+
+在 BENCHMARK_DATABASE_URL 指向的 PostgreSQL 上建立最小表结构，执行 008 迁移并灌入数据，
+再对各服务的筛选查询执行 EXPLAIN：禁用顺序扫描后计划中仍出现 Seq Scan，说明没有可用索引
+"""
+import importlib.util
+import json
+import os
+from pathlib import Path
+
+import pytest
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = os.environ.get("BENCHMARK_DATABASE_URL", "")
+ROWS = int(os.environ.get("QUERY_PLAN_ROWS", 200_000))
+SCHEMA = "query_plan_check"
+MIGRATION = Path(__file__).resolve().parents[1] / "backend/migrations/versions/008_hot_path_indexes.py"
+
+pytestmark = [
+    pytest.mark.performance,
+    pytest.mark.skipif(not DATABASE_URL.startswith("postgresql"), reason="需要 BENCHMARK_DATABASE_URL 指向 PostgreSQL"),
+]
+
+# 只保留热点查询涉及的列，表名、列名与线上一致
+_TABLES = """
+    CREATE TABLE topup_requests (
+        id SERIAL PRIMARY KEY,
+        ad_account_id INTEGER NOT NULL,
+        project_id INTEGER NOT NULL,
+        requested_by INTEGER NOT NULL,
+        requested_amount NUMERIC(15, 2) NOT NULL,
+        expected_date DATE,
+        status VARCHAR(20) NOT NULL,
+        created_at TIMESTAMP NOT NULL
+    );
+    CREATE TABLE ad_spend_daily (
+        id SERIAL PRIMARY KEY,
+        ad_account_id INTEGER NOT NULL,
+        date DATE NOT NULL,
+        spend NUMERIC(18, 2) NOT NULL,
+        leads_count INTEGER NOT NULL,
+        CONSTRAINT ad_spend_daily_unique_account_date UNIQUE (ad_account_id, date)
+    );
+    CREATE TABLE reconciliations (
+        id SERIAL PRIMARY KEY,
+        status VARCHAR(20) NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL
+    );
+    CREATE TABLE import_jobs (
+        id SERIAL PRIMARY KEY,
+        status VARCHAR(20) NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL
+    );
+    CREATE TABLE ad_accounts (
+        id SERIAL PRIMARY KEY,
+        assigned_user_id INTEGER,
+        status VARCHAR(20) NOT NULL
+    );
+    CREATE TABLE account_alerts (
+        id SERIAL PRIMARY KEY,
+        status VARCHAR(20) NOT NULL,
+        severity VARCHAR(20) NOT NULL
+    );
+"""
+
+_SEED = [
+    # 进行中的申请约占 15%
+    """
+    INSERT INTO topup_requests (ad_account_id, project_id, requested_by, requested_amount, expected_date, status, created_at)
+    SELECT n % 500 + 1, n % 50 + 1, n % 40 + 1, 100, DATE '2024-01-01' + n % 700,
+           CASE n % 20 WHEN 0 THEN 'pending' WHEN 1 THEN 'data_review' WHEN 2 THEN 'finance_approve'
+                ELSE 'completed' END,
+           TIMESTAMP '2024-01-01' + n * INTERVAL '1 minute'
+    FROM generate_series(0, {rows} - 1) AS n
+    """,
+    """
+    INSERT INTO ad_spend_daily (ad_account_id, date, spend, leads_count)
+    SELECT n % 500 + 1, DATE '2020-01-01' + n / 500, 10, n % 7
+    FROM generate_series(0, {rows} - 1) AS n
+    """,
+    """
+    INSERT INTO reconciliations (status, created_at)
+    SELECT CASE n % 10 WHEN 0 THEN 'matched' WHEN 1 THEN 'manual_review' ELSE 'confirmed' END,
+           TIMESTAMPTZ '2024-01-01' + n * INTERVAL '1 minute'
+    FROM generate_series(0, {rows} - 1) AS n
+    """,
+    """
+    INSERT INTO import_jobs (status, created_at)
+    SELECT CASE n % 20 WHEN 0 THEN 'pending' WHEN 1 THEN 'failed' ELSE 'completed' END,
+           TIMESTAMPTZ '2024-01-01' + n * INTERVAL '1 minute'
+    FROM generate_series(0, {rows} / 10 - 1) AS n
+    """,
+    """
+    INSERT INTO ad_accounts (assigned_user_id, status)
+    SELECT n % 200 + 1, CASE WHEN n % 5 = 0 THEN 'suspended' ELSE 'active' END
+    FROM generate_series(0, {rows} / 10 - 1) AS n
+    """,
+    """
+    INSERT INTO account_alerts (status, severity)
+    SELECT CASE WHEN n % 10 = 0 THEN 'active' ELSE 'resolved' END,
+           (ARRAY['low', 'medium', 'high', 'critical'])[n % 4 + 1]
+    FROM generate_series(0, {rows} - 1) AS n
+    """,
+]
+
+# (查询名, 表名, 可接受的索引, SQL)，SQL 与对应服务/路由中的查询条件一致
+HOT_QUERIES = [
+    (
+        "topup_list_by_status", "topup_requests", {"idx_topup_requests_status_created"},
+        "SELECT * FROM topup_requests WHERE status = 'finance_approve' ORDER BY created_at DESC LIMIT 20",
+    ),
+    (
+        "topup_dashboard_status_count", "topup_requests", {"idx_topup_requests_status_created"},
+        "SELECT count(*) FROM topup_requests WHERE status = 'data_review'",
+    ),
+    (
+        "topup_daily_request_limit", "topup_requests", {"idx_topup_requests_account_requester_created"},
+        "SELECT count(*) FROM topup_requests "
+        "WHERE ad_account_id = 7 AND requested_by = 7 AND created_at >= TIMESTAMP '2024-03-01'",
+    ),
+    (
+        "topup_pending_queue", "topup_requests",
+        {"idx_topup_requests_pending", "idx_topup_requests_status_created"},
+        "SELECT id, ad_account_id, project_id, requested_amount FROM topup_requests "
+        "WHERE status = 'pending' ORDER BY created_at DESC LIMIT 20",
+    ),
+    (
+        "topup_overdue_count", "topup_requests",
+        {"idx_topup_requests_open_expected", "idx_topup_requests_status_created"},
+        "SELECT count(*) FROM topup_requests "
+        "WHERE status IN ('pending', 'data_review', 'finance_approve') AND expected_date < DATE '2024-06-01'",
+    ),
+    (
+        "ad_spend_recompute", "ad_spend_daily",
+        {"idx_ad_spend_daily_account_date_cover", "ad_spend_daily_unique_account_date"},
+        "SELECT ad_account_id, sum(spend), sum(leads_count) FROM ad_spend_daily "
+        "WHERE ad_account_id IN (1, 2, 3) GROUP BY ad_account_id",
+    ),
+    (
+        "reconciliation_review", "reconciliations", {"idx_reconciliations_status_created"},
+        "SELECT * FROM reconciliations WHERE status IN ('matched', 'manual_review') "
+        "ORDER BY created_at DESC LIMIT 50",
+    ),
+    (
+        "import_jobs_by_status", "import_jobs", {"idx_import_jobs_status_created"},
+        "SELECT * FROM import_jobs WHERE status = 'failed' ORDER BY created_at DESC LIMIT 20",
+    ),
+    (
+        "ad_accounts_by_assignee", "ad_accounts", {"idx_ad_accounts_assigned_user_status"},
+        "SELECT * FROM ad_accounts WHERE assigned_user_id = 3 AND status = 'active'",
+    ),
+    (
+        "active_alerts_by_severity", "account_alerts", {"idx_account_alerts_status_severity"},
+        "SELECT severity, count(*) FROM account_alerts WHERE status = 'active' GROUP BY severity",
+    ),
+]
+
+
+def _load_migration():
+    spec = importlib.util.spec_from_file_location("hot_path_indexes", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+@pytest.fixture(scope="module")
+def plan_engine():
+    admin = create_engine(DATABASE_URL, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+
+    engine = create_engine(DATABASE_URL, connect_args={"options": f"-csearch_path={SCHEMA}"})
+    with engine.begin() as conn:
+        conn.execute(text(_TABLES))
+        for statement in _SEED:
+            conn.execute(text(statement.format(rows=ROWS)))
+
+    # 与线上一致：通过 alembic 执行迁移，索引在 autocommit 块中并发创建
+    migration = _load_migration()
+    with engine.connect() as conn:
+        context = MigrationContext.configure(conn)
+        with context.begin_transaction(), Operations.context(context):
+            migration.upgrade()
+
+    # VACUUM 更新可见性映射，仅索引扫描才会被采用
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table in {query[1] for query in HOT_QUERIES}:
+            conn.execute(text(f"VACUUM ANALYZE {table}"))
+
+    yield engine
+    engine.dispose()
+    with admin.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    admin.dispose()
+
+
+def test_migration_creates_every_hot_path_index(plan_engine) -> None:
+    with plan_engine.connect() as conn:
+        existing = set(conn.execute(
+            text("SELECT indexname FROM pg_indexes WHERE schemaname = :schema"), {"schema": SCHEMA}
+        ).scalars())
+    assert {spec[0] for spec in _load_migration().HOT_PATH_INDEXES} <= existing
+
+
+@pytest.mark.parametrize("name, table, indexes, sql", HOT_QUERIES, ids=[query[0] for query in HOT_QUERIES])
+def test_hot_query_uses_index(plan_engine, name, table, indexes, sql) -> None:
+    with plan_engine.connect() as conn:
+        conn.execute(text("SET enable_seqscan = off"))
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    nodes = list(_plan_nodes(plan[0]["Plan"]))
+    summary = json.dumps(plan[0]["Plan"], ensure_ascii=False, indent=1)
+    assert not [node for node in nodes if node["Node Type"] == "Seq Scan"], f"{name}: 顺序扫描\n{summary}"
+    # 位图扫描时索引名在 Bitmap Index Scan 子节点上
+    assert {node.get("Index Name") for node in nodes} & indexes, f"{name}: {table} 未使用预期索引\n{summary}"
@@ -0,0 +1,233 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+import jwt
+import pytest
+from fastapi import FastAPI
+
+from backend.core.config import get_settings
+from backend.middleware.rate_limit import (
+    ClientIdentifier,
+    MemoryRateLimitBackend,
+    RateLimitMiddleware,
+    RedisRateLimitBackend,
+    RoutePatternMatcher,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _app(backend, **kwargs) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/v1/projects")
+    async def projects():
+        return {"ok": True}
+
+    @app.get("/api/v1/ledger/export")
+    async def export():
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, backend=backend, enabled=True, **kwargs)
+    return app
+
+
+def _bearer(subject: str, **claims) -> dict:
+    payload = {"sub": subject, "type": "access", "exp": int(time.time()) + 600, "jti": uuid.uuid4().hex, **claims}
+    return {"Authorization": "Bearer " + jwt.encode(payload, get_settings().jwt_secret, algorithm="HS256")}
+
+
+def _get_all(app: FastAPI, requests):
+    async def _scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get(path, headers=headers) for path, headers in requests]
+
+    return asyncio.run(_scenario())
+
+
+def test_gcra_allows_burst_then_spaces_requests() -> None:
+    clock = FakeClock()
+    backend = MemoryRateLimitBackend(timer=clock)
+
+    results = [backend.hit("k", limit=5, window=10) for _ in range(6)]
+    assert [r.allowed for r in results] == [True] * 5 + [False]
+    assert [r.remaining for r in results] == [4, 3, 2, 1, 0, 0]
+    assert results[-1].retry_after == pytest.approx(2.0)
+    assert results[4].reset_after == pytest.approx(10.0)
+
+    # 滑动恢复：每过一个间隔恢复一次额度，而不是等整个窗口结束
+    clock.now += 2.0
+    assert backend.hit("k", limit=5, window=10).allowed
+    assert not backend.hit("k", limit=5, window=10).allowed
+    assert backend.hit("other", limit=5, window=10).remaining == 4
+
+    clock.now += 10.0
+    assert backend.hit("k", limit=5, window=10).remaining == 4
+
+
+def test_memory_backend_prunes_recovered_keys() -> None:
+    clock = FakeClock()
+    backend = MemoryRateLimitBackend(timer=clock, max_keys=3)
+    for key in "abc":
+        backend.hit(key, limit=10, window=10)
+    clock.now += 5
+    backend.hit("d", limit=10, window=10)
+    assert set(backend._tats) == {"d"}
+
+
+def test_route_pattern_matcher() -> None:
+    matcher = RoutePatternMatcher(["/api/v1/*/export", "/api/v1/reconciliation/batches/*/process"])
+    assert matcher.matches("/api/v1/ledger/export")
+    assert matcher.matches("/api/v1/reconciliation/batches/42/process")
+    assert not matcher.matches("/api/v1/ledger/export/jobs/abc")
+    assert not matcher.matches("/api/v1/ledger")
+
+
+def test_middleware_headers_and_429() -> None:
+    backend = MemoryRateLimitBackend(timer=FakeClock())
+    app = _app(backend, limit=2, window=60, heavy_limit=1, heavy_window=60)
+    alice = _bearer("alice")
+    bob = _bearer("bob")
+
+    responses = _get_all(app, [
+        ("/api/v1/projects", alice),
+        ("/api/v1/projects", alice),
+        ("/api/v1/projects", alice),
+        ("/api/v1/projects", bob),
+        ("/api/v1/ledger/export", alice),
+        ("/api/v1/ledger/export", alice),
+        ("/health", alice),
+    ])
+    first, second, limited, other_user, heavy, heavy_limited, health = responses
+
+    assert first.status_code == 200
+    assert first.headers["x-ratelimit-limit"] == "2"
+    assert first.headers["x-ratelimit-remaining"] == "1"
+    assert second.headers["x-ratelimit-remaining"] == "0"
+
+    assert limited.status_code == 429
+    assert limited.headers["retry-after"] == "30"
+    assert limited.json()["code"] == "RATE_LIMIT_EXCEEDED"
+    assert limited.json()["details"] == {"retry_after": 30}
+
+    # 不同用户、重型接口各自计数
+    assert other_user.status_code == 200
+    assert heavy.status_code == 200 and heavy.headers["x-ratelimit-limit"] == "1"
+    assert heavy_limited.status_code == 429 and heavy_limited.headers["retry-after"] == "60"
+    assert health.status_code == 200 and "x-ratelimit-limit" not in health.headers
+
+
+def test_anonymous_requests_keyed_by_ip() -> None:
+    backend = MemoryRateLimitBackend(timer=FakeClock())
+    # ASGITransport 的直连地址为 127.0.0.1，作为可信代理时按转发头取客户端 IP
+    app = _app(backend, limit=1, window=60, trusted_proxies=["127.0.0.1", "172.16.0.0/12"])
+    responses = _get_all(app, [
+        ("/api/v1/projects", {"X-Forwarded-For": "10.0.0.1, 172.16.0.1"}),
+        ("/api/v1/projects", {"X-Forwarded-For": "10.0.0.1"}),
+        ("/api/v1/projects", {"X-Forwarded-For": "10.0.0.2"}),
+        # 客户端自填在最左侧的地址不采信
+        ("/api/v1/projects", {"X-Forwarded-For": "10.9.9.9, 10.0.0.2"}),
+    ])
+    assert [r.status_code for r in responses] == [200, 429, 200, 429]
+
+
+def test_forwarded_headers_ignored_from_untrusted_peer() -> None:
+    backend = MemoryRateLimitBackend(timer=FakeClock())
+    app = _app(backend, limit=1, window=60, trusted_proxies=[])
+    responses = _get_all(app, [
+        ("/api/v1/projects", {"X-Forwarded-For": "10.0.0.1"}),
+        ("/api/v1/projects", {"X-Forwarded-For": "10.0.0.2"}),
+        ("/api/v1/projects", {"X-Real-IP": "10.0.0.3"}),
+    ])
+    assert [r.status_code for r in responses] == [200, 429, 429]
+
+
+def test_unverified_tokens_share_ip_budget() -> None:
+    backend = MemoryRateLimitBackend(timer=FakeClock())
+    app = _app(backend, limit=2, window=60)
+    forged = jwt.encode({"sub": "alice", "type": "access"}, "wrong-secret", algorithm="HS256")
+    responses = _get_all(app, [
+        ("/api/v1/projects", {"Authorization": f"Bearer random-{uuid.uuid4().hex}"}),
+        ("/api/v1/projects", {"Authorization": f"Bearer {forged}"}),
+        ("/api/v1/projects", {"Authorization": f"Bearer random-{uuid.uuid4().hex}"}),
+        ("/api/v1/projects", _bearer("alice", exp=int(time.time()) - 1)),
+        # 验签通过的令牌按用户计数，不受 IP 预算影响
+        ("/api/v1/projects", _bearer("alice")),
+    ])
+    assert [r.status_code for r in responses] == [200, 200, 429, 429, 200]
+
+
+def test_tokens_of_one_user_share_budget() -> None:
+    backend = MemoryRateLimitBackend(timer=FakeClock())
+    app = _app(backend, limit=2, window=60)
+    responses = _get_all(app, [("/api/v1/projects", _bearer("carol")) for _ in range(3)])
+    assert [r.status_code for r in responses] == [200, 200, 429]
+
+
+def test_client_identifier_rejects_refresh_tokens() -> None:
+    identify = ClientIdentifier(get_settings().jwt_secret)
+    refresh = _bearer("dave", type="refresh")["Authorization"][7:].encode()
+    access = _bearer("dave")["Authorization"][7:].encode()
+    assert identify.subject(refresh) is None
+    assert identify.subject(access) == "dave"
+
+
+def test_redis_backend_falls_back_to_local_counter() -> None:
+    class BrokenClient:
+        def register_script(self, script):
+            def _run(keys, args):
+                raise ConnectionError("redis down")
+            return _run
+
+    backend = RedisRateLimitBackend(BrokenClient(), fallback=MemoryRateLimitBackend(timer=FakeClock()))
+    assert [backend.hit("k", 1, 60).allowed for _ in range(2)] == [True, False]
+
+
+@pytest.mark.performance
+def test_in_memory_check_overhead_under_50us() -> None:
+    backend = MemoryRateLimitBackend()
+    middleware = RateLimitMiddleware(None, backend=backend, limit=10_000, window=1, enabled=True)
+
+    async def _noop(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def _send(message):
+        pass
+
+    middleware.app = _noop
+    tokens = [_bearer(f"user-{index}")["Authorization"].encode() for index in range(1000)]
+    scopes = [
+        {
+            "type": "http",
+            "path": f"/api/v1/ad-accounts/{index % 500}" if index % 3 else "/api/v1/ledger/export",
+            "headers": [(b"authorization", tokens[index % 1000]), (b"accept", b"*/*")],
+            "client": ("127.0.0.1", 1234),
+        }
+        for index in range(20_000)
+    ]
+
+    async def _run():
+        samples = []
+        for _ in range(5):
+            start = time.perf_counter()
+            for scope in scopes:
+                await middleware(scope, None, _send)
+            samples.append((time.perf_counter() - start) / len(scopes) * 1e6)
+        return samples
+
+    per_request_us = statistics.median(asyncio.run(_run()))
+    assert per_request_us < 50, f"rate limit check {per_request_us:.1f}µs per request"
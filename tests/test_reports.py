@@ -1,11 +1,15 @@
-from datetime import date, datetime
+import statistics
+import time
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 from uuid import uuid4
 
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from backend.models import AdAccount, AdSpendDaily, Ledger, Project, Reconciliation, User
+from backend.models import AdAccount, AdSpendDaily, Ledger, Log, Project, Reconciliation, User
+from backend.services.log_service import log_batch_writer
 
 
 def _clear_data(db: Session) -> None:
@@ -155,3 +159,248 @@ def test_reports_snapshot_post(client: TestClient, db_session: Session) -> None:
     assert len(data) == 1
     assert data[0]["project_id"] == str(project_id)
 
+
+def test_reports_snapshot_log_written_async(client: TestClient, db_session: Session) -> None:
+    _clear_data(db_session)
+    project_id = _setup_data(db_session)
+
+    response = client.post("/api/v1/reports", json={"project_id": str(project_id)})
+    assert response.status_code == 200
+
+    # 快照日志由后台批量写入线程落库
+    log_batch_writer.flush()
+    db_session.expire_all()
+    entry = db_session.query(Log).filter(Log.action == "generate_report_snapshot").one()
+    assert entry.after_data["project_id"] == str(project_id)
+
+
+
+def _add_fanout_data(db: Session, project_id) -> None:
+    """同一消耗对应多笔流水、同一流水对应多条消耗，复现一对多对账场景。"""
+    account = db.query(AdAccount).filter(AdAccount.project_id == project_id).first()
+    spends = (
+        db.query(AdSpendDaily)
+        .filter(AdSpendDaily.ad_account_id == account.id)
+        .order_by(AdSpendDaily.date)
+        .all()
+    )
+    ledger1 = db.query(Ledger).filter(Ledger.project_id == project_id).first()
+    ledger2 = Ledger(
+        id=uuid4(),
+        type="income",
+        project_id=project_id,
+        channel_id=uuid4(),
+        ad_account_id=account.id,
+        amount=Decimal("40.00"),
+        currency="USD",
+        occurred_at=datetime(2024, 1, 3),
+        remark="Income 2",
+        created_by=account.created_by,
+        updated_by=account.created_by,
+    )
+    db.add(ledger2)
+    db.flush()
+    db.add_all(
+        [
+            Reconciliation(
+                id=uuid4(),
+                ad_account_id=account.id,
+                daily_spend_id=spends[0].id,
+                finance_txn_id=ledger2.id,
+                match_type="manual",
+                status="matched",
+                amount_diff=Decimal("0"),
+                date_diff=0,
+            ),
+            Reconciliation(
+                id=uuid4(),
+                ad_account_id=account.id,
+                daily_spend_id=spends[1].id,
+                finance_txn_id=ledger1.id,
+                match_type="manual",
+                status="matched",
+                amount_diff=Decimal("0"),
+                date_diff=0,
+            ),
+        ]
+    )
+    db.commit()
+
+
+def test_reports_profit_no_join_fanout(client: TestClient, db_session: Session) -> None:
+    _clear_data(db_session)
+    project_id = _setup_data(db_session)
+    _add_fanout_data(db_session, project_id)
+
+    response = client.get("/api/v1/reports/profit")
+    assert response.status_code == 200
+    record = next(item for item in response.json()["data"] if item["project_id"] == str(project_id))
+    # 两条消耗各计一次，两笔流水各计一次
+    assert record["spend"] == "250.00"
+    assert record["finance_amount"] == "300.00"
+    assert record["profit"] == "50.00"
+
+    detail = client.get(f"/api/v1/reports/{project_id}").json()["data"]
+    assert detail["total_spend"] == "250.00"
+    assert detail["finance_amount"] == "300.00"
+
+
+def test_reports_etag_not_modified(client: TestClient, db_session: Session) -> None:
+    _clear_data(db_session)
+    _setup_data(db_session)
+
+    first = client.get("/api/v1/reports/performance")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    second = client.get("/api/v1/reports/performance", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert second.content == b""
+
+
+def test_reports_cache_invalidated_by_spend_write(client: TestClient, db_session: Session) -> None:
+    _clear_data(db_session)
+    project_id = _setup_data(db_session)
+
+    first = client.get("/api/v1/reports/performance")
+    etag = first.headers["etag"]
+
+    account = db_session.query(AdAccount).filter(AdAccount.project_id == project_id).first()
+    db_session.add(
+        AdSpendDaily(
+            id=uuid4(),
+            ad_account_id=account.id,
+            user_id=account.created_by,
+            date=date(2024, 1, 3),
+            spend=Decimal("50.00"),
+            leads_count=5,
+            cost_per_lead=Decimal("10.00"),
+            is_anomaly=False,
+        )
+    )
+    db_session.commit()
+
+    refreshed = client.get("/api/v1/reports/performance", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+    record = next(item for item in refreshed.json()["data"] if item["project_id"] == str(project_id))
+    assert record["total_spend"] == "300.00"
+
+
+def test_reports_from_replica_are_not_cached(client: TestClient, db_session: Session, monkeypatch) -> None:
+    from backend.services import analytics_store
+
+    _clear_data(db_session)
+    project_id = _setup_data(db_session)
+    calls = []
+
+    def _replica_rows(start, end, _project_id=None):
+        calls.append((start, end))
+        return [analytics_store.PerformanceRow(str(project_id), "Performance Project", Decimal("1.00"), 1)]
+
+    monkeypatch.setattr(analytics_store, "covers", lambda start, end: True)
+    monkeypatch.setattr(analytics_store, "project_performance", _replica_rows)
+
+    params = {"start": "2023-01-01", "end": "2024-12-31"}
+    first = client.get("/api/v1/reports/performance", params=params)
+    second = client.get("/api/v1/reports/performance", params=params, headers={"If-None-Match": first.headers["etag"]})
+
+    # 副本可能落后于主库，每次都重新计算，结果不变时仍可返回 304
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert len(calls) == 2
+
+
+def test_report_cache_month_versions_isolated() -> None:
+    from backend.services.report_cache import ReportCache
+
+    cache = ReportCache(maxsize=8, ttl=60)
+    project_id = uuid4()
+    feb = cache.version_names(project_id, date(2024, 2, 1), date(2024, 2, 29))
+    before = cache.versions.token(feb)
+
+    # 一月的消耗变更不影响二月报表
+    cache.invalidate([(project_id, date(2024, 1, 15))])
+    assert cache.versions.token(feb) == before
+
+    # 无法确定日期的流水变更使该项目所有区间失效
+    cache.invalidate([(project_id, None)])
+    assert cache.versions.token(feb) != before
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+def test_reports_profit_scales_with_rows_not_fanout(db_session: Session) -> None:
+    """对账条数成倍增加时，利润查询耗时不应随 消耗数 × 对账数 同步放大。"""
+    from backend.routers.reports import _collect_profit
+
+    _clear_data(db_session)
+    project_id = _setup_data(db_session)
+    account = db_session.query(AdAccount).filter(AdAccount.project_id == project_id).first()
+    spend_count = 500
+    spends = [
+        AdSpendDaily(
+            id=uuid4(),
+            ad_account_id=account.id,
+            user_id=account.created_by,
+            date=date(2023, 1, 1) + timedelta(days=i),
+            spend=Decimal("10.00"),
+            leads_count=1,
+            cost_per_lead=Decimal("10.00"),
+            is_anomaly=False,
+        )
+        for i in range(spend_count)
+    ]
+    db_session.add_all(spends)
+    db_session.commit()
+
+    def _measure(fanout: int) -> float:
+        db_session.query(Reconciliation).delete()
+        db_session.query(Ledger).delete()
+        ledgers = [
+            Ledger(
+                id=uuid4(),
+                type="income",
+                project_id=project_id,
+                channel_id=uuid4(),
+                ad_account_id=account.id,
+                amount=Decimal("1.00"),
+                currency="USD",
+                occurred_at=datetime(2023, 1, 1),
+            )
+            for _ in range(fanout)
+        ]
+        db_session.add_all(ledgers)
+        db_session.flush()
+        db_session.add_all(
+            Reconciliation(
+                id=uuid4(),
+                ad_account_id=account.id,
+                daily_spend_id=spend.id,
+                finance_txn_id=ledger.id,
+                match_type="auto",
+                status="matched",
+                amount_diff=Decimal("0"),
+                date_diff=0,
+            )
+            for spend in spends
+            for ledger in ledgers
+        )
+        db_session.commit()
+
+        rows = _collect_profit(db_session, date(2023, 1, 1), None, project_id)
+        assert Decimal(rows[0].spend_amount) == Decimal("10.00") * spend_count
+        assert Decimal(rows[0].ledger_amount) == Decimal("1.00") * fanout
+
+        times = []
+        for _ in range(5):
+            start = time.perf_counter()
+            _collect_profit(db_session, date(2023, 1, 1), None, project_id)
+            times.append(time.perf_counter() - start)
+        return statistics.median(times)
+
+    baseline = _measure(1)
+    fanned = _measure(8)
+    # 对账表本身增长 8 倍，聚合结果行与金额不变，耗时增长须明显低于放大倍数的平方
+    assert fanned / baseline < 8 * 4, f"fan-out x8 slowed profit query by {fanned / baseline:.1f}x"
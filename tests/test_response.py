@@ -0,0 +1,106 @@
+import statistics
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from enum import Enum
+from uuid import uuid4
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from backend.core import response as response_module
+from backend.core.response import FastJSONResponse, fail, ok, paginated_response, render_json
+
+
+class _Status(str, Enum):
+    ACTIVE = "active"
+
+
+class _Owner(BaseModel):
+    id: int
+    name: str
+
+
+def _legacy_body(content) -> bytes:
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+
+def _sample_content() -> dict:
+    return {
+        "id": uuid4(),
+        "spend": Decimal("100.50"),
+        "leads": Decimal("12"),
+        "ratio": 0.1234,
+        "tiny": 1e-05,
+        "huge": 1.5e20,
+        "date": date(2024, 1, 31),
+        "created_at": datetime(2024, 1, 31, 8, 30, 15, 123456, tzinfo=timezone.utc),
+        "naive_at": datetime(2024, 1, 31, 8, 30),
+        "duration": timedelta(minutes=5),
+        "status": _Status.ACTIVE,
+        "owner": _Owner(id=1, name="投手"),
+        "tags": {"a"},
+        "nested": [{"note": "中文 </script>", "value": None, "ok": True}],
+        "big": 2**70,
+        1: "int key",
+    }
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_render_json_matches_json_response_bytes(monkeypatch, use_orjson: bool) -> None:
+    if not use_orjson:
+        monkeypatch.setattr(response_module, "orjson", None)
+    content = _sample_content()
+
+    assert render_json(content) == _legacy_body(content)
+
+
+def test_response_helpers_use_fast_response() -> None:
+    spend_id = uuid4()
+    response = ok(data={"id": spend_id, "spend": Decimal("9.90")}, status_code=201)
+
+    assert isinstance(response, FastJSONResponse)
+    assert response.status_code == 201
+    assert b'"data":{"id":"%s","spend":9.9}' % str(spend_id).encode() in response.body
+    assert isinstance(fail("INVALID_PARAM", "参数错误"), FastJSONResponse)
+
+    page = paginated_response(data=[{"day": date(2024, 1, 1)}], page=1, page_size=20, total=1)
+    assert b'"data":[{"day":"2024-01-01"}]' in page.body
+    assert b'"pagination":{"page":1,"page_size":20,"total":1,"total_pages":1' in page.body
+
+
+@pytest.mark.performance
+@pytest.mark.slow
+def test_daily_report_page_serialization_performance() -> None:
+    rows = [
+        {
+            "id": uuid4(),
+            "ad_account_id": uuid4(),
+            "date": date(2024, 1, 1) + timedelta(days=index % 365),
+            "spend": Decimal("1234.56"),
+            "leads_count": index % 50,
+            "cost_per_lead": Decimal("24.69"),
+            "is_anomaly": index % 97 == 0,
+            "anomaly_reason": None,
+            "note": "日常投放",
+            "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=index),
+        }
+        for index in range(10000)
+    ]
+    content = {"success": True, "data": rows, "message": "获取成功"}
+
+    def _median_ms(render) -> float:
+        samples = []
+        for _ in range(5):
+            start = time.perf_counter()
+            render(content)
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    legacy_ms = _median_ms(_legacy_body)
+    fast_ms = _median_ms(render_json)
+
+    assert render_json(content) == _legacy_body(content)
+    assert fast_ms < legacy_ms, f"fast {fast_ms:.1f}ms vs legacy {legacy_ms:.1f}ms"
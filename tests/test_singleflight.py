@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from backend.core.singleflight import SingleFlight, run_coalesced, single_flight
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class DashboardService:
+    """模拟同步的重型服务方法"""
+
+    calls = 0
+
+    def __init__(self, db=None):
+        self.db = db
+
+    @single_flight(key=lambda self, user, day="today": (user["role"], day), ttl=0)
+    def get_dashboard(self, user, day="today"):
+        type(self).calls += 1
+        time.sleep(0.2)
+        return {"scope": user["role"], "day": day}
+
+
+def test_100_concurrent_identical_requests_execute_once() -> None:
+    DashboardService.calls = 0
+    app = FastAPI()
+
+    @app.get("/dashboard")
+    async def dashboard(role: str = "admin"):
+        # 每个请求各自的服务实例（各自的会话），按数据范围合并
+        return await run_coalesced(DashboardService(db=object()).get_dashboard, {"role": role})
+
+    async def _scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(client.get("/dashboard") for _ in range(100)))
+            other = await client.get("/dashboard", params={"role": "finance"})
+            return responses, other
+
+    responses, other = asyncio.run(_scenario())
+    assert {r.status_code for r in responses} == {200}
+    assert {r.json()["scope"] for r in responses} == {"admin"}
+    assert other.json()["scope"] == "finance"
+    assert DashboardService.calls == 2
+
+
+def test_sync_callers_across_threads_share_one_execution() -> None:
+    DashboardService.calls = 0
+    barrier = threading.Barrier(100)
+
+    def _call(_):
+        barrier.wait()
+        return DashboardService().get_dashboard({"role": "admin"})
+
+    with ThreadPoolExecutor(max_workers=100) as pool:
+        results = list(pool.map(_call, range(100)))
+    assert DashboardService.calls == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_async_callers_share_result_and_errors() -> None:
+    flight = SingleFlight()
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        if value == "bad":
+            raise ValueError("boom")
+        return value * 2
+
+    async def _scenario():
+        results = await asyncio.gather(*(flight.do_async("k", compute, 21) for _ in range(100)))
+        errors = await asyncio.gather(*(flight.do_async("e", compute, "bad") for _ in range(10)), return_exceptions=True)
+        return results, errors
+
+    results, errors = asyncio.run(_scenario())
+    assert results == [42] * 100
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert calls == [21, "bad"]
+
+    # 失败不缓存，进行中的调用结束后重新执行
+    with pytest.raises(ValueError):
+        asyncio.run(flight.do_async("e", compute, "bad"))
+    assert calls == [21, "bad", "bad"]
+
+
+def test_result_ttl() -> None:
+    clock = FakeClock()
+    flight = SingleFlight(ttl=2, timer=clock)
+    counter = iter(range(100))
+
+    assert flight.do("k", lambda: next(counter)) == 0
+    clock.now = 1.5
+    assert flight.do("k", lambda: next(counter)) == 0
+    clock.now = 2.5
+    assert flight.do("k", lambda: next(counter)) == 1
+    flight.forget("k")
+    assert flight.do("k", lambda: next(counter)) == 2
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call() -> None:
+    flight = SingleFlight()
+    started = threading.Event()
+
+    async def compute():
+        started.set()
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def _scenario():
+        leader = asyncio.ensure_future(flight.do_async("k", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do_async("k", compute))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await leader
+
+    assert asyncio.run(_scenario()) == "done"
+    assert started.is_set()